@@ -0,0 +1,260 @@
+# agent_core.py —— 学生端采样 / 编码 / 发送 流水线
+# 功能：采样线程按固定节拍探测前台窗口，编码线程负责截图压缩和组装上报数据，
+#      发送线程负责上报；线程之间用有界队列连接，慢速网络不会拖慢采样节拍。
+#      背压只在采样队列按策略处理（丢弃 / 合并）；编码后的记录不再丢弃，发送卡住时编码线程等待
+
+import collections
+import random
+import threading
+import time
+
+# 队列满时的处理策略
+DROP_OLDEST = 'drop_oldest'  # 丢弃最旧的一条，保证最新数据进入队列
+COALESCE = 'coalesce'        # 与队尾内容相同（key 相同）时合并为一条，否则丢弃最旧的
+BLOCK = 'block'              # 阻塞生产者直到有空位（超时则丢弃新数据）
+
+POLICIES = (DROP_OLDEST, COALESCE, BLOCK)
+
+
+class SampleQueue:
+    """
+    带背压策略的有界队列，记录深度、丢弃、合并等统计数据
+    on_drop(item)  数据被丢弃时调用（drop_oldest / coalesce 挤掉的旧数据，block 超时或队列关闭时未入队的新数据），
+                   在放入数据的线程中、队列锁之外调用；被合并的数据不算丢弃
+    """
+
+    def __init__(self, maxsize, policy=DROP_OLDEST, key=None, block_timeout=None, on_drop=None):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的队列策略: {policy}")
+        if policy == COALESCE and key is None:
+            raise ValueError("coalesce 策略需要 key")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.key = key
+        self.block_timeout = block_timeout
+        self.on_drop = on_drop
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.blocked_seconds = 0.0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """放入一条数据，返回是否入队（合并也算入队）"""
+        dropped = self._put(item)
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped[0])
+        return dropped is None or dropped[0] is not item
+
+    def _put(self, item):
+        """返回 None 或 (被丢弃的数据,)"""
+        with self._cond:
+            self.put_count += 1
+            if self.policy == COALESCE and self._items:
+                if self.key(self._items[-1]) == self.key(item):
+                    self._items[-1] = item
+                    self.coalesced += 1
+                    return None
+            dropped = None
+            if len(self._items) >= self.maxsize:
+                if self.policy == BLOCK:
+                    started = time.monotonic()
+                    self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed, self.block_timeout)
+                    self.blocked_seconds += time.monotonic() - started
+                    if len(self._items) >= self.maxsize:
+                        self.dropped += 1
+                        return (item,)
+                else:
+                    dropped = (self._items.popleft(),)
+                    self.dropped += 1
+            self._items.append(item)
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+            return dropped
+
+    def get(self, timeout=None):
+        """取出一条数据，超时返回 None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """停止时调用：唤醒在 block 策略下等待空位的生产者"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def metrics(self):
+        return {
+            "depth": len(self._items),
+            "max_depth": self.max_depth,
+            "put": self.put_count,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+        }
+
+
+class AgentCore:
+    """
+    sample()      采样线程按固定节拍调用，返回采样数据或 None（无需上报）
+    encode(s)     编码线程调用，把采样数据变成上报记录，返回 None 表示丢弃
+    send(r)       发送线程调用，负责上报记录
+    节拍按单调时钟计算下一次时间点，不受单次采样耗时影响；落后超过一个周期时跳过错过的节拍。
+    trigger()     立即采样一次（前台窗口变化时调用），节拍从这次采样重新开始计算
+    set_interval()  运行中修改采样间隔（服务器下发的策略），下一个节拍点按新间隔从上一次采样重新计算
+    policy / key / block_timeout  采样队列的背压策略；编码后的记录队列总是 block，记录不会因为发送卡住而丢弃
+    on_enqueued(s)  采样进入队列后在采样线程中调用（例如此时才记入去重缓存）
+    on_dropped(s)   采样被采样队列丢弃时在采样线程中调用（例如撤销去重记录、保留汇总数据）
+    start_delay   第一次采样前等待的秒数（机房内各台机器按相位错开，见 fleet_schedule）
+    jitter        每次采样时间在节拍点前后随机偏移 ±jitter × interval，节拍点本身不变，长期不会漂移
+    """
+
+    def __init__(self, sample, encode, send, interval, queue_size=32,
+                 policy=DROP_OLDEST, key=None, block_timeout=None, start_delay=0.0, jitter=0.0,
+                 rng=random.random, on_enqueued=None, on_dropped=None):
+        self.sample = sample
+        self.encode = encode
+        self.send = send
+        self.interval = float(interval)
+        self.start_delay = max(0.0, float(start_delay))
+        self.jitter = max(0.0, min(0.5, float(jitter)))
+        self.rng = rng
+        self.on_enqueued = on_enqueued
+        self.sample_queue = SampleQueue(queue_size, policy, key=key, block_timeout=block_timeout,
+                                        on_drop=on_dropped)
+        self.send_queue = SampleQueue(queue_size, BLOCK)
+        self.sampled = 0
+        self.encoded = 0
+        self.sent = 0
+        self.errors = 0
+        self.missed_ticks = 0
+        self.max_lateness = 0.0
+        self.triggered = 0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._retimed = False
+        self._threads = [
+            threading.Thread(target=self._sampler, name='agent-sampler', daemon=True),
+            threading.Thread(target=self._encoder, name='agent-encoder', daemon=True),
+            threading.Thread(target=self._sender, name='agent-sender', daemon=True),
+        ]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def trigger(self):
+        self.triggered += 1
+        self._wake.set()
+
+    def set_interval(self, interval):
+        """修改采样间隔，返回是否有变化"""
+        interval = float(interval)
+        if interval <= 0 or interval == self.interval:
+            return False
+        self.interval = interval
+        self._retimed = True
+        self._wake.set()
+        return True
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        self.sample_queue.close()
+        self.send_queue.close()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _target(self, tick):
+        """节拍点加上有界抖动后的实际采样时间"""
+        if not self.jitter:
+            return tick
+        return tick + self.jitter * self.interval * (2 * self.rng() - 1)
+
+    def _sampler(self):
+        next_tick = target = time.monotonic() + self.start_delay
+        triggered = self._wake.wait(self.start_delay) if self.start_delay else False
+        self._wake.clear()
+        while not self._stop.is_set():
+            started = time.monotonic()
+            if not triggered:
+                self.max_lateness = max(self.max_lateness, started - target)
+            try:
+                item = self.sample()
+                if item is not None:
+                    self.sampled += 1
+                    if self.sample_queue.put(item) and self.on_enqueued is not None:
+                        self.on_enqueued(item)
+            except Exception as e:
+                self.errors += 1
+                print(f"采样失败: {str(e)}")
+            next_tick = started + self.interval if triggered else next_tick + self.interval
+            now = time.monotonic()
+            if now > next_tick:
+                # 采样本身超过一个周期，跳过错过的节拍而不是连续补采
+                skipped = int((now - next_tick) // self.interval) + 1
+                self.missed_ticks += skipped
+                next_tick += skipped * self.interval
+            # 节拍未到就被唤醒，说明是 trigger() 触发的采样
+            while True:
+                target = self._target(next_tick)
+                triggered = self._wake.wait(max(0.0, target - now))
+                self._wake.clear()
+                if not self._retimed:
+                    break
+                # 间隔被修改：按新间隔从上一次采样重新计算节拍点，继续等待
+                self._retimed = False
+                next_tick = max(started + self.interval, time.monotonic())
+                now = time.monotonic()
+
+    def _encoder(self):
+        while not self._stop.is_set():
+            item = self.sample_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            try:
+                record = self.encode(item)
+            except Exception as e:
+                self.errors += 1
+                print(f"编码失败: {str(e)}")
+                continue
+            if record is not None:
+                self.encoded += 1
+                self.send_queue.put(record)
+
+    def _sender(self):
+        while not self._stop.is_set():
+            record = self.send_queue.get(timeout=0.5)
+            if record is None:
+                continue
+            try:
+                self.send(record)
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"发送失败: {str(e)}")
+
+    def metrics(self):
+        """队列深度与吞吐统计"""
+        return {
+            "sampled": self.sampled,
+            "encoded": self.encoded,
+            "sent": self.sent,
+            "errors": self.errors,
+            "missed_ticks": self.missed_ticks,
+            "triggered": self.triggered,
+            "max_lateness_ms": round(self.max_lateness * 1000, 1),
+            "sample_queue": self.sample_queue.metrics(),
+            "send_queue": self.send_queue.metrics(),
+        }
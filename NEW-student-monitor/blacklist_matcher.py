@@ -0,0 +1,159 @@
+# blacklist_matcher.py —— 黑名单编译匹配器
+# 功能：把黑名单规则编译成哈希索引，查询耗时只与被查域名的标签数有关，与规则条数无关
+#
+# 支持的规则写法：
+#   qq.com                  域名规则：匹配 qq.com 及其所有子域名（v.qq.com）；
+#                           bare_domains=False 时按 URL 精确规则处理（view+stu 学生端原来的写法，只有地址完全相同才拦截）
+#   *.qq.com                通配规则：同上（兼容 student.py 的写法）
+#   https://a.com/page      URL 精确规则：完整 URL 相同才匹配
+#   https://a.com/games/    URL 前缀规则：以 / 结尾，匹配该前缀下的所有地址
+#
+# 查询时把域名按标签从右往左依次取后缀（com → qq.com → v.qq.com）到集合中查找，
+# URL 前缀规则按主机名分组，只比较同一主机下的前缀。
+
+import re
+
+# 主机部分到第一个 / ? # 为止
+_HOST_END = re.compile(r'[/?#]')
+
+
+def normalize_host(value):
+    """从 URL 或域名中取出小写主机名（去掉协议、用户信息、端口、路径和末尾的点）"""
+    value = (value or '').strip().lower()
+    scheme_end = value.find('://')
+    if scheme_end >= 0:
+        value = value[scheme_end + 3:]
+    end = _HOST_END.search(value)
+    host = value[:end.start()] if end else value
+    if '@' in host:
+        host = host.rsplit('@', 1)[1]
+    if host.startswith('['):
+        # IPv6 地址：[::1]:8080
+        return host[1:host.find(']')] if ']' in host else host
+    colon = host.find(':')
+    if colon >= 0:
+        host = host[:colon]
+    return host.rstrip('.')
+
+
+class BlacklistMatcher:
+    """
+    rules          初始规则
+    bare_domains   不带 *. 和协议的规则（qq.com）是否当作域名规则匹配所有子域名；
+                   False 时只有地址与规则完全相同（不区分大小写）才匹配
+    """
+
+    def __init__(self, rules=(), bare_domains=True):
+        self.bare_domains = bare_domains
+        self._rules = set()
+        self._domains = {}      # 后缀 → 原始规则
+        self._exact_urls = {}   # 完整 URL → 原始规则
+        self._prefixes = {}     # 主机名 → {前缀: 原始规则}
+        # 不同写法可能归一到同一个索引键（如 qq.com 和 *.qq.com），记录每个键对应的全部规则
+        self._aliases = {}
+        for rule in rules:
+            self.add(rule)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, rule):
+        return rule in self._rules
+
+    @property
+    def rules(self):
+        return set(self._rules)
+
+    def _classify(self, rule):
+        """返回 (类型, 索引键, 主机名)"""
+        lowered = rule.strip().lower()
+        if '://' in lowered:
+            host = normalize_host(lowered)
+            if lowered.endswith('/'):
+                return 'prefix', lowered, host
+            return 'url', lowered, host
+        if lowered.startswith('*.'):
+            lowered = lowered[2:]
+        elif not self.bare_domains:
+            return 'url', lowered, normalize_host(lowered)
+        host = normalize_host(lowered)
+        if host.startswith('www.'):
+            host = host[4:]
+        return 'domain', host, host
+
+    def _index_for(self, kind, host):
+        if kind == 'domain':
+            return self._domains
+        if kind == 'url':
+            return self._exact_urls
+        return self._prefixes.setdefault(host, {})
+
+    def add(self, rule):
+        """增加一条规则"""
+        if not rule or not rule.strip() or rule in self._rules:
+            return False
+        kind, key, host = self._classify(rule)
+        if not key:
+            return False
+        self._rules.add(rule)
+        self._aliases.setdefault((kind, key), set()).add(rule)
+        self._index_for(kind, host).setdefault(key, rule)
+        return True
+
+    def remove(self, rule):
+        """删除一条规则"""
+        if rule not in self._rules:
+            return False
+        self._rules.discard(rule)
+        kind, key, host = self._classify(rule)
+        aliases = self._aliases.get((kind, key), set())
+        aliases.discard(rule)
+        index = self._index_for(kind, host)
+        if aliases:
+            # 还有其他写法指向同一个键，改由剩下的规则占用
+            index[key] = next(iter(aliases))
+        else:
+            self._aliases.pop((kind, key), None)
+            index.pop(key, None)
+            if kind == 'prefix' and not index:
+                self._prefixes.pop(host, None)
+        return True
+
+    def update(self, rules):
+        """与新的规则列表对比，只增删有变化的规则，返回 (新增数, 删除数)"""
+        new_rules = {r for r in rules if r and r.strip()}
+        removed = self._rules - new_rules
+        added = new_rules - self._rules
+        for rule in removed:
+            self.remove(rule)
+        for rule in added:
+            self.add(rule)
+        return len(added), len(removed)
+
+    def match_host(self, host):
+        """按域名后缀匹配，返回命中的规则或 None"""
+        if not host or not self._domains:
+            return None
+        labels = host.split('.')
+        for i in range(len(labels)):
+            rule = self._domains.get('.'.join(labels[i:]))
+            if rule is not None:
+                return rule
+        return None
+
+    def match(self, value):
+        """匹配 URL 或域名，返回命中的规则或 None"""
+        if not value or not self._rules:
+            return None
+        host = normalize_host(value)
+        lowered = value.strip().lower()
+        rule = self._exact_urls.get(lowered)
+        if rule is not None:
+            return rule
+        if '://' in value:
+            group = self._prefixes.get(host)
+            if group:
+                for prefix, rule in group.items():
+                    if lowered.startswith(prefix):
+                        return rule
+        return self.match_host(host)
@@ -0,0 +1,161 @@
+# blacklist_sync.py —— 带版本号的黑名单同步（学生端）
+# 功能：服务器每次增删黑名单规则时版本号加 1（见 server.js 的 /api/url-blacklist/current），学生端：
+#      - 带 since=当前版本号 和 If-None-Match 请求：没有变化时服务器返回 304，有变化时只返回差异（新增 / 删除的规则），
+#        版本太旧（变更记录已清理）或服务器重启过（epoch 不同）时返回完整列表
+#      - 推送事件（blacklist-update）直接带着差异：base 与本地版本号相同时就地应用，不再请求服务器；
+#        发现缺了版本（base 比本地新、epoch 不同）时才需要请求，由调用方等待随机的 fetch_delay() 秒后再请求，
+#        避免整栋楼的学生机在同一时刻请求服务器
+#      差异直接增删 BlacklistMatcher 中的规则（就地更新编译索引，不重建）。
+#
+# 服务器返回格式:
+#   完整列表  {"epoch": ..., "version": 12, "full": true, "blacklist": [规则, ...]}
+#   差异      {"epoch": ..., "version": 12, "base": 10, "full": false, "added": [...], "removed": [...]}
+#   推送事件  {"epoch": ..., "version": 12, "base": 11, "added": [...], "removed": [...]}
+
+import json
+import random
+import threading
+
+from blacklist_matcher import BlacklistMatcher
+
+
+class BlacklistSync:
+    """
+    matcher   要更新的 BlacklistMatcher
+    jitter    发现缺版本后，请求前随机等待的最长秒数
+    """
+
+    def __init__(self, matcher=None, jitter=10.0, rng=random.random):
+        self.matcher = matcher if matcher is not None else BlacklistMatcher()
+        self.jitter = jitter
+        self.rng = rng
+        self.epoch = None
+        self.version = None
+        self.etag = None
+        # 定期请求和推送可能来自不同线程
+        self._lock = threading.RLock()
+        self.stats = {"full": 0, "diffs": 0, "not_modified": 0, "pushes": 0, "push_duplicates": 0, "gaps": 0,
+                      "response_bytes": 0}
+
+    def request_options(self):
+        """返回 (查询参数, 请求头)"""
+        if self.version is None:
+            return {}, {}
+        params = {"since": self.version, "epoch": self.epoch}
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        return params, headers
+
+    def _apply(self, added, removed):
+        result = [0, 0]
+        for rule in removed or ():
+            result[1] += self.matcher.remove(rule)
+        for rule in added or ():
+            result[0] += self.matcher.add(rule)
+        return tuple(result)
+
+    def apply_response(self, status, data, etag=None):
+        """应用一次请求的结果，返回 (新增数, 删除数)"""
+        with self._lock:
+            return self._apply_response(status, data, etag)
+
+    def _apply_response(self, status, data, etag):
+        if status == 304:
+            self.stats["not_modified"] += 1
+            return 0, 0
+        self.etag = etag
+        if data.get("full", True) or "blacklist" in data:
+            self.stats["full"] += 1
+            changes = self.matcher.update(data.get("blacklist", []))
+        elif data.get("epoch") == self.epoch and data.get("base") == self.version:
+            self.stats["diffs"] += 1
+            changes = self._apply(data.get("added"), data.get("removed"))
+        else:
+            # 不是基于本地版本的差异：丢弃，下次请求完整列表
+            self.stats["gaps"] += 1
+            self.epoch = self.version = self.etag = None
+            return 0, 0
+        self.epoch = data.get("epoch")
+        self.version = data.get("version")
+        return changes
+
+    def apply_push(self, data):
+        """
+        应用推送事件中的差异，返回 (新增数, 删除数)；
+        缺版本时返回 None，调用方应在 fetch_delay() 秒后调用 pull()
+        """
+        with self._lock:
+            return self._apply_push(data)
+
+    def _apply_push(self, data):
+        self.stats["pushes"] += 1
+        version, base = data.get("version"), data.get("base")
+        if self.version is None or version is None or base is None or data.get("epoch") != self.epoch \
+                or base > self.version:
+            self.stats["gaps"] += 1
+            return None
+        if version <= self.version:
+            self.stats["push_duplicates"] += 1
+            return 0, 0
+        # base 不晚于本地版本：重复的部分增删是幂等的
+        changes = self._apply(data.get("added"), data.get("removed"))
+        self.version = version
+        self.etag = None
+        return changes
+
+    def fetch_delay(self):
+        return self.jitter * self.rng()
+
+    def pull(self, session, url, timeout=5):
+        """用 requests 兼容的 session 请求一次，返回 (新增数, 删除数)；HTTP 错误抛出异常"""
+        with self._lock:
+            params, headers = self.request_options()
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+            self.stats["response_bytes"] += len(response.content or b'')
+            if response.status_code == 304:
+                return self._apply_response(304, None, None)
+            response.raise_for_status()
+            return self._apply_response(response.status_code, response.json(), response.headers.get('ETag'))
+
+    def pull_or_full(self, session, url, full_url, timeout=5):
+        """
+        同 pull()；旧版服务器没有带版本号的接口（返回 404）时改为请求 full_url 的完整列表（域名数组，
+        如端口 3000 服务端的 /api/blacklist）
+        """
+        try:
+            return self.pull(session, url, timeout=timeout)
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            if response is None or response.status_code != 404:
+                raise
+        response = session.get(full_url, timeout=timeout)
+        response.raise_for_status()
+        with self._lock:
+            self.stats["full"] += 1
+            self.stats["response_bytes"] += len(response.content or b'')
+            self.epoch = self.version = self.etag = None
+            return self.matcher.update(response.json())
+
+    def metrics(self):
+        return dict(self.stats, version=self.version, rules=len(self.matcher))
+
+
+def read_events(lines):
+    """
+    解析 Server-Sent Events（如 requests 的 response.iter_lines(decode_unicode=True)），
+    依次产生 (事件名, 解析后的 JSON 数据)
+    """
+    event, data = 'message', []
+    for line in lines:
+        if line is None:
+            continue
+        if line == '':
+            if data:
+                try:
+                    yield event, json.loads('\n'.join(data))
+                except ValueError:
+                    pass
+            event, data = 'message', []
+        elif line.startswith('event:'):
+            event = line[6:].strip()
+        elif line.startswith('data:'):
+            data.append(line[5:].strip())
@@ -0,0 +1,108 @@
+// blacklist_versions.js —— 带版本号的黑名单（服务端，学生端见 blacklist_sync.py）
+// 功能：每次增删域名版本号加 1，变更记录保存在内存中（最多 keep 条）；
+//      GET /api/url-blacklist/current 带 since（及 epoch）时只返回差异，If-None-Match 或 since 与当前版本相同时返回 304；
+//      GET /api/url-blacklist/events（Server-Sent Events）推送 blacklist-update 事件，事件直接带着差异。
+// epoch 每次启动随机生成，区分不同的启动，其它启动的版本号一律返回完整列表。
+// server.js（端口 3003）与端口 3000 的服务端（server66.js、view+stu版本更新/ 中的服务端）共用。
+
+const crypto = require('crypto');
+
+function createBlacklistVersions(keep = 1000) {
+  const epoch = crypto.randomBytes(4).toString('hex');
+  const changes = [];  // [{ version, domain, op: 'add' | 'remove' }]
+  const subscribers = new Set();
+  let version = 0;
+
+  function etag() {
+    return `"${epoch}-${version}"`;
+  }
+
+  // 记录一次变更，并把差异直接推送给已连接的学生端
+  function record(domain, op) {
+    version += 1;
+    changes.push({ version, domain, op });
+    if (changes.length > keep) changes.shift();
+    const event = {
+      epoch,
+      base: version - 1,
+      version,
+      added: op === 'add' ? [domain] : [],
+      removed: op === 'remove' ? [domain] : []
+    };
+    broadcast(`event: blacklist-update\ndata: ${JSON.stringify(event)}\n\n`);
+  }
+
+  function broadcast(frame) {
+    subscribers.forEach(res => res.write(frame));
+  }
+
+  // since 之后的净变化；变更记录已被清理时返回 null
+  function diff(since) {
+    const oldest = changes.length ? changes[0].version : version + 1;
+    if (since < oldest - 1 || since > version) return null;
+    const first = new Map();
+    const last = new Map();
+    changes.forEach(change => {
+      if (change.version <= since) return;
+      if (!first.has(change.domain)) first.set(change.domain, change.op);
+      last.set(change.domain, change.op);
+    });
+    const added = [];
+    const removed = [];
+    // 先加后删、先删后加的域名相对 since 没有变化
+    last.forEach((op, domain) => {
+      if (op !== first.get(domain)) return;
+      (op === 'add' ? added : removed).push(domain);
+    });
+    return { added, removed };
+  }
+
+  // GET /api/url-blacklist/current；listDomains(callback(err, domains)) 读取完整列表
+  function current(listDomains) {
+    return (req, res) => {
+      const tag = etag();
+      const sameEpoch = req.query.epoch === epoch;
+      const since = Number.parseInt(req.query.since, 10);
+      res.set('ETag', tag);
+      res.set('Cache-Control', 'no-cache');
+      if (req.get('If-None-Match') === tag || (sameEpoch && since === version)) {
+        return res.status(304).end();
+      }
+      const changed = sameEpoch && Number.isInteger(since) ? diff(since) : null;
+      if (changed) {
+        return res.json({ epoch, version, base: since, full: false, ...changed });
+      }
+      const listed = version;
+      listDomains((err, domains) => {
+        if (err) return res.status(500).json({ error: '获取域名黑名单失败:' + err.message });
+        // 查询期间又有变更时，列表可能比 version 新；之后的差异按域名增删是幂等的
+        res.json({ epoch, version: listed, full: true, blacklist: domains });
+      });
+    };
+  }
+
+  // GET /api/url-blacklist/events；onConnect(res) 可以在连接后先发送其它事件
+  function events(onConnect) {
+    return (req, res) => {
+      res.set({ 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', Connection: 'keep-alive' });
+      res.flushHeaders();
+      res.write('retry: 10000\n\n');
+      if (onConnect) onConnect(res);
+      subscribers.add(res);
+      req.on('close', () => subscribers.delete(res));
+    };
+  }
+
+  return {
+    epoch,
+    get version() { return version; },
+    etag,
+    record,
+    broadcast,
+    diff,
+    current,
+    events
+  };
+}
+
+module.exports = { createBlacklistVersions };
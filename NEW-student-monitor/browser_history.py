@@ -0,0 +1,176 @@
+# browser_history.py —— 增量读取 Chrome / Edge / Firefox 浏览历史
+# 功能：按浏览器配置文件记录已上传的最大访问记录ID（高水位），每次只读取新的访问记录；
+#      优先以只读方式直接打开历史数据库，不再每次复制几百MB的文件
+#
+# 打开数据库的顺序：
+#   1. mode=ro        只读打开，能看到 WAL 中尚未合并的最新记录
+#   2. immutable=1    浏览器独占锁定数据库时使用，忽略锁直接读主文件（WAL 中的记录下次再补）
+#   3. 复制到临时文件  以上都失败时的兜底方案，连同 -wal 文件一起复制
+
+import glob
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote
+
+CHROME_QUERY = """
+    SELECT v.id, u.url, u.title, v.visit_time
+    FROM visits v JOIN urls u ON u.id = v.url
+    WHERE v.id > ?
+    ORDER BY v.id
+    LIMIT ?
+"""
+CHROME_MAX_ID = "SELECT MAX(id) FROM visits"
+
+FIREFOX_QUERY = """
+    SELECT v.id, p.url, p.title, v.visit_date
+    FROM moz_historyvisits v JOIN moz_places p ON p.id = v.place_id
+    WHERE v.id > ?
+    ORDER BY v.id
+    LIMIT ?
+"""
+FIREFOX_MAX_ID = "SELECT MAX(id) FROM moz_historyvisits"
+
+
+def chrome_time(value):
+    """Chrome时间戳（1601-01-01起的微秒）转字符串"""
+    return (datetime(1601, 1, 1) + timedelta(microseconds=value)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def firefox_time(value):
+    """Firefox时间戳（1970-01-01起的微秒）转字符串"""
+    return datetime.fromtimestamp(value / 1000000).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _sqlite_uri(path, **params):
+    """生成 SQLite URI（Windows 下为 file:///C:/...）"""
+    posix = Path(path).resolve().as_posix()
+    if not posix.startswith('/'):
+        posix = '/' + posix
+    query = '&'.join(f"{k}={v}" for k, v in params.items())
+    return f"file://{quote(posix, safe='/:')}?{query}"
+
+
+class HistoryCursorStore:
+    """把每个历史数据库的高水位（最后上传的访问记录ID）保存在 JSON 文件中"""
+
+    def __init__(self, path):
+        self.path = path
+        self.cursors = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.cursors = json.load(f)
+        except (OSError, ValueError):
+            self.cursors = {}
+
+    def get(self, key):
+        return self.cursors.get(key)
+
+    def commit(self, updates):
+        """上传成功后再写入新的高水位（先写临时文件再替换，避免写一半时断电）"""
+        if not updates:
+            return
+        self.cursors.update(updates)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cursors, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class BrowserHistoryCollector:
+    """
+    profiles: [(browser, db_path, kind)]，kind 为 'chromium' 或 'firefox'
+    collect() 返回 (新访问记录列表, 待提交的高水位)，上传成功后调用 commit() 提交高水位，
+    上传失败则不提交，下次从同一位置重新读取。
+    """
+
+    def __init__(self, profiles, cursor_store, limit=50):
+        self.profiles = profiles
+        self.cursor_store = cursor_store
+        self.limit = limit
+
+    def _open(self, db_path):
+        """返回 (连接, 需要清理的临时目录)"""
+        for params in ({'mode': 'ro'}, {'mode': 'ro', 'immutable': 1}):
+            try:
+                conn = sqlite3.connect(_sqlite_uri(db_path, **params), uri=True, timeout=0.5)
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+                return conn, None
+            except sqlite3.Error:
+                continue
+        # 兜底：复制数据库（及 WAL）到临时目录后读取
+        temp_dir = tempfile.mkdtemp(prefix='history_')
+        temp_path = os.path.join(temp_dir, os.path.basename(db_path))
+        shutil.copy2(db_path, temp_path)
+        for suffix in ('-wal', '-journal'):
+            if os.path.exists(db_path + suffix):
+                shutil.copy2(db_path + suffix, temp_path + suffix)
+        return sqlite3.connect(temp_path), temp_dir
+
+    def read_profile(self, browser, db_path, kind):
+        """读取一个配置文件中高水位之后的访问记录，返回 (记录列表, 新高水位)"""
+        query, max_query, to_time = (
+            (FIREFOX_QUERY, FIREFOX_MAX_ID, firefox_time) if kind == 'firefox'
+            else (CHROME_QUERY, CHROME_MAX_ID, chrome_time))
+        conn, temp_dir = self._open(db_path)
+        try:
+            cursor = self.cursor_store.get(db_path)
+            max_id = conn.execute(max_query).fetchone()[0] or 0
+            if cursor is None or cursor > max_id:
+                # 首次运行（或历史被清空后ID重新开始）只取最近 limit 条，不上传全部历史
+                cursor = max(0, max_id - self.limit)
+            rows = conn.execute(query, (cursor, self.limit)).fetchall()
+        finally:
+            conn.close()
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        visits = []
+        for visit_id, url, title, visit_time in rows:
+            cursor = max(cursor, visit_id)
+            if not visit_time:
+                continue
+            visits.append({
+                "browser": browser, "url": url, "title": title or "无标题",
+                "visit_time": to_time(visit_time)
+            })
+        return visits, cursor
+
+    def collect(self):
+        history = []
+        new_cursors = {}
+        for browser, db_path, kind in self.profiles:
+            if not os.path.exists(db_path):
+                continue
+            try:
+                visits, cursor = self.read_profile(browser, db_path, kind)
+            except Exception as e:
+                print(f"❌ 读取{browser}历史失败：{str(e)[:50]}")
+                continue
+            history.extend(visits)
+            if cursor != self.cursor_store.get(db_path):
+                new_cursors[db_path] = cursor
+        return history, new_cursors
+
+    def commit(self, new_cursors):
+        self.cursor_store.commit(new_cursors)
+
+
+def find_windows_profiles(user_home=None):
+    """枚举 Windows 上 Chrome / Edge 的所有用户配置及 Firefox 的 places.sqlite"""
+    home = user_home or str(Path.home())
+    local = os.path.join(home, 'AppData', 'Local')
+    roaming = os.path.join(home, 'AppData', 'Roaming')
+    profiles = []
+    for browser, root in (("Chrome", os.path.join(local, 'Google', 'Chrome', 'User Data')),
+                          ("Edge", os.path.join(local, 'Microsoft', 'Edge', 'User Data'))):
+        for profile_dir in ['Default'] + sorted(
+                os.path.basename(p) for p in glob.glob(os.path.join(root, 'Profile *'))):
+            profiles.append((browser, os.path.join(root, profile_dir, 'History'), 'chromium'))
+    for db_path in sorted(glob.glob(os.path.join(roaming, 'Mozilla', 'Firefox', 'Profiles', '*', 'places.sqlite'))):
+        profiles.append(("Firefox", db_path, 'firefox'))
+    return profiles
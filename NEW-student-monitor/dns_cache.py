@@ -0,0 +1,155 @@
+# dns_cache.py —— 后台解析、带过期时间的 DNS 缓存（上报网页IP用）
+# 功能：lookup() 只查缓存、从不阻塞调用方；未命中的域名交给后台线程解析，
+#      本次上报带上 pending 状态，解析完成后的上报再带上 IP。
+#      - 解析成功缓存 ttl 秒，失败缓存 negative_ttl 秒（避免反复查询不存在的域名）
+#      - 每次解析有 timeout 秒的期限，超时即记为失败，不会拖住上报
+#      - 过期的记录在后台刷新期间继续使用旧值
+#      - prefetch() 预先解析最近标题 / 网址中出现的域名
+
+import queue
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+RESOLVED = 'resolved'
+PENDING = 'pending'
+FAILED = 'failed'
+
+HOSTNAME_RE = re.compile(r'(?<![\w.-])((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24})(?![\w-])', re.I)
+
+
+def hostname_of(url):
+    """网址中的主机名，无法解析时返回 None"""
+    try:
+        return urlparse(url).hostname
+    except ValueError:
+        return None
+
+
+def hostnames_in(text):
+    """从标题等文本中找出形如域名的片段（用于预解析）"""
+    return [m.lower() for m in HOSTNAME_RE.findall(text or '')]
+
+
+class _Entry:
+    __slots__ = ('ip', 'state', 'expires', 'started')
+
+    def __init__(self):
+        self.ip = ''
+        self.state = PENDING
+        self.expires = 0.0
+        self.started = None
+
+
+class DnsCache:
+    """
+    ttl           解析成功的缓存时间（秒）
+    negative_ttl  解析失败 / 超时的缓存时间（秒）
+    timeout       单次解析期限（秒），超过即视为失败
+    workers       后台解析线程数
+    max_entries   缓存条目上限，超出时淘汰最久未使用的
+    """
+
+    def __init__(self, ttl=300, negative_ttl=30, timeout=1.0, workers=2, max_entries=1024,
+                 resolver=socket.gethostbyname, clock=time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.resolver = resolver
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_entries)
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "pending": 0, "resolved": 0, "failed": 0,
+                      "timeouts": 0, "dropped": 0}
+        # gethostbyname 无法取消，超时的解析只会占住一个守护线程，不影响调用方和程序退出
+        for i in range(max(1, workers)):
+            threading.Thread(target=self._worker, name=f"dns-{i}", daemon=True).start()
+
+    def lookup(self, hostname):
+        """返回 (ip, 状态)，立即返回；状态为 resolved / pending / failed"""
+        if not hostname:
+            return '', FAILED
+        hostname = hostname.lower()
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(hostname)
+            if entry is None:
+                self.stats["misses"] += 1
+                self._schedule(hostname, now)
+                return '', PENDING
+            self._entries.move_to_end(hostname)
+            if entry.started is not None and now - entry.started > self.timeout:
+                # 解析超过期限：记为失败，晚到的结果仍会被接受
+                self.stats["timeouts"] += 1
+                self._finish(entry, '', now)
+            if entry.state == PENDING:
+                self.stats["pending"] += 1
+                return '', PENDING
+            if now >= entry.expires:
+                # 过期：先用旧值，后台刷新
+                self.stats["stale"] += 1
+                self._schedule(hostname, now)
+            else:
+                self.stats["hits"] += 1
+            return entry.ip, entry.state
+
+    def lookup_url(self, url):
+        return self.lookup(hostname_of(url))
+
+    def prefetch(self, hostnames):
+        """后台解析尚未缓存的域名，不等待结果"""
+        now = self.clock()
+        with self._lock:
+            for hostname in hostnames:
+                hostname = hostname.lower()
+                if hostname not in self._entries:
+                    self._schedule(hostname, now)
+
+    def _schedule(self, hostname, now):
+        entry = self._entries.get(hostname)
+        if entry is None:
+            entry = self._entries[hostname] = _Entry()
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if entry.started is not None:
+            return
+        try:
+            self._queue.put_nowait(hostname)
+        except queue.Full:
+            # 解析线程全部卡住时不再排队，下次查询再试
+            self.stats["dropped"] += 1
+            if entry.state == PENDING:
+                del self._entries[hostname]
+            return
+        entry.started = now
+
+    def _finish(self, entry, ip, now):
+        entry.started = None
+        if ip:
+            entry.ip, entry.state, entry.expires = ip, RESOLVED, now + self.ttl
+            self.stats["resolved"] += 1
+        else:
+            entry.ip, entry.state, entry.expires = '', FAILED, now + self.negative_ttl
+            self.stats["failed"] += 1
+
+    def _worker(self):
+        while True:
+            hostname = self._queue.get()
+            try:
+                ip = self.resolver(hostname) or ''
+            except (OSError, UnicodeError):
+                ip = ''
+            now = self.clock()
+            with self._lock:
+                entry = self._entries.get(hostname)
+                if entry is not None and (entry.started is not None or ip):
+                    self._finish(entry, ip, now)
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
@@ -0,0 +1,63 @@
+# fleet_schedule.py —— 机房规模的调度：稳定的相位偏移、有界抖动、去相关的指数退避
+# 功能：同一机房的学生机往往在同一时刻开机（上课铃）或同时发现服务器重启，
+#      固定节拍 + 固定间隔重连会让所有机器步调一致地请求服务器，请求集中在少数几秒内。
+#      - phase_offset(key, interval)       由学生ID（或计算机名）的哈希得到 [0, interval) 内固定的相位，
+#                                          重启后不变，不同机器在周期内均匀错开
+#      - phase_delay(key, interval, now)   距离下一个相位对齐时间点的秒数（按墙上时钟对齐：
+#                                          不论何时开机，同一台机器总在周期内的同一位置执行）
+#      - jittered(delay, jitter)           在 delay 上加 ±jitter 比例的随机量（有界，不会为负）
+#      - DecorrelatedBackoff               去相关抖动的指数退避：下一次等待在 [base, 上一次 × 3] 内随机，
+#                                          不超过 cap；成功后 reset()。同时断线的机器重试时间很快错开。
+#                                          cap 决定服务器恢复后最晚多久全部连上，一般取原固定重连间隔的 3 倍左右：
+#                                          cap 越大重连请求越少、越分散，但恢复越慢（见 tests/sim_schedule.py）
+
+import hashlib
+import random
+import time
+
+
+def phase_offset(key, interval):
+    """key 的稳定哈希映射到 [0, interval)"""
+    digest = hashlib.sha256(str(key).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64 * interval
+
+
+def phase_delay(key, interval, now=None):
+    """从 now（墙上时钟，默认当前时间）到下一个 key 相位对齐的时间点的秒数，范围 [0, interval)"""
+    if interval <= 0:
+        return 0.0
+    now = time.time() if now is None else now
+    return (phase_offset(key, interval) - now) % interval
+
+
+def jittered(delay, jitter, rng=random.random):
+    """delay × (1 ± jitter) 范围内均匀随机"""
+    if jitter <= 0:
+        return delay
+    return max(0.0, delay * (1 + jitter * (2 * rng() - 1)))
+
+
+class DecorrelatedBackoff:
+    """
+    base   第一次重试的最短等待（秒）
+    cap    最长等待（秒），也是服务器恢复后最晚多久重新连上
+    """
+
+    def __init__(self, base=2.0, cap=15.0, rng=random.uniform):
+        self.base = float(base)
+        self.cap = float(cap)
+        self.rng = rng
+        self.current = 0.0
+        self.attempts = 0
+
+    def next(self):
+        """返回下一次重试前应等待的秒数"""
+        self.attempts += 1
+        # 第一次重试在 [base, 3 × base] 内随机
+        previous = self.current or self.base
+        self.current = min(self.cap, self.rng(self.base, previous * 3))
+        return self.current
+
+    def reset(self):
+        self.current = 0.0
+        self.attempts = 0
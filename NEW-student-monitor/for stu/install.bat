@@ -18,6 +18,17 @@ where %PYTHON% >nul 2>&1 || (
 )
 :python_found
 
+:: 复制公共模块（shared_modules.txt）：在源码目录中安装时从上级目录复制；
+:: 只复制了本目录时，先在教师机上运行 python tests\check_bundle.py --sync
+for /f "usebackq eol=# delims=" %%m in ("%~dp0shared_modules.txt") do (
+    if exist "%~dp0..\%%m.py" copy /Y "%~dp0..\%%m.py" "%~dp0%%m.py" >nul
+    if not exist "%~dp0%%m.py" (
+        echo ❌ 缺少公共模块 %%m.py，请在源码目录运行 python tests\check_bundle.py --sync 后重新复制本目录
+        pause
+        exit /b 1
+    )
+)
+
 :: 安装依赖
 %PYTHON% -m pip install --upgrade pip
 %PYTHON% -m pip install -r requirements.txt
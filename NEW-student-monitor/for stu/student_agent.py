@@ -49,7 +49,9 @@ except:
 try:
     import win32gui
     import win32process
-    import psutil
+    from process_cache import ProcessCache
+
+    process_cache = ProcessCache()
 
     def get_active_browser_info():
         """返回 (url, title)，若非浏览器或无法获取则返回 (None, None)"""
@@ -60,11 +62,10 @@ try:
         # 获取窗口标题 & 进程名
         title = win32gui.GetWindowText(hwnd)
         _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        try:
-            proc = psutil.Process(pid)
-            exe_name = os.path.basename(proc.exe()).lower()
-        except:
+        proc = process_cache.lookup(pid, hwnd)
+        if proc is None:
             return None, None
+        exe_name = proc.exe_name
 
         # 仅监控 Chromium 浏览器（Chrome / Edge）
         if 'chrome' not in exe_name and 'msedge' not in exe_name:
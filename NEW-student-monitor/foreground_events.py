@@ -0,0 +1,268 @@
+# foreground_events.py —— 前台窗口变化事件源
+# 功能：切换窗口 / 标签页时立即通知采样流水线，而不是等下一个固定节拍：
+#      - WinEventSource    Windows 事件钩子（EVENT_SYSTEM_FOREGROUND 前台切换、EVENT_OBJECT_NAMECHANGE 标题变化），
+#                          不轮询，没有变化时不消耗 CPU
+#      - PollingSource     没有事件钩子时的退化方案：高频只比较前台窗口句柄和标题（不做进程查询、标题解析）
+#      - ScriptedSource    按脚本（时间, 窗口）依次切换，供测试使用；同时提供 foreground_window()，可直接作为探测后端
+#      ForegroundMonitor 对原始事件去抖：连续 Alt-Tab 等快速切换在 settle 秒内没有新变化才通知一次，
+#      标题持续变化（如视频播放进度）时最多每 max_wait 秒通知一次；与上一次通知的窗口相同时不通知。
+#
+# 接口（各事件源相同）：
+#   start(emit)   开始监听，窗口变化时在事件源自己的线程中调用 emit(window)
+#   stop()
+
+import threading
+import time
+
+try:
+    import ctypes
+    from ctypes import wintypes
+    _user32 = ctypes.windll.user32
+    _kernel32 = ctypes.windll.kernel32
+except Exception:
+    _user32 = None
+    _kernel32 = None
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+WM_QUIT = 0x0012
+
+
+def window_key(window):
+    return None if window is None else (window.hwnd, window.title)
+
+
+class WinEventSource:
+    """Windows 事件钩子；钩子回调在本线程的消息循环中执行"""
+
+    name = 'winevent'
+
+    def __init__(self, probe):
+        self.probe = probe
+        self._emit = None
+        self._thread = None
+        self._thread_id = None
+        self._ready = threading.Event()
+        self._callback = None
+
+    def _on_event(self, hook, event, hwnd, id_object, id_child, event_thread, event_time):
+        if event == EVENT_OBJECT_NAMECHANGE:
+            # 只关心前台顶层窗口自身的标题变化（浏览器切换标签页时标题随之改变）
+            if id_object != OBJID_WINDOW or id_child != CHILDID_SELF or hwnd != _user32.GetForegroundWindow():
+                return
+        try:
+            self._emit(self.probe.foreground_window())
+        except Exception as e:
+            print(f"前台窗口事件处理失败: {str(e)}")
+
+    def _run(self):
+        self._thread_id = _kernel32.GetCurrentThreadId()
+        proc_type = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND, wintypes.LONG,
+                                       wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        # 回调对象必须一直被引用，否则会被回收
+        self._callback = proc_type(self._on_event)
+        flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+        hooks = [_user32.SetWinEventHook(event, event, 0, self._callback, 0, 0, flags)
+                 for event in (EVENT_SYSTEM_FOREGROUND, EVENT_OBJECT_NAMECHANGE)]
+        self._ready.set()
+        msg = wintypes.MSG()
+        while _user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            _user32.TranslateMessage(ctypes.byref(msg))
+            _user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks:
+            if hook:
+                _user32.UnhookWinEvent(hook)
+
+    def start(self, emit):
+        self._emit = emit
+        self._thread = threading.Thread(target=self._run, name='foreground-winevent', daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._thread_id is not None:
+            _user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class PollingSource:
+    """每 interval 秒比较一次前台窗口句柄和标题，有变化时通知"""
+
+    name = 'poll'
+
+    def __init__(self, probe, interval=0.5):
+        self.probe = probe
+        self.interval = interval
+        self.polls = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self, emit):
+        last = None
+        while not self._stop.is_set():
+            try:
+                window = self.probe.foreground_window()
+                self.polls += 1
+                if window_key(window) != last:
+                    last = window_key(window)
+                    emit(window)
+            except Exception as e:
+                print(f"前台窗口轮询失败: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self, emit):
+        self._thread = threading.Thread(target=self._run, args=(emit,), name='foreground-poll', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class ScriptedSource:
+    """
+    steps 为 [(相对开始的秒数, Window 或 None), ...]，按时间依次切换前台窗口并通知；
+    speed 为回放倍速。foreground_window() 返回当前脚本中的前台窗口。
+    """
+
+    name = 'scripted'
+
+    def __init__(self, steps, speed=1.0, clock=time.monotonic):
+        self.steps = sorted(steps, key=lambda step: step[0])
+        self.speed = float(speed)
+        self.clock = clock
+        self.current = None
+        self.done = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def foreground_window(self):
+        return self.current
+
+    def _run(self, emit):
+        start = self.clock()
+        for t, window in self.steps:
+            delay = start + t / self.speed - self.clock()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            self.current = window
+            emit(window)
+        self.done.set()
+
+    def start(self, emit):
+        self._thread = threading.Thread(target=self._run, args=(emit,), name='foreground-scripted', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class ForegroundMonitor:
+    """
+    source    事件源（WinEventSource / PollingSource / ScriptedSource）
+    callback  去抖后的通知，参数为当前前台窗口（可能为 None）
+    settle    最后一次变化后等待多少秒没有新变化才通知
+    max_wait  持续变化时，距第一次未通知的变化最多等待多少秒
+    """
+
+    def __init__(self, source, callback, settle=0.3, max_wait=2.0, clock=time.monotonic):
+        self.source = source
+        self.callback = callback
+        self.settle = settle
+        self.max_wait = max_wait
+        self.clock = clock
+        self.raw_events = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._has_pending = False
+        self._first = None
+        self._last = None
+        self._delivered_key = object()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='foreground-monitor', daemon=True)
+
+    def push(self, window):
+        """事件源线程调用：记录最新的前台窗口，由去抖线程决定何时通知"""
+        now = self.clock()
+        with self._cond:
+            self.raw_events += 1
+            if self._has_pending:
+                self.coalesced += 1
+            else:
+                self._first = now
+            self._pending = window
+            self._has_pending = True
+            self._last = now
+            self._cond.notify()
+
+    def _due_in(self, now):
+        return min(self._last + self.settle, self._first + self.max_wait) - now
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop and (not self._has_pending or self._due_in(self.clock()) > 0):
+                    self._cond.wait(self._due_in(self.clock()) if self._has_pending else None)
+                if self._stop:
+                    return
+                window = self._pending
+                self._pending = None
+                self._has_pending = False
+            if window_key(window) == self._delivered_key:
+                # 一阵切换之后又回到了原来的窗口
+                continue
+            self._delivered_key = window_key(window)
+            self.delivered += 1
+            try:
+                self.callback(window)
+            except Exception as e:
+                print(f"前台窗口变化处理失败: {str(e)}")
+
+    def start(self):
+        self._thread.start()
+        self.source.start(self.push)
+        return self
+
+    def stop(self):
+        self.source.stop()
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+
+    def metrics(self):
+        return {"source": self.source.name, "raw_events": self.raw_events,
+                "delivered": self.delivered, "coalesced": self.coalesced}
+
+
+def create_event_source(backend, probe, poll_interval=0.5):
+    """
+    backend: off（不使用，返回 None）/ auto（Windows 上用事件钩子，取不到窗口的 null 探测后端不使用，否则轮询）/
+             winevent / poll
+    """
+    if backend == 'auto':
+        if getattr(probe, 'name', '') == 'null':
+            return None
+        backend = 'winevent' if _user32 is not None and getattr(probe, 'name', '') == 'win32' else 'poll'
+    if backend == 'off':
+        return None
+    if backend == 'winevent':
+        if _user32 is None:
+            raise RuntimeError("winevent 事件源只能在 Windows 上使用")
+        return WinEventSource(probe)
+    if backend == 'poll':
+        return PollingSource(probe, interval=poll_interval)
+    raise ValueError(f"未知的前台窗口事件源: {backend}")
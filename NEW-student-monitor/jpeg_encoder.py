@@ -0,0 +1,138 @@
+# jpeg_encoder.py —— 按目标大小一次到位的 JPEG 编码器
+# 功能：根据本机最近截图的“每像素字节数”预测能满足大小上限的质量和缩放比例，
+#      通常一次编码即可达标；预测偏小时用本次实测结果修正后再编码一次，最多两次。
+#
+# 预测模型：
+#   大小 ≈ bpp × 质量系数(quality) × 像素数 × scale^SCALE_EXPONENT
+#   bpp 为质量 70、原始尺寸下的每像素字节数，按指数移动平均在本机持续学习，
+#   并可保存到 JSON 文件，重启后继续使用（同一机房的画面内容相近，预测会越来越准）。
+
+import json
+import os
+from io import BytesIO
+
+from PIL import Image
+
+# 相对质量 70 的文件大小系数（多种网页/视频/图片画面的中位数）
+QUALITY_CURVE = [(30, 0.66), (40, 0.75), (50, 0.82), (60, 0.89), (70, 1.0), (80, 1.15), (90, 1.46), (95, 1.8)]
+# 缩小后文字、边缘占比上升，文件大小下降得比面积慢
+SCALE_EXPONENT = 1.6
+# 预测时预留的余量，避免刚好超出上限
+SAFETY = 0.9
+RETRY_SAFETY = 0.8
+DEFAULT_BPP = 0.12
+
+
+def quality_factor(quality):
+    """质量系数，分段线性插值"""
+    if quality <= QUALITY_CURVE[0][0]:
+        return QUALITY_CURVE[0][1]
+    for (q0, f0), (q1, f1) in zip(QUALITY_CURVE, QUALITY_CURVE[1:]):
+        if quality <= q1:
+            return f0 + (f1 - f0) * (quality - q0) / (q1 - q0)
+    return QUALITY_CURVE[-1][1]
+
+
+class TargetSizeEncoder:
+    """
+    encode(img) 返回不超过 target_bytes 的 JPEG 数据；两次编码仍超出时返回 None。
+    last_encodes 记录最近一次调用实际编码的次数。
+    """
+
+    def __init__(self, target_bytes, max_quality=70, min_quality=30, min_scale=0.3,
+                 model_path=None, learning_rate=0.3, save_every=20):
+        self.target_bytes = target_bytes
+        self.max_quality = max_quality
+        self.min_quality = min_quality
+        self.min_scale = min_scale
+        self.model_path = model_path
+        self.learning_rate = learning_rate
+        self.save_every = save_every
+        self.bpp = DEFAULT_BPP
+        self.samples = 0
+        self.last_encodes = 0
+        self.total_encodes = 0
+        self._load()
+
+    # -------------------------- 模型 --------------------------
+    def _load(self):
+        if not self.model_path:
+            return
+        try:
+            with open(self.model_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.bpp = float(data.get('bpp', DEFAULT_BPP))
+            self.samples = int(data.get('samples', 0))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def save(self):
+        if not self.model_path:
+            return
+        try:
+            tmp_path = f"{self.model_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'bpp': self.bpp, 'samples': self.samples}, f)
+            os.replace(tmp_path, self.model_path)
+        except OSError as e:
+            print(f"保存JPEG编码模型失败: {str(e)}")
+
+    def predict(self, pixels, quality, scale, bpp=None):
+        """预测编码后的字节数"""
+        return (bpp or self.bpp) * quality_factor(quality) * pixels * scale ** SCALE_EXPONENT
+
+    def observed_bpp(self, size, pixels, quality, scale):
+        """把实测大小换算回参考条件下的每像素字节数"""
+        return size / (quality_factor(quality) * pixels * scale ** SCALE_EXPONENT)
+
+    def learn(self, bpp):
+        self.bpp += self.learning_rate * (bpp - self.bpp)
+        self.samples += 1
+        if self.save_every and self.samples % self.save_every == 0:
+            self.save()
+
+    # -------------------------- 编码 --------------------------
+    def plan(self, pixels, budget, bpp=None):
+        """选择 (质量, 缩放)：优先保持原始尺寸、尽量高的质量；最低质量仍超出时再缩小"""
+        for quality in range(self.max_quality, self.min_quality - 1, -5):
+            if self.predict(pixels, quality, 1.0, bpp) <= budget:
+                return quality, 1.0
+        quality = self.min_quality
+        at_full = self.predict(pixels, quality, 1.0, bpp)
+        scale = (budget / at_full) ** (1 / SCALE_EXPONENT)
+        return quality, max(self.min_scale, min(1.0, scale))
+
+    @staticmethod
+    def _encode(img, quality, scale):
+        if scale < 1.0:
+            size = (max(1, int(img.size[0] * scale)), max(1, int(img.size[1] * scale)))
+            img = img.resize(size, Image.LANCZOS)
+        buf = BytesIO()
+        img.save(buf, format='JPEG', quality=quality)
+        return buf.getvalue()
+
+    def encode(self, img, max_side=None):
+        """
+        max_side: 输出的最大边长。与预测出的缩放比例合并成一次缩放，
+                  不必先缩放到 max_side 再为了大小上限缩放第二次
+        """
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        base = 1.0
+        if max_side and max(img.size) > max_side:
+            base = max_side / max(img.size)
+        pixels = img.size[0] * img.size[1] * base * base
+        self.last_encodes = 0
+
+        bpp = None
+        for safety in (SAFETY, RETRY_SAFETY):
+            quality, scale = self.plan(pixels, self.target_bytes * safety, bpp)
+            data = self._encode(img, quality, base * scale)
+            self.last_encodes += 1
+            self.total_encodes += 1
+            # 本张图片的实测值用于第二次预测，同时更新本机模型
+            bpp = self.observed_bpp(len(data), pixels, quality, scale)
+            self.learn(bpp)
+            if len(data) <= self.target_bytes:
+                return data
+        return None
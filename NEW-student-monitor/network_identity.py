@@ -0,0 +1,98 @@
+# network_identity.py —— 学生端网络身份（本机IP / 主机名）缓存
+# 功能：解析一次本机IP后缓存起来，不再每条上报都做 UDP 探测、网卡枚举和 DNS 查询；
+#      只有在缓存超过 ttl，或定期检查发现网卡地址变化（换网、DHCP 续租得到新地址）时才重新解析。
+#      attach(session) 后 IP 和主机名写入 HTTP 会话的请求头；上报记录在编码时仍应写入 current() 的 IP，
+#      请求头只是服务器在记录缺少 student_ip 时的后备（记录可能先存进发件箱，发送时IP已经变化）。
+
+import socket
+import threading
+import time
+from urllib.parse import quote
+
+IP_HEADER = 'X-Student-IP'
+HOST_HEADER = 'X-Student-Host'
+
+
+def interface_fingerprint():
+    """当前所有网卡的 IPv4 地址（只读本机网卡表，不访问网络）；无法获取时返回 None"""
+    try:
+        import psutil
+        return tuple(sorted(
+            address.address
+            for addresses in psutil.net_if_addrs().values()
+            for address in addresses
+            if address.family == socket.AF_INET))
+    except Exception:
+        return None
+
+
+class NetworkIdentity:
+    """
+    resolve_ip      实际解析本机IP的函数（原 get_local_ip / get_student_ip）
+    ttl             缓存有效期（秒），到期后重新解析
+    check_interval  检查网卡地址是否变化的最短间隔（秒）
+    """
+
+    def __init__(self, resolve_ip, ttl=600, check_interval=10, fingerprint=interface_fingerprint,
+                 clock=time.monotonic):
+        self.resolve_ip = resolve_ip
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.fingerprint = fingerprint
+        self.clock = clock
+        self.ip = None
+        self.hostname = None
+        self._fingerprint = None
+        self._resolved_at = None
+        self._checked_at = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.resolves = 0
+
+    def current(self):
+        """返回 (ip, hostname)，必要时重新解析"""
+        now = self.clock()
+        with self._lock:
+            if self._resolved_at is None or now - self._resolved_at >= self.ttl:
+                self._refresh(now)
+            elif now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                if self.fingerprint() != self._fingerprint:
+                    self._refresh(now)
+            return self.ip, self.hostname
+
+    def invalidate(self):
+        """下次调用 current() 时强制重新解析（例如连续上报失败后）"""
+        with self._lock:
+            self._resolved_at = None
+
+    def on_change(self, callback):
+        """IP 或主机名变化时调用 callback(ip, hostname)"""
+        self._listeners.append(callback)
+
+    def attach(self, session):
+        """把 IP / 主机名写入 requests 会话的请求头，之后每个请求都会带上"""
+        def apply(ip, hostname):
+            session.headers[IP_HEADER] = ip
+            # 请求头只能是 latin-1，中文计算机名需要编码
+            session.headers[HOST_HEADER] = quote(hostname or '')
+        self.on_change(apply)
+        if self.ip is not None:
+            apply(self.ip, self.hostname)
+
+    def _refresh(self, now):
+        self._fingerprint = self.fingerprint()
+        ip = self.resolve_ip()
+        try:
+            hostname = socket.gethostname()
+        except OSError:
+            hostname = self.hostname
+        self.resolves += 1
+        self._resolved_at = self._checked_at = now
+        if (ip, hostname) != (self.ip, self.hostname):
+            self.ip, self.hostname = ip, hostname
+            for callback in self._listeners:
+                callback(ip, hostname)
+
+    def metrics(self):
+        return {"ip": self.ip, "resolves": self.resolves}
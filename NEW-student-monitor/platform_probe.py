@@ -0,0 +1,324 @@
+# platform_probe.py —— 平台探测层（前台窗口、窗口列表、进程信息、截图）
+# 功能：把 win32gui / win32process / psutil / PIL.ImageGrab 的调用集中到统一接口后面，
+#      采样流水线只依赖这个接口，因此在非 Windows 机器上也能用回放 / 合成后端跑基准和长时间测试：
+#      - Win32Probe        真实的 Windows 实现
+#      - TraceProbe        按时间回放窗口切换记录（JSON Lines），窗口和进程信息都来自记录
+#      - SyntheticCapture  按窗口生成确定性的合成画面，每次截图按比例改变部分区域
+#      - NullProbe         没有可用后端时使用，取不到任何窗口
+#
+# 接口（各后端相同）：
+#   foreground_window()  当前前台窗口 Window，没有时返回 None
+#   list_windows()       可见的顶层窗口列表
+#   capture(window)      窗口截图（PIL.Image），失败返回 None
+#   create_time(pid) / exe_name(pid) / pids()   进程信息，进程不存在或无权限时抛出异常（供 ProcessCache 使用）
+
+import bisect
+import json
+import os
+import random
+import time
+from collections import OrderedDict, namedtuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import win32gui
+    import win32process
+except Exception:
+    win32gui = None
+    win32process = None
+
+# rect 为 (left, top, right, bottom)；pid 取不到时为 None
+Window = namedtuple('Window', 'hwnd title window_class pid rect')
+
+
+class PsutilProcesses:
+    """通过 psutil 查询进程信息"""
+
+    def create_time(self, pid):
+        return psutil.Process(pid).create_time()
+
+    def exe_name(self, pid):
+        proc = psutil.Process(pid)
+        try:
+            return os.path.basename(proc.exe()).lower()
+        except Exception:
+            # 没有权限读取路径时退回进程名
+            return proc.name().lower()
+
+    def pids(self):
+        return psutil.pids()
+
+
+class NullProbe(PsutilProcesses):
+    """没有窗口接口的平台（例如未安装 pywin32 的非 Windows 环境）"""
+
+    name = 'null'
+
+    def foreground_window(self):
+        return None
+
+    def list_windows(self):
+        return []
+
+    def capture(self, window):
+        return None
+
+
+class Win32Probe(PsutilProcesses):
+    """Windows 实现"""
+
+    name = 'win32'
+
+    def _window(self, hwnd):
+        try:
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        except Exception:
+            pid = None
+        try:
+            rect = win32gui.GetWindowRect(hwnd)
+        except Exception:
+            rect = None
+        return Window(hwnd, win32gui.GetWindowText(hwnd), win32gui.GetClassName(hwnd), pid, rect)
+
+    def foreground_window(self):
+        hwnd = win32gui.GetForegroundWindow()
+        if not hwnd:
+            return None
+        return self._window(hwnd)
+
+    def list_windows(self):
+        handles = []
+
+        def collect(hwnd, _):
+            if win32gui.IsWindowVisible(hwnd) and win32gui.GetWindowText(hwnd):
+                handles.append(hwnd)
+            return True
+
+        win32gui.EnumWindows(collect, None)
+        windows = []
+        for hwnd in handles:
+            try:
+                windows.append(self._window(hwnd))
+            except Exception:
+                # 枚举过程中窗口已关闭
+                continue
+        return windows
+
+    def capture(self, window):
+        from PIL import ImageGrab
+        return ImageGrab.grab(bbox=window.rect)
+
+
+class SyntheticCapture:
+    """
+    合成截图：每个窗口（按标题）有固定的底图（背景色 + 类似文字行的色块），
+    每次截图把 change_ratio 比例的区块替换成噪声，模拟滚动 / 视频等画面变化。
+    max_side 限制合成画面的最大边长（窗口更大时按比例缩小）
+    """
+
+    def __init__(self, change_ratio=0.1, grid=8, max_side=1600, seed=0, cache_size=32):
+        self.change_ratio = change_ratio
+        self.grid = grid
+        self.max_side = max_side
+        self.seed = seed
+        self.cache_size = cache_size
+        self._bases = OrderedDict()
+        self._rng = random.Random(seed)
+
+    def _size(self, window):
+        left, top, right, bottom = window.rect or (0, 0, 1280, 800)
+        width, height = max(1, right - left), max(1, bottom - top)
+        scale = min(1.0, self.max_side / max(width, height))
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def _base(self, window, size):
+        from PIL import Image, ImageDraw
+        key = (window.title, size)
+        image = self._bases.get(key)
+        if image is not None:
+            self._bases.move_to_end(key)
+            return image
+        rng = random.Random(f"{self.seed}:{window.title}")
+        image = Image.new('RGB', size, tuple(rng.randint(200, 255) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        width, height = size
+        y = rng.randint(4, 40)
+        while y < height - 12:
+            x = rng.randint(8, 40)
+            line_end = rng.randint(width // 3, width - 8)
+            # 一行 “文字”：若干深色短块
+            while x < line_end:
+                word = rng.randint(10, 60)
+                shade = rng.randint(0, 90)
+                draw.rectangle([x, y, min(x + word, line_end), y + 10], fill=(shade, shade, shade))
+                x += word + rng.randint(4, 10)
+            y += rng.randint(16, 32)
+        self._bases[key] = image
+        while len(self._bases) > self.cache_size:
+            self._bases.popitem(last=False)
+        return image
+
+    def capture(self, window):
+        from PIL import Image
+        size = self._size(window)
+        image = self._base(window, size).copy()
+        width, height = size
+        tile_w, tile_h = max(1, width // self.grid), max(1, height // self.grid)
+        tiles = self.grid * self.grid
+        for index in self._rng.sample(range(tiles), int(round(tiles * self.change_ratio))):
+            x, y = index % self.grid * tile_w, index // self.grid * tile_h
+            noise = Image.effect_noise((tile_w, tile_h), self._rng.randint(20, 80)).convert('RGB')
+            image.paste(noise, (x, y))
+        return image
+
+
+class TraceProbe:
+    """
+    按时间回放窗口切换记录。events 为按时间排序的字典列表：
+      {"t": 相对开始的秒数, "title": ..., "exe": "chrome.exe", "class": "Chrome_WidgetWin_1",
+       "rect": [l, t, r, b], "pid": 可选, "closed": 可选（为 true 时表示该窗口关闭）}
+    相同 (exe, class, title) 的记录视为同一个窗口；同一 exe 的窗口属于同一个进程。
+    loop     回放到结尾后从头开始
+    capture  截图后端（默认 SyntheticCapture）
+    clock    时间来源，可传入模拟时钟
+    """
+
+    name = 'trace'
+
+    def __init__(self, events, loop=True, capture=None, clock=time.monotonic):
+        self.events = [e for e in events if not e.get('closed')]
+        self.closed = [e for e in events if e.get('closed')]
+        self.times = [float(e.get('t', 0)) for e in self.events]
+        self.duration = max([float(e.get('t', 0)) for e in events] + [0.0]) + 1.0
+        self.loop = loop
+        self.capture_backend = capture or SyntheticCapture()
+        self.clock = clock
+        self.start = clock()
+        self._windows = {}
+        self._exe_pids = {}
+        self._processes = {}
+
+    def _window_for(self, event):
+        exe = event.get('exe', 'chrome.exe').lower()
+        key = (exe, event.get('class', 'Chrome_WidgetWin_1'), event.get('title', ''))
+        window = self._windows.get(key)
+        if window is None:
+            pid = event.get('pid') or self._exe_pids.setdefault(exe, 1000 + 4 * len(self._exe_pids))
+            self._processes[pid] = exe
+            window = Window(0x10000 + 2 * len(self._windows), key[2], key[1], pid,
+                            tuple(event.get('rect', (0, 0, 1280, 800))))
+            self._windows[key] = window
+        return window
+
+    def _elapsed(self):
+        elapsed = self.clock() - self.start
+        if self.loop:
+            elapsed %= self.duration
+        return elapsed
+
+    def foreground_window(self):
+        index = bisect.bisect_right(self.times, self._elapsed()) - 1
+        if index < 0:
+            return None
+        return self._window_for(self.events[index])
+
+    def list_windows(self):
+        """到当前时间为止出现过且未关闭的窗口，最近激活的在前"""
+        elapsed = self._elapsed()
+        opened = OrderedDict()
+        for t, event in zip(self.times, self.events):
+            if t > elapsed:
+                break
+            window = self._window_for(event)
+            opened.pop(window.hwnd, None)
+            opened[window.hwnd] = window
+        for event in self.closed:
+            if float(event.get('t', 0)) <= elapsed:
+                opened.pop(self._window_for(event).hwnd, None)
+        return list(reversed(opened.values()))
+
+    def capture(self, window):
+        return self.capture_backend.capture(window)
+
+    # 进程信息：记录中出现过的进程一直存在
+    def create_time(self, pid):
+        if pid not in self._processes:
+            raise LookupError(pid)
+        return 0.0
+
+    def exe_name(self, pid):
+        return self._processes[pid]
+
+    def pids(self):
+        return list(self._processes)
+
+
+def load_trace(path):
+    """读取 JSON Lines 格式的窗口切换记录"""
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    events.sort(key=lambda e: float(e.get('t', 0)))
+    return events
+
+
+# 合成记录使用的站点 / 应用（exe, 窗口类名, 标题）
+SYNTHETIC_WINDOWS = [
+    ('chrome.exe', 'Chrome_WidgetWin_1', '百度一下，你就知道 - Google Chrome'),
+    ('chrome.exe', 'Chrome_WidgetWin_1', '学科网 - www.zxxk.com - Google Chrome'),
+    ('chrome.exe', 'Chrome_WidgetWin_1', '初中数学教学资源下载平台 - Google Chrome'),
+    ('msedge.exe', 'Chrome_WidgetWin_1', '哔哩哔哩 (゜-゜)つロ 干杯~-bilibili - bilibili.com - Microsoft​ Edge'),
+    ('msedge.exe', 'Chrome_WidgetWin_1', '知乎 - 有问题，就会有答案 - zhihu.com - Microsoft​ Edge'),
+    ('firefox.exe', 'MozillaWindowClass', 'GitHub - https://github.com/ — Mozilla Firefox'),
+    ('firefox.exe', 'MozillaWindowClass', '腾讯视频 - v.qq.com — Mozilla Firefox'),
+    ('WINWORD.EXE', 'OpusApp', '作业.docx - Word'),
+    ('notepad.exe', 'Notepad', '笔记.txt - 记事本'),
+    ('explorer.exe', 'CabinetWClass', '下载'),
+]
+
+
+def generate_trace(duration=3600, mean_dwell=20, seed=0, windows=SYNTHETIC_WINDOWS):
+    """
+    生成合成的窗口切换记录：停留时间服从对数正态分布（大多数切换很快，少数停留很久），
+    窗口按 Zipf 分布选取（少数常用网站占大部分时间）
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(len(windows))]
+    events = []
+    t = 0.0
+    while t < duration:
+        exe, window_class, title = rng.choices(windows, weights=weights)[0]
+        events.append({"t": round(t, 3), "exe": exe, "class": window_class, "title": title,
+                       "rect": [0, 0, 1280, 800]})
+        # 对数正态分布的中位数取 mean_dwell / 2，均值约为 mean_dwell
+        t += max(0.5, rng.lognormvariate(0, 1.18) * mean_dwell / 2)
+    return events
+
+
+def create_probe(backend='auto', trace_path=None, clock=time.monotonic):
+    """
+    backend: auto（有 pywin32 时用 win32，否则 null）/ win32 / trace（回放 trace_path）/
+             synthetic（回放合成记录）/ null
+    """
+    if backend == 'auto':
+        backend = 'win32' if win32gui is not None else 'null'
+    if backend == 'win32':
+        if win32gui is None:
+            raise RuntimeError("win32 探测后端需要 pywin32")
+        return Win32Probe()
+    if backend == 'trace':
+        if not trace_path:
+            raise ValueError("trace 探测后端需要指定记录文件")
+        return TraceProbe(load_trace(trace_path), clock=clock)
+    if backend == 'synthetic':
+        return TraceProbe(generate_trace(), clock=clock)
+    if backend == 'null':
+        return NullProbe()
+    raise ValueError(f"未知的探测后端: {backend}")
@@ -0,0 +1,120 @@
+# process_cache.py —— 前台窗口进程信息缓存
+# 功能：记住窗口所属进程的可执行文件名、浏览器类型和标题解析方式，
+#      不再每次采样都新建 psutil.Process 并调用 exe()/name()。
+#
+# 缓存以 (pid, create_time) 识别进程，PID 被新进程复用时不会误用旧信息：
+#   - 同一个窗口（hwnd）仍属于同一 PID：窗口存在说明进程还活着，直接命中（一次字典查找）
+#   - 换了窗口：查询一次进程创建时间，与缓存一致才命中，否则重新读取进程信息
+#   - sweep() 清理已退出的进程及其窗口
+# 进程信息来自 source（默认 psutil，未安装 psutil 时构造 ProcessCache 抛出 ImportError；也可以是 platform_probe 的回放后端）
+
+import time
+from collections import OrderedDict, namedtuple
+
+import platform_probe
+from platform_probe import PsutilProcesses
+
+CHROMIUM = 'chromium'
+FIREFOX = 'firefox'
+
+# 可执行文件名 → (浏览器名称, 标题解析方式)
+BROWSERS = {
+    'chrome.exe': ('Chrome', CHROMIUM),
+    'msedge.exe': ('Edge', CHROMIUM),
+    'opera.exe': ('Opera', CHROMIUM),
+    'firefox.exe': ('Firefox', FIREFOX),
+}
+
+ProcessInfo = namedtuple('ProcessInfo', 'pid create_time exe_name browser strategy')
+
+
+def classify(exe_name):
+    """返回 (浏览器名称, 标题解析方式)，非浏览器返回 (None, None)"""
+    exe_name = (exe_name or '').lower()
+    if exe_name in BROWSERS:
+        return BROWSERS[exe_name]
+    # 兼容 chrome_proxy.exe / msedge_beta.exe 等变体
+    for name, value in BROWSERS.items():
+        if name[:-4] in exe_name:
+            return value
+    return None, None
+
+
+class ProcessCache:
+    """
+    lookup(pid, hwnd) 返回 ProcessInfo，进程不存在或无法访问时返回 None。
+    max_entries    缓存的进程数上限
+    sweep_interval 清理已退出进程的最短间隔（秒）
+    source         提供 create_time(pid) / exe_name(pid) / pids() 的对象
+    """
+
+    def __init__(self, max_entries=256, sweep_interval=60, clock=time.monotonic, source=None):
+        if source is None and platform_probe.psutil is None:
+            raise ImportError("未安装 psutil，无法查询进程信息")
+        self.source = source or PsutilProcesses()
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._by_pid = OrderedDict()
+        self._by_window = {}
+        self._last_sweep = clock()
+        self.hits = 0
+        self.validated = 0
+        self.misses = 0
+
+    def lookup(self, pid, hwnd=None):
+        info = self._by_window.get(hwnd) if hwnd is not None else None
+        if info is not None and info.pid == pid:
+            self.hits += 1
+            return info
+
+        if self.clock() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+        try:
+            create_time = self.source.create_time(pid)
+        except Exception:
+            self._forget(pid)
+            return None
+
+        info = self._by_pid.get(pid)
+        if info is not None and info.create_time == create_time:
+            self.validated += 1
+            self._by_pid.move_to_end(pid)
+        else:
+            self.misses += 1
+            self._forget(pid)
+            try:
+                exe_name = self.source.exe_name(pid)
+            except Exception:
+                return None
+            browser, strategy = classify(exe_name)
+            info = ProcessInfo(pid, create_time, exe_name, browser, strategy)
+            self._by_pid[pid] = info
+            while len(self._by_pid) > self.max_entries:
+                self._forget(next(iter(self._by_pid)))
+        if hwnd is not None:
+            self._by_window[hwnd] = info
+        return info
+
+    def _forget(self, pid):
+        if self._by_pid.pop(pid, None) is not None:
+            for hwnd in [h for h, info in self._by_window.items() if info.pid == pid]:
+                del self._by_window[hwnd]
+
+    def sweep(self):
+        """清理已退出进程的缓存"""
+        self._last_sweep = self.clock()
+        try:
+            alive = set(self.source.pids())
+        except Exception:
+            return
+        for pid in [pid for pid in self._by_pid if pid not in alive]:
+            self._forget(pid)
+
+    def hit_rate(self):
+        total = self.hits + self.validated + self.misses
+        return (self.hits + self.validated) / total if total else 0.0
+
+    def metrics(self):
+        return {"hits": self.hits, "validated": self.validated, "misses": self.misses,
+                "hit_rate": round(self.hit_rate(), 4), "processes": len(self._by_pid)}
@@ -0,0 +1,217 @@
+# report_outbox.py —— 学生端本地上报发件箱（SQLite 持久化 + 后台补发）
+# 功能：采样线程把记录写入本地 SQLite 队列后立即返回，后台发送线程按批取出上报，
+#      服务器确认后才删除；断网期间记录保存在磁盘上，恢复后按原顺序补发
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from fleet_schedule import DecorrelatedBackoff
+
+
+class ReportOutbox:
+    """
+    只追加的本地上报队列，容量受 max_records / max_bytes 限制，超出时丢弃最旧的记录。
+    记录在 ack 之前一直保留在磁盘上，进程崩溃重启后会重新发送（至少送达一次）。
+    """
+
+    def __init__(self, path, max_records=50000, max_bytes=20 * 1024 * 1024):
+        self.path = path
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                payload TEXT NOT NULL
+            )''')
+        count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outbox').fetchone()
+        self._count = count
+        self._bytes = total
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def put(self, record):
+        """写入一条记录，返回记录ID"""
+        payload = json.dumps(record, ensure_ascii=False)
+        size = len(payload.encode('utf-8'))
+        with self._lock:
+            cur = self._conn.execute(
+                'INSERT INTO outbox (created_at, size, payload) VALUES (?, ?, ?)',
+                (time.time(), size, payload))
+            self._count += 1
+            self._bytes += size
+            self._enforce_limits()
+            return cur.lastrowid
+
+    def _enforce_limits(self):
+        """超出容量时按写入顺序删除最旧的记录（调用方持有锁）"""
+        while self._count > self.max_records or (self._bytes > self.max_bytes and self._count > 1):
+            excess = max(self._count - self.max_records, 1)
+            rows = self._conn.execute(
+                'SELECT id, size FROM outbox ORDER BY id LIMIT ?', (excess,)).fetchall()
+            if not rows:
+                break
+            self._conn.execute('DELETE FROM outbox WHERE id <= ?', (rows[-1][0],))
+            self._count -= len(rows)
+            self._bytes -= sum(size for _, size in rows)
+            self.dropped += len(rows)
+
+    def peek(self, limit):
+        """按写入顺序取出最多 limit 条未确认的记录: [(id, record), ...]"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, payload FROM outbox ORDER BY id LIMIT ?', (limit,)).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def oldest_age(self, now=None):
+        """最旧一条记录已等待的秒数，队列为空时返回 None"""
+        with self._lock:
+            row = self._conn.execute('SELECT MIN(created_at) FROM outbox').fetchone()
+        if not row or row[0] is None:
+            return None
+        return (time.time() if now is None else now) - row[0]
+
+    def ack(self, ids):
+        """服务器确认后删除记录"""
+        if not ids:
+            return
+        with self._lock:
+            placeholders = ','.join('?' * len(ids))
+            row = self._conn.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outbox WHERE id IN ({placeholders})',
+                list(ids)).fetchone()
+            self._conn.execute(f'DELETE FROM outbox WHERE id IN ({placeholders})', list(ids))
+            self._count -= row[0]
+            self._bytes -= row[1]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxSender:
+    """
+    后台发送线程：队列中满 batch_size 条或最旧记录等待超过 max_delay 秒时取出一批，
+    交给 transport.deliver 发送，只 ack 已处理的记录（批量请求中未入库的个别记录留在发件箱中），失败时按去相关抖动的指数退避等待后重试；
+    服务器用 Retry-After 要求暂停时（transport.retry_after()），至少等待到服务器允许的时间。
+    """
+
+    def __init__(self, outbox, transport, batch_size=20, max_delay=30.0,
+                 min_backoff=1.0, max_backoff=300.0):
+        self.outbox = outbox
+        self.transport = transport
+        self.batch_size = max(1, int(batch_size))
+        self.max_delay = float(max_delay)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.backoff = 0
+        self._backoff = DecorrelatedBackoff(min_backoff, max_backoff)
+        self.sent = 0
+        self._urgent = False
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='outbox-sender', daemon=True)
+
+    def __len__(self):
+        return len(self.outbox)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def set_batch_size(self, batch_size):
+        """修改每批条数（服务器下发的策略），下一批开始生效"""
+        self.batch_size = max(1, int(batch_size))
+        if len(self.outbox) >= self.batch_size:
+            self._wakeup.set()
+
+    def submit(self, record, urgent=False):
+        """写入发件箱，不等待网络；urgent 为 True 时不等凑满一批，立即发送"""
+        self.outbox.put(record)
+        if urgent:
+            self._urgent = True
+        if urgent or len(self.outbox) >= self.batch_size:
+            self._wakeup.set()
+
+    def _due(self):
+        if len(self.outbox) == 0:
+            return False
+        if self._urgent or len(self.outbox) >= self.batch_size:
+            return True
+        age = self.outbox.oldest_age()
+        return age is not None and age >= self.max_delay
+
+    def drain_once(self):
+        """发送一批记录，返回 (已处理条数, 本批条数)；被服务器永久拒绝的记录同样 ack，不会堵住队列"""
+        batch = self.outbox.peek(self.batch_size)
+        if not batch:
+            return 0, 0
+        failed = set(self.transport.deliver([record for _, record in batch]))
+        ids = [row_id for i, (row_id, _) in enumerate(batch) if i not in failed]
+        self.outbox.ack(ids)
+        sent = len(ids)
+        self.sent += sent
+        return sent, len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.backoff:
+                self._stop.wait(self.backoff)
+            elif not self._due():
+                self._wakeup.wait(min(1.0, self.max_delay) if self.max_delay > 0 else 1.0)
+                self._wakeup.clear()
+                continue
+            if self._stop.is_set():
+                break
+            self._urgent = False
+            try:
+                sent, total = self.drain_once()
+            except Exception as e:
+                print(f"发件箱发送异常: {str(e)}")
+                sent, total = 0, 1
+            if total and sent < total:
+                # 网络或服务器异常：去相关的指数退避，避免机房内所有机器同时重试
+                self.backoff = max(self._backoff.next(), self.transport.retry_after())
+                print(f"上报未完成，{self.backoff:.1f} 秒后重试（待发送 {len(self.outbox)} 条）")
+            else:
+                self.backoff = 0
+                self._backoff.reset()
+
+    def flush(self, timeout=10.0):
+        """停止前尽量把剩余记录发出去"""
+        deadline = time.time() + timeout
+        while len(self.outbox) and time.time() < deadline:
+            sent, total = self.drain_once()
+            if sent < total:
+                break
+
+    def stop(self, flush=True):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+        if self._thread.is_alive():
+            # 发送线程还在发送（网络很慢）：不再同时 flush，剩余记录留在发件箱中下次启动后补发
+            print(f"发件箱发送线程未退出，剩余 {len(self.outbox)} 条下次启动后补发")
+            return
+        if flush:
+            self.flush()
+
+
+def default_outbox_path():
+    """发件箱文件默认放在脚本所在目录"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report_outbox.db')
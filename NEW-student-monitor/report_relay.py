@@ -0,0 +1,112 @@
+# report_relay.py —— 机房本地上报中继（转发并记录上报流量）
+# 功能：学生端把 MONITOR_SERVER 指向中继，中继把请求原样转发给真实服务器并返回服务器的响应；
+#      服务器接受的上报请求（/api/report、/api/report/batch、截图上传）按 report_trace 格式追加到记录文件，
+#      之后可以用 tests/replay_report.py 在测试环境中回放整个机房的真实流量。
+#
+# 用法示例:
+#   python report_relay.py --upstream http://192.168.1.10:3003 --port 3004 --trace lab_0901.trace
+
+import argparse
+import gzip
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from report_trace import TraceWriter
+
+RECORDED_PATH_RE = re.compile(r'^/api/(report|report/batch|screenshots/[0-9a-f]{64})$')
+# 逐跳请求头，不转发
+HOP_HEADERS = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailers',
+               'transfer-encoding', 'upgrade', 'host', 'content-length'}
+
+
+class RelayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    upstream = None
+    recorder = None
+    session = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _forward(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS}
+        try:
+            resp = self.session.request(method, self.upstream + self.path, data=body, headers=headers,
+                                        timeout=30, allow_redirects=False, stream=False)
+        except requests.exceptions.RequestException as e:
+            data = f'{{"error": "中继无法连接服务器: {type(e).__name__}"}}'.encode('utf-8')
+            self.send_response(502)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        content = resp.content
+        self.send_response(resp.status_code)
+        for name, value in resp.headers.items():
+            # requests 已经解压过响应体
+            if name.lower() not in HOP_HEADERS and name.lower() != 'content-encoding':
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+        if self.recorder is not None and resp.status_code == 200 and method in ('POST', 'PUT') \
+                and RECORDED_PATH_RE.match(self.path):
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            self.recorder.record(method, self.path, body or b'', dict(self.headers.items()))
+
+    def do_GET(self):
+        self._forward('GET')
+
+    def do_POST(self):
+        self._forward('POST')
+
+    def do_PUT(self):
+        self._forward('PUT')
+
+
+class RelayServer(ThreadingHTTPServer):
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def start_relay(upstream, port=0, host='127.0.0.1', trace_path=None):
+    """在后台线程启动中继，返回 (server, base_url)；server.recorder 为记录器（未指定文件时为 None）"""
+    recorder = TraceWriter(trace_path) if trace_path else None
+    handler = type('Handler', (RelayHandler,), {
+        'upstream': upstream.rstrip('/'), 'recorder': recorder, 'session': requests.Session()})
+    server = RelayServer((host, port), handler)
+    server.recorder = recorder
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    p = argparse.ArgumentParser(description="机房本地上报中继")
+    p.add_argument('--upstream', required=True, help='真实服务器地址，如 http://192.168.1.10:3003')
+    p.add_argument('--host', default='0.0.0.0', help='监听地址')
+    p.add_argument('--port', type=int, default=3004, help='监听端口')
+    p.add_argument('--trace', help='流量记录文件（追加写入）')
+    args = p.parse_args()
+
+    server, base_url = start_relay(args.upstream, args.port, args.host, args.trace)
+    print(f"上报中继已启动: {base_url} → {args.upstream}" + (f"，记录到 {args.trace}" if args.trace else ""))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    if server.recorder is not None:
+        print(f"流量记录: {server.recorder.metrics()}")
+        server.recorder.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# report_trace.py —— 上报流量记录文件（只追加的二进制帧格式）
+# 功能：按发送顺序记录学生端实际发出的上报请求（记录、批量记录、截图上传）及其时间，
+#      用于在测试环境中原样回放真实机房的流量（tests/replay_report.py）。
+#      学生端（REPORT_TRACE_PATH）和本地中继（report_relay.py）写入的格式相同。
+#
+# 文件格式：
+#   文件头  b'RPTTRACE1\n'
+#   每一帧  FRAME 头（时间戳 float64、方法、路径长度、请求头长度、请求体长度）+ 路径 + 请求头 JSON + zlib 压缩的请求体
+#   请求体保存未经 gzip 的原始内容（批量请求回放时再压缩）；写到一半的最后一帧在读取时忽略
+
+import json
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+MAGIC = b'RPTTRACE1\n'
+FRAME = struct.Struct('<dBHHI')
+METHODS = ('POST', 'PUT')
+# 需要记录的请求头（学生IP / 计算机名由会话请求头携带）
+RECORDED_HEADERS = ('Content-Type', 'X-Student-IP', 'X-Student-Host')
+
+Frame = namedtuple('Frame', 't method path headers body')
+
+
+class TraceWriter:
+    """
+    record(method, path, body, headers) 追加一帧；多个线程可同时调用。
+    每帧写入后立即 flush，进程被强制结束时最多丢失最后一帧。
+    """
+
+    def __init__(self, path, level=6, clock=time.time):
+        self.path = path
+        self.level = level
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_written = 0
+
+    def record(self, method, path, body, headers=None):
+        headers = {k: v for k, v in (headers or {}).items() if k in RECORDED_HEADERS}
+        path_bytes = path.encode('utf-8')
+        header_bytes = json.dumps(headers, ensure_ascii=False).encode('utf-8') if headers else b''
+        payload = zlib.compress(body or b'', self.level)
+        frame = FRAME.pack(self.clock(), METHODS.index(method), len(path_bytes), len(header_bytes), len(payload))
+        data = frame + path_bytes + header_bytes + payload
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            self.frames += 1
+            self.bytes_in += len(body or b'')
+            self.bytes_written += len(data)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def metrics(self):
+        return {"frames": self.frames, "bytes_in": self.bytes_in, "bytes_written": self.bytes_written}
+
+
+def read_trace(path):
+    """依次返回文件中的 Frame；文件末尾不完整的帧直接忽略"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是上报记录文件: {path}")
+        while True:
+            head = f.read(FRAME.size)
+            if len(head) < FRAME.size:
+                return
+            t, method, path_len, header_len, body_len = FRAME.unpack(head)
+            rest = f.read(path_len + header_len + body_len)
+            if len(rest) < path_len + header_len + body_len:
+                return
+            try:
+                body = zlib.decompress(rest[path_len + header_len:])
+            except zlib.error:
+                return
+            headers = json.loads(rest[path_len:path_len + header_len]) if header_len else {}
+            yield Frame(t, METHODS[method], rest[:path_len].decode('utf-8'), headers, body)
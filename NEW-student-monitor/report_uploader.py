@@ -0,0 +1,370 @@
+# report_uploader.py —— 学生端上报传输层（批量 + gzip 压缩）
+# 功能：把多条上报记录合并成一个 gzip 压缩的批量请求发送到 /api/report/batch，
+#      服务器未声明批量能力时自动回退为逐条 POST /api/report；
+#      截图以原始 JPEG 按 sha256 单独上传到 /api/screenshots/<hash>，上报记录只引用哈希；
+#      服务器返回 429 / 503 时按 Retry-After 暂停发送，响应中的 policy 交给 server_policy.AgentPolicy
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from server_policy import THROTTLE_STATUS, parse_retry_after
+
+BATCH_PATH = '/api/report/batch'
+SINGLE_PATH = '/api/report'
+CAPABILITIES_PATH = '/api/report/capabilities'
+SCREENSHOT_PATH = '/api/screenshots/'
+
+# 这些状态码表示服务器不认识批量接口，需要回退为逐条上报
+BATCH_UNSUPPORTED_STATUS = (404, 405, 415, 501)
+
+
+def is_rejected(status):
+    """
+    服务器永久拒绝了这条记录（格式错误、缺少字段、请求体过大等 4xx），重试也不会成功，应丢弃以免堵住后面的记录；
+    429（限流）、408（超时）和 404 / 405（接口地址不对）不算，网络错误和 5xx 同样稍后重试
+    """
+    return 400 <= status < 500 and status not in (404, 405, 408, 429)
+
+
+class ReportTransport:
+    """
+    负责把上报记录发送到服务器。
+    deliver 按顺序发送，返回仍需重试的记录下标（送达或被服务器永久拒绝而丢弃的记录不在其中，见 is_rejected），
+    调用方据此只保留未处理的记录，保证记录顺序不乱；批量请求中服务器逐条返回结果，已入库的记录不会重复发送。
+    send_records 同 deliver，只返回已处理的条数。
+    recorder 不为 None 时（report_trace.TraceWriter），服务器接受的每个请求都会被记录下来。
+    policy 不为 None 时（server_policy.AgentPolicy），请求带上本地策略版本，响应中的新策略立即应用。
+    """
+
+    def __init__(self, server_base, session=None, timeout=6, capability_ttl=300, recorder=None, policy=None):
+        self.server_base = server_base.rstrip('/')
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.capability_ttl = capability_ttl
+        self.recorder = recorder
+        self.policy = policy
+        # 服务器要求暂停到这个时间（单调时钟）之后再发送
+        self.retry_at = 0.0
+        self.throttled = 0
+        self.rejected = 0
+        # None 表示尚未探测；探测失败（网络错误）时保持 None，下次再探测
+        self.batch_supported = None
+        self.max_batch = None
+        self.screenshot_upload = False
+        self._probed_at = 0
+
+    def probe(self):
+        """查询服务器是否支持批量上报"""
+        now = time.time()
+        if self.batch_supported is not None and now - self._probed_at < self.capability_ttl:
+            return self.batch_supported
+        try:
+            resp = self.session.get(self.server_base + CAPABILITIES_PATH, headers=self.headers(),
+                                    timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"查询服务器上报能力失败: {str(e)}")
+            return False
+        if self.throttle(resp):
+            return False
+        self._probed_at = now
+        if resp.status_code == 200:
+            try:
+                caps = resp.json()
+            except ValueError:
+                caps = {}
+            self.apply_policy(caps)
+            self.batch_supported = bool(caps.get('batch'))
+            self.max_batch = caps.get('max_batch')
+            self.screenshot_upload = bool(caps.get('screenshot_upload'))
+        else:
+            self.batch_supported = False
+            self.screenshot_upload = False
+        return self.batch_supported
+
+    def send_records(self, records):
+        """按顺序发送记录，返回已处理的条数"""
+        return len(records) - len(self.deliver(records))
+
+    def deliver(self, records):
+        """按顺序发送记录，返回仍需重试的记录下标（升序）"""
+        if not records or self.retry_after() > 0:
+            return list(range(len(records)))
+        if len(records) > 1 and self.probe():
+            pending = self._send_batches(records)
+            if pending is not None:
+                return pending
+        if self.retry_after() > 0:
+            return list(range(len(records)))
+        return list(range(self._send_singles(records), len(records)))
+
+    def headers(self, extra=None):
+        headers = dict(extra or {})
+        if self.policy is not None:
+            headers.update(self.policy.headers())
+        return headers
+
+    def retry_after(self):
+        """距离服务器允许再次发送还有多少秒"""
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def throttle(self, resp):
+        """429 / 503：按 Retry-After 暂停发送（没有该头时由调用方的退避决定何时重试），返回是否被限流"""
+        if resp.status_code not in THROTTLE_STATUS:
+            return False
+        self.throttled += 1
+        delay = parse_retry_after(resp.headers.get('Retry-After'))
+        if delay is not None:
+            self.retry_at = max(self.retry_at, time.monotonic() + delay)
+        print(f"服务器繁忙（状态码 {resp.status_code}），"
+              + (f"{delay:.0f} 秒后再上报" if delay is not None else "稍后重试"))
+        try:
+            self.apply_policy(resp.json())
+        except ValueError:
+            pass
+        return True
+
+    def apply_policy(self, data):
+        """响应中带有 policy 时交给 AgentPolicy（版本未变化时服务器不返回 policy）"""
+        if self.policy is not None and isinstance(data, dict) and isinstance(data.get('policy'), dict):
+            self.policy.apply(data['policy'])
+
+    def _accepted(self, resp):
+        try:
+            self.apply_policy(resp.json())
+        except ValueError:
+            pass
+
+    def _failed_in_batch(self, resp, count):
+        """
+        读取批量响应中逐条的结果，返回这一批中需要重试的下标；被服务器永久拒绝的记录丢弃。
+        旧版服务器不返回 results 时整批算送达
+        """
+        try:
+            results = resp.json().get('results')
+        except (ValueError, AttributeError):
+            results = None
+        if not isinstance(results, list):
+            return []
+        failed = []
+        for i in range(count):
+            result = results[i] if i < len(results) and isinstance(results[i], dict) else {}
+            if result.get('ok'):
+                continue
+            status = result.get('status', 500)
+            if isinstance(status, int) and is_rejected(status):
+                print(f"批量上报中第 {i + 1} 条被拒绝，丢弃该记录: 状态码 {status}, {result.get('error')}")
+                self.rejected += 1
+            else:
+                failed.append(i)
+        if failed:
+            print(f"批量上报中 {len(failed)} 条记录未入库，稍后重试")
+        return failed
+
+    def _send_batches(self, records):
+        """批量发送，返回需要重试的下标；服务器不支持批量时返回 None 让调用方回退"""
+        size = self.max_batch or len(records)
+        pending = []
+        sent = 0
+        while sent < len(records):
+            chunk = records[sent:sent + size]
+            raw = json.dumps({"records": chunk}, ensure_ascii=False).encode('utf-8')
+            body = gzip.compress(raw)
+            headers = self.headers({'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+            try:
+                resp = self.session.post(self.server_base + BATCH_PATH, data=body,
+                                         headers=headers, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                print(f"批量上报失败: {str(e)}")
+                return pending + list(range(sent, len(records)))
+            if self.throttle(resp):
+                return pending + list(range(sent, len(records)))
+            if resp.status_code in BATCH_UNSUPPORTED_STATUS and sent == 0:
+                print(f"服务器不支持批量上报（状态码 {resp.status_code}），改为逐条上报")
+                self.batch_supported = False
+                return None
+            if is_rejected(resp.status_code):
+                # 整批被拒绝（某条记录格式错误、请求体过大）：这一批改为逐条发送，只丢弃被拒绝的记录
+                print(f"批量上报被拒绝（状态码 {resp.status_code}），这一批改为逐条上报")
+                done = self._send_singles(chunk)
+                if done < len(chunk):
+                    return pending + list(range(sent + done, len(records)))
+                sent += len(chunk)
+                continue
+            if resp.status_code != 200:
+                print(f"批量上报失败: 状态码 {resp.status_code}, body={resp.text[:200]}")
+                return pending + list(range(sent, len(records)))
+            self.record('POST', BATCH_PATH, raw)
+            self._accepted(resp)
+            pending.extend(sent + i for i in self._failed_in_batch(resp, len(chunk)))
+            sent += len(chunk)
+        return pending
+
+    def _send_singles(self, records):
+        """逐条发送，被服务器拒绝的记录丢弃后继续，遇到第一条需要重试的失败即停止"""
+        sent = 0
+        for record in records:
+            # 自己序列化（UTF-8，不转义中文），记录下的请求体与实际发送的完全一致
+            body = json.dumps(record, ensure_ascii=False).encode('utf-8')
+            try:
+                resp = self.session.post(self.server_base + SINGLE_PATH, data=body,
+                                         headers=self.headers({'Content-Type': 'application/json'}),
+                                         timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                print(f"上报失败: {str(e)}")
+                break
+            if self.throttle(resp):
+                break
+            if is_rejected(resp.status_code):
+                print(f"上报被拒绝，丢弃该记录: 状态码 {resp.status_code}, body={resp.text[:200]}")
+                self.rejected += 1
+                sent += 1
+                continue
+            if resp.status_code != 200:
+                print(f"上报失败: 状态码 {resp.status_code}, body={resp.text[:200]}")
+                break
+            self.record('POST', SINGLE_PATH, body)
+            self._accepted(resp)
+            sent += 1
+        return sent
+
+    def record(self, method, path, body, content_type='application/json'):
+        """把已被服务器接受的请求写入流量记录（未启用时什么也不做，记录失败不影响上报）"""
+        if self.recorder is None:
+            return
+        try:
+            headers = dict(self.session.headers, **{'Content-Type': content_type})
+            self.recorder.record(method, path, body, headers)
+        except Exception as e:
+            print(f"写入流量记录失败: {str(e)}")
+
+    def metrics(self):
+        return {"throttled": self.throttled, "rejected": self.rejected, "retry_after": round(self.retry_after(), 1)}
+
+
+class ScreenshotUploader:
+    """
+    按内容哈希上传截图原始数据。upload(data) 返回 sha256 哈希，上报记录只需带上哈希；
+    返回 None 表示服务器不支持或上传失败，调用方应改为在记录中内嵌 base64。
+    最近上传过的哈希保存在 LRU 中，相同画面（包括相同区块）只上传一次。
+    """
+
+    def __init__(self, transport, max_known=1024):
+        self.transport = transport
+        self.max_known = max(1, int(max_known))
+        self._known = OrderedDict()
+        self.uploaded = 0
+        self.deduplicated = 0
+        self.bytes_uploaded = 0
+
+    def upload(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._known:
+            self._known.move_to_end(digest)
+            self.deduplicated += 1
+            return digest
+        self.transport.probe()
+        if not self.transport.screenshot_upload or self.transport.retry_after() > 0:
+            return None
+        try:
+            resp = self.transport.session.put(
+                self.transport.server_base + SCREENSHOT_PATH + digest, data=data,
+                headers={'Content-Type': 'image/jpeg'}, timeout=self.transport.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"截图上传失败: {str(e)}")
+            return None
+        if self.transport.throttle(resp):
+            return None
+        if resp.status_code in BATCH_UNSUPPORTED_STATUS:
+            print(f"服务器不支持截图上传（状态码 {resp.status_code}），改为内嵌截图")
+            self.transport.screenshot_upload = False
+            return None
+        if resp.status_code != 200:
+            print(f"截图上传失败: 状态码 {resp.status_code}, body={resp.text[:200]}")
+            return None
+        self.transport.record('PUT', SCREENSHOT_PATH + digest, data, content_type='image/jpeg')
+        self.uploaded += 1
+        self.bytes_uploaded += len(data)
+        self._known[digest] = True
+        if len(self._known) > self.max_known:
+            self._known.popitem(last=False)
+        return digest
+
+    def metrics(self):
+        return {"uploaded": self.uploaded, "deduplicated": self.deduplicated, "bytes": self.bytes_uploaded}
+
+
+class BatchUploader:
+    """
+    在内存中缓冲上报记录，满 max_records 条或最早一条等待超过 max_delay 秒时整批发送。
+    发送失败的记录（包括批量请求中未入库的个别记录）保留在缓冲区头部，下次继续按原顺序发送。
+    同一时刻只有一个线程在发送（采样线程的 urgent 提交与定时 flush 可能同时发生），批次不会乱序。
+    """
+
+    def __init__(self, transport, max_records=20, max_delay=30.0, max_buffer=1000):
+        self.transport = transport
+        self.max_records = max(1, int(max_records))
+        self.max_delay = float(max_delay)
+        self.max_buffer = max(self.max_records, int(max_buffer))
+        self._buffer = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def submit(self, record, urgent=False):
+        """加入一条记录，必要时立即发送（urgent 为 True 时不等凑满一批）"""
+        with self._lock:
+            self._buffer.append(record)
+            if self._oldest is None:
+                self._oldest = time.time()
+            # 长时间断网时限制缓冲区大小，丢弃最旧的记录
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+        if urgent or len(self._buffer) >= self.max_records:
+            self.flush()
+
+    def set_batch_size(self, max_records):
+        """修改每批条数（服务器下发的策略），下一次发送开始生效"""
+        self.max_records = max(1, int(max_records))
+        self.max_buffer = max(self.max_records, self.max_buffer)
+
+    def due(self, now=None):
+        """是否到了发送时间"""
+        if not self._buffer:
+            return False
+        now = time.time() if now is None else now
+        return len(self._buffer) >= self.max_records or now - self._oldest >= self.max_delay
+
+    def maybe_flush(self):
+        if self.due():
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """发送缓冲区内全部记录，返回成功条数；其它线程正在发送时等它发完再取出剩下的记录"""
+        with self._send_lock:
+            with self._lock:
+                pending = self._buffer
+                self._buffer = []
+                oldest = self._oldest
+                self._oldest = None
+            if not pending:
+                return 0
+            failed = self.transport.deliver(pending)
+            if failed:
+                # 未送达的记录放回缓冲区头部，保持顺序
+                with self._lock:
+                    self._buffer = [pending[i] for i in failed] + self._buffer
+                    self._oldest = oldest if len(failed) == len(pending) else time.time()
+            return len(pending) - len(failed)
@@ -0,0 +1,103 @@
+# screenshot_delta.py —— 截图变化检测（只发送有变化的画面 / 区块）
+# 功能：把截图缩成 64x64 灰度缩略图，与上一次发送的画面逐块比较平均差值：
+#      - 所有区块都没有明显变化：本次不发送截图
+#      - 少数区块变化：只发送变化的区块（tiles）
+#      - 大面积变化、尺寸变化或到了关键帧间隔：发送整张截图
+# 只依赖 Pillow，可以直接用合成图片测试，无需显示器
+
+import time
+
+from PIL import Image, ImageChops
+
+FULL = 'full'
+TILES = 'tiles'
+UNCHANGED = 'unchanged'
+
+THUMB_SIZE = (64, 64)
+
+
+def thumbnail(img):
+    """缩小后转灰度，用于比较（先缩小再转换，避免对整张大图做色彩转换）"""
+    return img.resize(THUMB_SIZE, Image.BOX).convert('L')
+
+
+class ScreenshotDelta:
+    """
+    grid               区块网格边数（grid x grid）
+    threshold          区块内平均灰度差（0-255）超过该值视为有变化
+    max_changed_ratio  变化区块比例超过该值时直接发送整张截图
+    keyframe_interval  距离上一次整张截图超过该秒数时强制发送整张截图，便于服务端重新同步
+    """
+
+    def __init__(self, grid=4, threshold=6, max_changed_ratio=0.5, keyframe_interval=300, clock=time.monotonic):
+        self.grid = max(1, int(grid))
+        self.threshold = threshold
+        self.max_changed_ratio = max_changed_ratio
+        self.keyframe_interval = keyframe_interval
+        self.clock = clock
+        self._last_thumb = None
+        self._last_size = None
+        self._last_keyframe = None
+        self.frames = 0
+        self.skipped = 0
+        self.partial = 0
+        self.full = 0
+
+    def reset(self):
+        """服务端丢失基准帧等情况下调用，下一帧强制整张发送"""
+        self._last_thumb = None
+
+    def tile_boxes(self, size):
+        """按网格划分区块，返回 [(left, top, right, bottom), ...]（按行优先顺序）"""
+        width, height = size
+        boxes = []
+        for row in range(self.grid):
+            for col in range(self.grid):
+                boxes.append((col * width // self.grid, row * height // self.grid,
+                              (col + 1) * width // self.grid, (row + 1) * height // self.grid))
+        return boxes
+
+    def tile_scores(self, thumb):
+        """各区块与上一帧的平均灰度差，顺序与 tile_boxes 一致"""
+        diff = ImageChops.difference(thumb, self._last_thumb)
+        # BOX 缩放到 grid x grid，每个像素就是对应区块的平均差值
+        return list(diff.resize((self.grid, self.grid), Image.BOX).getdata())
+
+    def compare(self, img):
+        """
+        与上一次发送的画面比较，返回 (类型, 变化区块列表)。
+        调用方按返回结果发送后，本帧发送的部分即成为新的比较基准：
+        只发送区块时，没发送的区块仍与之前发送的画面比较，缓慢变化累积超过阈值后同样会被发送。
+        """
+        self.frames += 1
+        now = self.clock()
+        thumb = thumbnail(img)
+        keyframe_due = self._last_keyframe is None or now - self._last_keyframe >= self.keyframe_interval
+        if self._last_thumb is None or img.size != self._last_size or keyframe_due:
+            return self._accept(img, thumb, now)
+
+        scores = self.tile_scores(thumb)
+        boxes = self.tile_boxes(img.size)
+        changed = [i for i, score in enumerate(scores) if score > self.threshold]
+        if not changed:
+            self.skipped += 1
+            return UNCHANGED, []
+        if len(changed) > len(boxes) * self.max_changed_ratio:
+            return self._accept(img, thumb, now)
+        self.partial += 1
+        # 基准中只更新已发送的区块（缩略图坐标），与服务端保存的画面保持一致
+        thumb_boxes = self.tile_boxes(THUMB_SIZE)
+        for i in changed:
+            self._last_thumb.paste(thumb.crop(thumb_boxes[i]), thumb_boxes[i])
+        return TILES, [boxes[i] for i in changed]
+
+    def _accept(self, img, thumb, now):
+        """整张发送：更新比较基准和关键帧时间"""
+        self.full += 1
+        self._last_thumb = thumb
+        self._last_size = img.size
+        self._last_keyframe = now
+        return FULL, []
+
+    def metrics(self):
+        return {"frames": self.frames, "full": self.full, "partial": self.partial, "skipped": self.skipped}
@@ -4,6 +4,10 @@ const sqlite3 = require('sqlite3').verbose();
 const cors = require('cors');
 const bodyParser = require('body-parser');
 const ExcelJS = require('exceljs');
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+const { createBlacklistVersions } = require('./blacklist_versions');
 const app = express();
 const PORT = 3003;
 
@@ -46,10 +50,16 @@ function normalizeIp(ip) {
 
 // 中间件配置
 app.use(cors());
+// 上报接口先经过准入控制（admitReport）再由路由自己的解析器读取请求体，全局解析器跳过这些路径，
+// 否则服务器繁忙时仍要先读完并解析大请求体才能返回 429
+const ADMITTED_PATHS = /^\/api\/(report|report\/batch|screenshots\/[^/]+)$/;
+function skipAdmittedPaths(parser) {
+  return (req, res, next) => (ADMITTED_PATHS.test(req.path) ? next() : parser(req, res, next));
+}
 // 增大 JSON/body 大小限制，学生端可能会上传截图(base64)导致请求体较大
-app.use(bodyParser.json({ limit: '12mb', strict: false }));
+app.use(skipAdmittedPaths(bodyParser.json({ limit: '12mb', strict: false })));
 // 支持较大的 urlencoded 表单（备用）
-app.use(bodyParser.urlencoded({ extended: true, limit: '12mb', parameterLimit: 10000 }));
+app.use(skipAdmittedPaths(bodyParser.urlencoded({ extended: true, limit: '12mb', parameterLimit: 10000 })));
 app.use(express.static('public'));
 
 // 数据库连接
@@ -71,6 +81,8 @@ function initDatabase() {
     db.run('DROP TABLE IF EXISTS browsing_records');
     db.run('DROP TABLE IF EXISTS blacklist');
     db.run('DROP TABLE IF EXISTS ip_blacklist');
+    db.run('DROP TABLE IF EXISTS visits');
+    db.run('DROP TABLE IF EXISTS domain_rollups');
     
     // 创建浏览记录表 - 添加original_url字段
     db.run(`
@@ -81,11 +93,48 @@ function initDatabase() {
         url TEXT NOT NULL,
         original_url TEXT,
         title TEXT,
+        screenshot_ref TEXT,
         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
       )`, (err) => {
       if (err) return console.error('❌ 浏览记录表创建失败:', err.message);
     });
     
+    // 创建访问区间表 - 学生端会话模式（REPORT_MODE=session）按 visit_id 上报开始 / 心跳 / 结束
+    db.run(`
+      CREATE TABLE visits (
+        visit_id TEXT PRIMARY KEY,
+        student_id TEXT NOT NULL,
+        student_ip TEXT,
+        url TEXT NOT NULL,
+        original_url TEXT,
+        title TEXT,
+        start_time DATETIME NOT NULL,
+        end_time DATETIME NOT NULL,
+        focused_seconds REAL DEFAULT 0,
+        state TEXT DEFAULT 'open',
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+      )`, (err) => {
+      if (err) return console.error('❌ 访问区间表创建失败:', err.message);
+    });
+    
+    // 创建域名汇总表 - 学生端汇总模式（REPORT_MODE=summary）按时间桶上报各域名停留时长
+    // summary_run 为学生端每次启动生成的标识：重发同一条汇总是幂等的，重启后的同一时间桶分开保存
+    db.run(`
+      CREATE TABLE domain_rollups (
+        student_id TEXT NOT NULL,
+        student_ip TEXT,
+        summary_run TEXT NOT NULL,
+        bucket_start DATETIME NOT NULL,
+        bucket_seconds INTEGER NOT NULL,
+        url TEXT NOT NULL,
+        focused_seconds REAL DEFAULT 0,
+        samples INTEGER DEFAULT 0,
+        top_titles TEXT,
+        PRIMARY KEY (student_id, summary_run, bucket_start, url)
+      )`, (err) => {
+      if (err) return console.error('❌ 域名汇总表创建失败:', err.message);
+    });
+    
     // 创建域名黑名单表 - 确保包含reason和created_at字段
     db.run(`
       CREATE TABLE blacklist (
@@ -133,6 +182,9 @@ function initDatabase() {
     db.run('CREATE INDEX idx_records_timestamp ON browsing_records(timestamp)');
     db.run('CREATE INDEX idx_records_url ON browsing_records(url)');
     db.run('CREATE INDEX idx_records_original_url ON browsing_records(original_url)');
+    db.run('CREATE INDEX idx_visits_student_start ON visits(student_id, start_time)');
+    db.run('CREATE INDEX idx_visits_url ON visits(url)');
+    db.run('CREATE INDEX idx_rollups_bucket ON domain_rollups(bucket_start)');
     db.run('CREATE INDEX idx_blacklist_domain ON blacklist(domain)');
     db.run('CREATE INDEX idx_ip_blacklist_address ON ip_blacklist(ip_address)');
     
@@ -140,10 +192,114 @@ function initDatabase() {
     console.log('✅ browsing_records 表就绪');
     console.log('✅ blacklist 表及初始数据就绪');
     console.log('✅ ip_blacklist 表就绪');
+    console.log('✅ visits 表就绪');
+    console.log('✅ domain_rollups 表就绪');
     console.log('✅ 所有索引创建完成');
   });
 }
 
+// 黑名单版本与变更推送（见 blacklist_versions.js）。服务器每次启动都会重建数据库，epoch 区分不同的启动
+const blacklistVersions = createBlacklistVersions();
+
+// 学生端拉取黑名单：带 since（及 epoch）时只返回差异，If-None-Match 或 since 与当前版本相同时返回 304
+app.get('/api/url-blacklist/current', blacklistVersions.current(callback => {
+  db.all('SELECT domain FROM blacklist ORDER BY domain', (err, rows) => callback(err, rows && rows.map(r => r.domain)));
+}));
+
+// 黑名单变更推送（Server-Sent Events），事件 blacklist-update 直接带着差异；
+// 同一连接也推送采集策略（policy-update），连接后先发送一次当前策略
+app.get('/api/url-blacklist/events', blacklistVersions.events(res => {
+  if (agentPolicy.version > 0) res.write(policyFrame());
+}));
+
+// 学生端采集策略：考试等高峰期由管理端放慢学生端的采样 / 关闭截图 / 加大批量，学生端不需要重启。
+// 字段为 null 时学生端使用本地配置。策略随上报响应下发（请求头 X-Policy-Version 与当前 "epoch-版本" 不同时才带上），
+// 修改后推送给已连接的学生端；服务器重启后 epoch 变化，学生端接受新的版本号
+const POLICY_EPOCH = crypto.randomBytes(4).toString('hex');
+let agentPolicy = { epoch: POLICY_EPOCH, version: 0, sample_interval: null, screenshot: null, batch_size: null };
+
+function policyFor(req) {
+  return req.get('X-Policy-Version') === `${POLICY_EPOCH}-${agentPolicy.version}` ? undefined : agentPolicy;
+}
+
+function policyFrame() {
+  return `event: policy-update\ndata: ${JSON.stringify(agentPolicy)}\n\n`;
+}
+
+// 上报准入控制：同时处理的上报请求超过 REPORT_MAX_INFLIGHT 个时返回 429，
+// Retry-After 在 REPORT_RETRY_AFTER 的 1~2 倍之间随机，被拒绝的学生端不会在同一时刻重试
+const REPORT_MAX_INFLIGHT = Number(process.env.REPORT_MAX_INFLIGHT) || 64;
+const REPORT_RETRY_AFTER = Number(process.env.REPORT_RETRY_AFTER) || 30;
+let reportsInFlight = 0;
+const admission = { accepted: 0, rejected: 0 };
+
+function admitReport(req, res, next) {
+  if (reportsInFlight >= REPORT_MAX_INFLIGHT) {
+    admission.rejected += 1;
+    res.set('Retry-After', String(Math.ceil(REPORT_RETRY_AFTER * (1 + Math.random()))));
+    return res.status(429).json({ error: '服务器繁忙，请稍后再上报', policy: policyFor(req) });
+  }
+  admission.accepted += 1;
+  reportsInFlight += 1;
+  let released = false;
+  const release = () => {
+    if (released) return;
+    released = true;
+    reportsInFlight -= 1;
+  };
+  res.on('finish', release);
+  res.on('close', release);
+  next();
+}
+
+// 查看当前策略和上报准入情况
+app.get('/api/agent-policy', (req, res) => {
+  res.json({
+    ...agentPolicy,
+    load: { in_flight: reportsInFlight, max_in_flight: REPORT_MAX_INFLIGHT, ...admission }
+  });
+});
+
+// 管理令牌：请求头 X-Admin-Token 与环境变量 ADMIN_TOKEN 相同才允许修改。
+// 采集策略对全部学生机生效，未设置 ADMIN_TOKEN 时一律拒绝，不能让局域网内任何人修改
+const ADMIN_TOKEN = process.env.ADMIN_TOKEN || '';
+
+function requireAdmin(req, res, next) {
+  if (!ADMIN_TOKEN) {
+    return res.status(403).json({ error: '服务器未设置 ADMIN_TOKEN，不允许修改' });
+  }
+  const given = Buffer.from(String(req.get('X-Admin-Token') || ''));
+  const expected = Buffer.from(ADMIN_TOKEN);
+  if (given.length !== expected.length || !crypto.timingSafeEqual(given, expected)) {
+    return res.status(401).json({ error: '管理令牌（X-Admin-Token）错误' });
+  }
+  next();
+}
+
+// 修改策略：{ sample_interval: 秒, screenshot: true/false, batch_size: 条 }，省略或为 null 的字段恢复学生端本地配置；
+// 需要管理令牌
+app.put('/api/agent-policy', requireAdmin, (req, res) => {
+  const { sample_interval = null, screenshot = null, batch_size = null } = req.body || {};
+  if (sample_interval !== null && !(Number(sample_interval) > 0)) {
+    return res.status(400).json({ error: '采样间隔必须是正数（秒）' });
+  }
+  if (screenshot !== null && typeof screenshot !== 'boolean') {
+    return res.status(400).json({ error: 'screenshot 必须是 true 或 false' });
+  }
+  if (batch_size !== null && !(Number.isInteger(Number(batch_size)) && batch_size >= 1 && batch_size <= MAX_REPORT_BATCH)) {
+    return res.status(400).json({ error: `每批条数必须是 1~${MAX_REPORT_BATCH} 的整数` });
+  }
+  agentPolicy = {
+    epoch: POLICY_EPOCH,
+    version: agentPolicy.version + 1,
+    sample_interval: sample_interval === null ? null : Number(sample_interval),
+    screenshot,
+    batch_size: batch_size === null ? null : Number(batch_size)
+  };
+  blacklistVersions.broadcast(policyFrame());
+  res.json({ ok: true, policy: agentPolicy });
+});
+
 // 获取域名黑名单
 app.get('/api/blacklist/domains', (req, res) => {
   db.all('SELECT id, domain, reason, created_at FROM blacklist ORDER BY domain', (err, rows) => {
@@ -164,7 +320,8 @@ app.post('/api/blacklist/domains/add', (req, res) => {
     [cleanDomain, reason || '无理由'],
     function (err) {
       if (err) return res.status(500).json({ error: '添加失败:' + err.message });
-      if (this.lastID) {
+      if (this.changes > 0) {
+        blacklistVersions.record(cleanDomain, 'add');
         res.json({ ok: true, message: `域名 ${cleanDomain} 已加入黑名单` });
       } else {
         res.json({ ok: false, message: `域名 ${cleanDomain} 已在黑名单中` });
@@ -176,18 +333,23 @@ app.post('/api/blacklist/domains/add', (req, res) => {
 // 删除域名黑名单
 app.delete('/api/blacklist/domains/:id', (req, res) => {
   const id = req.params.id;
-  db.run(
-    'DELETE FROM blacklist WHERE id = ?',
-    [id],
-    function (err) {
-      if (err) return res.status(500).json({ error: '删除失败:' + err.message });
-      if (this.changes > 0) {
-        res.json({ ok: true, message: '域名已从黑名单移除' });
-      } else {
-        res.json({ ok: false, message: '域名不存在于黑名单中' });
+  db.get('SELECT domain FROM blacklist WHERE id = ?', [id], (err, row) => {
+    if (err) return res.status(500).json({ error: '删除失败:' + err.message });
+    if (!row) return res.json({ ok: false, message: '域名不存在于黑名单中' });
+    db.run(
+      'DELETE FROM blacklist WHERE id = ?',
+      [id],
+      function (err) {
+        if (err) return res.status(500).json({ error: '删除失败:' + err.message });
+        if (this.changes > 0) {
+          blacklistVersions.record(row.domain, 'remove');
+          res.json({ ok: true, message: '域名已从黑名单移除' });
+        } else {
+          res.json({ ok: false, message: '域名不存在于黑名单中' });
+        }
       }
-    }
-  );
+    );
+  });
 });
 
 // 获取IP黑名单
@@ -356,18 +518,108 @@ app.get('/api/check/blacklist', (req, res) => {
   }
 });
 
-// 接收学生端上报
-// 对于上报接口单独增加更大的 body 限制以兼容截图等大负载
-app.post('/api/report', bodyParser.json({ limit: '20mb' }), (req, res) => {
-  const { student_id, student_ip, url, domain: client_domain, original_url, title } = req.body;
+// 截图按内容哈希（sha256）存放：screenshots/ab/abcdef....jpg，相同画面只存一份
+const SCREENSHOT_DIR = path.join(__dirname, 'screenshots');
+const SCREENSHOT_HASH_RE = /^[0-9a-f]{64}$/;
+const MAX_SCREENSHOT_BYTES = 10 * 1024 * 1024;
+
+function screenshotPath(hash) {
+  return path.join(SCREENSHOT_DIR, hash.slice(0, 2), hash + '.jpg');
+}
+
+// 合并一个访问区间事件（open / heartbeat / closed）
+// 同一 visit_id 的事件可能重发或乱序到达：结束时间和停留时长只增不减，已结束的访问不会重新打开
+function saveVisit(body, fields, callback) {
+  const start = new Date(body.visit_start);
+  if (isNaN(start.getTime())) {
+    return callback({ status: 400, error: '访问开始时间格式错误（visit_start）' });
+  }
+  const end = new Date(body.visit_end || body.visit_start);
+  const endTime = isNaN(end.getTime()) || end < start ? start : end;
+  const focused = Math.max(0, Number(body.focused_seconds) || 0);
+  const state = body.visit_state === 'closed' ? 'closed' : 'open';
+  db.run(
+    `INSERT INTO visits
+       (visit_id, student_id, student_ip, url, original_url, title, start_time, end_time, focused_seconds, state)
+     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+     ON CONFLICT(visit_id) DO UPDATE SET
+       end_time = MAX(end_time, excluded.end_time),
+       focused_seconds = MAX(focused_seconds, excluded.focused_seconds),
+       state = CASE WHEN visits.state = 'closed' THEN 'closed' ELSE excluded.state END,
+       updated_at = CURRENT_TIMESTAMP`,
+    [String(body.visit_id), fields.student_id, fields.student_ip, fields.url, fields.original_url, fields.title,
+     start, endTime, focused, state],
+    (err) => {
+      if (err) {
+        console.error('访问区间存储失败:', err.message);
+        return callback({ status: 500, error: '访问区间存储失败:' + err.message });
+      }
+      callback(null);
+    }
+  );
+}
+
+// 保存一条汇总记录：summary 为时间桶列表，每个时间桶内每个域名一行
+function saveSummary(body, studentIp, callback) {
+  const rows = [];
+  for (const bucket of body.summary) {
+    const start = new Date(bucket && bucket.bucket_start);
+    if (isNaN(start.getTime()) || !Array.isArray(bucket.domains)) {
+      return callback({ status: 400, error: '汇总时间桶格式错误' });
+    }
+    for (const item of bucket.domains) {
+      if (!item || !item.domain) continue;
+      rows.push([
+        String(body.student_id).trim(), studentIp, String(body.summary_run || ''), start,
+        Math.round(Number(bucket.bucket_seconds) || 60), String(item.domain).toLowerCase(),
+        Math.max(0, Number(item.seconds) || 0), Math.max(0, Number(item.samples) || 0),
+        JSON.stringify(Array.isArray(item.titles) ? item.titles : [])
+      ]);
+    }
+  }
+  if (rows.length === 0) return callback(null, { blacklisted: false });
+
+  // 同一时间桶重发时覆盖为相同的值（幂等）；多行合并为一条语句写入，每条最多 100 行（SQLite 参数个数限制）
+  const CHUNK = 100;
+  let offset = 0;
+  const next = () => {
+    if (offset >= rows.length) return callback(null, { blacklisted: false });
+    const chunk = rows.slice(offset, offset + CHUNK);
+    offset += CHUNK;
+    db.run(
+      `INSERT OR REPLACE INTO domain_rollups
+         (student_id, student_ip, summary_run, bucket_start, bucket_seconds, url, focused_seconds, samples, top_titles)
+       VALUES ${chunk.map(() => '(?, ?, ?, ?, ?, ?, ?, ?, ?)').join(', ')}`,
+      [].concat(...chunk),
+      (err) => {
+        if (err) {
+          console.error('汇总存储失败:', err.message);
+          return callback({ status: 500, error: '汇总存储失败:' + err.message });
+        }
+        next();
+      }
+    );
+  };
+  next();
+}
+
+// 保存一条学生端上报记录（单条与批量接口共用）
+// fallbackIp: 上报中缺少 student_ip 时使用的连接来源地址
+function saveReport(body, fallbackIp, callback) {
+  const { student_id, student_ip, url, domain: client_domain, original_url, title } = body || {};
   if (!student_id) {
-    return res.status(400).json({ error: '缺少必填参数（student_id）' });
+    return callback({ status: 400, error: '缺少必填参数（student_id）' });
+  }
+
+  // 汇总模式的记录没有 url，单独保存
+  if (Array.isArray(body.summary)) {
+    return saveSummary(body, student_ip || fallbackIp || '未知IP', callback);
   }
 
   // 确保有URL值
   const finalUrl = url || original_url || '';
   if (!finalUrl) {
-    return res.status(400).json({ error: '缺少必填参数（url）' });
+    return callback({ status: 400, error: '缺少必填参数（url）' });
   }
 
   // 使用学生端提供的域名，如果没有则自己提取
@@ -389,8 +641,7 @@ app.post('/api/report', bodyParser.json({ limit: '20mb' }), (req, res) => {
     }
   }
 
-  // 确保学生IP地址：优先使用上报的 student_ip，其次尝试 X-Forwarded-For / req.ip / remoteAddress
-  const finalStudentIp = student_ip || (req.headers['x-forwarded-for'] ? String(req.headers['x-forwarded-for']).split(',')[0].trim() : null) || req.ip || (req.connection && req.connection.remoteAddress) || '未知IP';
+  const finalStudentIp = student_ip || fallbackIp || '未知IP';
 
   // 检查域名黑名单
   db.get(
@@ -399,48 +650,176 @@ app.post('/api/report', bodyParser.json({ limit: '20mb' }), (req, res) => {
     (err, row) => {
       const blacklisted = !!row;
 
-      // 使用提供的时间戳，如果没有则使用数据库默认值
-      const userTimestamp = req.body.timestamp ? new Date(req.body.timestamp) : null;
-      const timestampParam = userTimestamp && !isNaN(userTimestamp.getTime()) ? userTimestamp : null;
-
-      // 构建字段列表，避免多余逗号
-      const fields = ['student_id', 'student_ip', 'url', 'original_url', 'title'];
-      const values = [
-        student_id.trim(),
-        finalStudentIp,
-        domain, // 存储清理后的域名
-        finalUrl, // 存储原始完整URL
-        (title || '无标题').trim()
-      ];
-      
-      // 如果有时间戳参数，添加到字段和值中
-      if (timestampParam) {
-        fields.push('timestamp');
-        values.push(timestampParam);
+      // 会话模式：心跳和结束事件只更新访问区间；开始事件同时新增一条浏览记录（带截图）
+      if (body.visit_id) {
+        const visitFields = {
+          student_id: String(student_id).trim(),
+          student_ip: finalStudentIp,
+          url: domain,
+          original_url: finalUrl,
+          title: (title || '无标题').trim()
+        };
+        return saveVisit(body, visitFields, (err) => {
+          if (err) return callback(err);
+          if (body.visit_state !== 'open') return callback(null, { blacklisted });
+          insertRecord(blacklisted);
+        });
       }
-      
-      // 生成参数占位符
-      const placeholders = fields.map(() => '?').join(', ');
-      
-      db.run(
-        `INSERT INTO browsing_records 
-         (${fields.join(', ')}) 
-         VALUES (${placeholders})`,
-        values,
-        (err) => {
-          if (err) {
-            console.error('记录存储失败:', err.message);
-            return res.status(500).json({ error: '记录存储失败:' + err.message });
-          }
-          res.json({ 
-            ok: true, 
-            blacklisted,
-            message: blacklisted ? '访问已记录（域名在黑名单中）' : '访问已记录'
-          });
-        }
-      );
+      insertRecord(blacklisted);
     }
   );
+
+  function insertRecord(blacklisted) {
+    // 使用提供的时间戳，如果没有则使用数据库默认值
+    const userTimestamp = body.timestamp ? new Date(body.timestamp) : null;
+    const timestampParam = userTimestamp && !isNaN(userTimestamp.getTime()) ? userTimestamp : null;
+
+    // 构建字段列表，避免多余逗号
+    const fields = ['student_id', 'student_ip', 'url', 'original_url', 'title'];
+    const values = [
+      String(student_id).trim(),
+      finalStudentIp,
+      domain, // 存储清理后的域名
+      finalUrl, // 存储原始完整URL
+      (title || '无标题').trim()
+    ];
+    
+    // 截图以哈希引用（图片本身通过 /api/screenshots/:hash 单独上传）
+    if (body.screenshot_ref && SCREENSHOT_HASH_RE.test(body.screenshot_ref)) {
+      fields.push('screenshot_ref');
+      values.push(body.screenshot_ref);
+    }
+
+    // 如果有时间戳参数，添加到字段和值中
+    if (timestampParam) {
+      fields.push('timestamp');
+      values.push(timestampParam);
+    }
+    
+    // 生成参数占位符
+    const placeholders = fields.map(() => '?').join(', ');
+    
+    db.run(
+      `INSERT INTO browsing_records 
+       (${fields.join(', ')}) 
+       VALUES (${placeholders})`,
+      values,
+      (err) => {
+        if (err) {
+          console.error('记录存储失败:', err.message);
+          return callback({ status: 500, error: '记录存储失败:' + err.message });
+        }
+        callback(null, { blacklisted });
+      }
+    );
+  }
+}
+
+// 获取上报来源IP：优先 X-Forwarded-For，其次 req.ip / remoteAddress
+function requestIp(req) {
+  return (req.headers['x-forwarded-for'] ? String(req.headers['x-forwarded-for']).split(',')[0].trim() : null) || req.ip || (req.connection && req.connection.remoteAddress) || null;
+}
+
+// 上报记录缺少 student_ip 时使用的地址：优先学生端在请求头中声明的本机IP（X-Student-IP），其次连接来源地址
+function reportIp(req) {
+  const declared = req.headers['x-student-ip'];
+  return (declared && String(declared).trim()) || requestIp(req);
+}
+
+// 接收学生端上报
+// 对于上报接口单独增加更大的 body 限制以兼容截图等大负载
+app.post('/api/report', admitReport, bodyParser.json({ limit: '20mb' }), (req, res) => {
+  saveReport(req.body, reportIp(req), (err, result) => {
+    if (err) return res.status(err.status).json({ error: err.error });
+    res.json({ 
+      ok: true, 
+      blacklisted: result.blacklisted,
+      message: result.blacklisted ? '访问已记录（域名在黑名单中）' : '访问已记录',
+      policy: policyFor(req)
+    });
+  });
+});
+
+// 上报能力声明：学生端据此决定是否使用批量接口
+const MAX_REPORT_BATCH = 500;
+app.get('/api/report/capabilities', (req, res) => {
+  res.json({ batch: true, gzip: true, max_batch: MAX_REPORT_BATCH, screenshot_upload: true, policy: agentPolicy });
+});
+
+// 上传截图原始 JPEG 数据（不做 base64），路径中的哈希必须与内容的 sha256 一致
+// 已存在的截图直接返回 stored: false，重复上传同一画面不会重复写盘
+app.put('/api/screenshots/:hash', admitReport, express.raw({ type: '*/*', limit: MAX_SCREENSHOT_BYTES }), (req, res) => {
+  const hash = String(req.params.hash).toLowerCase();
+  if (!SCREENSHOT_HASH_RE.test(hash)) {
+    return res.status(400).json({ error: '截图哈希格式错误' });
+  }
+  if (!Buffer.isBuffer(req.body) || req.body.length === 0) {
+    return res.status(400).json({ error: '缺少截图数据' });
+  }
+  if (crypto.createHash('sha256').update(req.body).digest('hex') !== hash) {
+    return res.status(422).json({ error: '截图内容与哈希不一致' });
+  }
+
+  const file = screenshotPath(hash);
+  if (fs.existsSync(file)) {
+    return res.json({ ok: true, hash, stored: false });
+  }
+  // 先写临时文件再改名，避免并发上传或中途断开时留下不完整的图片
+  const tmp = `${file}.${process.pid}.${Date.now()}.tmp`;
+  fs.mkdir(path.dirname(file), { recursive: true }, (err) => {
+    if (err) return res.status(500).json({ error: '截图保存失败:' + err.message });
+    fs.writeFile(tmp, req.body, (err) => {
+      if (err) return res.status(500).json({ error: '截图保存失败:' + err.message });
+      fs.rename(tmp, file, (err) => {
+        if (err) {
+          fs.unlink(tmp, () => {});
+          return res.status(500).json({ error: '截图保存失败:' + err.message });
+        }
+        res.json({ ok: true, hash, stored: true });
+      });
+    });
+  });
+});
+
+// 查看截图（内容不会变化，可长期缓存）
+app.get('/api/screenshots/:hash', (req, res) => {
+  const hash = String(req.params.hash).toLowerCase();
+  if (!SCREENSHOT_HASH_RE.test(hash)) {
+    return res.status(400).json({ error: '截图哈希格式错误' });
+  }
+  res.sendFile(screenshotPath(hash), {
+    headers: { 'Content-Type': 'image/jpeg', 'Cache-Control': 'public, max-age=31536000, immutable' }
+  }, (err) => {
+    if (err && !res.headersSent) res.status(404).json({ error: '截图不存在' });
+  });
+});
+
+// 批量上报：{ student_id, student_ip, records: [...] }，请求体可用 gzip 压缩（Content-Encoding: gzip）
+// 记录按数组顺序依次入库，每条记录可覆盖公共的 student_id / student_ip；
+// results 逐条给出结果，失败的记录带 status（400 格式错误不必重试，500 入库失败需要重试），学生端只重发失败的记录
+app.post('/api/report/batch', admitReport, bodyParser.json({ limit: '20mb' }), (req, res) => {
+  const { records } = req.body || {};
+  if (!Array.isArray(records) || records.length === 0) {
+    return res.status(400).json({ error: '缺少必填参数（records）' });
+  }
+  if (records.length > MAX_REPORT_BATCH) {
+    return res.status(413).json({ error: `单批最多 ${MAX_REPORT_BATCH} 条记录` });
+  }
+
+  const ip = reportIp(req);
+  const results = [];
+  let index = 0;
+  const next = () => {
+    if (index >= records.length) {
+      return res.json({ ok: true, accepted: results.filter(r => r.ok).length, results, policy: policyFor(req) });
+    }
+    const record = Object.assign({ student_id: req.body.student_id, student_ip: req.body.student_ip }, records[index++]);
+    saveReport(record, ip, (err, result) => {
+      results.push(err ? { ok: false, status: err.status || 500, error: err.error } : { ok: true, blacklisted: result.blacklisted });
+      next();
+    });
+  };
+  next();
 });
 
 // 获取带过滤功能的浏览记录
@@ -490,6 +869,7 @@ app.get('/api/records', (req, res) => {
       r.url,
       r.original_url,
       r.title,
+      r.screenshot_ref,
       r.timestamp,
       CASE WHEN b.id IS NOT NULL THEN 1 ELSE 0 END AS blacklisted,
       b.reason AS blacklist_reason
@@ -566,6 +946,156 @@ app.get('/api/latest', (req, res) => {
   );
 });
 
+// 访问区间（会话模式）：默认按开始时间倒序列出；group=domain 时按学生和域名汇总停留时长
+app.get('/api/visits', (req, res) => {
+  const { student_id, domain, start_time, end_time, group, page = 1, page_size = 50 } = req.query;
+  const limit = Math.min(Number(page_size) || 50, 100);
+  const offset = (Number(page) - 1) * limit;
+
+  const whereClause = [];
+  const params = [];
+  if (student_id) {
+    whereClause.push('student_id = ?');
+    params.push(student_id);
+  }
+  if (domain) {
+    whereClause.push('url LIKE ?');
+    params.push('%' + domain + '%');
+  }
+  if (start_time) {
+    whereClause.push('end_time >= ?');
+    params.push(new Date(start_time).getTime() || start_time);
+  }
+  if (end_time) {
+    whereClause.push('start_time <= ?');
+    params.push(new Date(end_time).getTime() || end_time);
+  }
+  const whereStr = whereClause.length > 0 ? 'WHERE ' + whereClause.join(' AND ') : '';
+
+  if (group === 'domain') {
+    return db.all(`
+      SELECT
+        student_id,
+        url,
+        COUNT(*) AS visits,
+        ROUND(SUM(focused_seconds), 1) AS focused_seconds,
+        MIN(start_time) AS first_start,
+        MAX(end_time) AS last_end
+      FROM visits
+      ${whereStr}
+      GROUP BY student_id, url
+      ORDER BY focused_seconds DESC
+      LIMIT ? OFFSET ?`,
+      [...params, limit, offset],
+      (err, rows) => {
+        if (err) return res.status(500).json({ error: '获取访问汇总失败:' + err.message });
+        res.json({
+          data: rows.map(row => ({
+            ...row,
+            first_start: new Date(row.first_start).toLocaleString('zh-CN'),
+            last_end: new Date(row.last_end).toLocaleString('zh-CN')
+          }))
+        });
+      }
+    );
+  }
+
+  db.all(`
+    SELECT visit_id, student_id, student_ip, url, original_url, title, start_time, end_time, focused_seconds, state
+    FROM visits
+    ${whereStr}
+    ORDER BY start_time DESC
+    LIMIT ? OFFSET ?`,
+    [...params, limit, offset],
+    (err, rows) => {
+      if (err) return res.status(500).json({ error: '获取访问区间失败:' + err.message });
+      db.get(`SELECT COUNT(*) as total FROM visits ${whereStr}`, params, (countErr, countRow) => {
+        if (countErr) return res.status(500).json({ error: '获取总数失败:' + countErr.message });
+        res.json({
+          data: rows.map(row => ({
+            ...row,
+            student_ip: normalizeIp(row.student_ip),
+            url: extractDisplayDomain(row.url, row.original_url),
+            title: row.title || '—',
+            start_time: new Date(row.start_time).toLocaleString('zh-CN'),
+            end_time: new Date(row.end_time).toLocaleString('zh-CN')
+          })),
+          pagination: {
+            current_page: Number(page),
+            page_size: limit,
+            total_items: countRow.total,
+            total_pages: Math.ceil(countRow.total / limit)
+          }
+        });
+      });
+    }
+  );
+});
+
+// 域名汇总（汇总模式）：按域名合计停留时长；by_student=true 时按学生和域名分组，
+// top_titles 合并各时间桶中停留最久的标题
+app.get('/api/summary', (req, res) => {
+  const { student_id, domain, start_time, end_time, by_student, limit: rawLimit } = req.query;
+  const limit = Math.min(Number(rawLimit) || 50, 500);
+
+  const whereClause = [];
+  const params = [];
+  if (student_id) {
+    whereClause.push('student_id = ?');
+    params.push(student_id);
+  }
+  if (domain) {
+    whereClause.push('url LIKE ?');
+    params.push('%' + domain + '%');
+  }
+  if (start_time) {
+    whereClause.push('bucket_start >= ?');
+    params.push(new Date(start_time).getTime() || start_time);
+  }
+  if (end_time) {
+    whereClause.push('bucket_start <= ?');
+    params.push(new Date(end_time).getTime() || end_time);
+  }
+  const whereStr = whereClause.length > 0 ? 'WHERE ' + whereClause.join(' AND ') : '';
+  const groupBy = by_student === 'true' ? 'student_id, url' : 'url';
+
+  db.all(`
+    SELECT
+      ${by_student === 'true' ? 'student_id,' : ''}
+      url,
+      ROUND(SUM(focused_seconds), 1) AS focused_seconds,
+      SUM(samples) AS samples,
+      COUNT(DISTINCT student_id) AS students,
+      GROUP_CONCAT(top_titles, '\u0001') AS titles
+    FROM domain_rollups
+    ${whereStr}
+    GROUP BY ${groupBy}
+    ORDER BY focused_seconds DESC
+    LIMIT ?`,
+    [...params, limit],
+    (err, rows) => {
+      if (err) return res.status(500).json({ error: '获取域名汇总失败:' + err.message });
+      res.json({
+        data: rows.map(({ titles, ...row }) => {
+          const merged = {};
+          String(titles || '').split('\u0001').forEach(text => {
+            try {
+              JSON.parse(text || '[]').forEach(([title, seconds]) => {
+                merged[title] = (merged[title] || 0) + (Number(seconds) || 0);
+              });
+            } catch (e) {}
+          });
+          const top_titles = Object.entries(merged)
+            .sort((a, b) => b[1] - a[1])
+            .slice(0, 5)
+            .map(([title, seconds]) => ({ title, seconds: Math.round(seconds * 10) / 10 }));
+          return { ...row, url: extractDisplayDomain(row.url, ''), top_titles };
+        })
+      });
+    }
+  );
+});
+
 // 获取统计信息
 app.get('/api/stats', (req, res) => {
   // 获取总记录数
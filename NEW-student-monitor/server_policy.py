@@ -0,0 +1,115 @@
+# server_policy.py —— 服务器下发的采集策略与限流（学生端）
+# 功能：考试等高峰期服务器负载过高时，由服务器控制学生端的上报节奏，不需要重启学生端：
+#      - 策略文档 {"epoch": ..., "version": 3, "sample_interval": 15, "screenshot": false, "batch_size": 50}
+#        随上报响应（policy 字段）、上报能力声明或推送事件（policy-update）下发，
+#        AgentPolicy.apply() 校验后只应用比本地新的版本（服务器重启后 epoch 不同，版本号重新计算），
+#        并通知订阅者（调整采样节拍、批量大小等）；字段为 null 或缺少时恢复本地配置
+#      - 服务器返回 429 / 503 时按 Retry-After 暂停上报，parse_retry_after() 解析秒数或 HTTP 日期
+#
+# 学生端在请求头 X-Policy-Version 中带上本地的 "epoch-版本号"，服务器只在不同时返回策略文档。
+
+import email.utils
+import threading
+import time
+
+POLICY_HEADER = 'X-Policy-Version'
+# 这些状态码表示服务器要求学生端稍后再试
+THROTTLE_STATUS = (429, 503)
+
+
+def parse_retry_after(value, now=None, cap=3600.0):
+    """Retry-After 头（秒数或 HTTP 日期）转换为等待秒数，范围 [0, cap]；无法解析时返回 None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+        if when is None:
+            return None
+        seconds = when.timestamp() - (time.time() if now is None else now)
+    if seconds != seconds:  # NaN
+        return None
+    return max(0.0, min(cap, seconds))
+
+
+class AgentPolicy:
+    """
+    defaults       本地配置：{"sample_interval": 秒, "screenshot": bool, "batch_size": 条}，
+                   服务器策略中为 null 的字段使用这里的值
+    min_interval / max_interval   服务器下发的采样间隔限制在这个范围内
+    max_batch      服务器下发的批量大小上限
+    """
+
+    def __init__(self, defaults, min_interval=1.0, max_interval=600.0, max_batch=500):
+        self.defaults = dict(defaults)
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.max_batch = int(max_batch)
+        self.epoch = None
+        self.version = None
+        self.values = dict(self.defaults)
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.stats = {"applied": 0, "stale": 0, "invalid": 0}
+
+    def get(self, name):
+        """当前生效的值（服务器策略或本地配置）"""
+        return self.values.get(name)
+
+    def subscribe(self, callback):
+        """策略变化后调用 callback(changes)，changes 为 {字段: 新值}"""
+        self._listeners.append(callback)
+
+    def _validate(self, name, value):
+        if value is None:
+            return self.defaults.get(name)
+        if name == 'sample_interval':
+            return max(self.min_interval, min(self.max_interval, float(value)))
+        if name == 'screenshot':
+            # 服务器只能关闭截图：本地未启用截图时不会因为策略而打开
+            return bool(value) and bool(self.defaults.get('screenshot', True))
+        if name == 'batch_size':
+            return max(1, min(self.max_batch, int(value)))
+        return value
+
+    def apply(self, doc):
+        """应用服务器下发的策略文档，返回变化的字段（旧版本、格式错误时返回 {}）"""
+        if not isinstance(doc, dict):
+            return {}
+        with self._lock:
+            version = doc.get('version')
+            if not isinstance(version, int):
+                self.stats["invalid"] += 1
+                return {}
+            if doc.get('epoch') == self.epoch and self.version is not None and version <= self.version:
+                self.stats["stale"] += 1
+                return {}
+            try:
+                values = {name: self._validate(name, doc.get(name)) for name in self.defaults}
+            except (TypeError, ValueError):
+                self.stats["invalid"] += 1
+                return {}
+            changes = {name: value for name, value in values.items() if value != self.values.get(name)}
+            self.epoch = doc.get('epoch')
+            self.version = version
+            self.values = values
+            self.stats["applied"] += 1
+        if changes:
+            print(f"应用服务器策略（版本 {version}）: {changes}")
+            for callback in self._listeners:
+                try:
+                    callback(changes)
+                except Exception as e:
+                    print(f"应用服务器策略失败: {str(e)}")
+        return changes
+
+    def headers(self):
+        return {POLICY_HEADER: f"{self.epoch}-{self.version}"} if self.version is not None else {}
+
+    def metrics(self):
+        return dict(self.stats, version=self.version, **self.values)
@@ -1,5 +1,6 @@
 import os
 import time
+import threading
 import json
 import socket
 import re
@@ -7,24 +8,37 @@ import base64
 import platform
 import requests
 import psutil
-try:
-    import win32gui
-    import win32process
-except Exception:
-    win32gui = None
-    win32process = None
 import uuid
 from datetime import datetime
 from io import BytesIO
 from PIL import Image
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from report_uploader import ReportTransport, BatchUploader, ScreenshotUploader
+from report_outbox import ReportOutbox, OutboxSender, default_outbox_path
+from agent_core import AgentCore
+from screenshot_delta import ScreenshotDelta, FULL, TILES, UNCHANGED
+from jpeg_encoder import TargetSizeEncoder
+from network_identity import NetworkIdentity
+from process_cache import ProcessCache
+from title_parser import TitleParser
+from platform_probe import create_probe
+from report_trace import TraceWriter
+from ttl_cache import TTLCache
+from visit_session import VisitTracker, OPEN
+from summary_rollup import DomainRollup
+from blacklist_matcher import BlacklistMatcher
+from blacklist_sync import BlacklistSync, read_events
+from foreground_events import ForegroundMonitor, create_event_source
+from fleet_schedule import DecorrelatedBackoff, phase_delay
+from server_policy import AgentPolicy
 
-# 用于去重的缓存，存储最近上报的记录
-# 格式: {(domain, title): (last_report_time, count)}
-recent_reports = {}
 # 去重时间窗口(秒)，相同内容在这个时间内不会重复上报
 DEDUPLICATION_WINDOW = int(os.environ.get('DEDUPLICATION_WINDOW', '30'))
+# 去重缓存的条目上限
+DEDUPLICATION_MAX_ENTRIES = int(os.environ.get('DEDUPLICATION_MAX_ENTRIES', '1024'))
+# 用于去重的缓存，存储最近上报的记录: (domain, title) → 去重窗口内的上报次数
+recent_reports = TTLCache(DEDUPLICATION_WINDOW, max_size=DEDUPLICATION_MAX_ENTRIES, clock=time.time)
 
 # 配置（可通过环境变量覆盖）
 SERVER_BASE = os.environ.get('MONITOR_SERVER') or os.environ.get('SERVER_URL') or 'http://localhost:3003'
@@ -37,14 +51,117 @@ MAX_SCREENSHOT_BYTES = int(os.environ.get('MAX_SCREENSHOT_BYTES', str(200 * 1024
 INITIAL_MAX_SCREENSHOT = int(os.environ.get('INITIAL_MAX_SCREENSHOT', '1024'))
 # JPEG初始质量
 INITIAL_JPEG_QUALITY = int(os.environ.get('INITIAL_JPEG_QUALITY', '70'))
+# 按目标大小编码：最低质量、最小缩放比例、本机编码模型文件（记录画面每像素字节数，重启后继续使用）
+MIN_JPEG_QUALITY = int(os.environ.get('MIN_JPEG_QUALITY', '30'))
+MIN_SCREENSHOT_SCALE = float(os.environ.get('MIN_SCREENSHOT_SCALE', '0.7'))
+JPEG_MODEL_PATH = os.environ.get('JPEG_MODEL_PATH') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'jpeg_model.json')
+# 截图变化检测：画面没变化时不发送，局部变化时只发送变化的区块
+SCREENSHOT_DELTA = os.environ.get('SCREENSHOT_DELTA', '1') not in ['0', 'false', 'False']
+# 区块网格边数、区块平均灰度差阈值（0-255）、强制整张发送的间隔（秒）
+SCREENSHOT_TILE_GRID = int(os.environ.get('SCREENSHOT_TILE_GRID', '4'))
+SCREENSHOT_CHANGE_THRESHOLD = float(os.environ.get('SCREENSHOT_CHANGE_THRESHOLD', '6'))
+SCREENSHOT_KEYFRAME_INTERVAL = float(os.environ.get('SCREENSHOT_KEYFRAME_INTERVAL', '300'))
+# 截图以原始 JPEG 按内容哈希单独上传，上报记录只带哈希（服务器不支持时自动改为内嵌 base64）
+SCREENSHOT_UPLOAD = os.environ.get('SCREENSHOT_UPLOAD', '1') not in ['0', 'false', 'False']
+# 批量上报：缓冲的记录满 BATCH_MAX_RECORDS 条或等待超过 BATCH_MAX_DELAY 秒时整批 gzip 发送
+BATCH_ENABLED = os.environ.get('BATCH_ENABLED', '1') not in ['0', 'false', 'False']
+BATCH_MAX_RECORDS = int(os.environ.get('BATCH_MAX_RECORDS', '20'))
+BATCH_MAX_DELAY = float(os.environ.get('BATCH_MAX_DELAY', '30'))
+# 本地发件箱：断网时记录先落盘，恢复后补发；文件大小上限（字节）
+OUTBOX_PATH = os.environ.get('OUTBOX_PATH') or default_outbox_path()
+OUTBOX_MAX_BYTES = int(os.environ.get('OUTBOX_MAX_BYTES', str(20 * 1024 * 1024)))
+# 本机IP缓存有效期（秒）；网卡地址变化时会提前重新获取
+NETWORK_IDENTITY_TTL = float(os.environ.get('NETWORK_IDENTITY_TTL', '600'))
+# 采样/编码/发送流水线：队列长度、队列满时的策略（drop_oldest / coalesce / block）、统计输出间隔（秒）
+QUEUE_SIZE = int(os.environ.get('QUEUE_SIZE', '32'))
+QUEUE_POLICY = os.environ.get('QUEUE_POLICY', 'coalesce')
+METRICS_INTERVAL = float(os.environ.get('METRICS_INTERVAL', '300'))
+# 窗口 / 进程 / 截图探测后端：auto（Windows 上为 win32）/ win32 / trace（回放 PROBE_TRACE 记录文件）/ synthetic / null
+PROBE_BACKEND = os.environ.get('PROBE_BACKEND', 'auto')
+PROBE_TRACE = os.environ.get('PROBE_TRACE')
+# 流量记录文件：设置后把服务器接受的每个上报请求及其时间追加到该文件（供 tests/replay_report.py 回放）
+REPORT_TRACE_PATH = os.environ.get('REPORT_TRACE_PATH')
+# 上报模式：sample 每次采样上报一条（经过去重）；session 上报访问区间（开始 / 心跳 / 结束）；
+# summary 只上报按时间桶汇总的域名停留时长，命中黑名单时立即上报一条记录
+REPORT_MODE = os.environ.get('REPORT_MODE', 'sample')
+# 会话模式下进行中的访问每隔多少秒上报一次心跳
+VISIT_HEARTBEAT = float(os.environ.get('VISIT_HEARTBEAT', '60'))
+# 相邻两次采样间隔超过多少秒视为中断（睡眠、锁屏），访问在上一次采样处结束
+VISIT_MAX_GAP = float(os.environ.get('VISIT_MAX_GAP', str(3 * REPORT_INTERVAL)))
+# 汇总模式：时间桶长度（秒）、每个域名保留的标题数、上报间隔（秒）
+SUMMARY_BUCKET = float(os.environ.get('SUMMARY_BUCKET', '60'))
+SUMMARY_TOP_TITLES = int(os.environ.get('SUMMARY_TOP_TITLES', '3'))
+SUMMARY_UPLOAD_INTERVAL = float(os.environ.get('SUMMARY_UPLOAD_INTERVAL', '300'))
+# 汇总模式下从服务器刷新黑名单的间隔（秒）
+BLACKLIST_REFRESH = float(os.environ.get('BLACKLIST_REFRESH', '300'))
+# 是否订阅服务器的黑名单变更推送（/api/url-blacklist/events，事件中直接带差异）；
+# 推送缺版本时随机等待最多 BLACKLIST_FETCH_JITTER 秒再请求，避免所有学生机同时请求
+BLACKLIST_PUSH = os.environ.get('BLACKLIST_PUSH', '1') != '0'
+BLACKLIST_FETCH_JITTER = float(os.environ.get('BLACKLIST_FETCH_JITTER', '10'))
+# 前台窗口变化事件源：auto / winevent / poll / off；窗口或标题变化时立即采样，不等下一个节拍
+FOREGROUND_EVENTS = os.environ.get('FOREGROUND_EVENTS', 'auto')
+# 快速连续切换（Alt-Tab）在多少秒内没有新变化才采样
+FOREGROUND_SETTLE = float(os.environ.get('FOREGROUND_SETTLE', '0.3'))
+# 轮询事件源比较前台窗口的间隔（秒）
+FOREGROUND_POLL_INTERVAL = float(os.environ.get('FOREGROUND_POLL_INTERVAL', '0.5'))
+# 有事件源时逐条上报模式的兜底采样间隔（秒），应小于去重时间窗口
+FOREGROUND_FALLBACK_INTERVAL = float(os.environ.get('FOREGROUND_FALLBACK_INTERVAL', '20'))
+# 机房错峰：按学生ID哈希得到固定相位，采样节拍和汇总上报都对齐到各自的相位（SCHEDULE_PHASE=0 关闭）；
+# 每次采样在节拍点前后随机偏移 ±SCHEDULE_JITTER × 采样间隔
+SCHEDULE_PHASE = os.environ.get('SCHEDULE_PHASE', '1') != '0'
+SCHEDULE_JITTER = float(os.environ.get('SCHEDULE_JITTER', '0.1'))
+# 是否通过推送连接接收服务器下发的采集策略（policy-update 事件）；上报响应中的策略总是会应用
+POLICY_PUSH = os.environ.get('POLICY_PUSH', '1') != '0'
 
 # requests session with retry
+# 503 / 429 不在这里自动重试：由上报传输层按服务器的 Retry-After 暂停发送
 session = requests.Session()
-retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=['POST','GET'])
+retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 504], allowed_methods=['POST','GET'])
 adapter = HTTPAdapter(max_retries=retries)
 session.mount('http://', adapter)
 session.mount('https://', adapter)
 
+# 服务器下发的采集策略（采样间隔 / 截图开关 / 批量大小），随上报响应或推送事件更新，未下发的字段使用本地配置
+agent_policy = AgentPolicy({
+    "sample_interval": REPORT_INTERVAL,
+    "screenshot": SCREENSHOT_ENABLED,
+    "batch_size": BATCH_MAX_RECORDS if BATCH_ENABLED else 1,
+})
+
+# 上报传输与缓冲（未启用批量时每条记录立即发送）
+transport = ReportTransport(SERVER_BASE, session=session, timeout=6,
+                            recorder=TraceWriter(REPORT_TRACE_PATH) if REPORT_TRACE_PATH else None,
+                            policy=agent_policy)
+# 截图上传（只在编码线程中使用），记住最近上传过的哈希，相同画面只传一次
+screenshot_uploader = ScreenshotUploader(transport) if SCREENSHOT_UPLOAD else None
+
+def create_uploader():
+    """
+    优先使用磁盘发件箱 + 后台发送线程；发件箱无法创建时退回内存缓冲
+    """
+    max_records = BATCH_MAX_RECORDS if BATCH_ENABLED else 1
+    max_delay = BATCH_MAX_DELAY if BATCH_ENABLED else 0
+    try:
+        outbox = ReportOutbox(OUTBOX_PATH, max_bytes=OUTBOX_MAX_BYTES)
+        if len(outbox):
+            print(f"发件箱中有 {len(outbox)} 条未发送记录，将在后台补发")
+        return OutboxSender(outbox, transport, batch_size=max_records, max_delay=max_delay).start()
+    except Exception as e:
+        print(f"创建本地发件箱失败，改用内存缓冲: {str(e)}")
+        return BatchUploader(transport, max_records=max_records, max_delay=max_delay)
+
+uploader = None
+
+def get_uploader():
+    """
+    首次上报时再创建上传器，避免仅导入模块就启动后台线程
+    """
+    global uploader
+    if uploader is None:
+        uploader = create_uploader()
+    return uploader
+
 # 获取本机IP地址
 def get_local_ip():
     try:
@@ -89,6 +206,11 @@ def get_local_ip():
     except:
         return "127.0.0.1"
 
+# 本机IP只解析一次并缓存；编码时写入每条记录的 student_ip（记录可能在发件箱里等待，发送时IP可能已经变化），
+# 会话请求头（X-Student-IP / X-Student-Host）只作为缺少 student_ip 的记录的后备
+network_identity = NetworkIdentity(get_local_ip, ttl=NETWORK_IDENTITY_TTL)
+network_identity.attach(session)
+
 # 学生ID获取函数
 def get_student_id():
     # 尝试从文件读取学生ID
@@ -120,6 +242,12 @@ def get_student_id():
         except:
             return "unknown_pc"
 
+# 前台窗口、进程信息和截图都通过探测后端获取
+probe = create_probe(PROBE_BACKEND, trace_path=PROBE_TRACE)
+# 窗口所属进程信息缓存（同一窗口不再重复查询进程）
+process_cache = ProcessCache(source=probe)
+title_parser = TitleParser()
+
 # 获取活动浏览器信息
 def get_active_browser_info():
     """
@@ -127,96 +255,47 @@ def get_active_browser_info():
     """
     try:
         # 获取活动窗口
-        hwnd = win32gui.GetForegroundWindow()
-        title = win32gui.GetWindowText(hwnd)
-        
-        # 检查是否是浏览器窗口
-        browser_classes = ['Chrome_WidgetWin_1', 'MozillaWindowClass', 'IEFrame', 'ApplicationFrameWindow']
-        window_class = win32gui.GetClassName(hwnd)
-        
-        # 提取URL的正则表达式模式 - 增强版本
-        url_patterns = [
-            r'(https?://[^\s]+)',  # 直接匹配URL
-            r'地址: (https?://[^\s]+)',  # 地址栏格式
-            r'URL: (https?://[^\s]+)',  # URL: 格式
-            r'(www\.[^\s]+\.[^\s]+)',  # www.开头的网址
-            r'([^\s]+\.(com|cn|net|org|edu|gov|mil|int|info|biz|name|museum|coop|aero|pro|tel|mobi|asia|jobs|travel)[^\s]*)',  # 常见顶级域名
-        ]
-        
-        # 尝试从标题中提取URL
-        url = None
-        for pattern in url_patterns:
-            match = re.search(pattern, title)
-            if match:
-                url = match.group(1)
-                if not url.startswith(('http://', 'https://')):
-                    # 如果是域名形式但没有协议，添加https
-                    if re.match(r'^www\.', url) or re.search(r'\.[a-zA-Z]{2,}(\.[a-zA-Z]{2,})?', url):
-                        url = 'https://' + url
-                break
-        
-        # 如果标题中没有找到URL，但窗口是浏览器，尝试从进程和窗口类名推断
-        if url is None and window_class in browser_classes:
-            try:
-                _, process_id = win32process.GetWindowThreadProcessId(hwnd)
-                process = psutil.Process(process_id)
-                process_name = process.name().lower()
-                
-                # 对于浏览器窗口，即使无法获取URL，也尝试从标题中提取域名信息
-                # 增强的域名提取模式
-                enhanced_domain_patterns = [
-                    r'([^\s]+\.(com|cn|net|org|edu|gov|mil|int|info|biz|name|museum|coop|aero|pro|tel|mobi|asia|jobs|travel)(/|$))',
-                    r'(www\.[^\s]+\.[^\s]+)',
-                    r'(youtube|baidu|google|bing|sohu|sina|qq|taobao|jd|tmall|1688)\.com',
-                ]
-                
-                for pattern in enhanced_domain_patterns:
-                    match = re.search(pattern, title.lower())
-                    if match:
-                        domain = match.group(1)
-                        url = 'https://' + domain
-                        break
-            except:
-                pass
-        
-        # 如果标题不为空但URL还是没有，尝试使用窗口标题作为特殊标识
-        if url is None and title.strip():
-            # 为有标题但无法提取URL的窗口创建一个基于标题的标识
-            # 这样可以避免返回about:blank导致域名显示unknown
-            sanitized_title = re.sub(r'[^a-zA-Z0-9_-]', '_', title[:30])
-            url = f"app:{sanitized_title}"
-        else:
-            # 如果还是没有找到URL，返回默认值
-            if url is None:
-                url = "about:blank"
+        window = probe.foreground_window()
+        if window is None:
+            return "about:blank", ""
+        title = window.title
+        process = process_cache.lookup(window.pid, window.hwnd) if window.pid else None
+
+        # 按浏览器类型解析标题（规则见 title_parser，相同标题直接使用缓存结果）
+        url = title_parser.parse(title, window.window_class,
+                                 process.exe_name if process else None,
+                                 process.strategy if process else None)
         
         return url, title[:100]  # 限制标题长度
     except Exception as e:
         print(f"获取浏览器信息失败: {str(e)}")
         return "unknown_app", ""
 
+# 截图编码器（只在编码线程中使用）
+jpeg_encoder = TargetSizeEncoder(
+    MAX_SCREENSHOT_BYTES,
+    max_quality=INITIAL_JPEG_QUALITY,
+    min_quality=MIN_JPEG_QUALITY,
+    min_scale=MIN_SCREENSHOT_SCALE,
+    model_path=JPEG_MODEL_PATH,
+)
+
 # 截图功能
-def take_screenshot():
+def capture_screenshot():
     """
-    对活动窗口进行截图
+    截取活动窗口的原始图像（在采样线程中调用，只做抓屏不做压缩）
     """
     try:
-        if not SCREENSHOT_ENABLED:
-            return None
-
-        if not win32gui:
-            # 平台不支持 win32gui（例如非 Windows 环境）
+        if not agent_policy.get("screenshot"):
             return None
 
-        from PIL import ImageGrab
-
         # 获取活动窗口
-        hwnd = win32gui.GetForegroundWindow()
-        if not hwnd:
+        window = probe.foreground_window()
+        if window is None or window.rect is None:
             return None
 
         # 获取窗口位置和大小
-        left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+        left, top, right, bottom = window.rect
         width = right - left
         height = bottom - top
 
@@ -225,43 +304,7 @@ def take_screenshot():
             return None
 
         # 截图
-        screenshot = ImageGrab.grab(bbox=(left, top, right, bottom))
-
-        # 初始缩放以控制尺寸
-        max_side = INITIAL_MAX_SCREENSHOT
-        if max(screenshot.size) > max_side:
-            ratio = max_side / max(screenshot.size)
-            new_size = (int(screenshot.size[0] * ratio), int(screenshot.size[1] * ratio))
-            screenshot = screenshot.resize(new_size, Image.LANCZOS)
-
-        # 逐步压缩直到小于阈值或达到最小质量
-        quality = INITIAL_JPEG_QUALITY
-        buf = BytesIO()
-        screenshot.save(buf, format='JPEG', quality=quality)
-        image_data = buf.getvalue()
-
-        while len(image_data) > MAX_SCREENSHOT_BYTES and quality > 30:
-            quality = max(30, int(quality * 0.8))
-            buf = BytesIO()
-            screenshot.save(buf, format='JPEG', quality=quality)
-            image_data = buf.getvalue()
-
-        # 如果仍然过大，尝试再缩小分辨率一次
-        if len(image_data) > MAX_SCREENSHOT_BYTES:
-            ratio = 0.7
-            new_size = (max(1, int(screenshot.size[0] * ratio)), max(1, int(screenshot.size[1] * ratio)))
-            screenshot = screenshot.resize(new_size, Image.LANCZOS)
-            quality = max(30, int(quality * 0.8))
-            buf = BytesIO()
-            screenshot.save(buf, format='JPEG', quality=quality)
-            image_data = buf.getvalue()
-
-        if len(image_data) > MAX_SCREENSHOT_BYTES:
-            # 无法压缩到允许范围，跳过截图
-            return None
-
-        # 转换为base64
-        return base64.b64encode(image_data).decode('utf-8')
+        return probe.capture(window)
     except ImportError:
         print("缺少截图相关库，截图功能已禁用")
         return None
@@ -269,6 +312,109 @@ def take_screenshot():
         print(f"截图失败: {str(e)}")
         return None
 
+def compress_screenshot(screenshot):
+    """
+    缩放并压缩截图，返回JPEG原始数据（在编码线程中调用）
+    """
+    try:
+        if screenshot is None:
+            return None
+
+        # 按本机模型预测质量/缩放（与最大边长限制合并为一次缩放），一般一次编码即可满足大小上限，最多两次
+        # 无法压缩到允许范围时返回None，跳过截图
+        return jpeg_encoder.encode(screenshot, max_side=INITIAL_MAX_SCREENSHOT)
+    except Exception as e:
+        print(f"截图压缩失败: {str(e)}")
+        return None
+
+def encode_screenshot(screenshot):
+    """
+    缩放并压缩截图，返回base64字符串
+    """
+    image_data = compress_screenshot(screenshot)
+    if image_data is None:
+        return None
+    return base64.b64encode(image_data).decode('utf-8')
+
+def screenshot_reference(image_data):
+    """
+    上传截图原始数据并返回 {"ref": 哈希}；不支持或上传失败时返回 {"data": base64}
+    """
+    if screenshot_uploader is not None:
+        digest = screenshot_uploader.upload(image_data)
+        if digest:
+            return {"ref": digest}
+    return {"data": base64.b64encode(image_data).decode('utf-8')}
+
+def take_screenshot():
+    """
+    对活动窗口进行截图
+    """
+    return encode_screenshot(capture_screenshot())
+
+# 与上一次发送的截图比较（只在编码线程中使用）
+screenshot_delta = ScreenshotDelta(
+    grid=SCREENSHOT_TILE_GRID,
+    threshold=SCREENSHOT_CHANGE_THRESHOLD,
+    keyframe_interval=SCREENSHOT_KEYFRAME_INTERVAL,
+) if SCREENSHOT_DELTA else None
+
+def encode_screenshot_fields(screenshot):
+    """
+    根据画面变化生成上报字段：
+      screenshot_state=full       screenshot_ref 为整张截图的哈希（或 screenshot 为内嵌的 base64）
+      screenshot_state=tiles      screenshot_tiles 为变化区块 [{box: [l, t, r, b], ref: 哈希 或 data: base64}]，
+                                  坐标基于 screenshot_size（缩放后的整图尺寸）
+      screenshot_state=unchanged  与上一张相同，不发送图片
+    """
+    if screenshot is None:
+        return {"screenshot": None}
+    if screenshot_delta is None:
+        return full_screenshot_fields(compress_screenshot(screenshot))
+
+    kind, boxes = screenshot_delta.compare(screenshot)
+    if kind == UNCHANGED:
+        return {"screenshot": None, "screenshot_state": UNCHANGED}
+
+    ratio = min(1.0, INITIAL_MAX_SCREENSHOT / max(screenshot.size))
+    if kind == TILES:
+        tiles = []
+        total = 0
+        for box in boxes:
+            tile = screenshot.crop(box)
+            scaled_box = [int(c * ratio) for c in box]
+            if ratio < 1:
+                tile = tile.resize((max(1, scaled_box[2] - scaled_box[0]), max(1, scaled_box[3] - scaled_box[1])),
+                                   Image.LANCZOS)
+            buf = BytesIO()
+            tile.convert('RGB').save(buf, format='JPEG', quality=INITIAL_JPEG_QUALITY)
+            total += buf.tell()
+            tiles.append(dict({"box": scaled_box}, **screenshot_reference(buf.getvalue())))
+        if total <= MAX_SCREENSHOT_BYTES:
+            return {
+                "screenshot": None,
+                "screenshot_state": TILES,
+                "screenshot_size": [int(screenshot.size[0] * ratio), int(screenshot.size[1] * ratio)],
+                "screenshot_tiles": tiles,
+            }
+
+    fields = full_screenshot_fields(compress_screenshot(screenshot))
+    if fields["screenshot"] is None and "screenshot_ref" not in fields:
+        # 整张截图没有发出去，服务端没有新的基准帧，下次必须整张发送
+        screenshot_delta.reset()
+    return fields
+
+def full_screenshot_fields(image_data):
+    """
+    整张截图的上报字段
+    """
+    if image_data is None:
+        return {"screenshot": None}
+    ref = screenshot_reference(image_data)
+    if "ref" in ref:
+        return {"screenshot": None, "screenshot_ref": ref["ref"], "screenshot_state": FULL}
+    return {"screenshot": ref["data"], "screenshot_state": FULL}
+
 # 从URL提取域名
 def extract_domain(url):
     """
@@ -314,91 +460,312 @@ def extract_domain(url):
         # 即使出错也不返回unknown，返回一个更有用的标识
         return "domain_parse_error"
 
-# 上报函数
-def report_once(student_id):
+# 去重函数
+def deduplicate(report_key, current_time, reports=None, record=True):
     """
-    执行一次数据上报，包含去重逻辑
+    返回该内容在去重时间窗口内已上报的次数；返回 0 表示需要上报（record 为 True 时同时记入去重缓存，
+    为 False 时由调用方在采样进入队列后调用 remember_report）
+    reports 默认为本进程的 recent_reports（模拟器为每个模拟代理传入各自的 TTLCache）
     """
-    try:
-        # 步骤1: 获取浏览器信息
-        original_url, title = get_active_browser_info()
-        
-        # 步骤2: 检查是否需要跳过上报
-        if original_url == "about:blank" and not title.strip():
-            return False
-        
-        # 步骤3: 提取域名
-        domain = extract_domain(original_url)
-        
-        # 步骤4: 执行去重逻辑
-        current_time = time.time()
-        report_key = (domain, title)
-        
-        # 4.1: 清理过期的缓存记录
-        expired_keys = [
-            k for k, v in recent_reports.items() 
-            if current_time - v[0] > DEDUPLICATION_WINDOW
-        ]
-        for key in expired_keys:
-            del recent_reports[key]
-        
-        # 4.2: 检查是否在去重窗口内已上报
-        if report_key in recent_reports:
-            last_time, count = recent_reports[report_key]
-            recent_reports[report_key] = (current_time, count + 1)
-            print(f"[去重] 相同内容在{DEDUPLICATION_WINDOW}秒内已上报过 {count} 次，" 
-                  f"跳过本次上报: {domain} - {title[:20]}...")
-            return False
-        
-        # 步骤5: 准备上报数据
-        # 5.1: 生成截图
-        screenshot = take_screenshot() if SCREENSHOT_ENABLED else None
-        
-        # 5.2: 获取时间戳和IP
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        student_ip = get_local_ip()
-        
-        # 5.3: 构造上报数据结构
+    if reports is None:
+        reports = recent_reports
+    
+    # 检查是否在去重窗口内已上报（过期条目由缓存按时间顺序清理）
+    count = reports.get(report_key, current_time)
+    if count is not None:
+        reports.set(report_key, count + 1, current_time)
+        return count
+    
+    # 进入上报流程即记入去重缓存（未送达的记录由发件箱负责补发）
+    if record:
+        reports.set(report_key, 1, current_time)
+    return 0
+
+# 被采样队列丢弃的汇总时间桶，并入下一次汇总上报（只在采样线程中使用）
+dropped_summary_buckets = []
+
+def remember_report(sample):
+    """采样进入队列后才记入去重缓存；队列满被丢弃的采样不会让相同内容在去重窗口内被跳过"""
+    if "summary" not in sample:
+        recent_reports.set(sample["key"], 1, time.time())
+
+def release_sample(sample):
+    """采样被队列丢弃：撤销去重记录（下次采样重新上报）；汇总数据的时间桶留到下一次汇总上报"""
+    if "summary" in sample:
+        dropped_summary_buckets.extend(sample["summary"])
+    else:
+        recent_reports.pop(sample["key"])
+
+# 采样函数
+def sample_once(student_id):
+    """
+    采集一次前台窗口信息并执行去重，返回待编码的采样数据；无需上报时返回None
+    """
+    # 步骤1: 获取浏览器信息
+    original_url, title = get_active_browser_info()
+    
+    # 步骤2: 检查是否需要跳过上报
+    if original_url == "about:blank" and not title.strip():
+        return None
+    
+    # 步骤3: 提取域名
+    domain = extract_domain(original_url)
+    
+    # 步骤4: 执行去重逻辑
+    current_time = time.time()
+    report_key = (domain, title)
+    
+    count = deduplicate(report_key, current_time, record=False)
+    if count:
+        print(f"[去重] 相同内容在{DEDUPLICATION_WINDOW}秒内已上报过 {count} 次，" 
+              f"跳过本次上报: {domain} - {title[:20]}...")
+        return None
+    
+    # 步骤5: 抓取截图并组装采样数据
+    return full_sample(student_id, report_key, original_url)
+
+def full_sample(student_id, report_key, original_url):
+    """
+    抓取截图（压缩留给编码阶段）并记录采样时间
+    """
+    domain, title = report_key
+    return {
+        "student_id": student_id,
+        "key": report_key,
+        "domain": domain,
+        "original_url": original_url,
+        "title": title,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "image": capture_screenshot(),
+    }
+
+# 会话模式的访问区间（只在采样线程中使用）
+visit_tracker = VisitTracker(heartbeat=VISIT_HEARTBEAT, max_gap=VISIT_MAX_GAP, clock=time.time)
+
+def format_time(t):
+    return datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+
+def visit_sample(student_id, events):
+    """
+    把访问事件组装成待编码的采样数据；只有访问开始时抓取截图
+    """
+    opened = any(event["state"] == OPEN for event in events)
+    return {
+        "student_id": student_id,
+        # 同一访问的连续心跳在队列中可以合并，开始 / 结束事件不会被合并掉
+        "key": tuple((event["visit_id"], event["state"]) for event in events),
+        "visits": events,
+        "image": capture_screenshot() if opened else None,
+    }
+
+def sample_session(student_id):
+    """
+    会话模式的采样：前台窗口交给 visit_tracker，返回本次产生的访问事件；没有事件时返回None
+    """
+    original_url, title = get_active_browser_info()
+    key = None
+    if not (original_url == "about:blank" and not title.strip()):
+        key = (extract_domain(original_url), title)
+    events = visit_tracker.observe(key, time.time(), original_url)
+    if not events:
+        return None
+    return visit_sample(student_id, events)
+
+def encode_visits(sample):
+    """
+    把访问事件编码为上报记录列表（字段与单条上报相同，另加 visit_* 字段；开始事件附带截图）
+    """
+    student_ip = network_identity.current()[0]
+    reports = []
+    for event in sample["visits"]:
+        domain, title = event["key"]
         report_data = {
-            "student_id": student_id,
+            "student_id": sample["student_id"],
             "student_ip": student_ip,
             "url": domain,
-            "original_url": original_url,
+            "original_url": event["data"],
             "domain": domain,
             "title": title,
-            "timestamp": timestamp,
-            "screenshot": screenshot,
+            "timestamp": format_time(event["start"] if event["state"] == OPEN else event["end"]),
             "system": platform.system(),
-            "system_version": platform.version()
+            "system_version": platform.version(),
+            "visit_id": event["visit_id"],
+            "visit_state": event["state"],
+            "visit_start": format_time(event["start"]),
+            "visit_end": format_time(event["end"]),
+            "focused_seconds": event["focused"],
         }
-        
-        # 步骤6: 发送数据到服务器（使用 session，带重试和超时）
-        headers = {'Content-Type': 'application/json'}
-
-        # 指数退避重试（在 session 的重试失败时再做一次逐步退避）
-        tries = 0
-        max_tries = 3
-        backoff = 1
-        while tries < max_tries:
-            try:
-                resp = session.post(SERVER_URL, json=report_data, headers=headers, timeout=6)
-                if resp.status_code == 200:
-                    print(f"[{timestamp}] 上报成功: {domain}")
-                    recent_reports[report_key] = (current_time, 1)
-                    return True
-                else:
-                    print(f"上报失败: 状态码 {resp.status_code}, body={resp.text}")
-                    return False
-            except requests.exceptions.RequestException as e:
-                tries += 1
-                print(f"网络请求失败 ({tries}/{max_tries}): {str(e)}")
-                time.sleep(backoff)
-                backoff *= 2
-        return False
-              
-    except requests.exceptions.RequestException as e:
-        print(f"网络请求失败: {str(e)}")
-        return False
+        if event["state"] == OPEN:
+            report_data.update(encode_screenshot_fields(sample["image"]))
+        reports.append(report_data)
+    return reports
+
+# 汇总模式的时间桶统计（只在采样线程中使用）和本地黑名单
+summary_rollup = DomainRollup(bucket_seconds=SUMMARY_BUCKET, top_titles=SUMMARY_TOP_TITLES,
+                              max_gap=VISIT_MAX_GAP, clock=time.time)
+blacklist_matcher = BlacklistMatcher()
+blacklist_sync = BlacklistSync(blacklist_matcher, jitter=BLACKLIST_FETCH_JITTER)
+# 本次运行的标识：服务器按 (学生, 运行标识, 时间桶, 域名) 保存汇总，重发幂等，重启后的同一时间桶不会覆盖
+SUMMARY_RUN_ID = uuid.uuid4().hex[:12]
+next_summary_upload = None
+
+def refresh_blacklist():
+    """
+    从服务器获取域名黑名单，增量更新本地索引：带版本号的条件请求，没有变化时服务器返回 304，
+    有变化时只返回差异；旧版服务器没有 /api/url-blacklist/current 时改为获取完整列表
+    """
+    try:
+        added, removed = blacklist_sync.pull(session, SERVER_BASE.rstrip('/') + '/api/url-blacklist/current',
+                                             timeout=6)
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            raise
+        response = session.get(SERVER_BASE.rstrip('/') + '/api/blacklist/domains', timeout=6)
+        response.raise_for_status()
+        added, removed = blacklist_matcher.update(row.get('domain') for row in response.json())
+    if added or removed:
+        print(f"黑名单已更新: 新增 {added} 条，删除 {removed} 条，共 {len(blacklist_matcher)} 条")
+
+def listen_blacklist_events(stop_event, blacklist=True):
+    """
+    订阅服务器推送（后台线程）：
+      blacklist-update  黑名单差异直接应用（blacklist 为 False 时忽略）；发现缺版本时随机等待几秒再请求
+      policy-update     服务器下发的采集策略，立即应用
+    连接断开后按去相关的指数退避重连（服务器重启时各台机器错开），重连后先请求一次补上断开期间的变化
+    """
+    url = SERVER_BASE.rstrip('/') + '/api/url-blacklist/events'
+    # 原实现固定 30 秒重连；最长等待 90 秒，服务器恢复后最晚 3 个原间隔内全部连上
+    backoff = DecorrelatedBackoff(base=10, cap=90)
+    while not stop_event.is_set():
+        try:
+            if blacklist:
+                refresh_blacklist()
+            with requests.get(url, stream=True, timeout=(6, None)) as response:
+                if response.status_code == 404:
+                    print("服务器不支持推送，只按间隔刷新")
+                    return
+                response.raise_for_status()
+                backoff.reset()
+                for event, data in read_events(response.iter_lines(decode_unicode=True)):
+                    if stop_event.is_set():
+                        return
+                    if event == 'policy-update':
+                        agent_policy.apply(data)
+                    if event != 'blacklist-update' or not blacklist:
+                        continue
+                    changes = blacklist_sync.apply_push(data)
+                    if changes is None:
+                        if stop_event.wait(blacklist_sync.fetch_delay()):
+                            return
+                        refresh_blacklist()
+                    elif changes[0] or changes[1]:
+                        print(f"黑名单已更新（推送）: 新增 {changes[0]} 条，删除 {changes[1]} 条，共 {len(blacklist_matcher)} 条")
+        except Exception as e:
+            print(f"推送连接失败: {str(e)}")
+        stop_event.wait(backoff.next())
+
+def summary_sample(student_id, buckets):
+    return {"student_id": student_id, "key": ("summary", buckets[0]["bucket_start"]), "summary": buckets}
+
+def sample_summary(student_id):
+    """
+    汇总模式的采样：只更新时间桶统计；命中黑名单时返回一条完整的采样数据（经过去重），
+    到了上报间隔时返回已结束的时间桶；其余情况返回None
+    """
+    global next_summary_upload
+    original_url, title = get_active_browser_info()
+    current_time = time.time()
+    report_key = None
+    if not (original_url == "about:blank" and not title.strip()):
+        report_key = (extract_domain(original_url), title)
+    summary_rollup.observe(report_key, current_time)
+
+    if report_key is not None and (blacklist_matcher.match(original_url) or blacklist_matcher.match(report_key[0])):
+        if deduplicate(report_key, current_time, record=False) == 0:
+            return full_sample(student_id, report_key, original_url)
+
+    if next_summary_upload is None:
+        # 第一次上报对齐到本机的相位，之后每 SUMMARY_UPLOAD_INTERVAL 秒一次，机房内各台机器错开
+        delay = phase_delay(student_id, SUMMARY_UPLOAD_INTERVAL, current_time) if SCHEDULE_PHASE else 0.0
+        next_summary_upload = current_time + (delay or SUMMARY_UPLOAD_INTERVAL)
+    if current_time >= next_summary_upload:
+        missed = (current_time - next_summary_upload) // SUMMARY_UPLOAD_INTERVAL
+        next_summary_upload += (missed + 1) * SUMMARY_UPLOAD_INTERVAL
+        buckets = dropped_summary_buckets + summary_rollup.drain()
+        dropped_summary_buckets.clear()
+        if buckets:
+            return summary_sample(student_id, buckets)
+    return None
+
+def encode_summary(sample):
+    """
+    汇总数据编码为一条上报记录（时间桶开始时间转为本地时间字符串）；黑名单命中的采样按普通记录编码
+    """
+    if "summary" not in sample:
+        return encode_sample(sample)
+    return {
+        "student_id": sample["student_id"],
+        "student_ip": network_identity.current()[0],
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "system": platform.system(),
+        "system_version": platform.version(),
+        "summary_run": SUMMARY_RUN_ID,
+        "summary": [dict(bucket, bucket_start=format_time(bucket["bucket_start"])) for bucket in sample["summary"]],
+    }
+
+# 编码函数
+def encode_sample(sample):
+    """
+    压缩截图并构造上报数据结构（学生IP在编码时写入记录）
+    """
+    report_data = {
+        "student_id": sample["student_id"],
+        "student_ip": network_identity.current()[0],
+        "url": sample["domain"],
+        "original_url": sample["original_url"],
+        "domain": sample["domain"],
+        "title": sample["title"],
+        "timestamp": sample["timestamp"],
+        "system": platform.system(),
+        "system_version": platform.version()
+    }
+    report_data.update(encode_screenshot_fields(sample["image"]))
+    return report_data
+
+# 发送函数
+def submit_report(report_data, urgent=False):
+    """
+    交给上传器（写入发件箱或内存缓冲，由后台线程批量发送；urgent 为 True 时立即发送）
+    """
+    pending = get_uploader()
+    pending.submit(report_data, urgent=urgent)
+    print(f"[{report_data['timestamp']}] 已记录: {report_data['domain']}（待发送 {len(pending)} 条）")
+
+def submit_reports(reports):
+    for report_data in reports:
+        submit_report(report_data)
+
+def submit_summary(report_data):
+    """
+    汇总记录随下一批发送；黑名单命中的记录立即发送
+    """
+    if "summary" not in report_data:
+        return submit_report(report_data, urgent=True)
+    pending = get_uploader()
+    pending.submit(report_data)
+    print(f"[{report_data['timestamp']}] 已汇总 {len(report_data['summary'])} 个时间桶（待发送 {len(pending)} 条）")
+
+# 上报函数
+def report_once(student_id):
+    """
+    执行一次数据上报，包含去重逻辑（采样、编码、发送依次在当前线程完成）
+    """
+    try:
+        sample = sample_once(student_id)
+        if sample is None:
+            return False
+        submit_report(encode_sample(sample))
+        return True
     except Exception as e:
         print(f"上报过程中出错: {str(e)}")
         return False
@@ -433,6 +800,15 @@ def main():
     print("学生端监控代理已启动")
     print(f"服务器地址: {SERVER_URL}")
     print(f"上报间隔: {REPORT_INTERVAL}秒")
+    session_mode = REPORT_MODE == 'session'
+    summary_mode = REPORT_MODE == 'summary'
+    if session_mode:
+        print(f"会话模式: 上报访问区间，心跳间隔 {VISIT_HEARTBEAT} 秒")
+    if summary_mode:
+        print(f"汇总模式: 每 {SUMMARY_BUCKET:g} 秒一个时间桶，每 {SUMMARY_UPLOAD_INTERVAL:g} 秒上报一次，"
+              f"命中黑名单时立即上报")
+    if BATCH_ENABLED:
+        print(f"批量上报: 每 {BATCH_MAX_RECORDS} 条或 {BATCH_MAX_DELAY} 秒发送一次")
     
     # 创建静默运行脚本
     create_vbs_wrapper()
@@ -441,12 +817,123 @@ def main():
     student_id = get_student_id()
     print(f"学生ID: {student_id}")
     
-    # 主循环
+    uploader = get_uploader()
+    
+    # 前台窗口变化时立即采样；会话 / 汇总模式需要按节拍累计停留时长，节拍不变，
+    # 逐条上报模式只靠事件发现变化，节拍放宽为兜底间隔
+    event_source = None
+    try:
+        event_source = create_event_source(FOREGROUND_EVENTS, probe, poll_interval=FOREGROUND_POLL_INTERVAL)
+    except Exception as e:
+        print(f"前台窗口事件源不可用，只按节拍采样: {str(e)}")
+    interval = REPORT_INTERVAL
+    if event_source is not None and not (session_mode or summary_mode):
+        interval = max(REPORT_INTERVAL, FOREGROUND_FALLBACK_INTERVAL)
+    if event_source is not None:
+        print(f"前台窗口事件源: {event_source.name}，兜底采样间隔 {interval:g} 秒")
+    start_delay = phase_delay(student_id, interval) if SCHEDULE_PHASE else 0.0
+    if SCHEDULE_PHASE:
+        print(f"错峰采样: 相位 {start_delay:.1f} 秒后开始，抖动 ±{SCHEDULE_JITTER:.0%}")
+    
+    # 采样线程按固定节拍运行；截图压缩和发送在独立线程中完成，不影响采样节拍
+    # 去重记录在采样进入队列后才写入，被队列丢弃时撤销（会话模式不去重）
+    enqueued, dropped = remember_report, release_sample
+    if session_mode:
+        sample, encode, send = (lambda: sample_session(student_id)), encode_visits, submit_reports
+        enqueued = dropped = None
+    elif summary_mode:
+        sample, encode, send = (lambda: sample_summary(student_id)), encode_summary, submit_summary
+    else:
+        sample, encode, send = (lambda: sample_once(student_id)), encode_sample, submit_report
+    core = AgentCore(
+        sample=sample,
+        encode=encode,
+        send=send,
+        interval=interval,
+        queue_size=QUEUE_SIZE,
+        policy=QUEUE_POLICY,
+        key=lambda sample: sample["key"],
+        block_timeout=REPORT_INTERVAL,
+        start_delay=start_delay,
+        jitter=SCHEDULE_JITTER,
+        on_enqueued=enqueued,
+        on_dropped=dropped,
+    ).start()
+    monitor = None
+    if event_source is not None:
+        monitor = ForegroundMonitor(event_source, lambda window: core.trigger(), settle=FOREGROUND_SETTLE).start()
+
+    def apply_policy(changes):
+        """服务器下发的策略立即生效：调整采样节拍和每批条数，截图开关在下一次采样时生效"""
+        if "sample_interval" in changes:
+            new_interval = changes["sample_interval"]
+            if event_source is not None and not (session_mode or summary_mode):
+                new_interval = max(new_interval, FOREGROUND_FALLBACK_INTERVAL)
+            if core.set_interval(new_interval):
+                # 采样间隔变大后，相邻两次采样的间隔不能被当作睡眠 / 锁屏
+                visit_tracker.max_gap = summary_rollup.max_gap = max(VISIT_MAX_GAP, 3 * new_interval)
+                print(f"采样间隔调整为 {new_interval:g} 秒")
+        if "batch_size" in changes:
+            uploader.set_batch_size(changes["batch_size"])
+
+    agent_policy.subscribe(apply_policy)
+    # 启动前已经收到的策略
+    apply_policy(agent_policy.values)
+
+    stop_event = threading.Event()
+    if (summary_mode and BLACKLIST_PUSH) or POLICY_PUSH:
+        threading.Thread(target=listen_blacklist_events, args=(stop_event, summary_mode and BLACKLIST_PUSH),
+                         name='server-events', daemon=True).start()
+    
+    last_metrics = time.monotonic()
+    last_blacklist = None
     try:
         while True:
-            report_once(student_id)
-            time.sleep(REPORT_INTERVAL)
+            time.sleep(1)
+            if summary_mode and (last_blacklist is None or time.monotonic() - last_blacklist >= BLACKLIST_REFRESH):
+                last_blacklist = time.monotonic()
+                try:
+                    refresh_blacklist()
+                except Exception as e:
+                    print(f"获取黑名单失败: {str(e)}")
+            if isinstance(uploader, BatchUploader):
+                uploader.maybe_flush()
+            # 定期输出队列深度等统计
+            if time.monotonic() - last_metrics >= METRICS_INTERVAL:
+                last_metrics = time.monotonic()
+                metrics = core.metrics()
+                if screenshot_uploader is not None:
+                    metrics["screenshots"] = screenshot_uploader.metrics()
+                metrics["network"] = network_identity.metrics()
+                metrics["policy"] = agent_policy.metrics()
+                metrics["transport"] = transport.metrics()
+                metrics["processes"] = process_cache.metrics()
+                metrics["titles"] = title_parser.metrics()
+                metrics["dedup"] = recent_reports.metrics()
+                if session_mode:
+                    metrics["visits"] = visit_tracker.metrics()
+                if summary_mode:
+                    metrics["summary"] = summary_rollup.metrics()
+                    metrics["blacklist"] = blacklist_sync.metrics()
+                if monitor is not None:
+                    metrics["foreground"] = monitor.metrics()
+                print(f"[统计] {json.dumps(metrics, ensure_ascii=False)}，待发送 {len(uploader)} 条")
     except KeyboardInterrupt:
+        stop_event.set()
+        if monitor is not None:
+            monitor.stop()
+        core.stop()
+        # 结束进行中的访问，结束事件随剩余记录一起发出
+        closing = visit_tracker.close()
+        if closing:
+            submit_reports(encode_visits(visit_sample(student_id, closing)))
+        buckets = summary_rollup.flush() if summary_mode else []
+        if buckets:
+            submit_summary(encode_summary(summary_sample(student_id, buckets)))
+        if isinstance(uploader, OutboxSender):
+            uploader.stop(flush=True)
+        else:
+            uploader.flush()
         print("\n代理已停止")
     except Exception as e:
         print(f"运行出错: {str(e)}")
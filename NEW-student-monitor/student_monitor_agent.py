@@ -6,17 +6,25 @@
 import time
 import json
 import requests
-import os
 import socket
 import re
 import threading
 from urllib.parse import urlparse
+from agent_core import AgentCore
+from blacklist_matcher import BlacklistMatcher
+from blacklist_sync import BlacklistSync
+from network_identity import NetworkIdentity
+from process_cache import ProcessCache
 
 # ====== 配置项 ======
 SERVER_URL = "http://localhost:3000/api/report"  # 后端服务器地址
 REPORT_INTERVAL = 10  # 基础上报间隔（秒）
 DUPLICATE_INTERVAL = 30  # 同一域名重复上报的间隔（秒）
 UPDATE_BLACKLIST_INTERVAL = 300  # 黑名单更新间隔（秒）
+QUEUE_SIZE = 16  # 采样队列长度
+QUEUE_POLICY = "coalesce"  # 队列满时的策略：drop_oldest / coalesce / block
+METRICS_INTERVAL = 300  # 队列统计输出间隔（秒）
+NETWORK_IDENTITY_TTL = 600  # 本机IP缓存有效期（秒），网卡地址变化时会提前重新获取
 
 # ====== 获取学生信息 ======
 def get_student_id():
@@ -48,6 +56,11 @@ def get_student_ip():
         print(f"获取IP失败: {e}")
         return "未知IP"
 
+# 本机IP只解析一次并缓存，编码时写入每条记录的 student_ip（端口 3000 的服务器不读取 X-Student-IP 请求头）
+http = requests.Session()
+network_identity = NetworkIdentity(get_student_ip, ttl=NETWORK_IDENTITY_TTL)
+network_identity.attach(http)
+
 # ====== 从URL提取域名 ======
 def get_domain_from_url(url):
     """将完整URL转换为域名（如https://www.baidu.com/index → baidu.com）"""
@@ -76,7 +89,8 @@ def get_domain_from_url(url):
 try:
     import win32gui
     import win32process
-    import psutil
+
+    process_cache = ProcessCache()
 
     def get_active_browser_info():
         """获取当前活动浏览器窗口信息（URL和标题）"""
@@ -91,9 +105,10 @@ try:
         try:
             # 获取进程信息
             _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            proc = psutil.Process(pid)
-            exe_path = proc.exe()
-            exe_name = os.path.basename(exe_path).lower()
+            proc = process_cache.lookup(pid, hwnd)
+            if proc is None:
+                return None, "进程已退出"
+            exe_name = proc.exe_name
 
             # 检查是否为浏览器
             browser_patterns = ['chrome.exe', 'msedge.exe', 'firefox.exe', 'iexplore.exe', 'opera.exe']
@@ -132,25 +147,21 @@ except ImportError:
         return random.choice(sites)
 
 # ====== 黑名单本地缓存 ======
-blacklist_cache = set()
-last_blacklist_update = 0
+blacklist_matcher = BlacklistMatcher()  # 编译后的黑名单索引，同步时按差异就地增删
+blacklist_sync = BlacklistSync(blacklist_matcher)
+BLACKLIST_URL = SERVER_URL.replace('/api/report', '/api/url-blacklist/current')
+BLACKLIST_FULL_URL = SERVER_URL.replace('/api/report', '/api/blacklist')  # 旧版服务端只有完整列表
 
 def update_blacklist():
-    """定期从服务器获取黑名单并更新本地缓存"""
-    global blacklist_cache, last_blacklist_update
+    """定期从服务器同步黑名单：带版本号的条件请求，没有变化时服务器返回 304，有变化时只返回差异"""
     while True:
         try:
-            current_time = time.time()
-            if current_time - last_blacklist_update > UPDATE_BLACKLIST_INTERVAL:
-                response = requests.get(f"{SERVER_URL.replace('/report', '/blacklist/check')}", timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    blacklist_cache = set(data.get('domains', []))
-                    last_blacklist_update = current_time
-                    print(f"✅ 黑名单更新成功，共 {len(blacklist_cache)} 个域名")
+            added, removed = blacklist_sync.pull_or_full(http, BLACKLIST_URL, BLACKLIST_FULL_URL, timeout=10)
+            if added or removed:
+                print(f"✅ 黑名单更新成功：新增 {added} 个，删除 {removed} 个，共 {len(blacklist_matcher)} 个域名")
         except Exception as e:
             print(f"❌ 更新黑名单失败: {e}")
-        time.sleep(min(UPDATE_BLACKLIST_INTERVAL, 60))  # 最多每分钟尝试一次
+        time.sleep(UPDATE_BLACKLIST_INTERVAL)
 
 # ====== 检查是否在黑名单 ======
 def is_blacklisted(domain):
@@ -158,53 +169,61 @@ def is_blacklisted(domain):
     if not domain or domain == "空白页":
         return False
     
-    for blacklisted_domain in blacklist_cache:
-        if blacklisted_domain in domain or domain.endswith(blacklisted_domain):
-            return True
-    return False
+    # 按域名标签逐级查找（domain 本身及其上级域名），与黑名单大小无关
+    return blacklist_matcher.match(domain) is not None
 
-# ====== 主上报函数 ======
-def report_once():
-    """上报一次浏览记录"""
+# ====== 采样 / 编码 / 发送 ======
+def sample_once():
+    """采集一次前台浏览器信息，非浏览器或无效域名返回 None"""
     # 获取浏览器信息
     raw_url, title = get_active_browser_info()
     
     # 如果不是浏览器或获取失败，跳过
     if not raw_url:
-        return
+        return None
     
     # 提取域名
     domain = get_domain_from_url(raw_url)
     
     # 如果域名过短，可能不是有效网址，跳过
     if len(domain) < 3:
-        return
-    
-    # 获取学生IP
-    student_ip = get_student_ip()
+        return None
     
-    # 检查黑名单状态
-    blacklisted = is_blacklisted(domain)
+    return {"domain": domain, "title": title, "time": time.strftime('%H:%M:%S')}
+
+def encode_sample(sample):
+    """补充黑名单状态，构造上报数据（学生IP在编码时写入记录）"""
+    domain = sample["domain"]
     
     # 构造上报数据
     payload = {
         "student_id": STUDENT_ID,
-        "student_ip": student_ip,
+        "student_ip": network_identity.current()[0],
         "url": domain,  # 存储域名
-        "title": title[:256]  # 限制标题长度
+        "title": sample["title"][:256]  # 限制标题长度
     }
-    
-    # 发送数据到服务器
+    return payload, is_blacklisted(domain), sample["time"]
+
+def send_payload(record):
+    """发送数据到服务器"""
+    payload, blacklisted, sampled_at = record
     try:
-        response = requests.post(SERVER_URL, json=payload, timeout=10)
+        response = http.post(SERVER_URL, json=payload, timeout=10)
         if response.status_code == 200:
             status = "🔴黑名单" if blacklisted else "🟢正常"
-            print(f"[{time.strftime('%H:%M:%S')}] {STUDENT_ID} | {status} | {domain} | {title}")
+            print(f"[{sampled_at}] {STUDENT_ID} | {status} | {payload['url']} | {payload['title']}")
         else:
             print(f"[{time.strftime('%H:%M:%S')}] ❌ 服务器返回错误: {response.status_code}")
     except Exception as e:
         print(f"[{time.strftime('%H:%M:%S')}] ❌ 上报失败: {e}")
 
+# ====== 主上报函数 ======
+def report_once():
+    """上报一次浏览记录"""
+    sample = sample_once()
+    if sample:
+        send_payload(encode_sample(sample))
+
 # ====== 主函数 ======
 def main():
     print(f"🚀 学生端监控代理启动")
@@ -217,13 +236,22 @@ def main():
     # 启动黑名单更新线程
     threading.Thread(target=update_blacklist, daemon=True).start()
     
-    # 主循环
+    # 采样、编码、发送分别在独立线程中运行，服务器变慢不会拉低采样频率
+    core = AgentCore(
+        sample=sample_once,
+        encode=encode_sample,
+        send=send_payload,
+        interval=REPORT_INTERVAL,
+        queue_size=QUEUE_SIZE,
+        policy=QUEUE_POLICY,
+        key=lambda sample: (sample["domain"], sample["title"]),
+        block_timeout=REPORT_INTERVAL,
+    ).start()
+    
+    # 主线程只负责定期输出队列统计
     while True:
-        try:
-            report_once()
-        except Exception as e:
-            print(f"🔴 主循环异常: {e}")
-        time.sleep(REPORT_INTERVAL)
+        time.sleep(METRICS_INTERVAL)
+        print(f"📊 队列统计: {json.dumps(core.metrics(), ensure_ascii=False)}")
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,140 @@
+# summary_rollup.py —— 汇总模式：在学生端按时间桶统计各域名的停留时长
+# 功能：每次采样只更新内存中的统计，不产生上报记录；每个时间桶（默认 1 分钟）保存
+#        域名 → 停留秒数、采样次数，以及该域名下停留最久的前 k 个标题，
+#      由调用方按较慢的节拍（如 5 分钟）取出已结束的时间桶整体上报。
+#      标题统计使用 Space-Saving 算法，每个域名最多保留 4k 个标题计数，
+#      标题很多（搜索结果页、视频页）时内存不会增长，前 k 个的结果仍然准确。
+#
+# 停留时长与会话模式（visit_session）的计算方法相同：相邻两次采样的间隔计入前一次采样的窗口，
+# 跨越时间桶边界时按比例拆分；间隔超过 max_gap（睡眠、锁屏）时不计入。
+
+import time
+
+# 一个时间桶内域名过多时，超出部分合并到这一项
+OTHER_DOMAIN = '(other)'
+
+
+class TopTitles:
+    """Space-Saving：最多保留 capacity 个标题；满了以后新标题替换计数最小的一项并继承其计数"""
+
+    __slots__ = ('capacity', 'counts')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}  # 标题 → [秒数, 误差上限]
+
+    def add(self, title, seconds):
+        entry = self.counts.get(title)
+        if entry is not None:
+            entry[0] += seconds
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[title] = [seconds, 0.0]
+            return
+        victim = min(self.counts, key=lambda t: self.counts[t][0])
+        floor = self.counts.pop(victim)[0]
+        self.counts[title] = [floor + seconds, floor]
+
+    def top(self, k):
+        ranked = sorted(self.counts.items(), key=lambda item: -item[1][0])[:k]
+        return [[title, round(seconds, 1)] for title, (seconds, _) in ranked]
+
+
+class DomainStats:
+    __slots__ = ('seconds', 'samples', 'titles')
+
+    def __init__(self, capacity):
+        self.seconds = 0.0
+        self.samples = 0
+        self.titles = TopTitles(capacity)
+
+
+class DomainRollup:
+    """
+    observe(key, now)  每次采样调用，key 为 (domain, title)，没有可统计的前台窗口时传 None
+    drain()            取出已经完整统计的时间桶（按开始时间排序），其余继续累计
+    flush(now)         把到 now 为止的时间计入后取出全部时间桶（代理退出时调用）
+    取出的时间桶格式:
+      {"bucket_start": 开始时间（时间戳）, "bucket_seconds": 60,
+       "domains": [{"domain": ..., "seconds": 停留秒数, "samples": 采样次数, "titles": [[标题, 秒数], ...]}]}
+    """
+
+    def __init__(self, bucket_seconds=60, top_titles=3, max_gap=15, max_domains=100, clock=time.time):
+        self.bucket_seconds = float(bucket_seconds)
+        self.top_titles = max(1, int(top_titles))
+        self.max_gap = max_gap
+        self.max_domains = max(1, int(max_domains))
+        self.clock = clock
+        self._buckets = {}  # 时间桶开始时间 → {domain: DomainStats}
+        self._last_key = None
+        self._last_time = None
+        self.samples = 0
+        self.buckets_emitted = 0
+
+    def _stats(self, bucket_start, domain):
+        bucket = self._buckets.setdefault(bucket_start, {})
+        stats = bucket.get(domain)
+        if stats is None:
+            if len(bucket) >= self.max_domains and domain != OTHER_DOMAIN:
+                return self._stats(bucket_start, OTHER_DOMAIN)
+            stats = bucket[domain] = DomainStats(4 * self.top_titles)
+        return stats
+
+    def _bucket_start(self, t):
+        return (t // self.bucket_seconds) * self.bucket_seconds
+
+    def _credit(self, key, start, end):
+        """把 [start, end) 这段时间计入 key，跨越时间桶时拆分"""
+        domain, title = key
+        t = start
+        while t < end:
+            bucket_start = self._bucket_start(t)
+            until = min(end, bucket_start + self.bucket_seconds)
+            stats = self._stats(bucket_start, domain)
+            stats.seconds += until - t
+            stats.titles.add(title, until - t)
+            t = until
+
+    def _advance(self, now):
+        if self._last_key is not None and self._last_time is not None:
+            gap = now - self._last_time
+            if 0 < gap <= self.max_gap:
+                self._credit(self._last_key, self._last_time, now)
+
+    def observe(self, key, now=None):
+        now = self.clock() if now is None else now
+        self.samples += 1
+        self._advance(now)
+        if key is not None:
+            self._stats(self._bucket_start(now), key[0]).samples += 1
+        self._last_key = key
+        self._last_time = now
+
+    def _emit(self, starts):
+        result = []
+        for start in sorted(starts):
+            bucket = self._buckets.pop(start)
+            domains = [{"domain": domain, "seconds": round(stats.seconds, 1), "samples": stats.samples,
+                        "titles": stats.titles.top(self.top_titles)}
+                       for domain, stats in sorted(bucket.items(), key=lambda item: -item[1].seconds)]
+            result.append({"bucket_start": start, "bucket_seconds": self.bucket_seconds, "domains": domains})
+        self.buckets_emitted += len(result)
+        return result
+
+    def drain(self):
+        """只取出结束时间不晚于最后一次采样的时间桶（之后的时间要等下一次采样才能计入）"""
+        if self._last_time is None:
+            return []
+        return self._emit([start for start in self._buckets
+                           if start + self.bucket_seconds <= self._last_time])
+
+    def flush(self, now=None):
+        now = self.clock() if now is None else now
+        self._advance(now)
+        self._last_key = None
+        self._last_time = now
+        return self._emit(list(self._buckets))
+
+    def metrics(self):
+        return {"samples": self.samples, "pending_buckets": len(self._buckets),
+                "buckets_emitted": self.buckets_emitted}
@@ -3,7 +3,7 @@ import time
 
 # 导入主程序中的关键函数
 sys.path.append('.')
-from student_agent import extract_domain, report_once, recent_reports, DEDUPLICATION_WINDOW
+from student_agent import extract_domain, report_once, recent_reports, deduplicate, DEDUPLICATION_WINDOW
 
 print("开始测试学生监控代理功能...\n")
 
@@ -37,41 +37,35 @@ print("\n第一次上报...")
 def test_deduplication_logic():
     # 重置缓存
     recent_reports.clear()
-    print(f"初始缓存: {recent_reports}")
+    print(f"初始缓存: {recent_reports.metrics()}")
     
     # 模拟第一次上报
     domain, title = "test-domain.com", "测试页面"
     report_key = (domain, title)
     current_time = time.time()
     print(f"模拟上报: {domain} - {title}")
-    print("✓ 应该上报成功(首次上报)")
-    recent_reports[report_key] = (current_time, 1)
-    print(f"缓存更新: {recent_reports}")
+    if deduplicate(report_key, current_time) == 0:
+        print("✓ 应该上报成功(首次上报)")
+    else:
+        print("✗ 首次上报被去重，去重逻辑可能有问题")
+    print(f"缓存更新: {recent_reports.metrics()}")
     
     # 模拟第二次上报相同内容
-    current_time = time.time()
     print(f"\n模拟再次上报相同内容: {domain} - {title}")
-    if report_key in recent_reports:
-        last_time, count = recent_reports[report_key]
+    count = deduplicate(report_key, current_time + 1)
+    if count:
         print(f"✓ 检测到重复，应该去重")
-        print(f"✓ 重复次数: {count}，上次上报时间差: {current_time - last_time:.2f}秒")
+        print(f"✓ 重复次数: {count}")
     else:
         print("✗ 未检测到重复，去重逻辑可能有问题")
     
-    # 模拟时间窗口过期后的上报
+    # 模拟时间窗口过期后的上报（最后一次记录在 current_time + 1）
     print(f"\n模拟{DEDUPLICATION_WINDOW + 1}秒后上报相同内容...")
-    # 人为修改缓存中的时间戳使其过期
-    if report_key in recent_reports:
-        recent_reports[report_key] = (current_time - (DEDUPLICATION_WINDOW + 1), 3)
-    
-    # 模拟清理过期缓存
-    expired_keys = [k for k, v in recent_reports.items() if current_time - v[0] > DEDUPLICATION_WINDOW]
-    for key in expired_keys:
-        print(f"✓ 清理过期缓存: {key}")
-        del recent_reports[key]
-    
-    print(f"缓存状态: {recent_reports}")
-    print("✓ 过期后，相同内容应该可以再次上报")
+    if deduplicate(report_key, current_time + DEDUPLICATION_WINDOW + 2) == 0:
+        print(f"✓ 过期缓存已清理: {recent_reports.metrics()}")
+        print("✓ 过期后，相同内容应该可以再次上报")
+    else:
+        print("✗ 过期后仍被去重，去重逻辑可能有问题")
 
 test_deduplication_logic()
 
@@ -0,0 +1,115 @@
+"""黑名单匹配性能对比脚本
+
+用法示例:
+  python tests/bench_blacklist.py --rules 100000 --lookups 20000
+
+对比两种实现在不同规则数量下的单次查询耗时:
+  linear    原 is_blacklisted / is_url_blocked 的逐条扫描
+  compiled  blacklist_matcher.BlacklistMatcher 的哈希后缀索引
+
+支持参数:
+  --rules     最大规则条数，默认 100000（会依次测试 100 / 1000 / ... 直到该值）
+  --lookups   每轮查询次数，默认 20000
+  --seed      随机种子，默认 1
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blacklist_matcher import BlacklistMatcher  # noqa: E402
+
+TLDS = ['com', 'cn', 'net', 'org', 'edu.cn', 'com.cn']
+
+
+def random_label(rng, n=8):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(n))
+
+
+def make_rules(rng, count):
+    rules = []
+    for i in range(count):
+        domain = f"{random_label(rng)}.{rng.choice(TLDS)}"
+        kind = i % 10
+        if kind < 6:
+            rules.append(domain)
+        elif kind < 8:
+            rules.append('*.' + domain)
+        else:
+            rules.append(f"https://{domain}/{random_label(rng, 4)}/")
+    return rules
+
+
+def make_queries(rng, rules, count):
+    """一半命中黑名单（子域名或前缀下的页面），一半随机域名"""
+    queries = []
+    for i in range(count):
+        if i % 2 == 0:
+            rule = rng.choice(rules)
+            if rule.startswith('https://'):
+                queries.append(rule + 'index.html')
+            else:
+                queries.append(f"https://www.{rule.lstrip('*.')}/page")
+        else:
+            queries.append(f"https://{random_label(rng)}.{random_label(rng)}.{rng.choice(TLDS)}/x")
+    return queries
+
+
+def linear_match(rules, url):
+    """原实现：逐条规则比较"""
+    domain = url.split('://', 1)[-1].split('/', 1)[0]
+    for pattern in rules:
+        if pattern == url:
+            return True
+        if pattern.startswith('*.') and domain.endswith(pattern[2:]):
+            return True
+        if pattern.endswith('/') and url.startswith(pattern):
+            return True
+        if domain == pattern or domain.endswith('.' + pattern):
+            return True
+    return False
+
+
+def time_per_lookup(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1e9
+
+
+def main():
+    p = argparse.ArgumentParser(description="黑名单匹配性能对比")
+    p.add_argument('--rules', type=int, default=100000, help='最大规则条数')
+    p.add_argument('--lookups', type=int, default=20000, help='每轮查询次数')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    args = p.parse_args()
+
+    rng = random.Random(args.seed)
+    all_rules = make_rules(rng, args.rules)
+    sizes = []
+    n = 100
+    while n < args.rules:
+        sizes.append(n)
+        n *= 10
+    sizes.append(args.rules)
+
+    print(f"{'规则数':>8} | {'编译耗时(ms)':>12} | {'compiled(ns/次)':>15} | {'linear(ns/次)':>14}")
+    for size in sizes:
+        rules = all_rules[:size]
+        queries = make_queries(rng, rules, args.lookups)
+        start = time.perf_counter()
+        matcher = BlacklistMatcher(rules)
+        build_ms = (time.perf_counter() - start) * 1000
+        compiled_ns = time_per_lookup(matcher.match, queries)
+        # 线性扫描太慢，规则多时只抽样少量查询
+        linear_queries = queries[:max(20, args.lookups * 1000 // max(size, 1))]
+        linear_ns = time_per_lookup(lambda q: linear_match(rules, q), linear_queries)
+        print(f"{size:>8} | {build_ms:>12.1f} | {compiled_ns:>15.0f} | {linear_ns:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
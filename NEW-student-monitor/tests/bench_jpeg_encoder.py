@@ -0,0 +1,159 @@
+"""截图 JPEG 编码性能对比脚本
+
+用法示例:
+  python tests/bench_jpeg_encoder.py
+  python tests/bench_jpeg_encoder.py --corpus D:\\frames --target 150000
+
+对比两种实现在同一组画面上的编码次数、输出字节数和耗时（均包含缩放到最大边长）:
+  loop    原 encode_screenshot 的逐步降质量循环（最后再缩小 0.7 倍）
+  target  jpeg_encoder.TargetSizeEncoder 按本机模型预测质量/缩放
+
+支持参数:
+  --corpus   截图目录（png/jpg/bmp），不指定时生成合成画面（网页文字、视频、图片混合）
+  --frames   合成画面数量，默认 60
+  --target   大小上限（字节），默认 200*1024
+  --max-side 输出的最大边长，默认 1024（与 INITIAL_MAX_SCREENSHOT 一致）
+  --seed     随机种子，默认 1
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jpeg_encoder import TargetSizeEncoder  # noqa: E402
+
+
+def make_text_page(rng, size):
+    """白底文字网页"""
+    img = Image.new('RGB', size, (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, size[0], 60], fill=(rng.randint(0, 80), rng.randint(60, 160), 200))
+    y = 80
+    while y < size[1] - 20:
+        x = 20
+        while x < size[0] - 60:
+            word = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+            draw.text((x, y), word, fill=(20, 20, 20))
+            x += len(word) * 6 + 6
+        y += rng.choice((14, 16, 18))
+    return img
+
+
+def make_video_frame(rng, size):
+    """噪声 + 色块，模拟视频/游戏画面"""
+    noise = Image.effect_noise(size, rng.randint(20, 80)).convert('RGB')
+    base = Image.new('RGB', size, (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    img = Image.blend(base, noise, rng.uniform(0.2, 0.7))
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(5, 30)):
+        x, y = rng.randint(0, size[0]), rng.randint(0, size[1])
+        draw.ellipse([x, y, x + rng.randint(20, 300), y + rng.randint(20, 300)],
+                     fill=(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    return img
+
+
+def make_mixed_page(rng, size):
+    """文字网页中嵌入图片"""
+    img = make_text_page(rng, size)
+    w, h = size[0] // 2, size[1] // 3
+    img.paste(make_video_frame(rng, (w, h)), (rng.randint(0, size[0] - w), rng.randint(60, size[1] - h)))
+    return img
+
+
+def synthetic_corpus(rng, count):
+    makers = (make_text_page, make_video_frame, make_mixed_page)
+    sizes = ((1920, 1080), (1366, 768), (1280, 1024))
+    # 连续若干帧属于同一类画面，与实际使用时相邻截图相似的情况一致
+    frames = []
+    while len(frames) < count:
+        maker, size = rng.choice(makers), rng.choice(sizes)
+        for _ in range(rng.randint(3, 10)):
+            frames.append(maker(rng, size))
+    return frames[:count]
+
+
+def load_corpus(path):
+    frames = []
+    for pattern in ('*.png', '*.jpg', '*.jpeg', '*.bmp'):
+        for name in sorted(glob.glob(os.path.join(path, pattern))):
+            with Image.open(name) as img:
+                frames.append(img.convert('RGB'))
+    return frames
+
+
+def legacy_encode(img, target, max_side, quality=70):
+    """原实现（含最大边长缩放），返回 (数据或None, 编码次数)"""
+    if max(img.size) > max_side:
+        ratio = max_side / max(img.size)
+        img = img.resize((int(img.size[0] * ratio), int(img.size[1] * ratio)), Image.LANCZOS)
+    encodes = 1
+    buf = BytesIO()
+    img.save(buf, format='JPEG', quality=quality)
+    data = buf.getvalue()
+    while len(data) > target and quality > 30:
+        quality = max(30, int(quality * 0.8))
+        buf = BytesIO()
+        img.save(buf, format='JPEG', quality=quality)
+        data = buf.getvalue()
+        encodes += 1
+    if len(data) > target:
+        img = img.resize((max(1, int(img.size[0] * 0.7)), max(1, int(img.size[1] * 0.7))), Image.LANCZOS)
+        quality = max(30, int(quality * 0.8))
+        buf = BytesIO()
+        img.save(buf, format='JPEG', quality=quality)
+        data = buf.getvalue()
+        encodes += 1
+    return (data if len(data) <= target else None), encodes
+
+
+def run(name, frames, encode):
+    stats = {'encodes': 0, 'max_encodes': 0, 'bytes': 0, 'sent': 0, 'seconds': 0.0}
+    for img in frames:
+        start = time.perf_counter()
+        data, encodes = encode(img)
+        stats['seconds'] += time.perf_counter() - start
+        stats['encodes'] += encodes
+        stats['max_encodes'] = max(stats['max_encodes'], encodes)
+        if data is not None:
+            stats['sent'] += 1
+            stats['bytes'] += len(data)
+    n = len(frames)
+    print(f"{name:>8} | {stats['encodes'] / n:>10.2f} | {stats['max_encodes']:>8} | {stats['sent']:>4}/{n:<4} | "
+          f"{stats['bytes'] / max(stats['sent'], 1) / 1024:>13.1f} | {stats['seconds'] / n * 1000:>10.1f}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="截图JPEG编码性能对比")
+    p.add_argument('--corpus', help='截图目录')
+    p.add_argument('--frames', type=int, default=60, help='合成画面数量')
+    p.add_argument('--target', type=int, default=200 * 1024, help='大小上限（字节）')
+    p.add_argument('--max-side', type=int, default=1024, help='输出的最大边长')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    args = p.parse_args()
+
+    rng = random.Random(args.seed)
+    frames = load_corpus(args.corpus) if args.corpus else synthetic_corpus(rng, args.frames)
+    if not frames:
+        print("没有可用的画面")
+        return
+    encoder = TargetSizeEncoder(args.target, min_scale=0.7)
+
+    def target_encode(img):
+        data = encoder.encode(img, max_side=args.max_side)
+        return data, encoder.last_encodes
+
+    print(f"画面数: {len(frames)}，大小上限: {args.target} 字节")
+    print(f"{'实现':>8} | {'平均编码次数':>10} | {'最多次数':>8} | {'成功/总数':>9} | {'平均大小(KB)':>13} | {'耗时(ms/张)':>10}")
+    run('loop', frames, lambda img: legacy_encode(img, args.target, args.max_side))
+    run('target', frames, target_encode)
+
+
+if __name__ == '__main__':
+    main()
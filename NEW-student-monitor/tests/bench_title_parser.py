@@ -0,0 +1,177 @@
+"""窗口标题 → URL 解析性能对比脚本
+
+用法示例:
+  python tests/bench_title_parser.py
+  python tests/bench_title_parser.py --corpus titles.txt
+
+对比三种方式解析同一组标题的耗时（ns/条），并先校验新旧实现的结果完全一致:
+  legacy    原 get_active_browser_info 中逐条 re.search 的实现
+  compiled  title_parser 预编译正则 + 分词扫描（不使用缓存）
+  memo      title_parser.TitleParser（带 LRU 缓存，标题重复出现时直接命中）
+
+支持参数:
+  --corpus   标题文件，每行一条，可写成 “可执行文件名<TAB>标题”；不指定时生成合成标题
+             （Chrome / Edge / Firefox 的中英文标题，含超长中文标题，按 Zipf 分布重复出现）
+  --titles   合成标题条数，默认 5000
+  --fuzz     额外随机生成的校验字符串条数，默认 20000
+  --seed     随机种子，默认 1
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from process_cache import classify  # noqa: E402
+from title_parser import TitleParser, TLDS  # noqa: E402
+
+BROWSERS = [
+    ('chrome.exe', 'Chrome_WidgetWin_1', ' - Google Chrome'),
+    ('msedge.exe', 'Chrome_WidgetWin_1', ' - Microsoft​ Edge'),
+    ('firefox.exe', 'MozillaWindowClass', ' — Mozilla Firefox'),
+]
+CJK_WORDS = ['初中数学', '教学资源', '下载平台', '智能题库', '在线视频', '新闻', '搜索', '学科网', '哔哩哔哩',
+             '百度一下，你就知道', '作业帮', '知乎', '期末复习', '试卷', '答案解析', '腾讯视频', '游戏攻略']
+EN_WORDS = ['Home', 'Search', 'News', 'Video', 'Login', 'Math', 'Homework', 'Download', 'GitHub', 'Docs']
+DOMAINS = ['baidu.com', 'zxxk.com', 'jyeoo.com', 'v.qq.com', 'bilibili.com', 'zhihu.com', 'sina.com.cn',
+           'example.org', 'edu.cn', 'taobao.com']
+
+
+def legacy_parse(title, window_class, process_alive=True):
+    """原实现（student_agent.get_active_browser_info 的 URL 提取部分）"""
+    browser_classes = ['Chrome_WidgetWin_1', 'MozillaWindowClass', 'IEFrame', 'ApplicationFrameWindow']
+    url_patterns = [
+        r'(https?://[^\s]+)',
+        r'地址: (https?://[^\s]+)',
+        r'URL: (https?://[^\s]+)',
+        r'(www\.[^\s]+\.[^\s]+)',
+        r'([^\s]+\.(com|cn|net|org|edu|gov|mil|int|info|biz|name|museum|coop|aero|pro|tel|mobi|asia|jobs|travel)[^\s]*)',
+    ]
+    url = None
+    for pattern in url_patterns:
+        match = re.search(pattern, title)
+        if match:
+            url = match.group(1)
+            if not url.startswith(('http://', 'https://')):
+                if re.match(r'^www\.', url) or re.search(r'\.[a-zA-Z]{2,}(\.[a-zA-Z]{2,})?', url):
+                    url = 'https://' + url
+            break
+    if url is None and window_class in browser_classes and process_alive:
+        enhanced_domain_patterns = [
+            r'([^\s]+\.(com|cn|net|org|edu|gov|mil|int|info|biz|name|museum|coop|aero|pro|tel|mobi|asia|jobs|travel)(/|$))',
+            r'(www\.[^\s]+\.[^\s]+)',
+            r'(youtube|baidu|google|bing|sohu|sina|qq|taobao|jd|tmall|1688)\.com',
+        ]
+        for pattern in enhanced_domain_patterns:
+            match = re.search(pattern, title.lower())
+            if match:
+                url = 'https://' + match.group(1)
+                break
+    if url is None and title.strip():
+        url = "app:" + re.sub(r'[^a-zA-Z0-9_-]', '_', title[:30])
+    elif url is None:
+        url = "about:blank"
+    return url
+
+
+def make_title(rng):
+    exe, window_class, suffix = rng.choice(BROWSERS)
+    kind = rng.random()
+    if kind < 0.45:
+        # 中文标题，少数非常长（论坛帖子、搜索结果页）
+        words = rng.randint(2, 6) if rng.random() < 0.9 else rng.randint(40, 120)
+        page = ''.join(rng.choice(CJK_WORDS) for _ in range(words))
+    elif kind < 0.65:
+        page = ' '.join(rng.choice(EN_WORDS) for _ in range(rng.randint(1, 6)))
+    elif kind < 0.8:
+        page = f"{rng.choice(CJK_WORDS)} - {rng.choice(DOMAINS)}"
+    elif kind < 0.9:
+        page = f"{rng.choice(CJK_WORDS)} - https://www.{rng.choice(DOMAINS)}/{rng.choice(EN_WORDS).lower()}"
+    else:
+        page = f"{rng.choice(EN_WORDS)} | {rng.choice(DOMAINS).upper()}"
+    return exe, window_class, page + suffix
+
+
+def synthetic_corpus(rng, count):
+    """约 count/10 个不同标题，按 Zipf 分布重复（实际使用中同一标题会被反复采样）"""
+    pool = [make_title(rng) for _ in range(max(1, count // 10))]
+    weights = [1.0 / (i + 1) for i in range(len(pool))]
+    return rng.choices(pool, weights=weights, k=count)
+
+
+def load_corpus(path):
+    corpus = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            exe, _, title = line.partition('\t') if '\t' in line else ('chrome.exe', '', line)
+            strategy = classify(exe)[1]
+            corpus.append((exe, 'MozillaWindowClass' if strategy == 'firefox' else 'Chrome_WidgetWin_1', title))
+    return corpus
+
+
+def fuzz_strings(rng, count):
+    """随机拼接点号、顶级域名、空白、中文、斜杠等片段，专门覆盖边界情况"""
+    pieces = ['.', '..', '/', ' ', '\t', '\n', 'www.', 'WWW.', 'http://', 'https://', 'a', 'B', '中文', '-',
+              '—', ' - Google Chrome', ' — Mozilla Firefox', 'baidu.com', 'qq.com'] + \
+             ['.' + t for t in TLDS] + [t for t in TLDS] + ['.' + t.upper() for t in TLDS[:5]]
+    strings = []
+    for _ in range(count):
+        strings.append(''.join(rng.choice(pieces) for _ in range(rng.randint(0, 10))))
+    return strings
+
+
+def ns_per_title(fn, corpus, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for exe, window_class, title in corpus:
+            fn(exe, window_class, title)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(corpus) * 1e9
+
+
+def main():
+    p = argparse.ArgumentParser(description="窗口标题解析性能对比")
+    p.add_argument('--corpus', help='标题文件')
+    p.add_argument('--titles', type=int, default=5000, help='合成标题条数')
+    p.add_argument('--fuzz', type=int, default=20000, help='随机校验字符串条数')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    args = p.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(rng, args.titles)
+
+    # 校验：新实现必须与原实现逐条一致
+    checks = [(exe, cls, title) for exe, cls, title in corpus]
+    checks += [(exe, cls, s) for s in fuzz_strings(rng, args.fuzz) for exe, cls, _ in [rng.choice(BROWSERS)]]
+    checks += [('notepad.exe', 'Notepad', s) for s in fuzz_strings(rng, args.fuzz // 4)]
+    mismatches = 0
+    for exe, window_class, title in checks:
+        expected = legacy_parse(title, window_class)
+        actual = TitleParser(memo_size=1).parse(title, window_class, exe, classify(exe)[1])
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"不一致: {title!r}\n  原实现 {expected!r}\n  新实现 {actual!r}")
+    print(f"校验 {len(checks)} 条，不一致 {mismatches} 条")
+
+    unique = len(set(corpus))
+    print(f"标题 {len(corpus)} 条（不同标题 {unique} 条），最长 {max(len(t) for _, _, t in corpus)} 字符")
+    legacy_ns = ns_per_title(lambda exe, cls, title: legacy_parse(title, cls), corpus)
+    compiled = TitleParser(memo_size=1)
+    compiled_ns = ns_per_title(lambda exe, cls, title: compiled._parse(title, cls, exe, classify(exe)[1]), corpus)
+    memo = TitleParser()
+    memo_ns = ns_per_title(lambda exe, cls, title: memo.parse(title, cls, exe, classify(exe)[1]), corpus)
+    print(f"{'实现':>8} | {'ns/条':>8}")
+    print(f"{'legacy':>8} | {legacy_ns:>8.0f}")
+    print(f"{'compiled':>8} | {compiled_ns:>8.0f}")
+    print(f"{'memo':>8} | {memo_ns:>8.0f}   缓存 {memo.metrics()}")
+
+
+if __name__ == '__main__':
+    main()
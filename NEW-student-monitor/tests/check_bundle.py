@@ -0,0 +1,115 @@
+"""检查学生端部署目录（view+stu版本更新/、for stu/）使用的公共模块清单，并在部署前复制公共模块
+
+公共模块（process_cache、agent_core 等）只在上级目录保存一份，不在部署目录中提交副本：
+  - 部署目录的 shared_modules.txt 列出学生端脚本需要的公共模块，install.bat 安装时从上级目录复制；
+  - 只把部署目录单独复制到学生机时，先在教师机上运行 --sync 把公共模块复制进去（副本已在 .gitignore 中忽略）。
+
+用法示例:
+  python tests/check_bundle.py           # 检查
+  python tests/check_bundle.py --sync    # 把公共模块复制到部署目录（单独复制部署目录到学生机之前运行）
+
+依次检查:
+  1. shared_modules.txt 与学生端脚本实际导入的公共模块一致，包括公共模块之间的导入（如 process_cache → platform_probe）
+  2. 公共模块的副本都在部署目录的 .gitignore 中，不会被提交；已复制的副本与上级目录一致（过期时报错）
+  3. 学生端脚本不修改 sys.path（部署目录单独复制到学生机时没有上级目录）
+"""
+
+import argparse
+import ast
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 部署目录 → 学生端脚本
+BUNDLES = {
+    'view+stu版本更新': ['student.py', 'student_async.py', 'stu55.py', 'stu66.py', 'stu77.py'],
+    'for stu': ['student_agent.py'],
+}
+MANIFEST = 'shared_modules.txt'
+
+
+def imported_modules(path):
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split('.')[0])
+    return names
+
+
+def shared_modules(bundle):
+    """学生端脚本直接或间接导入的、上级目录中的公共模块"""
+    pending = [os.path.join(ROOT, bundle, name) for name in BUNDLES[bundle]]
+    found = set()
+    while pending:
+        for name in imported_modules(pending.pop()):
+            if name not in found and os.path.exists(os.path.join(ROOT, name + '.py')):
+                found.add(name)
+                pending.append(os.path.join(ROOT, name + '.py'))
+    return sorted(found)
+
+
+def read_lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def check_bundle(bundle, sync):
+    directory = os.path.join(ROOT, bundle)
+    problems = []
+    modules = shared_modules(bundle)
+    listed = read_lines(os.path.join(directory, MANIFEST))
+    if listed != modules:
+        problems.append(f"{MANIFEST} 应为 {modules}，实际为 {listed}")
+    ignored = set(read_lines(os.path.join(directory, '.gitignore')))
+
+    for name in modules:
+        if name + '.py' not in ignored:
+            problems.append(f"{name}.py 不在 .gitignore 中（公共模块的副本不应提交）")
+        source = os.path.join(ROOT, name + '.py')
+        copy = os.path.join(directory, name + '.py')
+        if sync:
+            if not os.path.exists(copy) or read(copy) != read(source):
+                shutil.copyfile(source, copy)
+                print(f"已复制 {name}.py → {bundle}/")
+        elif os.path.exists(copy) and read(copy) != read(source):
+            problems.append(f"{name}.py 的副本已过期")
+
+    for script in BUNDLES[bundle]:
+        with open(os.path.join(directory, script), encoding='utf-8') as f:
+            if 'sys.path.append' in f.read():
+                problems.append(f"{script} 修改了 sys.path（部署目录单独复制到学生机时找不到上级目录）")
+
+    print(f"{bundle}/ 使用的公共模块: {', '.join(modules)}")
+    return [f"{bundle}/: {problem}" for problem in problems]
+
+
+def main():
+    p = argparse.ArgumentParser(description="检查学生端部署目录的公共模块清单")
+    p.add_argument('--sync', action='store_true', help='把公共模块复制到部署目录')
+    args = p.parse_args()
+
+    problems = []
+    for bundle in BUNDLES:
+        problems.extend(check_bundle(bundle, args.sync))
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        print("副本过期时运行 python tests/check_bundle.py --sync 重新复制")
+        sys.exit(1)
+    print("✅ 学生端部署目录检查通过")
+
+
+if __name__ == '__main__':
+    main()
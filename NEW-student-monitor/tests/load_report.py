@@ -0,0 +1,366 @@
+"""上报接口压测工具（asyncio，开环到达，长连接）
+
+用法示例:
+  python tests/load_report.py --server http://localhost:3003 --rate 200 --duration 30
+  python tests/load_report.py --rates 100,200,400,800 --connections 2000 --mix plain:70,shot256:25,batch20:5
+  python tests/load_report.py --rate 0 --connections 64 --duration 10        # 闭环，测最大吞吐
+  python tests/load_report.py --stub --rate 500 --json result.json           # 使用 tests/stub_server.py 替身服务器
+
+到达方式:
+  --rate N 为开环泊松到达（每秒 N 个请求，不等前一个请求完成），请求在计划时间点进入队列，
+  由 --connections 个长连接（HTTP/1.1 keep-alive）取出发送；延迟从计划时间点开始计算，
+  服务器变慢时排队时间也计入延迟（避免“协调遗漏”，与 HdrHistogram / wrk2 的做法相同）。
+  --rate 0 为闭环：每个连接收到响应后立即发送下一个请求。
+
+请求类型（--mix 类型:权重，逗号分隔）:
+  plain       POST /api/report，记录内容与 tests/test_report.py 的 make_payload 相同
+  shotN       POST /api/report，附带 N KB（原始数据）的 base64 截图
+  batchN      POST /api/report/batch，N 条记录，gzip 压缩
+  batchN+shotM  同上，每条记录附带 M KB 截图
+
+输出 JSON（--json 写入文件，同时打印到屏幕）:
+  每个到达速率一项：实际发送 / 完成数、吞吐量、错误分类（http_状态码 / timeout / connection_reset /
+  connect_refused 等）、延迟百分位（微秒，p50 … p99.99 及最大值）、按请求类型分开的统计
+"""
+
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from test_report import make_payload  # noqa: E402
+
+PERCENTILES = (50, 75, 90, 95, 99, 99.9, 99.99)
+TITLES = ['百度一下，你就知道', '学科网-初中数学教学资源下载平台', '哔哩哔哩 (゜-゜)つロ 干杯~-bilibili',
+          'GitHub', '知乎 - 有问题，就会有答案', '作业帮', '腾讯视频']
+URLS = ['https://www.baidu.com/', 'https://www.zxxk.com/', 'https://www.bilibili.com/',
+        'https://github.com/', 'https://www.zhihu.com/', 'https://www.zybang.com/', 'https://v.qq.com/']
+
+
+class LatencyHistogram:
+    """
+    对数分桶的延迟直方图（与 HdrHistogram 相同的思路，按微秒记录，约 3 位有效数字），
+    内存占用与记录条数无关
+    """
+
+    SUB_BITS = 10
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1e6))
+        magnitude = value.bit_length()
+        if magnitude <= self.SUB_BITS:
+            index = value
+        else:
+            shift = magnitude - self.SUB_BITS
+            index = (shift << self.SUB_BITS) + (value >> shift)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _value_of(self, index):
+        shift = index >> self.SUB_BITS
+        if shift == 0:
+            return index
+        base = index & ((1 << self.SUB_BITS) - 1)
+        # 取桶的中点
+        return (base << shift) + (1 << (shift - 1))
+
+    def percentiles(self, points=PERCENTILES):
+        result = {}
+        if not self.total:
+            return result
+        ordered = sorted(self.counts.items())
+        for point in points:
+            target = max(1, int(round(self.total * point / 100.0)))
+            seen = 0
+            for index, count in ordered:
+                seen += count
+                if seen >= target:
+                    result[f"p{point:g}"] = min(self.max, self._value_of(index))
+                    break
+        return result
+
+    def summary(self):
+        data = {"count": self.total}
+        if self.total:
+            data.update(self.percentiles())
+            data.update({"min": self.min, "max": self.max, "mean": round(self.sum / self.total)})
+        return data
+
+
+def parse_mix(spec):
+    """'plain:70,shot256:25,batch20:5' → [(类型, 权重)]"""
+    mix = []
+    for part in spec.split(','):
+        kind, _, weight = part.strip().partition(':')
+        mix.append((kind, float(weight or 1)))
+    return mix
+
+
+class PayloadFactory:
+    """预先生成每种请求类型的若干个请求体（学生ID、标题不同），压测时不再消耗 CPU 生成"""
+
+    def __init__(self, kinds, variants=16, seed=1):
+        self.rng = random.Random(seed)
+        self.bodies = {kind: [self._build(kind, i) for i in range(variants)] for kind in kinds}
+
+    def _record(self, i, shot_kb):
+        index = self.rng.randrange(len(TITLES))
+        record = make_payload(f"load_{i:04d}", f"10.0.{i // 250}.{i % 250 + 1}", URLS[index], TITLES[index],
+                              add_timestamp=True)
+        record["domain"] = urlparse(URLS[index]).hostname
+        if shot_kb:
+            record["screenshot"] = base64.b64encode(os.urandom(shot_kb * 1024)).decode('ascii')
+        return record
+
+    def _build(self, kind, i):
+        batch, shot_kb = 0, 0
+        for part in kind.split('+'):
+            if part.startswith('batch'):
+                batch = int(part[5:] or 20)
+            elif part.startswith('shot'):
+                shot_kb = int(part[4:] or 100)
+            elif part != 'plain':
+                raise ValueError(f"未知的请求类型: {kind}")
+        if batch:
+            records = [self._record(i * batch + n, shot_kb) for n in range(batch)]
+            body = gzip.compress(json.dumps({"records": records}, ensure_ascii=False).encode('utf-8'))
+            return '/api/report/batch', body, {'Content-Encoding': 'gzip'}
+        body = json.dumps(self._record(i, shot_kb), ensure_ascii=False).encode('utf-8')
+        return '/api/report', body, {}
+
+    def pick(self, kind):
+        return self.rng.choice(self.bodies[kind])
+
+
+class Connection:
+    """最简单的 HTTP/1.1 客户端连接（只支持本工具需要的部分），断开后下次请求时重连"""
+
+    def __init__(self, host, port, stats):
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.reader = None
+        self.writer = None
+
+    async def request(self, path, body, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self.stats["connects"] += 1
+        head = [f"POST {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                "Content-Type: application/json", f"Content-Length: {len(body)}"]
+        head += [f"{k}: {v}" for k, v in headers.items()]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode('ascii') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("服务器关闭了连接")
+        version, status = status_line.split(b' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        if 'content-length' in response_headers:
+            await self.reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.read()
+            response_headers['connection'] = 'close'
+        connection = response_headers.get('connection', '').lower()
+        if connection == 'close' or (version == b'HTTP/1.0' and connection != 'keep-alive'):
+            self.close()
+        return int(status)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def classify_error(exc):
+    if isinstance(exc, asyncio.TimeoutError):
+        return 'timeout'
+    if isinstance(exc, ConnectionRefusedError):
+        return 'connect_refused'
+    if isinstance(exc, (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError)):
+        return 'connection_reset'
+    if isinstance(exc, OSError):
+        return f"os_error_{exc.errno}"
+    return type(exc).__name__
+
+
+async def run_step(args, factory, mix, rate):
+    url = urlparse(args.server)
+    host, port = url.hostname, url.port or 80
+    stats = {"connects": 0}
+    histogram = LatencyHistogram()
+    service = LatencyHistogram()
+    by_kind = {kind: {"histogram": LatencyHistogram(), "errors": 0} for kind, _ in mix}
+    errors = {}
+    counters = {"scheduled": 0, "completed": 0, "ok": 0, "bytes": 0, "in_flight": 0}
+    kinds = [kind for kind, _ in mix]
+    weights = [weight for _, weight in mix]
+    rng = random.Random(args.seed)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    start = loop.time()
+    end = start + args.duration
+
+    async def send(conn, intended, kind):
+        path, body, headers = factory.pick(kind)
+        sent_at = loop.time()
+        counters["in_flight"] += 1
+        try:
+            status = await asyncio.wait_for(conn.request(path, body, headers), args.timeout)
+            error = None if status < 400 else f"http_{status}"
+        except Exception as e:
+            conn.close()
+            error = classify_error(e)
+        finally:
+            counters["in_flight"] -= 1
+        done = loop.time()
+        counters["completed"] += 1
+        counters["bytes"] += len(body)
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+            by_kind[kind]["errors"] += 1
+            return
+        counters["ok"] += 1
+        histogram.record(done - intended)
+        service.record(done - sent_at)
+        by_kind[kind]["histogram"].record(done - intended)
+
+    async def open_loop_worker(conn):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            await send(conn, *item)
+
+    async def closed_loop_worker(conn):
+        while loop.time() < end:
+            counters["scheduled"] += 1
+            await send(conn, loop.time(), rng.choices(kinds, weights)[0])
+
+    connections = [Connection(host, port, stats) for _ in range(args.connections)]
+    if rate > 0:
+        workers = [asyncio.ensure_future(open_loop_worker(c)) for c in connections]
+        # 泊松到达：按计划时间点放入队列，不等待请求完成
+        next_at = start
+        while True:
+            next_at += rng.expovariate(rate)
+            if next_at >= end:
+                break
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            counters["scheduled"] += 1
+            queue.put_nowait((next_at, rng.choices(kinds, weights)[0]))
+        backlog = queue.qsize()
+        for _ in workers:
+            queue.put_nowait(None)
+    else:
+        workers = [asyncio.ensure_future(closed_loop_worker(c)) for c in connections]
+        backlog = 0
+    # 到达结束后最多再等一个超时时间，服务器过载时剩余的请求记为 abandoned
+    _, pending = await asyncio.wait(workers, timeout=max(0.0, end - loop.time()) + args.timeout)
+    abandoned = counters["in_flight"] + max(0, queue.qsize() - len(pending))
+    for worker in pending:
+        worker.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    elapsed = loop.time() - start
+    for conn in connections:
+        conn.close()
+
+    return {
+        "target_rate": rate or "closed_loop",
+        "connections": args.connections,
+        "duration": round(elapsed, 2),
+        "scheduled": counters["scheduled"],
+        "completed": counters["completed"],
+        "ok": counters["ok"],
+        "backlog_at_end": backlog,
+        "abandoned": abandoned,
+        "throughput": round(counters["ok"] / elapsed, 1) if elapsed else 0.0,
+        "request_bytes": counters["bytes"],
+        "connects": stats["connects"],
+        "errors": errors,
+        "latency_us": histogram.summary(),
+        "service_time_us": service.summary(),
+        "by_kind": {kind: dict(v["histogram"].summary(), errors=v["errors"]) for kind, v in by_kind.items()},
+    }
+
+
+async def run_all(args):
+    mix = parse_mix(args.mix)
+    factory = PayloadFactory([kind for kind, _ in mix], seed=args.seed)
+    rates = [float(r) for r in args.rates.split(',')] if args.rates else [args.rate]
+    results = []
+    for rate in rates:
+        print(f"到达速率 {rate or '闭环'}（每秒），{args.connections} 个连接，持续 {args.duration} 秒...")
+        result = await run_step(args, factory, mix, rate)
+        latency = result["latency_us"]
+        print(f"  完成 {result['ok']}/{result['scheduled']}，吞吐 {result['throughput']}/秒，"
+              f"p50 {latency.get('p50', 0) / 1000:.1f} ms，p99 {latency.get('p99', 0) / 1000:.1f} ms，"
+              f"错误 {result['errors'] or '无'}")
+        results.append(result)
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser(description="上报接口压测工具")
+    p.add_argument('--server', default='http://localhost:3003', help='后端地址')
+    p.add_argument('--stub', action='store_true', help='在本进程中启动替身服务器并对其压测')
+    p.add_argument('--rate', type=float, default=100, help='每秒请求数（开环泊松到达），0 为闭环')
+    p.add_argument('--rates', help='逐级压测的到达速率列表，如 100,200,400')
+    p.add_argument('--duration', type=float, default=30, help='每级持续时间（秒）')
+    p.add_argument('--connections', type=int, default=256, help='长连接数量')
+    p.add_argument('--mix', default='plain:80,shot128:15,batch20:5', help='请求类型及权重')
+    p.add_argument('--timeout', type=float, default=30, help='单个请求超时（秒）')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    p.add_argument('--json', help='把结果写入 JSON 文件')
+    args = p.parse_args()
+
+    server = None
+    if args.stub:
+        from stub_server import start_stub_server
+        server, args.server = start_stub_server()
+    started = time.time()
+    results = asyncio.run(run_all(args))
+    output = {"server": args.server, "mix": args.mix, "started": started, "steps": results}
+    text = json.dumps(output, ensure_ascii=False, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            f.write(text)
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""回放记录的上报流量（容量测试）
+
+用法示例:
+  python tests/replay_report.py lab_0901.trace --server http://localhost:3003            # 原速回放
+  python tests/replay_report.py lab_0901.trace --server http://localhost:3003 --speed 10 # 10 倍速
+  python tests/replay_report.py lab_0901.trace --speed 0 --fanout 20 --stub              # 最快速度，扩展为 20 倍学生数
+
+记录文件由学生端（环境变量 REPORT_TRACE_PATH）或本地中继（report_relay.py --trace）生成，
+保存的是服务器实际接受的请求（单条上报、批量上报、截图上传）及其发送时间，
+因此回放时标题 / 域名分布、学生端去重后的上报频率、截图大小都与真实机房一致。
+
+支持参数:
+  --speed     回放倍速，1 为原速，0 为不等待、尽快发送
+  --fanout    每个请求复制成 N 份，学生ID 依次加上 _1 … _N 后缀（第 0 份保持原样），模拟更多学生端
+  --spread    复制出的请求在 0 ~ spread 秒（记录时间）内随机错开，避免所有副本同时到达
+  --workers   并发发送线程数
+  --stub      在本进程中启动 tests/stub_server.py 替身服务器并回放到它
+  --json      把结果写入 JSON 文件
+"""
+
+import argparse
+import gzip
+import heapq
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from report_trace import read_trace  # noqa: E402
+from load_report import LatencyHistogram  # noqa: E402
+
+BATCH_PATH = '/api/report/batch'
+
+
+def with_student_suffix(frame, copy):
+    """第 copy 份副本的请求体：学生ID 加上后缀（截图上传按内容寻址，原样发送）"""
+    if copy == 0 or frame.method != 'POST':
+        return frame.body
+    data = json.loads(frame.body)
+    records = data.get('records') if isinstance(data, dict) and 'records' in data else [data]
+    for record in records:
+        if record.get('student_id'):
+            record['student_id'] = f"{record['student_id']}_{copy}"
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def expand(frames, fanout, spread, rng):
+    """按发送时间顺序产生 (时间, 副本序号, 帧)；副本时间只会比原帧晚，因此可以边读边产生"""
+    heap = []
+    order = 0
+    for frame in frames:
+        while heap and heap[0][0] <= frame.t:
+            t, _, copy, item = heapq.heappop(heap)
+            yield t, copy, item
+        for copy in range(fanout):
+            order += 1
+            offset = rng.uniform(0, spread) if copy else 0.0
+            heapq.heappush(heap, (frame.t + offset, order, copy, frame))
+    while heap:
+        t, _, copy, item = heapq.heappop(heap)
+        yield t, copy, item
+
+
+class Replayer:
+    def __init__(self, server, workers):
+        self.server = server.rstrip('/')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        # 最多 2 × workers 个请求在排队或发送中，尽快回放时不会把整个记录读进内存
+        self.slots = threading.Semaphore(2 * workers)
+        self.lock = threading.Lock()
+        self.latency = LatencyHistogram()
+        self.lateness = LatencyHistogram()
+        self.errors = {}
+        self.by_path = {}
+        self.ok = 0
+        self.bytes = 0
+
+    def _send(self, frame, body):
+        try:
+            self._request(frame, body)
+        finally:
+            self.slots.release()
+
+    def _request(self, frame, body):
+        headers = dict(frame.headers)
+        data = body
+        if frame.path == BATCH_PATH:
+            data = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        kind = frame.path if not frame.path.startswith('/api/screenshots/') else '/api/screenshots'
+        start = time.perf_counter()
+        try:
+            resp = self.session.request(frame.method, self.server + frame.path, data=data,
+                                        headers=headers, timeout=30)
+            error = None if resp.status_code < 400 else f"http_{resp.status_code}"
+        except requests.exceptions.Timeout:
+            error = 'timeout'
+        except requests.exceptions.ConnectionError:
+            error = 'connection_error'
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.bytes += len(data)
+            stats = self.by_path.setdefault(kind, {"requests": 0, "errors": 0, "bytes": 0})
+            stats["requests"] += 1
+            stats["bytes"] += len(data)
+            if error:
+                self.errors[error] = self.errors.get(error, 0) + 1
+                stats["errors"] += 1
+            else:
+                self.ok += 1
+                self.latency.record(elapsed)
+
+    def submit(self, frame, body, lateness):
+        self.slots.acquire()
+        with self.lock:
+            self.lateness.record(max(0.0, lateness))
+        self.pool.submit(self._send, frame, body)
+
+    def wait(self):
+        self.pool.shutdown(wait=True)
+
+
+def replay(args):
+    server = None
+    target = args.server
+    if args.stub:
+        from stub_server import start_stub_server
+        server, target = start_stub_server()
+
+    replayer = Replayer(target, args.workers)
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    first = None
+    requests_sent = 0
+    for t, copy, frame in expand(read_trace(args.trace), args.fanout, args.spread, rng):
+        if first is None:
+            first = t
+        lateness = 0.0
+        if args.speed > 0:
+            due = started + (t - first) / args.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lateness = time.perf_counter() - due
+        replayer.submit(frame, with_student_suffix(frame, copy), lateness)
+        requests_sent += 1
+    replayer.wait()
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "trace": args.trace,
+        "server": target,
+        "speed": args.speed or "max",
+        "fanout": args.fanout,
+        "requests": requests_sent,
+        "ok": replayer.ok,
+        "errors": replayer.errors,
+        "seconds": round(elapsed, 2),
+        "request_rate": round(requests_sent / elapsed, 1) if elapsed else 0.0,
+        "bytes": replayer.bytes,
+        "by_path": replayer.by_path,
+        "latency_us": replayer.latency.summary(),
+        "schedule_lateness_us": replayer.lateness.summary(),
+    }
+    if server is not None:
+        result["stub_stats"] = dict(server.state.stats)
+        server.shutdown()
+    return result
+
+
+def main():
+    p = argparse.ArgumentParser(description="回放记录的上报流量")
+    p.add_argument('trace', help='流量记录文件')
+    p.add_argument('--server', default='http://localhost:3003', help='回放目标服务器')
+    p.add_argument('--speed', type=float, default=1.0, help='回放倍速，0 为尽快发送')
+    p.add_argument('--fanout', type=int, default=1, help='每个请求复制的份数（模拟更多学生端）')
+    p.add_argument('--spread', type=float, default=5.0, help='副本在多少秒（记录时间）内随机错开')
+    p.add_argument('--workers', type=int, default=64, help='并发发送线程数')
+    p.add_argument('--stub', action='store_true', help='回放到本进程中的替身服务器')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    p.add_argument('--json', help='把结果写入 JSON 文件')
+    args = p.parse_args()
+    args.fanout = max(1, args.fanout)
+
+    result = replay(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""机房规模模拟：在一个进程内运行成百上千个模拟学生端，按加速的模拟时钟采样并上报
+
+用法示例:
+  python tests/sim_fleet.py                                   # 200 台，20 倍速，模拟 10 分钟，上报到替身服务器
+  python tests/sim_fleet.py --agents 1000 --speed 50 --duration 1800
+  python tests/sim_fleet.py --server http://localhost:3003 --agents 500   # 压测真实的 server.js
+  python tests/sim_fleet.py --trace lab_trace.jsonl --json result.json
+
+每个模拟学生端与 student_agent 的 sample_once / encode_sample / 批量上报 流程相同：
+  前台窗口（platform_probe 回放记录）→ 进程信息缓存 → 标题解析 → 提取域名 → 去重 →
+  组装上报记录 → 满 --batch 条或等待超过 --max-delay 秒后由发送线程池调用 ReportTransport 发送
+采样节拍与 AgentCore 相同（固定节拍，落后超过一个周期时跳过错过的节拍）。
+不使用 --trace 时每台机器回放各自随机生成的窗口切换记录（platform_probe.generate_trace）；
+使用 --trace 时所有机器回放同一份记录，起点随机错开。
+--screenshot-kb 大于 0 时每条上报前按内容哈希上传一张该大小的随机数据（模拟截图流量，不做 JPEG 编码）。
+
+输出（所有时间均为模拟时间，服务器延迟为真实时间）:
+  实际采样率     实际执行的采样次数 / 应执行的次数
+  节拍漂移       每次采样相对计划时间点的延后（p50 / p99 / 最大），模拟器跟不上倍速时会明显增大
+  去重比例       被去重跳过的采样 / 有前台窗口的采样
+  发送字节       全部请求体字节数（批量请求为 gzip 后的大小）及每条记录平均字节数
+  服务器延迟     每个请求的往返时间 p50 / p90 / p99 / 最大
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('PROBE_BACKEND', 'null')
+import student_agent  # noqa: E402
+from platform_probe import TraceProbe, generate_trace, load_trace  # noqa: E402
+from process_cache import ProcessCache  # noqa: E402
+from report_uploader import ReportTransport, ScreenshotUploader  # noqa: E402
+from title_parser import TitleParser  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+
+
+class VirtualClock:
+    """模拟时钟：从启动开始按 speed 倍速前进"""
+
+    def __init__(self, speed):
+        self.speed = float(speed)
+        self.start = time.perf_counter()
+
+    def __call__(self):
+        return (time.perf_counter() - self.start) * self.speed
+
+    def sleep_until(self, when):
+        delay = (when - self()) / self.speed
+        if delay > 0:
+            time.sleep(delay)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class MeteredSession(requests.Session):
+    """记录每个请求的往返时间和请求体字节数"""
+
+    def __init__(self, pool_size):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.request_bytes = 0
+        self.requests = 0
+        self.errors = 0
+
+    def request(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            with self.lock:
+                self.errors += 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(elapsed)
+            self.request_bytes += len(resp.request.body or b'')
+            if resp.status_code >= 400:
+                self.errors += 1
+        return resp
+
+
+class SimAgent:
+    """一台模拟学生端（采样在调度线程中执行，发送交给线程池）"""
+
+    def __init__(self, index, probe, transport, args, uploader=None):
+        self.student_id = f"sim_{index:04d}"
+        self.probe = probe
+        self.transport = transport
+        self.uploader = uploader
+        self.args = args
+        self.process_cache = ProcessCache(source=probe)
+        self.title_parser = TitleParser()
+        self.recent_reports = TTLCache(student_agent.DEDUPLICATION_WINDOW)
+        self.buffer = []
+        self.oldest = None
+        self.in_flight = False
+        self.ticks = 0
+        self.idle = 0
+        self.deduplicated = 0
+        self.records = 0
+        self.sent = 0
+
+    def sample(self, now, wall_start):
+        """与 sample_once + encode_sample 相同的步骤，时间使用模拟时钟"""
+        self.ticks += 1
+        window = self.probe.foreground_window()
+        if window is None:
+            self.idle += 1
+            return
+        process = self.process_cache.lookup(window.pid, window.hwnd) if window.pid else None
+        url = self.title_parser.parse(window.title, window.window_class,
+                                      process.exe_name if process else None,
+                                      process.strategy if process else None)
+        title = window.title[:100]
+        if url == "about:blank" and not title.strip():
+            self.idle += 1
+            return
+        domain = student_agent.extract_domain(url)
+        if student_agent.deduplicate((domain, title), now, self.recent_reports):
+            self.deduplicated += 1
+            return
+        self.records += 1
+        self.buffer.append({
+            "student_id": self.student_id,
+            "url": domain,
+            "original_url": url,
+            "domain": domain,
+            "title": title,
+            "timestamp": (wall_start + timedelta(seconds=now)).strftime("%Y-%m-%d %H:%M:%S"),
+            "system": "Windows",
+            "system_version": "10.0.19045",
+        })
+        if self.oldest is None:
+            self.oldest = now
+
+    def due(self, now, force=False):
+        if self.in_flight or not self.buffer:
+            return False
+        return force or len(self.buffer) >= self.args.batch or now - self.oldest >= self.args.max_delay
+
+    def take_batch(self):
+        batch, self.buffer, self.oldest = self.buffer, [], None
+        self.in_flight = True
+        return batch
+
+    def send(self, batch, lock, now):
+        """在发送线程中执行；未送达的记录放回缓冲区头部，下次再发"""
+        try:
+            if self.uploader is not None:
+                for record in batch:
+                    record["screenshot_ref"] = self.uploader.upload(os.urandom(self.args.screenshot_kb * 1024))
+            failed = self.transport.deliver(batch)
+        except Exception as e:
+            print(f"{self.student_id} 发送异常: {str(e)}")
+            failed = range(len(batch))
+        with lock:
+            self.sent += len(batch) - len(failed)
+            if failed:
+                self.buffer = [batch[i] for i in failed] + self.buffer
+                self.oldest = now()
+            self.in_flight = False
+
+
+def build_probes(args, clock):
+    if args.trace:
+        events = load_trace(args.trace)
+        rng = random.Random(args.seed)
+        probes = []
+        for _ in range(args.agents):
+            offset = rng.uniform(0, max(1.0, float(events[-1].get('t', 0)) if events else 1.0))
+            probes.append(TraceProbe(events, clock=lambda offset=offset: clock() + offset))
+        return probes
+    return [TraceProbe(generate_trace(duration=args.duration, mean_dwell=args.mean_dwell, seed=args.seed + i),
+                       clock=clock) for i in range(args.agents)]
+
+
+def run(args):
+    server = None
+    base_url = args.server
+    if not base_url:
+        from stub_server import start_stub_server
+        server, base_url = start_stub_server()
+
+    session = MeteredSession(args.senders)
+    clock = VirtualClock(args.speed)
+    probes = build_probes(args, clock)
+    agents = []
+    for i, probe in enumerate(probes):
+        transport = ReportTransport(base_url, session=session, timeout=10)
+        uploader = ScreenshotUploader(transport) if args.screenshot_kb > 0 else None
+        agents.append(SimAgent(i, probe, transport, args, uploader))
+
+    lock = threading.Lock()
+    pool = ThreadPoolExecutor(max_workers=args.senders)
+    rng = random.Random(args.seed)
+    interval = args.interval
+    # 各台机器开机时间不同：第一次采样时间在一个周期内随机分布
+    heap = [(rng.uniform(0, interval), i) for i in range(len(agents))]
+    heapq.heapify(heap)
+    wall_start = datetime.now()
+    lateness = []
+    missed = 0
+    scheduled = 0
+
+    # 模拟时间从这里开始计算，各回放记录也从头开始
+    clock.start = time.perf_counter()
+    for probe in probes:
+        probe.start = 0.0
+    real_start = time.perf_counter()
+    while heap and heap[0][0] < args.duration:
+        due, i = heapq.heappop(heap)
+        clock.sleep_until(due)
+        now = clock()
+        lateness.append(now - due)
+        agent = agents[i]
+        with lock:
+            agent.sample(now, wall_start)
+            if agent.due(now):
+                batch = agent.take_batch()
+                pool.submit(agent.send, batch, lock, clock)
+        scheduled += 1
+        next_tick = due + interval
+        if now > next_tick:
+            skipped = int((now - next_tick) // interval) + 1
+            missed += skipped
+            next_tick += skipped * interval
+        heapq.heappush(heap, (next_tick, i))
+    real_elapsed = time.perf_counter() - real_start
+
+    # 结束前把缓冲区里剩余的记录发完（发送失败的最多再重试两轮）
+    pool.shutdown(wait=True)
+    for _ in range(3):
+        with lock:
+            batches = [(agent, agent.take_batch()) for agent in agents if agent.due(0, force=True)]
+        if not batches:
+            break
+        with ThreadPoolExecutor(max_workers=args.senders) as drain:
+            for agent, batch in batches:
+                drain.submit(agent.send, batch, lock, clock)
+    if server is not None:
+        server.shutdown()
+
+    ticks = sum(a.ticks for a in agents)
+    active = ticks - sum(a.idle for a in agents)
+    deduplicated = sum(a.deduplicated for a in agents)
+    records = sum(a.records for a in agents)
+    sent = sum(a.sent for a in agents)
+    expected = args.agents * args.duration / interval
+    return {
+        "agents": args.agents,
+        "speed": args.speed,
+        "virtual_seconds": args.duration,
+        "real_seconds": round(real_elapsed, 2),
+        "achieved_speed": round(args.duration / real_elapsed, 1) if real_elapsed else None,
+        "sample_rate": round(ticks / expected, 4) if expected else 0.0,
+        "missed_ticks": missed,
+        "drift_ms": {"p50": round(percentile(lateness, 0.5) * 1000, 1),
+                     "p99": round(percentile(lateness, 0.99) * 1000, 1),
+                     "max": round(max(lateness, default=0) * 1000, 1)},
+        "dedup_ratio": round(deduplicated / active, 4) if active else 0.0,
+        "records": records,
+        "records_sent": sent,
+        "requests": session.requests,
+        "request_errors": session.errors,
+        "bytes_sent": session.request_bytes,
+        "bytes_per_record": round(session.request_bytes / sent, 1) if sent else 0.0,
+        "bytes_per_agent_hour": round(session.request_bytes / args.agents * 3600 / args.duration),
+        "latency_ms": {"p50": round(percentile(session.latencies, 0.5) * 1000, 1),
+                       "p90": round(percentile(session.latencies, 0.9) * 1000, 1),
+                       "p99": round(percentile(session.latencies, 0.99) * 1000, 1),
+                       "max": round(max(session.latencies, default=0) * 1000, 1)},
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="机房规模模拟")
+    p.add_argument('--agents', type=int, default=200, help='模拟学生端数量')
+    p.add_argument('--speed', type=float, default=20, help='模拟时钟倍速')
+    p.add_argument('--duration', type=float, default=600, help='模拟时长（模拟秒）')
+    p.add_argument('--interval', type=float, default=student_agent.REPORT_INTERVAL, help='采样间隔（模拟秒）')
+    p.add_argument('--batch', type=int, default=student_agent.BATCH_MAX_RECORDS, help='批量上报条数')
+    p.add_argument('--max-delay', type=float, default=student_agent.BATCH_MAX_DELAY, help='批量最长等待（模拟秒）')
+    p.add_argument('--mean-dwell', type=float, default=20, help='合成记录中窗口平均停留时间（秒）')
+    p.add_argument('--trace', help='窗口切换记录（JSON Lines），所有机器共用')
+    p.add_argument('--screenshot-kb', type=int, default=0, help='每条上报附带的模拟截图大小（KB），0 为不上传')
+    p.add_argument('--senders', type=int, default=32, help='发送线程数（同时也是连接池大小）')
+    p.add_argument('--server', help='服务器地址，默认启动 tests/stub_server.py 替身服务器')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    p.add_argument('--json', help='把结果写入 JSON 文件')
+    args = p.parse_args()
+
+    print(f"模拟 {args.agents} 台学生端，{args.speed:g} 倍速，模拟 {args.duration:g} 秒"
+          f"（约 {args.duration / args.speed:.0f} 秒）...")
+    result = run(args)
+    print(f"实际采样率: {result['sample_rate']:.2%}（错过节拍 {result['missed_ticks']} 次，"
+          f"实际倍速 {result['achieved_speed']}）")
+    print(f"节拍漂移: p50 {result['drift_ms']['p50']} ms，p99 {result['drift_ms']['p99']} ms，"
+          f"最大 {result['drift_ms']['max']} ms（模拟时间）")
+    print(f"去重比例: {result['dedup_ratio']:.2%}，生成记录 {result['records']} 条，送达 {result['records_sent']} 条")
+    print(f"发送: {result['requests']} 个请求（失败 {result['request_errors']}），{result['bytes_sent']} 字节，"
+          f"每条记录 {result['bytes_per_record']} 字节，每台每小时 {result['bytes_per_agent_hour']} 字节")
+    print(f"服务器延迟: p50 {result['latency_ms']['p50']} ms，p90 {result['latency_ms']['p90']} ms，"
+          f"p99 {result['latency_ms']['p99']} ms，最大 {result['latency_ms']['max']} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == '__main__':
+    main()
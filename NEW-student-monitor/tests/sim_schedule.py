@@ -0,0 +1,173 @@
+"""机房错峰调度（fleet_schedule + AgentCore 的 start_delay / jitter）演示脚本，纯模拟、不需要服务器，运行约 2 秒
+
+用法示例:
+  python tests/sim_schedule.py
+  python tests/sim_schedule.py --agents 300 --interval 60 --outage 120
+
+依次检查:
+  1. phase_offset 稳定（同一学生ID每次相同）且在周期内均匀分布；DecorrelatedBackoff 的等待时间在 [base, cap] 内
+  2. 上课铃同时开机：原实现开机即上报、固定间隔，请求集中在开机那几秒；
+     新实现按学生ID相位对齐 + 有界抖动。输出每秒请求数的峰值 / 平均值
+  3. 服务器重启：原实现所有机器每 5 秒同时重连，服务器恢复的那一秒全部涌入；
+     新实现去相关的指数退避（base 2 秒、cap 15 秒）。输出断线期间的重连次数、每秒重连数的峰均比、
+     服务器恢复后每秒的最大重连数和全部重新连上所需的时间（不超过 3 个原重连间隔）
+  4. 实时运行一个 AgentCore：第一次采样等待 start_delay，之后每次采样偏离节拍点不超过 jitter × interval，长期不漂移
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent_core import AgentCore  # noqa: E402
+from fleet_schedule import DecorrelatedBackoff, jittered, phase_delay, phase_offset  # noqa: E402
+
+
+def peak_to_mean(per_second, start, end):
+    counts = [per_second.get(t, 0) for t in range(int(start), int(end))]
+    mean = sum(counts) / len(counts)
+    return max(counts), mean, (max(counts) / mean if mean else 0.0)
+
+
+def check_primitives(args):
+    ids = [f"lab-{i}" for i in range(args.agents)]
+    assert [phase_offset(i, 60) for i in ids] == [phase_offset(i, 60) for i in ids]
+    buckets = Counter(int(phase_offset(i, 60) // 6) for i in ids)
+    assert len(buckets) == 10 and max(buckets.values()) < args.agents / 10 * 2.5
+    # now + phase_delay 落在相位上
+    residue = (1000.0 + phase_delay('x', 60, 1000.0) - phase_offset('x', 60)) % 60
+    assert min(residue, 60 - residue) < 1e-6
+
+    rng = random.Random(args.seed)
+    backoff = DecorrelatedBackoff(base=1, cap=60, rng=rng.uniform)
+    waits = [backoff.next() for _ in range(50)]
+    assert all(1 <= w <= 60 for w in waits) and backoff.attempts == 50
+    backoff.reset()
+    assert backoff.next() <= 3
+    print(f"相位: {args.agents} 台机器落在 10 个 6 秒区间内，每区间 {min(buckets.values())}–{max(buckets.values())} 台；"
+          f"退避前 8 次等待 {[round(w, 1) for w in waits[:8]]}")
+
+
+def simulate_boot(args):
+    """上课铃：所有机器在 boot_spread 秒内开机，统计之后 periods 个周期内每秒的上报请求数"""
+    rng = random.Random(args.seed)
+    boot_wall = 1_700_000_000.0
+    boots = [rng.uniform(0, args.boot_spread) for _ in range(args.agents)]
+    end = args.interval * args.periods
+    old, new = Counter(), Counter()
+    for i, boot in enumerate(boots):
+        t = boot
+        while t < end:
+            old[int(t)] += 1
+            t += args.interval
+        tick = boot + phase_delay(f"lab-{i}", args.interval, boot_wall + boot)
+        while True:
+            t = tick + args.jitter * args.interval * (2 * rng.random() - 1)
+            if t >= end:
+                break
+            new[int(max(t, boot))] += 1
+            tick += args.interval
+    # 从第二个周期开始统计（新实现第一个周期内还有机器没到相位）
+    old_peak, old_mean, old_ratio = peak_to_mean(old, args.interval, end)
+    new_peak, new_mean, new_ratio = peak_to_mean(new, args.interval, end)
+    print(f"{args.agents} 台机器 {args.boot_spread:g} 秒内同时开机，上报间隔 {args.interval:g} 秒:")
+    print(f"  原实现: 每秒最多 {old_peak} 个请求，平均 {old_mean:.2f}，峰均比 {old_ratio:.1f}")
+    print(f"  新实现: 每秒最多 {new_peak} 个请求，平均 {new_mean:.2f}，峰均比 {new_ratio:.1f}")
+    assert new_ratio < old_ratio / 4
+
+
+def simulate_outage(args):
+    """服务器在 down_at 时重启，outage 秒后恢复；统计断线期间和恢复后的重连请求"""
+    rng = random.Random(args.seed)
+    down_at, up_at = 10.0, 10.0 + args.outage
+    # 所有机器在同一时刻发现断线（连接被服务器关闭），之后的连接尝试 connect_cost 秒后失败
+    connect_cost = 0.2
+
+    def run(next_wait):
+        per_second, attempts, connected_at = Counter(), 0, []
+        for i in range(args.agents):
+            wait = next_wait(i)
+            t = down_at + connect_cost * rng.random()
+            while True:
+                t += wait()
+                attempts += 1
+                per_second[int(t)] += 1
+                if t >= up_at:
+                    connected_at.append(t)
+                    break
+                t += connect_cost
+        return per_second, attempts, max(connected_at) - up_at
+
+    def flat(_):
+        return lambda: 5.0
+
+    def decorrelated(_):
+        return DecorrelatedBackoff(base=2, cap=15, rng=rng.uniform).next
+
+    def report(name, per_second, attempts, last):
+        _, _, ratio = peak_to_mean(per_second, down_at, up_at + 60)
+        # 服务器恢复后的 10 秒内是否同时涌入
+        recovery_peak = max(per_second.get(t, 0) for t in range(int(up_at), int(up_at) + 10))
+        print(f"  {name}: 重连 {attempts} 次，峰均比 {ratio:.1f}，恢复后每秒最多 {recovery_peak} 个，"
+              f"{last:.1f} 秒后全部连上")
+        return attempts, ratio, recovery_peak, last
+
+    print(f"服务器重启 {args.outage:g} 秒，{args.agents} 台机器同时断线:")
+    old_attempts, old_ratio, old_peak, _ = report("原实现（每 5 秒重连）", *run(flat))
+    new_attempts, new_ratio, new_peak, new_last = report("新实现（去相关退避）", *run(decorrelated))
+    assert new_attempts < old_attempts * 0.6 and new_ratio < old_ratio and new_peak < old_peak / 4
+    # cap 15 秒：最后一次失败后最多再等 15 秒，加上连接失败的耗时
+    assert new_last <= 15 + 2 * connect_cost
+
+
+def check_agent_core():
+    """实时运行：interval 0.1 秒，start_delay 0.3 秒，jitter 0.2"""
+    interval, start_delay, jitter = 0.1, 0.3, 0.2
+    times = []
+    started = time.monotonic()
+    core = AgentCore(lambda: times.append(time.monotonic()) or None, lambda s: s, lambda r: None, interval,
+                     start_delay=start_delay, jitter=jitter, rng=random.Random(3).random).start()
+    time.sleep(start_delay + interval * 10 + 0.05)
+    core.stop()
+    offsets = [t - started - start_delay - k * interval for k, t in enumerate(times)]
+    print(f"AgentCore: 第一次采样在 {times[0] - started:.3f} 秒，{len(times)} 次采样相对节拍点最大偏移 "
+          f"{max(abs(o) for o in offsets) * 1000:.0f} ms（上限 {jitter * interval * 1000:.0f} ms）")
+    assert times[0] - started >= start_delay - 0.005
+    assert 10 <= len(times) <= 12
+    assert max(abs(o) for o in offsets) < jitter * interval + 0.02
+
+    # 触发采样可以提前结束 start_delay 的等待
+    times.clear()
+    core = AgentCore(lambda: times.append(time.monotonic()) or None, lambda s: s, lambda r: None, 1.0,
+                     start_delay=5.0).start()
+    started = time.monotonic()
+    core.trigger()
+    time.sleep(0.05)
+    core.stop()
+    assert len(times) == 1 and times[0] - started < 0.05
+    assert 0 <= jittered(10, 0.5) <= 15
+
+
+def main():
+    p = argparse.ArgumentParser(description="机房错峰调度模拟")
+    p.add_argument('--agents', type=int, default=120, help='模拟学生机数')
+    p.add_argument('--interval', type=float, default=60, help='上报间隔（秒）')
+    p.add_argument('--periods', type=int, default=10, help='模拟的上报周期数')
+    p.add_argument('--boot-spread', type=float, default=3, help='开机时间的分布范围（秒）')
+    p.add_argument('--jitter', type=float, default=0.1, help='每次上报的随机偏移（上报间隔的比例）')
+    p.add_argument('--outage', type=float, default=90, help='服务器重启期间不可用的秒数')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    args = p.parse_args()
+
+    check_primitives(args)
+    simulate_boot(args)
+    simulate_outage(args)
+    check_agent_core()
+    print("✅ 机房错峰调度检查通过")
+
+
+if __name__ == '__main__':
+    main()
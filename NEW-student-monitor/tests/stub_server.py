@@ -0,0 +1,346 @@
+"""本地替身服务器（只用于测试学生端传输层，不依赖 Node.js / SQLite）
+
+用法示例:
+  python tests/stub_server.py --port 3003
+  python tests/stub_server.py --port 3003 --no-batch --no-screenshot-upload   # 模拟旧版服务器
+
+实现与 server.js 相同的上报接口，数据只保存在内存中:
+  GET  /api/report/capabilities
+  POST /api/report
+  POST /api/report/batch          （支持 Content-Encoding: gzip）
+  PUT  /api/screenshots/<sha256>  （校验哈希，相同内容只保存一份）
+  GET  /api/screenshots/<sha256>
+  GET  /api/blacklist/domains     返回启动时传入的 blacklist 域名列表
+  GET  /api/blacklist             同一列表的域名数组（端口 3000 服务端的格式）
+  GET  /api/url-blacklist/current 带版本号的黑名单（since / If-None-Match → 304 或差异），
+                                  测试中用 state.change_blacklist() 增删规则并得到与 server.js 相同的推送事件；
+                                  state.versioned_blacklist = False 时返回 404（模拟没有该接口的旧版服务端）
+  POST /api/student/upload        view+stu 学生端（student.py / student_async.py）的定时采集上传，保存到 state.uploads，
+                                  返回 {"success": true, "student_id": "stub-<计算机名>"}
+  GET  /api/stub/stats            请求次数、请求体字节数等统计，便于对比不同传输方式
+采集策略与限流与 server.js 相同：上报响应在请求头 X-Policy-Version 与当前策略不同时带上 policy，
+测试中用 state.set_policy() 修改策略（返回推送事件），state.throttle(n, retry_after) 让接下来 n 个上报请求返回 429。
+max_body 不为 None 时，解压后超过这么多字节的上报请求与 server.js 的 bodyParser 一样返回 413。
+带 visit_id 的记录（会话模式）与 server.js 一样按 visit_id 合并到 state.visits，
+只有开始事件计入 browsing_records（stats['records_stored']）；
+带 summary 的记录（汇总模式）按 (学生, summary_run, 时间桶, 域名) 保存到 state.rollups（stats['rollup_rows']）。
+
+在其它测试脚本中可直接调用 start_stub_server() 在后台线程启动。
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SCREENSHOT_RE = re.compile(r'^/api/screenshots/([0-9a-f]{64})$')
+
+
+class StubState:
+    def __init__(self, batch=True, screenshot_upload=True, blacklist=(), max_body=None):
+        self.batch = batch
+        self.max_body = max_body
+        self.screenshot_upload = screenshot_upload
+        self.blacklist = list(blacklist)
+        self.blacklist_epoch = 'stub'
+        self.blacklist_version = 0
+        self.blacklist_changes = []
+        self.versioned_blacklist = True
+        self.lock = threading.Lock()
+        self.reports = []
+        self.uploads = []
+        self.screenshots = {}
+        self.visits = {}
+        self.rollups = {}
+        self.policy = {"epoch": "stub", "version": 0, "sample_interval": None, "screenshot": None,
+                       "batch_size": None}
+        self.throttle_remaining = 0
+        self.retry_after = 1
+        # 批量上报中个别记录入库失败：record_error(record) 返回 (状态码, 错误信息) 时这条记录不保存
+        self.record_error = None
+        self.stats = {"requests": 0, "request_bytes": 0, "reports": 0, "batches": 0,
+                      "screenshot_puts": 0, "screenshots_stored": 0, "records_stored": 0, "rollup_rows": 0,
+                      "blacklist_pulls": 0, "blacklist_not_modified": 0, "blacklist_bytes": 0,
+                      "throttled": 0, "policy_sent": 0}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def set_policy(self, **fields):
+        """修改采集策略（未给出的字段为 None），返回与 server.js 相同的推送事件"""
+        with self.lock:
+            self.policy = dict({"sample_interval": None, "screenshot": None, "batch_size": None}, **fields,
+                               epoch=self.policy["epoch"], version=self.policy["version"] + 1)
+            return dict(self.policy)
+
+    def throttle(self, count, retry_after=1):
+        """接下来 count 个上报请求返回 429（Retry-After: retry_after 秒）"""
+        with self.lock:
+            self.throttle_remaining = count
+            self.retry_after = retry_after
+
+    def policy_for(self, header):
+        with self.lock:
+            if header == f"{self.policy['epoch']}-{self.policy['version']}":
+                return None
+            self.stats['policy_sent'] += 1
+            return dict(self.policy)
+
+    def admit(self):
+        """返回 None 表示接受，否则为 Retry-After 秒数"""
+        with self.lock:
+            if self.throttle_remaining <= 0:
+                return None
+            self.throttle_remaining -= 1
+            self.stats['throttled'] += 1
+            return self.retry_after
+
+    def change_blacklist(self, added=(), removed=()):
+        """增删规则，每条实际变化版本号加 1，返回与 server.js 相同的推送事件列表"""
+        events = []
+        with self.lock:
+            changes = [(d, 'remove') for d in removed if d in self.blacklist]
+            changes += [(d, 'add') for d in added if d not in self.blacklist]
+            for domain, op in changes:
+                if op == 'add':
+                    self.blacklist.append(domain)
+                else:
+                    self.blacklist.remove(domain)
+                self.blacklist_version += 1
+                self.blacklist_changes.append((self.blacklist_version, domain, op))
+                events.append({"epoch": self.blacklist_epoch, "base": self.blacklist_version - 1,
+                               "version": self.blacklist_version,
+                               "added": [domain] if op == 'add' else [], "removed": [domain] if op == 'remove' else []})
+        return events
+
+    def blacklist_response(self, query, if_none_match):
+        """与 server.js 的 /api/url-blacklist/current 相同，返回 (状态码, 数据, ETag)"""
+        with self.lock:
+            etag = f'"{self.blacklist_epoch}-{self.blacklist_version}"'
+            same_epoch = query.get('epoch') == self.blacklist_epoch
+            try:
+                since = int(query.get('since'))
+            except (TypeError, ValueError):
+                since = None
+            if if_none_match == etag or (same_epoch and since == self.blacklist_version):
+                return 304, None, etag
+            if same_epoch and since is not None and 0 <= since <= self.blacklist_version:
+                first, last = {}, {}
+                for version, domain, op in self.blacklist_changes:
+                    if version > since:
+                        first.setdefault(domain, op)
+                        last[domain] = op
+                changed = [(d, op) for d, op in last.items() if first[d] == op]
+                return 200, {"epoch": self.blacklist_epoch, "version": self.blacklist_version, "base": since,
+                             "full": False, "added": [d for d, op in changed if op == 'add'],
+                             "removed": [d for d, op in changed if op == 'remove']}, etag
+            return 200, {"epoch": self.blacklist_epoch, "version": self.blacklist_version, "full": True,
+                         "blacklist": sorted(self.blacklist)}, etag
+
+    def merge_visit(self, record):
+        """与 server.js 的 saveVisit 相同：结束时间、停留时长只增不减，已结束的访问不会重新打开"""
+        visit = self.visits.setdefault(record['visit_id'], {
+            "student_id": record.get('student_id'), "url": record.get('domain') or record.get('url'),
+            "title": record.get('title'), "start_time": record.get('visit_start'),
+            "end_time": record.get('visit_start'), "focused_seconds": 0.0, "state": "open"})
+        visit["end_time"] = max(visit["end_time"], record.get('visit_end') or visit["end_time"])
+        visit["focused_seconds"] = max(visit["focused_seconds"], float(record.get('focused_seconds') or 0))
+        if record.get('visit_state') == 'closed':
+            visit["state"] = "closed"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # 与 Express 相同，默认保持长连接
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply(self, data):
+        """上报成功的响应：策略版本与请求头不同时带上 policy"""
+        policy = self.state.policy_for(self.headers.get('X-Policy-Version'))
+        if policy is not None:
+            data = dict(data, policy=policy)
+        return self._send_json(200, data)
+
+    def _throttled(self):
+        retry_after = self.state.admit()
+        if retry_after is None:
+            return False
+        self._send_json(429, {"error": "服务器繁忙，请稍后再上报",
+                              "policy": self.state.policy_for(self.headers.get('X-Policy-Version'))},
+                        {"Retry-After": str(retry_after)})
+        return True
+
+    def _read_body(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.state.count('requests')
+        self.state.count('request_bytes', len(raw))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            raw = gzip.decompress(raw)
+        return raw
+
+    def _save_reports(self, records):
+        with self.state.lock:
+            self.state.reports.extend(records)
+            self.state.stats['reports'] += len(records)
+            for record in records:
+                if isinstance(record.get('summary'), list):
+                    for bucket in record['summary']:
+                        for item in bucket.get('domains', []):
+                            key = (record['student_id'], record.get('summary_run'), bucket['bucket_start'],
+                                   item['domain'])
+                            self.state.rollups[key] = item
+                            self.state.stats['rollup_rows'] += 1
+                    continue
+                if record.get('visit_id'):
+                    self.state.merge_visit(record)
+                if record.get('visit_state', 'open') == 'open':
+                    self.state.stats['records_stored'] += 1
+
+    def do_GET(self):
+        if self.path == '/api/report/capabilities':
+            return self._send_json(200, {"batch": self.state.batch, "gzip": self.state.batch, "max_batch": 500,
+                                         "screenshot_upload": self.state.screenshot_upload,
+                                         "policy": dict(self.state.policy)})
+        if self.path == '/api/blacklist/domains':
+            return self._send_json(200, [{"id": i + 1, "domain": d, "reason": "测试"}
+                                         for i, d in enumerate(self.state.blacklist)])
+        if self.path == '/api/blacklist':
+            return self._send_json(200, list(self.state.blacklist))
+        url = urlsplit(self.path)
+        if url.path == '/api/url-blacklist/current' and self.state.versioned_blacklist:
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            status, data, etag = self.state.blacklist_response(query, self.headers.get('If-None-Match'))
+            self.state.count('blacklist_pulls')
+            if status == 304:
+                self.state.count('blacklist_not_modified')
+            else:
+                self.state.count('blacklist_bytes', len(json.dumps(data, ensure_ascii=False).encode('utf-8')))
+            return self._send_json(status, data, {"ETag": etag})
+        if self.path == '/api/stub/stats':
+            with self.state.lock:
+                return self._send_json(200, dict(self.state.stats))
+        match = SCREENSHOT_RE.match(self.path)
+        if match and self.state.screenshot_upload:
+            data = self.state.screenshots.get(match.group(1))
+            if data is None:
+                return self._send_json(404, {"error": "截图不存在"})
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.path.startswith('/api/report') and self._throttled():
+            return
+        if self.state.max_body is not None and len(body) > self.state.max_body:
+            return self._send_json(413, {"error": "request entity too large"})
+        try:
+            data = json.loads(body.decode('utf-8') or 'null')
+        except ValueError:
+            return self._send_json(400, {"error": "JSON格式错误"})
+        if self.path == '/api/report':
+            if not isinstance(data, dict) or not data.get('student_id'):
+                return self._send_json(400, {"error": "缺少必填参数（student_id）"})
+            self._save_reports([data])
+            return self._reply({"ok": True, "blacklisted": False})
+        if self.path == '/api/student/upload':
+            if not isinstance(data, dict):
+                return self._send_json(400, {"success": False, "error": "数据格式错误"})
+            with self.state.lock:
+                self.state.uploads.append(data)
+                student_id = f"stub-{(data.get('system_info') or {}).get('hostname') or 'pc'}"
+            return self._reply({"success": True, "student_id": student_id})
+        if self.path == '/api/report/batch' and self.state.batch:
+            records = (data or {}).get('records')
+            if not isinstance(records, list) or not records:
+                return self._send_json(400, {"error": "缺少必填参数（records）"})
+            self.state.count('batches')
+            results, saved = [], []
+            for record in records:
+                error = self.state.record_error(record) if self.state.record_error else None
+                if error:
+                    results.append({"ok": False, "status": error[0], "error": error[1]})
+                else:
+                    results.append({"ok": True, "blacklisted": False})
+                    saved.append(record)
+            self._save_reports(saved)
+            return self._reply({"ok": True, "accepted": len(saved), "results": results})
+        self._send_json(404, {"error": "not found"})
+
+    def do_PUT(self):
+        match = SCREENSHOT_RE.match(self.path)
+        body = self._read_body()
+        if not match or not self.state.screenshot_upload:
+            return self._send_json(404, {"error": "not found"})
+        if self._throttled():
+            return
+        digest = match.group(1)
+        if hashlib.sha256(body).hexdigest() != digest:
+            return self._send_json(422, {"error": "截图内容与哈希不一致"})
+        self.state.count('screenshot_puts')
+        with self.state.lock:
+            stored = digest not in self.state.screenshots
+            if stored:
+                self.state.screenshots[digest] = body
+                self.state.stats['screenshots_stored'] += 1
+        self._send_json(200, {"ok": True, "hash": digest, "stored": stored})
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # 默认监听队列只有 5，模拟大量学生端并发上报时会出现连接被重置
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def start_stub_server(port=0, host='127.0.0.1', **options):
+    """在后台线程启动替身服务器，返回 (server, base_url)；server.state 为内存中的数据"""
+    handler = type('Handler', (StubHandler,), {'state': StubState(**options)})
+    server = StubHTTPServer((host, port), handler)
+    server.state = handler.state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    p = argparse.ArgumentParser(description="学生端测试用替身服务器")
+    p.add_argument('--host', default='127.0.0.1', help='监听地址')
+    p.add_argument('--port', type=int, default=3003, help='监听端口')
+    p.add_argument('--no-batch', action='store_true', help='不提供批量上报接口')
+    p.add_argument('--no-screenshot-upload', action='store_true', help='不提供截图上传接口')
+    args = p.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.host, batch=not args.no_batch,
+                                         screenshot_upload=not args.no_screenshot_upload)
+    print(f"替身服务器已启动: {base_url}（Ctrl+C 退出）")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    print(json.dumps(server.state.stats, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""批量上报（report_uploader.BatchUploader + ReportTransport）检查脚本
+（使用 tests/stub_server.py 替身服务器，无需启动 Node.js 后端），运行约 2 秒
+
+用法示例:
+  python tests/test_batch_uploader.py
+
+依次检查:
+  1. 触发条件：满 max_records 条立即整批发送；不满一批时最旧记录等待超过 max_delay 秒后 maybe_flush 发送；urgent 立即发送
+  2. gzip：批量请求体压缩发送，服务器收到的记录与发送的一致，请求体字节数明显小于未压缩的 JSON
+  3. 回退：批量接口返回 404（服务器降级为旧版）时改为逐条上报，记录不丢、不乱序
+  4. 并发 flush：采样线程的 urgent 提交与定时 flush 同时发生时，服务器收到的批次仍按提交顺序
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from report_uploader import BatchUploader, ReportTransport  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+def make_record(i):
+    return {"student_id": "demo_pc", "url": f"https://www.zxxk.com/p/{i}", "domain": "www.zxxk.com",
+            "title": f"第 {i} 页 - 学科网"}
+
+
+def titles(server, start=0):
+    return [r["title"] for r in server.state.reports[start:]]
+
+
+def check_triggers():
+    server, base_url = start_stub_server()
+    uploader = BatchUploader(ReportTransport(base_url, timeout=3), max_records=5, max_delay=30)
+    for i in range(4):
+        uploader.submit(make_record(i))
+    assert len(uploader) == 4 and server.state.stats['reports'] == 0
+    uploader.submit(make_record(4))
+    assert len(uploader) == 0 and server.state.stats['batches'] == 1 and server.state.stats['reports'] == 5
+
+    uploader.submit(make_record(5))
+    assert not uploader.due() and uploader.maybe_flush() == 0
+    assert uploader.due(now=time.time() + 31)
+    uploader._oldest -= 31
+    assert uploader.maybe_flush() == 1
+
+    uploader.submit(make_record(6), urgent=True)
+    assert len(uploader) == 0 and titles(server) == [make_record(i)["title"] for i in range(7)]
+    print(f"触发条件: 满 5 条 / 等待超过 30 秒 / urgent 时发送，共 {server.state.stats['requests']} 个请求")
+    server.shutdown()
+
+
+def check_gzip():
+    server, base_url = start_stub_server()
+    uploader = BatchUploader(ReportTransport(base_url, timeout=3), max_records=200)
+    records = [make_record(i) for i in range(200)]
+    for record in records:
+        uploader.submit(record)
+    raw = len(json.dumps({"records": records}, ensure_ascii=False).encode('utf-8'))
+    # request_bytes 统计的是实际收到的（压缩后的）请求体
+    sent = server.state.stats['request_bytes']
+    print(f"gzip: 200 条记录 JSON {raw} 字节，实际请求体 {sent} 字节")
+    assert server.state.reports == records and server.state.stats['batches'] == 1
+    assert sent < raw / 4
+    server.shutdown()
+
+
+def check_fallback():
+    server, base_url = start_stub_server()
+    transport = ReportTransport(base_url, timeout=3)
+    uploader = BatchUploader(transport, max_records=3)
+    for i in range(3):
+        uploader.submit(make_record(i))
+    assert server.state.stats['batches'] == 1 and transport.batch_supported
+    # 服务器回滚到旧版：能力缓存还没过期，批量接口已经返回 404
+    server.state.batch = False
+    for i in range(3, 6):
+        uploader.submit(make_record(i))
+    assert len(uploader) == 0 and not transport.batch_supported
+    assert titles(server) == [make_record(i)["title"] for i in range(6)] and server.state.stats['batches'] == 1
+    print("回退: 批量接口 404 后同一批改为逐条上报，记录完整且有序")
+    server.shutdown()
+
+
+def check_concurrent_flush():
+    delivered = []
+    first_call = threading.Event()
+
+    class SlowTransport:
+        """第一次发送很慢（网络卡顿），之后正常"""
+
+        def deliver(self, records):
+            if not first_call.is_set():
+                first_call.set()
+                time.sleep(0.2)
+            delivered.extend(r["title"] for r in records)
+            return []
+
+    uploader = BatchUploader(SlowTransport(), max_records=100)
+    for i in range(5):
+        uploader.submit(make_record(i))
+    timer = threading.Thread(target=uploader.flush)
+    timer.start()
+    first_call.wait(1)
+    for i in range(5, 10):
+        uploader.submit(make_record(i))
+    uploader.submit(make_record(10), urgent=True)
+    timer.join()
+    print(f"并发 flush: 服务器收到的顺序 {[t.split()[1] for t in delivered]}")
+    assert delivered == [make_record(i)["title"] for i in range(11)]
+
+
+def main():
+    check_triggers()
+    check_gzip()
+    check_fallback()
+    check_concurrent_flush()
+    print("✅ 批量上报检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""黑名单规则语义（blacklist_matcher.BlacklistMatcher）检查脚本，无需服务器，运行不到 1 秒
+
+用法示例:
+  python tests/test_blacklist_matcher.py
+
+依次检查:
+  1. 默认（student_monitor_agent / student_agent / stu66 的域名黑名单）：qq.com 匹配 qq.com 及其子域名，
+     按标签边界匹配，myqq.com 不算
+  2. bare_domains=False（view+stu 学生端 student.py 的 URL 黑名单）：纯域名规则与原实现一样只在地址完全相同时匹配，
+     不会因为 qq.com 这条规则关闭 v.qq.com 的窗口；*.域名、完整 URL、URL 前缀规则与默认相同
+  3. 增删规则后索引与规则列表一致
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blacklist_matcher import BlacklistMatcher  # noqa: E402
+
+RULES = ['qq.com', '*.bilibili.com', 'https://www.zxxk.com/exam', 'https://www.zxxk.com/games/']
+
+
+def check_domain_rules():
+    matcher = BlacklistMatcher(RULES)
+    assert matcher.match('qq.com') == 'qq.com'
+    assert matcher.match('https://v.qq.com/x/cover') == 'qq.com'
+    assert matcher.match('https://www.qq.com') == 'qq.com'
+    assert matcher.match('https://myqq.com') is None
+    assert matcher.match('https://search.bilibili.com/all') == '*.bilibili.com'
+    print("域名黑名单: qq.com 匹配 qq.com / v.qq.com，不匹配 myqq.com")
+
+
+def check_url_rules():
+    matcher = BlacklistMatcher(RULES, bare_domains=False)
+    # 纯域名规则：只有地址栏内容与规则完全相同才匹配
+    assert matcher.match('qq.com') == 'qq.com' and matcher.match('QQ.com') == 'qq.com'
+    assert matcher.match('https://v.qq.com/x/cover') is None
+    assert matcher.match('https://www.qq.com') is None
+    assert matcher.match('v.qq.com') is None
+    # 其它写法与默认相同
+    assert matcher.match('https://search.bilibili.com/all') == '*.bilibili.com'
+    assert matcher.match('https://www.zxxk.com/exam') == 'https://www.zxxk.com/exam'
+    assert matcher.match('https://www.zxxk.com/exam/1') is None
+    assert matcher.match('https://www.zxxk.com/games/2048') == 'https://www.zxxk.com/games/'
+    assert matcher.match('https://www.zxxk.com/p/1') is None
+    print("URL 黑名单（bare_domains=False）: qq.com 只匹配地址 qq.com，拦截整个域名需写 *.qq.com")
+
+
+def check_update():
+    for bare_domains in (True, False):
+        matcher = BlacklistMatcher(RULES, bare_domains=bare_domains)
+        assert matcher.update(['*.qq.com', 'https://www.zxxk.com/exam']) == (1, 3)
+        assert matcher.rules == {'*.qq.com', 'https://www.zxxk.com/exam'}
+        assert matcher.match('https://v.qq.com') == '*.qq.com'
+        assert matcher.match('https://www.zxxk.com/games/2048') is None
+        assert matcher.match('https://www.bilibili.com') is None
+        matcher.remove('https://www.zxxk.com/exam')
+        assert matcher.match('https://www.zxxk.com/exam') is None and len(matcher) == 1
+    print("增删规则: 索引与规则列表一致")
+
+
+def main():
+    check_domain_rules()
+    check_url_rules()
+    check_update()
+    print("✅ 黑名单规则检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""带版本号的黑名单同步（blacklist_sync.BlacklistSync）演示脚本（使用 tests/stub_server.py 替身服务器，无需启动 Node.js 后端）
+
+用法示例:
+  python tests/test_blacklist_sync.py
+  python tests/test_blacklist_sync.py --agents 500 --rules 5000 --changes 10
+
+依次检查:
+  1. 条件请求：第一次得到完整列表，没有变化时 304，有变化时只返回差异；服务器重启（epoch 变化）后重新得到完整列表
+  2. 旧版服务端（没有 /api/url-blacklist/current，返回 404）：pull_or_full 改为获取完整列表，服务端升级后恢复条件请求
+  3. 推送事件直接带差异：按顺序到达时就地应用、不请求服务器；重复事件被忽略；缺了版本时返回 None，请求一次补齐
+  4. 机房规模对比：每次黑名单变化时，原实现所有学生机在同一时刻请求完整列表；
+     新实现只有漏收推送的学生机在随机等待后请求差异。输出请求数、响应字节数和同一秒内的最大请求数
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import requests  # noqa: E402
+from blacklist_matcher import BlacklistMatcher  # noqa: E402
+from blacklist_sync import BlacklistSync, read_events  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+def check_conditional(http):
+    server, base_url = start_stub_server(blacklist=['bilibili.com', 'v.qq.com'])
+    url = base_url + '/api/url-blacklist/current'
+    sync = BlacklistSync()
+    assert sync.pull(http, url) == (2, 0) and sync.version == 0
+    assert sync.pull(http, url) == (0, 0)
+    server.state.change_blacklist(added=['douyu.com', 'huya.com'], removed=['v.qq.com'])
+    server.state.change_blacklist(removed=['huya.com'])
+    assert sync.pull(http, url) == (1, 1)
+    assert sync.matcher.match('https://www.douyu.com/1') and not sync.matcher.match('https://v.qq.com/x')
+    server.state.blacklist_epoch = 'restarted'
+    assert sync.pull(http, url) == (0, 0) and sync.stats["full"] == 2
+    print(f"条件请求: {sync.metrics()}，服务器 {server.state.stats['blacklist_pulls']} 次请求 / "
+          f"{server.state.stats['blacklist_not_modified']} 次 304")
+    assert sync.stats == dict(sync.stats, full=2, diffs=1, not_modified=1)
+    server.shutdown()
+
+
+def check_fallback(http):
+    server, base_url = start_stub_server(blacklist=['bilibili.com', 'v.qq.com'])
+    url, full_url = base_url + '/api/url-blacklist/current', base_url + '/api/blacklist'
+    server.state.versioned_blacklist = False
+    sync = BlacklistSync()
+    assert sync.pull_or_full(http, url, full_url) == (2, 0) and sync.version is None
+    server.state.change_blacklist(added=['douyu.com'])
+    assert sync.pull_or_full(http, url, full_url) == (1, 0)
+    # 服务端升级：第一次得到完整列表（规则没有变化），之后是 304
+    server.state.versioned_blacklist = True
+    assert sync.pull_or_full(http, url, full_url) == (0, 0) and sync.version == 1
+    assert sync.pull_or_full(http, url, full_url) == (0, 0) and sync.stats["not_modified"] == 1
+    print(f"旧版服务端: 获取完整列表 2 次，升级后恢复条件请求，现有规则 {sorted(sync.matcher.rules)}")
+    assert sorted(sync.matcher.rules) == ['bilibili.com', 'douyu.com', 'v.qq.com']
+    server.shutdown()
+
+
+def check_push(http):
+    server, base_url = start_stub_server(blacklist=['bilibili.com'])
+    url = base_url + '/api/url-blacklist/current'
+    sync = BlacklistSync(rng=lambda: 0.5)
+    sync.pull(http, url)
+    pulls = server.state.stats['blacklist_pulls']
+
+    # SSE 格式的推送经 read_events 解析后应用
+    frames = []
+    for event in server.state.change_blacklist(added=['douyu.com']):
+        frames += ['event: blacklist-update', 'data: ' + json.dumps(event, ensure_ascii=False), '']
+    for name, data in read_events(['retry: 10000', ''] + frames):
+        assert name == 'blacklist-update' and sync.apply_push(data) == (1, 0)
+    assert sync.apply_push(data) == (0, 0)
+
+    missed = server.state.change_blacklist(added=['huya.com'])
+    later = server.state.change_blacklist(removed=['bilibili.com'])
+    assert missed and sync.apply_push(later[0]) is None
+    assert server.state.stats['blacklist_pulls'] == pulls
+    delay = sync.fetch_delay()
+    assert sync.pull(http, url) == (1, 1)
+    print(f"推送: 按顺序应用 1 次、重复 1 次、缺版本 1 次（{delay:g} 秒后请求补齐），"
+          f"现有规则 {sorted(sync.matcher.rules)}")
+    assert sorted(sync.matcher.rules) == ['douyu.com', 'huya.com']
+    server.shutdown()
+
+
+def simulate_fleet(http, args):
+    rng = random.Random(args.seed)
+    rules = [f"site{i}.example.com" for i in range(args.rules)]
+    server, base_url = start_stub_server(blacklist=rules)
+    url = base_url + '/api/url-blacklist/current'
+    full_bytes = len(json.dumps({"blacklist": rules}, ensure_ascii=False).encode('utf-8'))
+    agents = [BlacklistSync(BlacklistMatcher(), jitter=args.jitter, rng=rng.random) for _ in range(args.agents)]
+    for sync in agents:
+        sync.pull(http, url)
+    before = dict(server.state.stats)
+
+    per_second = Counter()
+    for change in range(args.changes):
+        at = change * 60.0
+        events = server.state.change_blacklist(added=[f"new{change}.example.com"])
+        for sync in agents:
+            if rng.random() < args.miss:
+                continue  # 断线 / 漏收了这一条推送
+            if sync.apply_push(events[0]) is None:
+                per_second[int(at + sync.fetch_delay())] += 1
+                sync.pull(http, url)
+    # 再做一次定期请求：漏收推送且之后没有再收到推送的学生机在这里补齐
+    for sync in agents:
+        sync.pull(http, url)
+    after = server.state.stats
+    requests_made = after['blacklist_pulls'] - before['blacklist_pulls']
+    bytes_sent = after['blacklist_bytes'] - before['blacklist_bytes']
+    server.shutdown()
+
+    old_requests = args.agents * args.changes
+    print(f"{args.agents} 台学生机、{args.rules} 条规则、{args.changes} 次变化（漏收推送概率 {args.miss:.0%}）:")
+    print(f"  原实现: {old_requests} 次完整列表请求，约 {old_requests * full_bytes} 字节，"
+          f"每次变化同一时刻 {args.agents} 个请求")
+    print(f"  新实现: 推送时 {requests_made - args.agents} 次差异请求 + {args.agents} 次定期请求"
+          f"（{after['blacklist_not_modified'] - before['blacklist_not_modified']} 次 304），共 {bytes_sent} 字节，"
+          f"同一秒内最多 {max(per_second.values(), default=0)} 个请求")
+    expected = set(rules) | {f"new{c}.example.com" for c in range(args.changes)}
+    assert all(sync.matcher.rules == expected for sync in agents)
+    assert bytes_sent < old_requests * full_bytes / 20
+    assert max(per_second.values(), default=0) < args.agents / 5
+
+
+def main():
+    p = argparse.ArgumentParser(description="带版本号的黑名单同步演示")
+    p.add_argument('--agents', type=int, default=200, help='模拟学生机数')
+    p.add_argument('--rules', type=int, default=2000, help='黑名单规则数')
+    p.add_argument('--changes', type=int, default=5, help='黑名单变化次数')
+    p.add_argument('--miss', type=float, default=0.1, help='每条推送被漏收的概率')
+    p.add_argument('--jitter', type=float, default=10, help='缺版本时请求前随机等待的最长秒数')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    args = p.parse_args()
+
+    http = requests.Session()
+    check_conditional(http)
+    check_fallback(http)
+    check_push(http)
+    simulate_fleet(http, args)
+    print("✅ 黑名单同步检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+// 带版本号的黑名单（blacklist_versions.js）检查脚本：用模拟的 req / res 调用接口处理函数，不需要 express 和数据库
+// 用法：node tests/test_blacklist_versions.js
+// 依次检查：完整列表 → 304 → 差异（先加后删的域名不出现）→ epoch 不同时完整列表 → 推送事件带差异
+
+const assert = require('assert');
+const { createBlacklistVersions } = require('../blacklist_versions');
+
+function call(handler, query = {}, headers = {}) {
+  return new Promise(resolve => {
+    const res = {
+      statusCode: 200,
+      headers: {},
+      set(name, value) { this.headers[name] = value; return this; },
+      status(code) { this.statusCode = code; return this; },
+      json(body) { resolve({ status: this.statusCode, body, etag: this.headers.ETag }); },
+      end() { resolve({ status: this.statusCode, body: null, etag: this.headers.ETag }); }
+    };
+    handler({ query, get: name => headers[name] }, res);
+  });
+}
+
+async function run() {
+  const domains = new Set(['qq.com', 'youku.com']);
+  const versions = createBlacklistVersions();
+  const current = versions.current(callback => callback(null, [...domains].sort()));
+  const frames = [];
+  versions.events()({ on() {} }, { set() {}, flushHeaders() {}, write: frame => frames.push(frame) });
+
+  const full = await call(current);
+  assert.deepStrictEqual(full.body, { epoch: versions.epoch, version: 0, full: true, blacklist: ['qq.com', 'youku.com'] });
+  const since = { since: '0', epoch: versions.epoch };
+  assert.strictEqual((await call(current, since)).status, 304);
+  assert.strictEqual((await call(current, {}, { 'If-None-Match': full.etag })).status, 304);
+
+  domains.add('douyu.com'); versions.record('douyu.com', 'add');
+  domains.add('huya.com'); versions.record('huya.com', 'add');
+  domains.delete('huya.com'); versions.record('huya.com', 'remove');
+  domains.delete('qq.com'); versions.record('qq.com', 'remove');
+  const diff = await call(current, since);
+  console.log('差异:', diff.body);
+  assert.deepStrictEqual(diff.body, { epoch: versions.epoch, version: 4, base: 0, full: false, added: ['douyu.com'], removed: ['qq.com'] });
+
+  const restarted = await call(current, { since: '4', epoch: 'other' });
+  assert.strictEqual(restarted.body.full, true);
+  assert.deepStrictEqual(restarted.body.blacklist, ['douyu.com', 'youku.com']);
+
+  const events = frames.filter(f => f.startsWith('event: blacklist-update')).map(f => JSON.parse(f.split('data: ')[1]));
+  console.log('推送:', events.length, '个事件');
+  assert.deepStrictEqual(events.map(e => [e.base, e.version]), [[0, 1], [1, 2], [2, 3], [3, 4]]);
+  assert.deepStrictEqual(events[3].removed, ['qq.com']);
+  console.log('✅ 带版本号的黑名单检查通过');
+}
+
+run().catch(err => { console.error(err); process.exit(1); });
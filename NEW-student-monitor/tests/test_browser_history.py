@@ -0,0 +1,99 @@
+"""增量浏览历史采集演示脚本（无需浏览器和 Windows，使用临时生成的 SQLite 夹具）
+
+用法示例:
+  python tests/test_browser_history.py
+
+步骤:
+  1. 生成 Chrome（urls/visits）和 Firefox（moz_places/moz_historyvisits）结构的历史数据库
+  2. 第一次采集：只取最近 limit 条，并提交高水位
+  3. 追加新的访问记录后第二次采集：只返回新增记录
+  4. 上传失败（不提交高水位）时再次采集：返回同样的记录
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from browser_history import BrowserHistoryCollector, HistoryCursorStore  # noqa: E402
+
+CHROME_EPOCH_OFFSET = 11644473600 * 1000000  # 1601-01-01 到 1970-01-01 的微秒数
+
+
+def make_chrome_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT, last_visit_time INTEGER)")
+    conn.execute("CREATE TABLE visits (id INTEGER PRIMARY KEY, url INTEGER, visit_time INTEGER)")
+    conn.commit()
+    return conn
+
+
+def make_firefox_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT, title TEXT)")
+    conn.execute("CREATE TABLE moz_historyvisits (id INTEGER PRIMARY KEY, place_id INTEGER, visit_date INTEGER)")
+    conn.commit()
+    return conn
+
+
+def add_chrome_visit(conn, url, title, ts):
+    cur = conn.execute("INSERT INTO urls (url, title, last_visit_time) VALUES (?, ?, ?)",
+                       (url, title, ts * 1000000 + CHROME_EPOCH_OFFSET))
+    conn.execute("INSERT INTO visits (url, visit_time) VALUES (?, ?)",
+                 (cur.lastrowid, ts * 1000000 + CHROME_EPOCH_OFFSET))
+    conn.commit()
+
+
+def add_firefox_visit(conn, url, title, ts):
+    cur = conn.execute("INSERT INTO moz_places (url, title) VALUES (?, ?)", (url, title))
+    conn.execute("INSERT INTO moz_historyvisits (place_id, visit_date) VALUES (?, ?)",
+                 (cur.lastrowid, ts * 1000000))
+    conn.commit()
+
+
+def main():
+    work = tempfile.mkdtemp(prefix='history_fixture_')
+    chrome_path = os.path.join(work, 'History')
+    firefox_path = os.path.join(work, 'places.sqlite')
+    cursor_path = os.path.join(work, 'history_cursors.json')
+    chrome = make_chrome_db(chrome_path)
+    firefox = make_firefox_db(firefox_path)
+    base = 1700000000
+    for i in range(8):
+        add_chrome_visit(chrome, f"https://www.example.com/{i}", f"页面{i}", base + i)
+        add_firefox_visit(firefox, f"https://www.zxxk.com/{i}", f"学科网{i}", base + i)
+
+    profiles = [("Chrome", chrome_path, 'chromium'), ("Firefox", firefox_path, 'firefox')]
+    collector = BrowserHistoryCollector(profiles, HistoryCursorStore(cursor_path), limit=5)
+
+    history, cursors = collector.collect()
+    print(f"第一次采集: {len(history)} 条, 高水位 {cursors}")
+    assert len(history) == 10, "首次采集应只取每个浏览器最近 5 条"
+    collector.commit(cursors)
+
+    # 浏览器仍打开（连接未关闭、WAL 未合并）时追加新的访问
+    add_chrome_visit(chrome, "https://www.example.com/new", "新页面", base + 100)
+    add_firefox_visit(firefox, "https://www.zxxk.com/new", "学科网新", base + 100)
+
+    # 重新加载高水位，模拟进程重启
+    collector = BrowserHistoryCollector(profiles, HistoryCursorStore(cursor_path), limit=5)
+    history, cursors = collector.collect()
+    print(f"第二次采集: {[h['url'] for h in history]}")
+    assert [h['url'] for h in history] == ["https://www.example.com/new", "https://www.zxxk.com/new"]
+
+    # 上传失败：不提交高水位，下次仍能取到相同记录
+    again, _ = collector.collect()
+    assert [h['url'] for h in again] == [h['url'] for h in history]
+    collector.commit(cursors)
+    history, _ = collector.collect()
+    assert history == [], "提交后不应再返回旧记录"
+    print("✅ 增量采集检查通过")
+
+    chrome.close()
+    firefox.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""DNS 缓存演示脚本（使用模拟的解析函数，不访问真实 DNS）
+
+用法示例:
+  python tests/test_dns_cache.py
+
+依次检查:
+  1. 首次查询立即返回 pending，后台解析完成后返回 resolved
+  2. 解析失败记为 failed，在 negative_ttl 内不再重复解析
+  3. 解析很慢（模拟学校 DNS 卡住）时查询仍立即返回，超过期限记为 failed
+  4. 缓存过期后继续返回旧 IP，同时在后台刷新
+  5. 从标题中提取域名预解析
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dns_cache import DnsCache, hostnames_in, RESOLVED, PENDING, FAILED  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResolver:
+    def __init__(self):
+        self.calls = []
+        self.table = {'www.example.com': '93.184.216.34', 'news.example.com': '93.184.216.35'}
+        self.release = threading.Event()
+
+    def __call__(self, hostname):
+        self.calls.append(hostname)
+        if hostname == 'slow.example.com':
+            self.release.wait()
+        if hostname not in self.table:
+            raise OSError('not found')
+        return self.table[hostname]
+
+
+def wait_idle(cache, hostname, state):
+    """等待后台解析结束（最多 1 秒）"""
+    deadline = time.time() + 1
+    while time.time() < deadline:
+        entry = cache._entries.get(hostname)
+        if entry is not None and entry.started is None and entry.state == state:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"{hostname} 未变为 {state}")
+
+
+def main():
+    clock = FakeClock()
+    resolver = FakeResolver()
+    cache = DnsCache(ttl=300, negative_ttl=30, timeout=1.0, resolver=resolver, clock=clock)
+
+    start = time.perf_counter()
+    result = cache.lookup('www.example.com')
+    print(f"首次查询: {result}（耗时 {(time.perf_counter() - start) * 1e6:.0f} 微秒）")
+    assert result == ('', PENDING)
+    wait_idle(cache, 'www.example.com', RESOLVED)
+    result = cache.lookup('WWW.example.com')
+    print(f"解析完成后: {result}")
+    assert result == ('93.184.216.34', RESOLVED)
+
+    cache.lookup('missing.example.com')
+    wait_idle(cache, 'missing.example.com', FAILED)
+    clock.now += 10
+    assert cache.lookup('missing.example.com') == ('', FAILED)
+    print(f"不存在的域名: failed，解析次数 {resolver.calls.count('missing.example.com')}")
+    assert resolver.calls.count('missing.example.com') == 1
+
+    start = time.perf_counter()
+    assert cache.lookup('slow.example.com') == ('', PENDING)
+    clock.now += 2
+    result = cache.lookup('slow.example.com')
+    print(f"DNS 卡住: {result}（两次查询共耗时 {(time.perf_counter() - start) * 1e6:.0f} 微秒）")
+    assert result == ('', FAILED)
+    resolver.release.set()
+
+    clock.now += 400
+    result = cache.lookup('www.example.com')
+    print(f"缓存过期: {result}（后台刷新）")
+    assert result == ('93.184.216.34', RESOLVED)
+    wait_idle(cache, 'www.example.com', RESOLVED)
+    assert resolver.calls.count('www.example.com') == 2
+
+    title = "热点新闻 - news.example.com 与 www.example.com"
+    cache.prefetch(hostnames_in(title))
+    wait_idle(cache, 'news.example.com', RESOLVED)
+    print(f"标题预解析: {hostnames_in(title)} → {cache.lookup('news.example.com')}")
+
+    print(f"统计: {cache.metrics()}")
+    print("✅ DNS 缓存检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""前台窗口变化事件源（foreground_events）演示脚本，无需 Windows，运行约 10 秒
+
+用法示例:
+  python tests/test_foreground_events.py
+
+依次检查:
+  1. ForegroundMonitor 去抖：一阵 Alt-Tab 快速切换只通知一次（最终停留的窗口），
+     标题持续变化时最多每 max_wait 秒通知一次，切换后又回到原窗口时不通知
+  2. PollingSource 只在前台窗口句柄或标题变化时产生事件
+  3. 同一段脚本分别用固定节拍（AgentCore 每秒采样）和事件驱动（ScriptedSource → ForegroundMonitor →
+     AgentCore.trigger，兜底节拍 10 秒）采样：对比采样次数、是否发现 0.3 秒的短暂访问以及发现变化的延迟
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent_core import AgentCore  # noqa: E402
+from foreground_events import ForegroundMonitor, PollingSource, ScriptedSource  # noqa: E402
+from platform_probe import Window  # noqa: E402
+
+
+def window(hwnd, title):
+    return Window(hwnd, title, 'Chrome_WidgetWin_1', 1000, (0, 0, 1280, 800))
+
+
+A = window(1, '学科网 - Google Chrome')
+B = window(2, '哔哩哔哩 - Google Chrome')
+C = window(3, '作业.docx - Word')
+D = window(4, '下载')
+E = window(5, '百度一下，你就知道 - Google Chrome')
+F = window(6, 'GitHub - Google Chrome')
+
+# 0.3 秒的短暂访问（B），2.1–2.3 秒的 Alt-Tab 连续切换，最后停在 E
+SCRIPT = [(0.0, A), (1.2, B), (1.5, A), (2.1, C), (2.15, D), (2.2, C), (2.3, E), (4.5, F), (6.0, F)]
+
+
+class Collector:
+    def __init__(self):
+        self.items = []
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+
+    def __call__(self, item):
+        with self.lock:
+            self.items.append((round(time.monotonic() - self.start, 2), item))
+
+
+def titles(items):
+    return [w.title.split(' - ')[0] if w else None for _, w in items]
+
+
+def check_debounce():
+    delivered = Collector()
+    steps = [(0.0, A), (0.04, B), (0.08, C), (0.12, D), (0.16, E)]
+    # E 的标题每 0.1 秒变化一次（如视频播放进度），持续 1.5 秒
+    steps += [(0.5 + i * 0.1, window(5, f'播放中 {i} - Google Chrome')) for i in range(15)]
+    # 切到 C 又马上切回来
+    last = steps[-1][1]
+    steps += [(2.5, C), (2.55, last)]
+    source = ScriptedSource(steps)
+    monitor = ForegroundMonitor(source, delivered, settle=0.1, max_wait=0.5).start()
+    source.done.wait(5)
+    time.sleep(0.3)
+    monitor.stop()
+    print(f"去抖: 原始事件 {monitor.raw_events} 个 → 通知 {monitor.delivered} 次 {titles(delivered.items)}")
+    assert titles(delivered.items)[0] == '百度一下，你就知道'
+    assert 2 <= monitor.delivered <= 6
+    assert titles(delivered.items).count('作业.docx') == 0
+
+
+def check_polling():
+    emitted = Collector()
+    script = ScriptedSource([(0.0, A), (0.3, B), (0.6, B), (0.9, C)])
+    script.start(lambda w: None)
+    source = PollingSource(script, interval=0.05).start(emitted)
+    script.done.wait(5)
+    time.sleep(0.2)
+    source.stop()
+    print(f"轮询事件源: 比较 {source.polls} 次，产生事件 {titles(emitted.items)}")
+    assert titles(emitted.items) == ['学科网', '哔哩哔哩', '作业.docx']
+
+
+def run_core(event_driven):
+    script = ScriptedSource(SCRIPT)
+    seen = Collector()
+
+    def sample():
+        current = script.foreground_window()
+        seen(current)
+        return None
+
+    core = AgentCore(sample=sample, encode=lambda s: s, send=lambda r: None,
+                     interval=10.0 if event_driven else 1.0)
+    core.start()
+    monitor = None
+    if event_driven:
+        monitor = ForegroundMonitor(script, lambda w: core.trigger(), settle=0.1, max_wait=1.0).start()
+    else:
+        script.start(lambda w: None)
+    script.done.wait(10)
+    time.sleep(0.3)
+    core.stop()
+    if monitor:
+        monitor.stop()
+    return seen.items, monitor
+
+
+def detection_latency(items):
+    """每次切换（不含连续切换中途经过的窗口）到被采样看到的延迟（秒），没看到记为 None"""
+    result = []
+    for (t, w), (t_next, _) in zip(SCRIPT, SCRIPT[1:]):
+        if t_next - t < 0.25:
+            continue
+        hits = [at for at, seen in items if seen == w and t <= at < t_next + 0.05]
+        result.append(round(hits[0] - t, 2) if hits else None)
+    return result
+
+
+def check_event_driven():
+    results = {}
+
+    def run(name, event_driven):
+        results[name] = run_core(event_driven)
+
+    threads = [threading.Thread(target=run, args=(name, flag)) for name, flag in
+               (('fixed', False), ('events', True))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    fixed, _ = results['fixed']
+    events, monitor = results['events']
+    print(f"固定节拍（每 1 秒）: 采样 {len(fixed)} 次，看到 {titles(fixed)}")
+    print(f"  各次切换的发现延迟: {detection_latency(fixed)}")
+    print(f"事件驱动（兜底 10 秒）: 采样 {len(events)} 次，看到 {titles(events)}，{monitor.metrics()}")
+    print(f"  各次切换的发现延迟: {detection_latency(events)}")
+    assert B not in [w for _, w in fixed]
+    assert B in [w for _, w in events]
+    assert len(events) < len(fixed)
+    assert C not in [w for _, w in events] and D not in [w for _, w in events]
+
+
+def main():
+    check_debounce()
+    check_polling()
+    check_event_driven()
+    print("✅ 前台窗口事件源检查通过")
+
+
+if __name__ == '__main__':
+    main()
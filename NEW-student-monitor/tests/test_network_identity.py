@@ -0,0 +1,153 @@
+"""学生端网络身份缓存（network_identity.NetworkIdentity）检查脚本
+（用模拟时钟、模拟解析函数和模拟网卡表，流水线部分使用 tests/stub_server.py 替身服务器），运行约 1 秒
+
+用法示例:
+  python tests/test_network_identity.py
+
+依次检查:
+  1. 缓存：连续调用 current() 只解析一次；缓存超过 ttl 后重新解析
+  2. 地址变化：网卡地址变化（换网、DHCP 续租）后，到了 check_interval 才重新解析，得到新IP并通知 on_change；
+     网卡地址没有变化时不重新解析；invalidate() 后强制重新解析
+  3. 请求头：attach(session) 后会话带 X-Student-IP / X-Student-Host（中文计算机名经过编码），IP 变化后请求头随之更新
+  4. student_agent 流水线：IP 在编码时写入每条记录（student_ip），记录在发件箱里等待期间IP变化，
+     服务器收到的仍是采样时的IP
+"""
+
+import os
+import socket
+import sys
+import tempfile
+from unittest import mock
+from urllib.parse import unquote
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from network_identity import HOST_HEADER, IP_HEADER, NetworkIdentity  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+class FakeNetwork:
+    """模拟的本机网络：resolve 返回当前地址并计数，fingerprint 返回当前网卡表"""
+
+    def __init__(self, ip):
+        self.ip = ip
+        self.calls = 0
+
+    def resolve(self):
+        self.calls += 1
+        return self.ip
+
+    def fingerprint(self):
+        return (self.ip,)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_identity(network, clock, ttl=600, check_interval=10):
+    return NetworkIdentity(network.resolve, ttl=ttl, check_interval=check_interval,
+                           fingerprint=network.fingerprint, clock=clock)
+
+
+def check_cache():
+    network, clock = FakeNetwork('10.0.0.7'), FakeClock()
+    identity = make_identity(network, clock)
+    for _ in range(100):
+        clock.now += 1
+        assert identity.current()[0] == '10.0.0.7'
+    # 100 秒内经过多次网卡检查，地址没变，不重新解析
+    assert network.calls == 1 and identity.resolves == 1
+    clock.now += 600
+    identity.current()
+    print(f"缓存: 100 次调用解析 1 次，超过 ttl 后重新解析，{identity.metrics()}")
+    assert network.calls == 2
+
+
+def check_address_change():
+    network, clock = FakeNetwork('10.0.0.7'), FakeClock()
+    identity = make_identity(network, clock)
+    changes = []
+    identity.on_change(lambda ip, hostname: changes.append(ip))
+    identity.current()
+    network.ip = '10.0.3.21'
+    # 还没到检查间隔，仍返回缓存的地址
+    clock.now += 5
+    assert identity.current()[0] == '10.0.0.7' and network.calls == 1
+    clock.now += 5
+    assert identity.current()[0] == '10.0.3.21' and network.calls == 2
+    print(f"地址变化: 检查间隔到期后得到新地址，on_change 收到 {changes}")
+    assert changes == ['10.0.0.7', '10.0.3.21']
+
+    identity.invalidate()
+    identity.current()
+    assert network.calls == 3 and changes == ['10.0.0.7', '10.0.3.21']
+
+
+def check_session_header():
+    network, clock = FakeNetwork('10.0.0.7'), FakeClock()
+    identity = make_identity(network, clock)
+    session = requests.Session()
+    with mock.patch.object(socket, 'gethostname', return_value='机房1-07'):
+        identity.current()
+        identity.attach(session)
+        assert session.headers[IP_HEADER] == '10.0.0.7'
+        assert unquote(session.headers[HOST_HEADER]) == '机房1-07'
+        session.headers[HOST_HEADER].encode('latin-1')
+
+        network.ip = '10.0.3.21'
+        clock.now += 10
+        identity.current()
+    print(f"请求头: {IP_HEADER}={session.headers[IP_HEADER]}，{HOST_HEADER}={session.headers[HOST_HEADER]}")
+    assert session.headers[IP_HEADER] == '10.0.3.21'
+
+
+def make_sample(i):
+    return {"student_id": "ip_demo", "domain": "www.zxxk.com", "original_url": f"https://www.zxxk.com/p/{i}",
+            "title": f"第 {i} 页 - 学科网", "timestamp": f"2026-10-18 09:00:0{i}", "image": None}
+
+
+def check_pipeline():
+    server, base_url = start_stub_server()
+    workdir = tempfile.mkdtemp(prefix='ip_demo_')
+    os.environ.update({
+        'MONITOR_SERVER': base_url,
+        'PROBE_BACKEND': 'null',
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.db'),
+        'JPEG_MODEL_PATH': os.path.join(workdir, 'jpeg_model.json'),
+    })
+    import student_agent
+
+    network, clock = FakeNetwork('10.0.0.7'), FakeClock()
+    student_agent.network_identity = make_identity(network, clock)
+    student_agent.network_identity.attach(student_agent.session)
+    # 前两条采样时是旧地址，记录在发件箱里等待期间换了网
+    student_agent.submit_report(student_agent.encode_sample(make_sample(0)))
+    student_agent.submit_report(student_agent.encode_sample(make_sample(1)))
+    network.ip = '10.0.3.21'
+    clock.now += 10
+    student_agent.submit_report(student_agent.encode_sample(make_sample(2)))
+    student_agent.get_uploader().stop()
+
+    received = [r.get('student_ip') for r in server.state.reports]
+    print(f"流水线: 服务器收到的 student_ip {received}，发送时请求头 {student_agent.session.headers[IP_HEADER]}")
+    assert received == ['10.0.0.7', '10.0.0.7', '10.0.3.21']
+    server.shutdown()
+
+
+def main():
+    check_cache()
+    check_address_change()
+    check_session_header()
+    check_pipeline()
+    print("✅ 网络身份缓存检查通过")
+
+
+if __name__ == '__main__':
+    main()
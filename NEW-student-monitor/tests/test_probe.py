@@ -0,0 +1,129 @@
+"""平台探测层演示脚本（回放 / 合成后端，无需 Windows，也无需启动 Node.js 后端）
+
+用法示例:
+  python tests/test_probe.py
+  python tests/test_probe.py --samples 500
+
+依次检查:
+  1. TraceProbe 按模拟时间回放前台窗口，窗口列表反映打开 / 关闭，进程信息可供 ProcessCache 使用
+  2. SyntheticCapture 同一窗口底图固定、每次截图只改变一部分区块
+  3. 使用合成记录驱动 student_agent 的完整流水线（采样 → 标题解析 → 截图编码 → 上传替身服务器），
+     输出每次采样 / 编码的平均耗时
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from platform_probe import TraceProbe, SyntheticCapture, generate_trace  # noqa: E402
+from process_cache import ProcessCache  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def check_trace_probe():
+    clock = FakeClock()
+    events = [
+        {"t": 0, "exe": "chrome.exe", "class": "Chrome_WidgetWin_1", "title": "百度一下，你就知道 - Google Chrome"},
+        {"t": 10, "exe": "notepad.exe", "class": "Notepad", "title": "笔记.txt - 记事本"},
+        {"t": 20, "exe": "firefox.exe", "class": "MozillaWindowClass", "title": "GitHub — Mozilla Firefox"},
+        {"t": 25, "exe": "notepad.exe", "class": "Notepad", "title": "笔记.txt - 记事本", "closed": True},
+    ]
+    probe = TraceProbe(events, loop=False, clock=clock)
+    titles = []
+    for now in (5, 15, 30):
+        clock.now = now
+        titles.append(probe.foreground_window().title)
+    print(f"回放前台窗口: {titles}")
+    assert titles[1] == "笔记.txt - 记事本" and titles[2].startswith("GitHub")
+    open_titles = [w.title for w in probe.list_windows()]
+    print(f"当前窗口列表（记事本已关闭）: {open_titles}")
+    assert open_titles == ["GitHub — Mozilla Firefox", "百度一下，你就知道 - Google Chrome"]
+
+    cache = ProcessCache(source=probe)
+    window = probe.foreground_window()
+    info = cache.lookup(window.pid, window.hwnd)
+    print(f"进程信息: {info}")
+    assert info.exe_name == 'firefox.exe' and info.strategy == 'firefox'
+
+
+def check_synthetic_capture():
+    capture = SyntheticCapture(change_ratio=0.1, grid=8)
+    window = TraceProbe([{"t": 0, "title": "示例", "rect": [0, 0, 800, 600]}]).foreground_window()
+    a, b = capture.capture(window), capture.capture(window)
+    changed = sum(1 for y in range(8) for x in range(8)
+                  if a.crop((x * 100, y * 75, x * 100 + 100, y * 75 + 75)).tobytes()
+                  != b.crop((x * 100, y * 75, x * 100 + 100, y * 75 + 75)).tobytes())
+    print(f"合成截图 {a.size}: 两次截图之间变化的区块 {changed}/64")
+    assert a.size == (800, 600) and 0 < changed <= 13
+
+
+def run_pipeline(samples):
+    server, base_url = start_stub_server()
+    workdir = tempfile.mkdtemp(prefix='probe_demo_')
+    os.environ.update({
+        'MONITOR_SERVER': base_url,
+        'PROBE_BACKEND': 'null',
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.db'),
+        'JPEG_MODEL_PATH': os.path.join(workdir, 'jpeg_model.json'),
+        # 模拟时间比真实时间快得多，关闭按真实时间计算的去重
+        'DEDUPLICATION_WINDOW': '0',
+    })
+    import student_agent
+
+    clock = FakeClock()
+    student_agent.probe = TraceProbe(generate_trace(duration=samples * student_agent.REPORT_INTERVAL, seed=1),
+                                     clock=clock)
+    student_agent.process_cache = ProcessCache(source=student_agent.probe)
+
+    sample_time = encode_time = 0.0
+    reported = 0
+    for _ in range(samples):
+        clock.now += student_agent.REPORT_INTERVAL
+        start = time.perf_counter()
+        sample = student_agent.sample_once('probe_demo')
+        sample_time += time.perf_counter() - start
+        if sample is None:
+            continue
+        start = time.perf_counter()
+        report = student_agent.encode_sample(sample)
+        encode_time += time.perf_counter() - start
+        student_agent.submit_report(report)
+        reported += 1
+    student_agent.get_uploader().stop()
+
+    domains = sorted({r.get('domain') for r in server.state.reports})
+    print(f"完整流水线: 采样 {samples} 次，上报 {reported} 条，服务器收到 {server.state.stats['reports']} 条，"
+          f"截图 {server.state.stats['screenshots_stored']} 张")
+    print(f"  平均耗时: 采样 {sample_time / samples * 1000:.2f} ms，编码 {encode_time / max(1, reported) * 1000:.2f} ms")
+    print(f"  域名: {domains}")
+    print(f"  进程缓存 {student_agent.process_cache.metrics()}，标题解析 {student_agent.title_parser.metrics()}")
+    assert server.state.stats['reports'] == reported > 0
+    assert len(domains) >= 3
+    server.shutdown()
+
+
+def main():
+    p = argparse.ArgumentParser(description="平台探测层演示")
+    p.add_argument('--samples', type=int, default=120, help='完整流水线的采样次数')
+    args = p.parse_args()
+
+    check_trace_probe()
+    check_synthetic_capture()
+    run_pipeline(args.samples)
+    print("✅ 平台探测层检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""本地上报发件箱（report_outbox.ReportOutbox / OutboxSender）检查脚本
+（使用 tests/stub_server.py 替身服务器，无需启动 Node.js 后端），运行约 2 秒
+
+用法示例:
+  python tests/test_report_outbox.py
+
+依次检查:
+  1. 顺序：peek 按写入顺序返回，只 ack 部分记录后剩余记录仍按原顺序
+  2. 容量：超过 max_records / max_bytes 时丢弃最旧的记录，计数与磁盘上的数据一致
+  3. 崩溃恢复：未 ack 的记录在重新打开发件箱后还在，按原顺序补发
+  4. 坏记录：服务器永久拒绝（400 / 413）的记录被丢弃，后面的记录继续发送；服务器出错（5xx / 断网）时保留重试
+  5. 部分失败：批量请求返回 200 但个别记录入库失败（results 中 status 500）时，只有这些记录留在发件箱中重试，
+     已入库的记录不重复发送；status 400 的记录丢弃
+  6. stop()：发送线程退出后才 flush，发送线程卡住时不与其同时发送
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from report_outbox import OutboxSender, ReportOutbox  # noqa: E402
+from report_uploader import ReportTransport  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+def make_record(i, **fields):
+    record = {"student_id": "demo_pc", "url": "example.com", "domain": "example.com", "title": f"页面 {i}"}
+    record.update(fields)
+    return record
+
+
+def check_order(tmp):
+    outbox = ReportOutbox(os.path.join(tmp, 'order.db'))
+    ids = [outbox.put(make_record(i)) for i in range(5)]
+    assert [r["title"] for _, r in outbox.peek(10)] == [f"页面 {i}" for i in range(5)]
+    outbox.ack(ids[:2])
+    assert [row_id for row_id, _ in outbox.peek(10)] == ids[2:] and len(outbox) == 3
+    outbox.close()
+    print("顺序: 部分 ack 后剩余记录保持原顺序")
+
+
+def check_limits(tmp):
+    outbox = ReportOutbox(os.path.join(tmp, 'limit.db'), max_records=3)
+    for i in range(5):
+        outbox.put(make_record(i))
+    assert len(outbox) == 3 and outbox.dropped == 2
+    assert [r["title"] for _, r in outbox.peek(10)] == ["页面 2", "页面 3", "页面 4"]
+    outbox.close()
+
+    big = "x" * 1000
+    outbox = ReportOutbox(os.path.join(tmp, 'bytes.db'), max_bytes=2500)
+    for i in range(4):
+        outbox.put(make_record(i, title=big + str(i)))
+    assert len(outbox) == 2 and outbox.size_bytes <= 2500 and outbox.dropped == 2
+    assert [r["title"][-1] for _, r in outbox.peek(10)] == ["2", "3"]
+    outbox.close()
+    reopened = ReportOutbox(os.path.join(tmp, 'bytes.db'), max_bytes=2500)
+    assert len(reopened) == 2 and reopened.size_bytes == outbox.size_bytes
+    reopened.close()
+    print(f"容量: 超过条数 / 字节上限时丢弃最旧的记录（剩余 {outbox.size_bytes} 字节）")
+
+
+def check_recovery(tmp, base_url, server):
+    path = os.path.join(tmp, 'crash.db')
+    outbox = ReportOutbox(path)
+    for i in range(4):
+        outbox.put(make_record(i))
+    outbox.ack([outbox.peek(1)[0][0]])
+    # 模拟进程崩溃：不 stop、不 close，直接重新打开同一个文件
+    reopened = ReportOutbox(path)
+    assert len(reopened) == 3
+    before = server.state.stats['reports']
+    sender = OutboxSender(reopened, ReportTransport(base_url, timeout=3), batch_size=10, max_delay=0)
+    sender.flush()
+    titles = [r["title"] for r in server.state.reports[before:]]
+    assert titles == ["页面 1", "页面 2", "页面 3"] and len(reopened) == 0
+    reopened.close()
+    outbox.close()
+    print(f"崩溃恢复: 重新打开后按原顺序补发 {titles}")
+
+
+def check_poison_record(tmp):
+    # 旧版服务器：没有批量接口，逐条发送
+    server, base_url = start_stub_server(batch=False)
+    transport = ReportTransport(base_url, timeout=3)
+    outbox = ReportOutbox(os.path.join(tmp, 'poison.db'))
+    outbox.put(make_record(0, student_id=None))  # 缺少 student_id，服务器返回 400
+    for i in range(1, 6):
+        outbox.put(make_record(i))
+    sender = OutboxSender(outbox, transport, batch_size=10, max_delay=0)
+    assert sender.drain_once() == (6, 6)
+    assert len(outbox) == 0 and server.state.stats['reports'] == 5 and transport.rejected == 1
+    server.shutdown()
+
+    # 批量接口：某条记录太大整批返回 413 时，这一批改为逐条发送，只丢弃那一条
+    server, base_url = start_stub_server(max_body=4096)
+    transport = ReportTransport(base_url, timeout=3)
+    sender.transport = transport
+    for i in range(3):
+        outbox.put(make_record(i, title="x" * 8192 if i == 1 else f"页面 {i}"))
+    assert sender.drain_once() == (3, 3) and len(outbox) == 0
+    assert [r["title"] for r in server.state.reports] == ["页面 0", "页面 2"] and transport.rejected == 1
+    server.shutdown()
+    server.server_close()
+    transport.session.close()
+
+    # 服务器停止：网络错误不丢记录
+    outbox.put(make_record(9))
+    assert sender.drain_once() == (0, 1) and len(outbox) == 1
+    outbox.close()
+    print(f"坏记录: 400 / 413 的记录被丢弃（{transport.metrics()}），断网时记录保留")
+
+
+def check_partial_batch(tmp):
+    server, base_url = start_stub_server()
+    errors = {"页面 2": (500, "记录存储失败"), "页面 4": (400, "缺少必填参数（url）")}
+    server.state.record_error = lambda record: errors.get(record["title"])
+    transport = ReportTransport(base_url, timeout=3)
+    outbox = ReportOutbox(os.path.join(tmp, 'partial.db'))
+    for i in range(6):
+        outbox.put(make_record(i))
+    sender = OutboxSender(outbox, transport, batch_size=10, max_delay=0)
+    assert sender.drain_once() == (5, 6)
+    assert [r["title"] for _, r in outbox.peek(10)] == ["页面 2"] and transport.rejected == 1
+    errors.clear()
+    assert sender.drain_once() == (1, 1) and len(outbox) == 0
+    titles = [r["title"] for r in server.state.reports]
+    assert titles == ["页面 0", "页面 1", "页面 3", "页面 5", "页面 2"], titles
+    outbox.close()
+    server.shutdown()
+    print(f"部分失败: 只重发入库失败的记录，服务器收到 {titles}")
+
+
+def check_stop(tmp):
+    outbox = ReportOutbox(os.path.join(tmp, 'stop.db'))
+    release = threading.Event()
+    calls = []
+
+    class SlowTransport:
+        def deliver(self, records):
+            calls.append(threading.current_thread().name)
+            release.wait(10)
+            return []
+
+        def retry_after(self):
+            return 0.0
+
+    sender = OutboxSender(outbox, SlowTransport(), batch_size=1, max_delay=0).start()
+    sender.submit(make_record(0), urgent=True)
+    time.sleep(0.1)
+    sender._thread.join = lambda timeout=None: None  # 模拟等待超时
+    sender.stop(flush=True)
+    assert calls == ['outbox-sender'], calls
+    release.set()
+    time.sleep(0.1)
+    assert len(outbox) == 0
+    outbox.close()
+    print("stop(): 发送线程未退出时不再同时 flush")
+
+
+def main():
+    server, base_url = start_stub_server()
+    with tempfile.TemporaryDirectory() as tmp:
+        check_order(tmp)
+        check_limits(tmp)
+        check_recovery(tmp, base_url, server)
+        check_poison_record(tmp)
+        check_partial_batch(tmp)
+        check_stop(tmp)
+    server.shutdown()
+    print("✅ 发件箱检查通过")
+
+
+if __name__ == '__main__':
+    main()
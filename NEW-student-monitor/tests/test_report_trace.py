@@ -0,0 +1,83 @@
+"""上报流量记录与回放演示脚本（使用 tests/stub_server.py 替身服务器，无需启动 Node.js 后端）
+
+用法示例:
+  python tests/test_report_trace.py
+
+依次检查:
+  1. 学生端（ReportTransport 的 recorder）与本地中继（report_relay.py）记录下的请求完全相同
+  2. 记录文件比原始请求体小（zlib 压缩），写到一半的最后一帧读取时被忽略
+  3. 回放到另一台替身服务器，--fanout 3 时收到 3 倍的记录，学生ID 带上副本后缀
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from report_relay import start_relay  # noqa: E402
+from report_trace import TraceWriter, read_trace  # noqa: E402
+from report_uploader import ReportTransport, ScreenshotUploader  # noqa: E402
+from replay_report import replay  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+def make_record(i):
+    titles = ['百度一下，你就知道', '学科网-初中数学教学资源下载平台', 'GitHub']
+    domains = ['www.baidu.com', 'www.zxxk.com', 'github.com']
+    return {"student_id": f"pc_{i % 4:02d}", "url": domains[i % 3], "domain": domains[i % 3],
+            "original_url": f"https://{domains[i % 3]}/", "title": titles[i % 3],
+            "timestamp": f"2025-09-01 08:00:{i:02d}"}
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='report_trace_')
+    agent_trace = os.path.join(workdir, 'agent.trace')
+    relay_trace = os.path.join(workdir, 'relay.trace')
+
+    upstream, upstream_url = start_stub_server()
+    relay, relay_url = start_relay(upstream_url, trace_path=relay_trace)
+    recorder = TraceWriter(agent_trace)
+    transport = ReportTransport(relay_url, timeout=3, recorder=recorder)
+    uploader = ScreenshotUploader(transport)
+
+    transport.send_records([make_record(i) for i in range(12)])
+    transport.send_records([make_record(12)])
+    digest = uploader.upload(os.urandom(20000))
+    transport.send_records([dict(make_record(13), screenshot_ref=digest)])
+    recorder.close()
+    relay.recorder.close()
+
+    agent_frames = list(read_trace(agent_trace))
+    relay_frames = list(read_trace(relay_trace))
+    print(f"学生端记录 {len(agent_frames)} 帧，中继记录 {len(relay_frames)} 帧: "
+          f"{[f.method + ' ' + f.path[:20] for f in relay_frames]}")
+    assert [(f.method, f.path, f.body) for f in agent_frames] == [(f.method, f.path, f.body) for f in relay_frames]
+    assert upstream.state.stats['reports'] == 14
+
+    print(f"记录文件: {recorder.metrics()}")
+    size = os.path.getsize(agent_trace)
+    with open(agent_trace, 'r+b') as f:
+        f.truncate(size - 5)
+    assert len(list(read_trace(agent_trace))) == len(agent_frames) - 1
+    print("截断最后一帧后可继续读取前面的帧")
+
+    target, target_url = start_stub_server()
+    args = argparse.Namespace(trace=relay_trace, server=target_url, speed=0, fanout=3, spread=1.0,
+                              workers=8, stub=False, seed=1, json=None)
+    result = replay(args)
+    student_ids = sorted({r['student_id'] for r in target.state.reports})
+    print(f"回放（fanout 3）: 请求 {result['requests']} 个，成功 {result['ok']} 个，"
+          f"服务器收到 {target.state.stats['reports']} 条记录，学生ID {student_ids[:6]}…")
+    assert result['ok'] == result['requests'] == 3 * len(relay_frames)
+    assert target.state.stats['reports'] == 3 * 14
+    assert 'pc_00_2' in student_ids and 'pc_00' in student_ids
+
+    for server in (upstream, relay, target):
+        server.shutdown()
+    print("✅ 流量记录与回放检查通过")
+
+
+if __name__ == '__main__':
+    main()
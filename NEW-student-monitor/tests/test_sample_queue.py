@@ -0,0 +1,171 @@
+"""采样队列背压策略（agent_core.SampleQueue / AgentCore）检查脚本，纯本地、不需要服务器，运行约 2 秒
+
+用法示例:
+  python tests/test_sample_queue.py
+
+消费者卡住（网络中断、编码很慢）时依次检查三种策略留下了哪些数据:
+  1. drop_oldest：队列里总是最新的 maxsize 条，旧数据被丢弃（on_drop 收到被丢弃的数据），生产者从不等待
+  2. coalesce：同一窗口（key 相同）的连续采样合并为最新的一条，不同窗口都保留；队列满时再丢弃最旧的；没有 key 时报错
+  3. block：生产者等待空位，数据一条不丢、顺序不变；设置 block_timeout 时超时丢弃新数据，保留旧数据
+  4. AgentCore：发送卡住时 drop_oldest 的采样节拍不受影响，编码后的记录不丢弃，之后发出的是最新的采样；
+     on_enqueued / on_dropped 恰好覆盖每一条采样（去重记录在入队后才写入、被丢弃时撤销）；
+     block 的采样线程被拖慢（错过节拍），但每条采样都按顺序发出
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent_core import AgentCore, BLOCK, COALESCE, DROP_OLDEST, SampleQueue  # noqa: E402
+
+
+def make_sample(i):
+    # 每 5 次采样切换一次窗口
+    return {"seq": i, "title": f"窗口 {i // 5}"}
+
+
+class StalledConsumer:
+    """release() 之前不取数据，之后取完队列里的全部数据"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.items = []
+        self._release = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self._release.wait()
+        while True:
+            item = self.queue.get(timeout=0.2)
+            if item is None:
+                return
+            self.items.append(item["seq"])
+
+    def release(self):
+        self._release.set()
+
+    def join(self):
+        self._thread.join(2)
+        return self.items
+
+
+def fill(queue, count=20):
+    return [queue.put(make_sample(i)) for i in range(count)]
+
+
+def check_drop_oldest():
+    dropped = []
+    queue = SampleQueue(4, DROP_OLDEST, on_drop=lambda s: dropped.append(s["seq"]))
+    consumer = StalledConsumer(queue)
+    accepted = fill(queue)
+    consumer.release()
+    kept = consumer.join()
+    print(f"drop_oldest: 保留 {kept}，{queue.metrics()}")
+    assert all(accepted) and kept == [16, 17, 18, 19] and dropped == list(range(16))
+    assert queue.dropped == 16 and queue.max_depth == 4 and queue.blocked_seconds == 0
+
+
+def check_coalesce():
+    queue = SampleQueue(4, COALESCE, key=lambda s: s["title"])
+    consumer = StalledConsumer(queue)
+    fill(queue)
+    consumer.release()
+    kept = consumer.join()
+    print(f"coalesce: 保留 {kept}，{queue.metrics()}")
+    assert kept == [4, 9, 14, 19] and queue.coalesced == 16 and queue.dropped == 0
+
+    # 窗口数超过队列容量：合并之后再丢弃最旧的窗口
+    queue = SampleQueue(4, COALESCE, key=lambda s: s["title"])
+    consumer = StalledConsumer(queue)
+    fill(queue, 30)
+    consumer.release()
+    assert consumer.join() == [14, 19, 24, 29] and queue.dropped == 2
+
+    try:
+        SampleQueue(4, COALESCE)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("coalesce 没有 key 时应报错")
+
+
+def check_block():
+    queue = SampleQueue(4, BLOCK)
+    consumer = StalledConsumer(queue)
+    started = time.monotonic()
+    producer = threading.Thread(target=fill, args=(queue,))
+    producer.start()
+    time.sleep(0.2)
+    assert producer.is_alive() and len(queue) == 4
+    consumer.release()
+    producer.join(2)
+    kept = consumer.join()
+    print(f"block: 生产者等待 {queue.blocked_seconds:.2f} 秒，保留 {len(kept)} 条，{queue.metrics()}")
+    assert kept == list(range(20)) and queue.dropped == 0
+    assert queue.blocked_seconds >= 0.15 and time.monotonic() - started >= 0.2
+
+    dropped = []
+    queue = SampleQueue(4, BLOCK, block_timeout=0.02, on_drop=lambda s: dropped.append(s["seq"]))
+    consumer = StalledConsumer(queue)
+    accepted = fill(queue, 8)
+    consumer.release()
+    assert accepted == [True] * 4 + [False] * 4 and consumer.join() == [0, 1, 2, 3] and queue.dropped == 4
+    assert dropped == [4, 5, 6, 7]
+
+
+def run_core(policy, count=20, interval=0.01, stall=0.4):
+    """发送卡住 stall 秒，采样 count 次后不再产生数据，返回 (发出的序号, 指标, 入队的序号, 被丢弃的序号)"""
+    produced = iter(range(count))
+    release = threading.Event()
+    sent, enqueued, dropped = [], [], []
+
+    def sample():
+        i = next(produced, None)
+        return None if i is None else make_sample(i)
+
+    def send(record):
+        release.wait()
+        sent.append(record["seq"])
+
+    core = AgentCore(sample, lambda s: s, send, interval, queue_size=3, policy=policy,
+                     on_enqueued=lambda s: enqueued.append(s["seq"]),
+                     on_dropped=lambda s: dropped.append(s["seq"])).start()
+    time.sleep(stall)
+    release.set()
+    deadline = time.monotonic() + 2
+    while core.sampled < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    core.stop()
+    return sent, core.metrics(), enqueued, dropped
+
+
+def check_agent_core():
+    sent, metrics, enqueued, dropped = run_core(DROP_OLDEST)
+    print(f"AgentCore drop_oldest: 发出 {sent}，丢弃 {dropped}，错过节拍 {metrics['missed_ticks']} 次")
+    # 第一条在发送线程里卡住，记录队列的 3 条和编码线程手里的 1 条等待发送，不会丢弃；
+    # 之后采样队列里留下的是最新的 3 条
+    assert sent == [0, 1, 2, 3, 4, 17, 18, 19] and metrics["missed_ticks"] <= 2
+    assert enqueued == list(range(20)) and sorted(sent + dropped) == list(range(20))
+    assert metrics["send_queue"]["dropped"] == 0
+
+    sent, metrics, enqueued, dropped = run_core(BLOCK)
+    print(f"AgentCore block: 发出 {len(sent)} 条，错过节拍 {metrics['missed_ticks']} 次，"
+          f"采样线程等待 {metrics['sample_queue']['blocked_seconds']} 秒")
+    assert sent == list(range(20)) and metrics["missed_ticks"] >= 10 and not dropped
+    assert metrics["sample_queue"]["blocked_seconds"] > 0.1
+
+
+def main():
+    check_drop_oldest()
+    check_coalesce()
+    check_block()
+    check_agent_core()
+    print("✅ 采样队列背压策略检查通过")
+
+
+if __name__ == '__main__':
+    main()
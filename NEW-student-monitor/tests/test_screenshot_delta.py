@@ -0,0 +1,105 @@
+"""截图变化检测演示脚本（使用 Pillow 合成图片，无需显示器）
+
+用法示例:
+  python tests/test_screenshot_delta.py
+
+依次检查:
+  1. 第一帧整张发送
+  2. 完全相同的画面被跳过
+  3. 只有一个区域变化（如弹出对话框）时只发送变化区块
+  4. 切换到完全不同的页面时整张发送
+  5. 窗口尺寸变化、到达关键帧间隔时整张发送
+  6. 只发送区块时其余区块仍与已发送的画面比较：每帧变化都低于阈值的缓慢变化累积后同样被发送
+"""
+
+import os
+import sys
+
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from screenshot_delta import ScreenshotDelta, FULL, TILES, UNCHANGED  # noqa: E402
+
+
+def make_page(size=(1280, 800), color=(245, 245, 245), lines=20, seed=0):
+    """合成一个类似网页的画面：背景 + 若干行文字块"""
+    img = Image.new('RGB', size, color)
+    draw = ImageDraw.Draw(img)
+    for i in range(lines):
+        y = 40 + i * 35
+        width = 300 + (i * 97 + seed * 131) % 700
+        draw.rectangle([60, y, 60 + width, y + 14], fill=(60, 60, 60))
+    return img
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def main():
+    clock = FakeClock()
+    delta = ScreenshotDelta(grid=4, threshold=6, keyframe_interval=300, clock=clock)
+    page = make_page()
+
+    kind, _ = delta.compare(page)
+    print(f"第一帧: {kind}")
+    assert kind == FULL
+
+    clock.now += 5
+    kind, _ = delta.compare(page.copy())
+    print(f"相同画面: {kind}")
+    assert kind == UNCHANGED
+
+    clock.now += 5
+    dialog = page.copy()
+    ImageDraw.Draw(dialog).rectangle([900, 550, 1250, 780], fill=(30, 120, 220))
+    kind, tiles = delta.compare(dialog)
+    print(f"局部变化: {kind}, 区块 {tiles}")
+    assert kind == TILES and 0 < len(tiles) <= 4
+
+    clock.now += 5
+    kind, _ = delta.compare(make_page(color=(20, 20, 20), seed=7))
+    print(f"切换页面: {kind}")
+    assert kind == FULL
+
+    clock.now += 5
+    kind, _ = delta.compare(make_page(size=(1024, 768)))
+    print(f"窗口尺寸变化: {kind}")
+    assert kind == FULL
+
+    clock.now += 301
+    kind, _ = delta.compare(make_page(size=(1024, 768)))
+    print(f"关键帧间隔: {kind}")
+    assert kind == FULL
+
+    # 右下角每帧都有明显变化（只发送区块），左上角每帧只亮 4 个灰度（低于阈值 6）
+    clock.now += 5
+    base = Image.new('RGB', (1280, 800), (100, 100, 100))
+    kind, _ = delta.compare(base)
+    assert kind == FULL
+    drift_tile = (0, 0, 320, 200)
+    sent_at = None
+    for k in range(1, 5):
+        clock.now += 5
+        frame = base.copy()
+        draw = ImageDraw.Draw(frame)
+        draw.rectangle([0, 0, 319, 199], fill=(100 + 4 * k,) * 3)
+        draw.rectangle([960, 600, 1279, 799], fill=(0, 0, 0) if k % 2 else (255, 255, 255))
+        kind, tiles = delta.compare(frame)
+        assert kind == TILES and (960, 600, 1280, 800) in tiles
+        if drift_tile in tiles:
+            sent_at = k
+            break
+    print(f"缓慢变化: 第 {sent_at} 帧累积超过阈值后发送")
+    assert sent_at == 2
+
+    print(f"统计: {delta.metrics()}")
+    print("✅ 截图变化检测检查通过")
+
+
+if __name__ == '__main__':
+    main()
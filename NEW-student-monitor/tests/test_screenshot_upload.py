@@ -0,0 +1,82 @@
+"""截图二进制上传演示脚本（使用 tests/stub_server.py 替身服务器，无需启动 Node.js 后端）
+
+用法示例:
+  python tests/test_screenshot_upload.py
+
+依次检查:
+  1. 截图以原始 JPEG 上传，相同画面只上传一次，可按哈希取回
+  2. 上报记录引用哈希时请求体比内嵌 base64 小
+  3. 内容与哈希不一致时服务器拒绝
+  4. 旧版服务器（未声明 screenshot_upload）时返回 None，调用方改为内嵌 base64
+"""
+
+import base64
+import os
+import sys
+from io import BytesIO
+
+import requests
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from report_uploader import ReportTransport, ScreenshotUploader  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+
+def make_jpeg(seed=0):
+    img = Image.new('RGB', (1024, 640), (245, 245, 245))
+    draw = ImageDraw.Draw(img)
+    for i in range(16):
+        draw.rectangle([40, 30 + i * 36, 300 + (i * 97 + seed * 131) % 600, 44 + i * 36], fill=(60, 60, 60))
+    buf = BytesIO()
+    img.save(buf, format='JPEG', quality=70)
+    return buf.getvalue()
+
+
+def make_record(**fields):
+    record = {"student_id": "demo_pc", "url": "example.com", "domain": "example.com",
+              "original_url": "https://example.com/", "title": "示例页面"}
+    record.update(fields)
+    return record
+
+
+def main():
+    server, base_url = start_stub_server()
+    transport = ReportTransport(base_url, timeout=3)
+    uploader = ScreenshotUploader(transport)
+    frame = make_jpeg()
+
+    digests = [uploader.upload(frame) for _ in range(3)]
+    print(f"相同画面上传 3 次: 哈希 {digests[0][:12]}…，实际上传 {server.state.stats['screenshot_puts']} 次")
+    assert len(set(digests)) == 1 and server.state.stats['screenshot_puts'] == 1
+    assert requests.get(f"{base_url}/api/screenshots/{digests[0]}", timeout=3).content == frame
+
+    before = server.state.stats['request_bytes']
+    transport.send_records([make_record(screenshot=base64.b64encode(frame).decode('utf-8'))])
+    inline_bytes = server.state.stats['request_bytes'] - before
+    digest = uploader.upload(make_jpeg(seed=1))
+    before = server.state.stats['request_bytes']
+    transport.send_records([make_record(screenshot=None, screenshot_ref=digest)])
+    ref_bytes = server.state.stats['request_bytes'] - before
+    print(f"截图 {len(frame)} 字节: 内嵌 base64 上报 {inline_bytes} 字节，引用哈希上报 {ref_bytes} 字节"
+          f"（另有一次 {len(frame)} 字节左右的原始数据上传）")
+    assert ref_bytes < 1024 < inline_bytes
+
+    resp = requests.put(f"{base_url}/api/screenshots/{'0' * 64}", data=frame, timeout=3)
+    print(f"哈希不一致: 状态码 {resp.status_code}")
+    assert resp.status_code == 422
+
+    old_server, old_url = start_stub_server(screenshot_upload=False)
+    result = ScreenshotUploader(ReportTransport(old_url, timeout=3)).upload(frame)
+    print(f"旧版服务器: upload 返回 {result}")
+    assert result is None
+
+    print(f"统计: {uploader.metrics()}")
+    server.shutdown()
+    old_server.shutdown()
+    print("✅ 截图上传检查通过")
+
+
+if __name__ == '__main__':
+    main()
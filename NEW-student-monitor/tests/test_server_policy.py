@@ -0,0 +1,169 @@
+"""服务器准入控制与下发策略（server_policy + ReportTransport / OutboxSender / AgentCore）演示脚本
+（使用 tests/stub_server.py 替身服务器，无需启动 Node.js 后端），运行约 5 秒
+
+用法示例:
+  python tests/test_server_policy.py
+  python tests/test_server_policy.py --agents 100 --rounds 10
+
+依次检查:
+  1. Retry-After 解析（秒数 / HTTP 日期 / 无效值）；策略只应用更新的版本，服务器重启（epoch 变化）后重新计数，
+     null 字段恢复本地配置，服务器不能打开本地关闭的截图
+  2. 429 + Retry-After：期限内不再请求服务器，期限过后补发；发件箱按 Retry-After 等待而不是按退避提前重试
+  3. 上报响应带回新策略：每批条数、采样间隔立即生效（AgentCore 不重启），版本未变化时服务器不再返回策略
+  4. 机房规模对比：服务器繁忙时原实现每次发送都请求服务器，新实现在 Retry-After 期限内保持安静
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from agent_core import AgentCore  # noqa: E402
+from report_outbox import OutboxSender, ReportOutbox  # noqa: E402
+from report_uploader import ReportTransport  # noqa: E402
+from server_policy import AgentPolicy, parse_retry_after  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+
+DEFAULTS = {"sample_interval": 5.0, "screenshot": True, "batch_size": 20}
+
+
+def make_record(i):
+    return {"student_id": "demo_pc", "url": "example.com", "domain": "example.com", "title": f"页面 {i}"}
+
+
+def check_policy_rules():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412480 - 30) == 30
+    assert parse_retry_after('soon') is None and parse_retry_after(None) is None
+    assert parse_retry_after('-5') == 0 and parse_retry_after('99999') == 3600
+
+    policy = AgentPolicy(DEFAULTS, min_interval=2)
+    seen = []
+    policy.subscribe(seen.append)
+    assert policy.apply({"epoch": "a", "version": 2, "sample_interval": 30, "screenshot": False}) == \
+        {"sample_interval": 30.0, "screenshot": False}
+    assert policy.apply({"epoch": "a", "version": 1, "sample_interval": 60}) == {}
+    assert policy.apply({"epoch": "a", "version": 3, "sample_interval": 0.1, "batch_size": 10000}) == \
+        {"sample_interval": 2, "screenshot": True, "batch_size": 500}
+    # 服务器重启：版本号从 1 重新开始
+    assert policy.apply({"epoch": "b", "version": 1}) == {"sample_interval": 5.0, "batch_size": 20}
+    assert policy.apply({"version": "x"}) == {} and policy.stats["invalid"] == 1
+    assert len(seen) == 3 and policy.headers() == {"X-Policy-Version": "b-1"}
+
+    local_off = AgentPolicy(dict(DEFAULTS, screenshot=False))
+    local_off.apply({"epoch": "a", "version": 1, "screenshot": True})
+    assert local_off.get("screenshot") is False
+    print(f"策略规则: {policy.metrics()}")
+
+
+def check_retry_after():
+    server, base_url = start_stub_server()
+    policy = AgentPolicy(DEFAULTS)
+    transport = ReportTransport(base_url, timeout=3, policy=policy)
+    server.state.throttle(1, retry_after=1)
+    assert transport.send_records([make_record(0), make_record(1)]) == 0
+    assert 0.5 < transport.retry_after() <= 1
+    requests_before = server.state.stats['requests']
+    assert transport.send_records([make_record(0)]) == 0
+    assert server.state.stats['requests'] == requests_before, "期限内不应请求服务器"
+    time.sleep(transport.retry_after() + 0.05)
+    assert transport.send_records([make_record(0), make_record(1)]) == 2
+
+    # 发件箱：退避最短 0.05 秒，但服务器要求等待 1 秒
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = ReportOutbox(os.path.join(tmp, 'outbox.db'))
+        sender = OutboxSender(outbox, transport, batch_size=2, max_delay=0.1, min_backoff=0.05).start()
+        server.state.throttle(1, retry_after=1)
+        started = time.monotonic()
+        for i in range(4):
+            sender.submit(make_record(i))
+        while len(outbox) and time.monotonic() - started < 5:
+            time.sleep(0.02)
+        elapsed = time.monotonic() - started
+        sender.stop(flush=False)
+        outbox.close()
+    print(f"限流: 429 {server.state.stats['throttled']} 次，{transport.metrics()}；"
+          f"发件箱按 Retry-After 等待后 {elapsed:.2f} 秒内发完")
+    assert 1.0 <= elapsed < 2.5 and server.state.stats['reports'] == 6
+    server.shutdown()
+
+
+def check_live_policy():
+    server, base_url = start_stub_server()
+    policy = AgentPolicy(DEFAULTS, min_interval=0.01)
+    transport = ReportTransport(base_url, timeout=3, policy=policy)
+    times = []
+    core = AgentCore(lambda: times.append(time.monotonic()) or None, lambda s: s, lambda r: None, 0.05).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = ReportOutbox(os.path.join(tmp, 'outbox.db'))
+        sender = OutboxSender(outbox, transport, batch_size=20, max_delay=60)
+
+        def apply_policy(changes):
+            if "sample_interval" in changes:
+                core.set_interval(changes["sample_interval"])
+            if "batch_size" in changes:
+                sender.set_batch_size(changes["batch_size"])
+
+        policy.subscribe(apply_policy)
+        sender.start()
+        time.sleep(0.3)
+        server.state.set_policy(sample_interval=0.2, batch_size=3)
+        transport.send_records([make_record(0)])
+        changed_at = time.monotonic()
+        for i in range(3):
+            sender.submit(make_record(i))
+        while len(outbox) and time.monotonic() - changed_at < 2:
+            time.sleep(0.02)
+        time.sleep(0.6)
+        core.stop()
+        sender.stop(flush=False)
+        outbox.close()
+    before = [b - a for a, b in zip(times, times[1:]) if b < changed_at]
+    after = [b - a for a, b in zip(times, times[1:]) if a > changed_at]
+    sent_policy = server.state.stats['policy_sent']
+    transport.send_records([make_record(9)])
+    print(f"下发策略: 版本 {policy.version}，采样间隔 {max(before) * 1000:.0f} ms → {min(after) * 1000:.0f} ms，"
+          f"每批 3 条后发件箱立即发送；服务器返回策略 {sent_policy} 次")
+    assert max(before) < 0.1 and min(after) > 0.15
+    assert server.state.stats['batches'] == 1 and server.state.stats['reports'] == 5
+    assert server.state.stats['policy_sent'] == sent_policy == 1
+    server.shutdown()
+
+
+def compare_fleet(args):
+    """服务器繁忙期间（Retry-After: 60 秒）每台学生机尝试发送 rounds 次"""
+    results = {}
+    for name in ('original', 'retry_after'):
+        server, base_url = start_stub_server()
+        server.state.throttle(10 ** 6, retry_after=60)
+        transports = [ReportTransport(base_url, timeout=3) for _ in range(args.agents)]
+        for _ in range(args.rounds):
+            for transport in transports:
+                if name == 'original':
+                    transport.retry_at = 0.0  # 原实现不理会 Retry-After
+                transport.send_records([make_record(0)])
+        results[name] = server.state.stats['throttled']
+        server.shutdown()
+    print(f"{args.agents} 台学生机在服务器繁忙期间各发送 {args.rounds} 次: 原实现被拒绝 {results['original']} 个请求，"
+          f"按 Retry-After 暂停后 {results['retry_after']} 个")
+    assert results['original'] == args.agents * args.rounds and results['retry_after'] == args.agents
+
+
+def main():
+    p = argparse.ArgumentParser(description="服务器准入控制与下发策略演示")
+    p.add_argument('--agents', type=int, default=20, help='模拟学生机数')
+    p.add_argument('--rounds', type=int, default=5, help='服务器繁忙期间每台学生机尝试发送的次数')
+    args = p.parse_args()
+
+    check_policy_rules()
+    check_retry_after()
+    check_live_policy()
+    compare_fleet(args)
+    print("✅ 准入控制与下发策略检查通过")
+
+
+if __name__ == '__main__':
+    main()
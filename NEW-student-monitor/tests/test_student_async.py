@@ -0,0 +1,105 @@
+"""view+stu 学生端异步运行时（view+stu版本更新/student_async.py）检查脚本
+（使用 tests/stub_server.py 替身服务器），运行约 3 秒
+
+需要学生端的全部依赖（aiohttp、python-socketio、schedule、pygetwindow、uiautomation 等，即在学生机上运行）：
+  python tests/test_student_async.py
+
+依次检查:
+  1. AGENT_RUNTIME=asyncio 运行 student.py 时 student 模块只加载一次：student_async 中的 student 就是正在运行的脚本
+  2. 黑名单拉取：第一次得到完整列表，服务器增删规则后只拉取差异，没有变化时服务器返回 304
+  3. 定时采集上传：数据带 url_block 指标，服务器分配的学生机ID写回本地，浏览历史高水位在上传成功后提交
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUNDLE = os.path.join(ROOT, 'view+stu版本更新')
+# 公共模块在上级目录（部署时由 install.bat 复制到学生端目录）
+sys.path.append(BUNDLE)
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stub_server import start_stub_server  # noqa: E402
+
+# 在子进程里以脚本方式运行 student.py，用一个只检查模块身份的 student_async 代替真正的异步运行时
+SINGLE_LOAD_CHECK = '''
+import runpy, sys, types
+fake = types.ModuleType("student_async")
+def main():
+    import student
+    print("SAME" if student is sys.modules["__main__"] else "RELOADED")
+fake.main = main
+sys.modules["student_async"] = fake
+sys.path.insert(0, sys.argv[1])
+runpy.run_path(sys.argv[1] + "/student.py", run_name="__main__")
+'''
+
+
+def check_single_load():
+    pythonpath = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+    env = dict(os.environ, AGENT_RUNTIME='asyncio', PYTHONPATH=pythonpath)
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run([sys.executable, '-c', SINGLE_LOAD_CHECK, BUNDLE], cwd=tmp, env=env,
+                                capture_output=True, text=True, encoding='utf-8', timeout=60)
+    print(f"AGENT_RUNTIME=asyncio: student_async 使用的 student 模块 {result.stdout.strip().splitlines()[-1:]}")
+    assert 'SAME' in result.stdout, result.stdout + result.stderr
+
+
+async def check_runtime():
+    import aiohttp
+    import student
+    import student_async
+
+    server, base_url = start_stub_server()
+    server.state.change_blacklist(added=['*.4399.com', 'https://www.zxxk.com/games/'])
+    config = dict(student.CONFIG, SERVER=dict(student.CONFIG["SERVER"], api_url=base_url))
+    runtime = student_async.AsyncStudentRuntime(config)
+    runtime.loop = asyncio.get_running_loop()
+    runtime.http = aiohttp.ClientSession()
+    try:
+        await runtime.pull_blacklist()
+        assert student.blacklist_matcher.rules == {'*.4399.com', 'https://www.zxxk.com/games/'}
+        assert student.is_url_blocked('https://www.4399.com/flash/1.htm')
+        server.state.change_blacklist(added=['*.douyin.com'], removed=['*.4399.com'])
+        await runtime.pull_blacklist()
+        await runtime.pull_blacklist()
+        stats = server.state.stats
+        print(f"黑名单: {sorted(student.blacklist_matcher.rules)}，拉取 {stats['blacklist_pulls']} 次，"
+              f"304 {stats['blacklist_not_modified']} 次")
+        assert student.blacklist_matcher.rules == {'*.douyin.com', 'https://www.zxxk.com/games/'}
+        assert stats['blacklist_not_modified'] == 1
+
+        # 机器相关的采集函数换成固定数据，只检查上传流程
+        committed = []
+        student.get_system_info = lambda: {"hostname": "lab-7", "ip": "10.0.0.7", "os": "Windows 10"}
+        student.get_browser_history = lambda: ([{"url": "https://www.zxxk.com", "title": "学科网"}], {"chrome": 42})
+        student.commit_browser_history = committed.append
+        await runtime.collect_and_upload()
+        upload = server.state.uploads[-1]
+        print(f"采集上传: 学生机ID {student.student_id}，url_block {upload['url_block']}")
+        assert upload['browser_history'][0]['title'] == "学科网" and 'scans' in upload['url_block']
+        assert student.student_id == 'stub-lab-7' and committed == [{"chrome": 42}]
+    finally:
+        await runtime.http.close()
+        runtime.executor.shutdown(wait=False)
+        server.shutdown()
+
+
+def main():
+    check_single_load()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # student_id.txt 等本地文件写到临时目录
+        os.chdir(tmp)
+        try:
+            asyncio.run(check_runtime())
+        finally:
+            os.chdir(cwd)
+    print("✅ 异步运行时检查通过")
+
+
+if __name__ == '__main__':
+    main()
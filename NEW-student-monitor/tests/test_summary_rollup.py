@@ -0,0 +1,172 @@
+"""汇总模式（summary_rollup.DomainRollup）演示脚本（使用 tests/stub_server.py 替身服务器，无需启动 Node.js 后端）
+
+用法示例:
+  python tests/test_summary_rollup.py
+  python tests/test_summary_rollup.py --duration 7200 --bucket 300
+
+依次检查:
+  1. Space-Saving 标题统计：标题数远多于保留数时，前 k 个标题及其停留时长仍然正确
+  2. 采样间隔跨越时间桶边界时按比例拆分；drain() 只取出已经完整统计的时间桶
+  3. student_agent.refresh_blacklist 从替身服务器获取黑名单
+  4. 用合成的窗口切换记录按采样间隔驱动汇总模式，与逐条上报（report_once 每次采样一条）对比
+     上报记录数、请求体字节数和服务器写入行数，并检查各域名停留时长与真实值一致
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stub_server import start_stub_server  # noqa: E402
+
+BLACKLIST = ['bilibili.com', 'v.qq.com']
+# 学生端读取 MONITOR_SERVER 作为服务器地址，需要在导入前启动替身服务器
+STUB, STUB_URL = start_stub_server(blacklist=BLACKLIST)
+os.environ['MONITOR_SERVER'] = STUB_URL
+os.environ.setdefault('PROBE_BACKEND', 'null')
+import student_agent  # noqa: E402
+from platform_probe import TraceProbe, generate_trace  # noqa: E402
+from report_uploader import ReportTransport  # noqa: E402
+from summary_rollup import DomainRollup, TopTitles  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def check_top_titles():
+    top = TopTitles(12)
+    for i in range(2000):
+        top.add(f"搜索结果 {i}", 1.0)
+        top.add(["作业", "课件", "题库"][i % 3], 5.0)
+    result = top.top(3)
+    print(f"2000 个不同标题中的前 3 名: {result}（保留 {len(top.counts)} 项）")
+    assert sorted(t for t, _ in result) == ["作业", "课件", "题库"]
+    assert all(abs(seconds - 5.0 * 2000 / 3) < 10 for _, seconds in result)
+
+
+def check_buckets():
+    rollup = DomainRollup(bucket_seconds=60, top_titles=2, max_gap=15)
+    rollup.observe(('zxxk.com', '学科网'), 50.0)
+    rollup.observe(('zxxk.com', '学科网'), 55.0)
+    rollup.observe(('baidu.com', '百度'), 65.0)
+    assert rollup.drain()[0]["domains"] == [{"domain": "zxxk.com", "seconds": 10.0, "samples": 2,
+                                             "titles": [["学科网", 10.0]]}]
+    rollup.observe(('baidu.com', '百度'), 200.0)
+    buckets = rollup.flush(205.0)
+    print(f"跨桶拆分 / 中断 / 退出: {[(b['bucket_start'], b['domains'][0]['seconds']) for b in buckets]}")
+    # 65 秒后的 135 秒中断不计入；60–65 秒计入 zxxk.com（上一次采样的窗口），200–205 秒计入 baidu.com
+    assert [(b['bucket_start'], [d['seconds'] for d in b['domains']]) for b in buckets] == \
+        [(60.0, [5.0, 0.0]), (180.0, [5.0])]
+
+
+def check_blacklist():
+    student_agent.refresh_blacklist()
+    print(f"从替身服务器获取黑名单 {len(student_agent.blacklist_matcher)} 条")
+    assert student_agent.blacklist_matcher.match('https://www.bilibili.com/video/1')
+    assert not student_agent.blacklist_matcher.match('https://www.zxxk.com/')
+
+
+def true_dwell(events, duration):
+    totals = defaultdict(float)
+    for event, following in zip(events, events[1:] + [{"t": duration}]):
+        totals[event["title"]] += min(duration, following["t"]) - event["t"]
+    return totals
+
+
+def run_modes(args):
+    clock = FakeClock()
+    trace = generate_trace(duration=args.duration, mean_dwell=args.mean_dwell, seed=args.seed)
+    probe = TraceProbe(trace, loop=False, clock=clock)
+    rollup = DomainRollup(bucket_seconds=args.bucket, top_titles=3, max_gap=3 * args.interval, clock=clock)
+    per_tick_server, per_tick_url = start_stub_server()
+    summary_server, summary_url = start_stub_server()
+    per_tick = ReportTransport(per_tick_url, timeout=5)
+    summary = ReportTransport(summary_url, timeout=5)
+    reports = TTLCache(student_agent.DEDUPLICATION_WINDOW)
+
+    per_tick_pending, summary_pending = [], []
+    blacklist_events = 0
+    last_upload = 0.0
+    domain_of = {}
+    t = 0.0
+    while t < args.duration:
+        clock.now = t
+        window = probe.foreground_window()
+        url = student_agent.title_parser.parse(window.title, window.window_class, None, None)
+        key = (student_agent.extract_domain(url), window.title[:100])
+        domain_of[window.title] = key[0]
+        sample = {"student_id": "pc_01", "key": key, "domain": key[0], "original_url": url,
+                  "title": key[1], "timestamp": "2025-09-01 08:00:00", "image": None}
+        per_tick_pending.append(student_agent.encode_sample(sample))
+
+        rollup.observe(key, t)
+        if student_agent.blacklist_matcher.match(url) and not student_agent.deduplicate(key, t, reports):
+            blacklist_events += 1
+            summary_pending.append(student_agent.encode_summary(sample))
+        if t - last_upload >= args.upload_interval:
+            last_upload = t
+            buckets = rollup.drain()
+            if buckets:
+                summary_pending.append(student_agent.encode_summary(student_agent.summary_sample("pc_01", buckets)))
+        for transport, pending in ((per_tick, per_tick_pending), (summary, summary_pending)):
+            if len(pending) >= student_agent.BATCH_MAX_RECORDS:
+                transport.send_records(pending)
+                pending.clear()
+        t += args.interval
+    buckets = rollup.flush(args.duration)
+    summary_pending.append(student_agent.encode_summary(student_agent.summary_sample("pc_01", buckets)))
+    per_tick.send_records(per_tick_pending)
+    summary.send_records(summary_pending)
+    per_tick_server.shutdown()
+    summary_server.shutdown()
+
+    truth = defaultdict(float)
+    for title, seconds in true_dwell(trace, args.duration).items():
+        truth[domain_of.get(title, title)] += seconds
+    measured = defaultdict(float)
+    for item in summary_server.state.rollups.values():
+        measured[item["domain"]] += item["seconds"]
+    error = sum(abs(measured[d] - s) for d, s in truth.items())
+
+    a, b = per_tick_server.state.stats, summary_server.state.stats
+    print(f"模拟 {args.duration:g} 秒、采样间隔 {args.interval:g} 秒、时间桶 {args.bucket:g} 秒、"
+          f"每 {args.upload_interval:g} 秒上报:")
+    print(f"  逐条上报: {a['reports']} 条记录，{a['requests']} 个请求，{a['request_bytes']} 字节，"
+          f"写入 {a['records_stored']} 行")
+    print(f"  汇总模式: {b['reports']} 条记录（其中黑名单事件 {blacklist_events} 条），{b['requests']} 个请求，"
+          f"{b['request_bytes']} 字节，写入 {b['records_stored'] + b['rollup_rows']} 行")
+    print(f"  字节数减少到 {b['request_bytes'] / a['request_bytes']:.1%}，记录数减少到 {b['reports'] / a['reports']:.1%}")
+    print(f"  各域名停留时长总误差 {error:.0f}s / {args.duration:g}s")
+    assert blacklist_events > 0 and b['records_stored'] == blacklist_events
+    assert error <= 0.05 * args.duration
+    assert b['request_bytes'] < a['request_bytes'] / 5
+
+
+def main():
+    p = argparse.ArgumentParser(description="汇总模式演示")
+    p.add_argument('--duration', type=float, default=3600, help='模拟时长（秒）')
+    p.add_argument('--interval', type=float, default=5, help='采样间隔（秒）')
+    p.add_argument('--bucket', type=float, default=60, help='时间桶长度（秒）')
+    p.add_argument('--upload-interval', type=float, default=300, help='汇总上报间隔（秒）')
+    p.add_argument('--mean-dwell', type=float, default=60, help='合成记录中窗口平均停留时间（秒）')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    args = p.parse_args()
+
+    check_top_titles()
+    check_buckets()
+    check_blacklist()
+    run_modes(args)
+    STUB.shutdown()
+    print("✅ 汇总模式检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""去重缓存（ttl_cache.TTLCache）检查与性能对比脚本
+
+用法示例:
+  python tests/test_ttl_cache.py
+  python tests/test_ttl_cache.py --keys 20000
+
+依次检查:
+  1. 过期时间从最后一次写入算起，add() 命中时不刷新（拦截记录每分钟最多上报一次）
+  2. 超过条目上限时淘汰最旧条目，命中 / 未命中 / 过期 / 淘汰计数正确
+  3. student_agent.deduplicate 的结果与原来逐条扫描字典的实现完全一致
+  4. 去重记录在采样进入队列后才写入（remember_report），采样被队列丢弃时撤销（release_sample），
+     被丢弃的汇总时间桶留到下一次汇总上报
+  5. 缓存中有大量不同标题时，原实现每次上报都要遍历整个字典，TTLCache 的耗时与条目数无关
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ttl_cache import TTLCache  # noqa: E402
+import student_agent  # noqa: E402
+
+
+def legacy_deduplicate(report_key, current_time, reports, window):
+    """原 student_agent 中的实现：每次调用遍历全部条目清理过期记录"""
+    expired_keys = [k for k, v in reports.items() if current_time - v[0] > window]
+    for key in expired_keys:
+        del reports[key]
+    if report_key in reports:
+        last_time, count = reports[report_key]
+        reports[report_key] = (current_time, count + 1)
+        return count
+    reports[report_key] = (current_time, 1)
+    return 0
+
+
+def make_events(n, keys, seed):
+    """按 Zipf 分布重复出现的标题，时间间隔 0~2 秒"""
+    rng = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(keys)]
+    names = rng.choices(range(keys), weights=weights, k=n)
+    t = 0.0
+    events = []
+    for name in names:
+        t += rng.uniform(0, 2)
+        events.append((('site%d.example.com' % name, '标题 %d' % name), t))
+    return events
+
+
+def check_basics():
+    cache = TTLCache(10, max_size=3)
+    cache.set('a', 1, now=0)
+    assert cache.get('a', now=10) == 1
+    cache.set('a', 2, now=10)
+    assert cache.get('a', now=20) == 2
+    assert cache.get('a', now=20.5) is None
+    assert cache.add('url', now=0) and not cache.add('url', now=9)
+    assert cache.add('url', now=10.5)
+
+    for i, key in enumerate('bcde'):
+        cache.set(key, i, now=11 + i)
+    assert len(cache) == 3 and cache.get('url', now=15) is None
+    metrics = cache.metrics()
+    print(f"计数: {metrics}")
+    assert metrics['evicted'] == 2 and metrics['expired'] == 2 and metrics['size'] == 3
+
+
+def check_equivalence(events, window):
+    legacy = {}
+    cache = TTLCache(window, max_size=len(events) + 1)
+    for key, t in events:
+        expected = legacy_deduplicate(key, t, legacy, window)
+        assert student_agent.deduplicate(key, t, cache) == expected, (key, t)
+    print(f"{len(events)} 次采样结果一致，缓存: {cache.metrics()}")
+
+
+def check_queue_hooks():
+    key, t = ("www.zxxk.com", "学科网"), time.time()
+    student_agent.recent_reports.clear()
+    # 采样阶段只检查，不写入
+    assert student_agent.deduplicate(key, t, record=False) == 0 and key not in student_agent.recent_reports
+    student_agent.remember_report({"key": key})
+    assert student_agent.deduplicate(key, t + 1, record=False) == 1
+    # 队列满被丢弃：撤销后下一次采样重新上报
+    student_agent.release_sample({"key": key})
+    assert student_agent.deduplicate(key, t + 2, record=False) == 0
+    buckets = [{"bucket_start": t, "bucket_seconds": 60, "domains": []}]
+    student_agent.release_sample({"key": ("summary", t), "summary": buckets})
+    assert student_agent.dropped_summary_buckets == buckets
+    student_agent.dropped_summary_buckets.clear()
+    print("队列钩子: 入队后才写入去重记录，丢弃时撤销，汇总时间桶保留到下一次上报")
+
+
+def bench(events, window):
+    legacy = {}
+    start = time.perf_counter()
+    for key, t in events:
+        legacy_deduplicate(key, t, legacy, window)
+    legacy_ns = (time.perf_counter() - start) / len(events) * 1e9
+
+    cache = TTLCache(window, max_size=len(events) + 1)
+    start = time.perf_counter()
+    for key, t in events:
+        student_agent.deduplicate(key, t, cache)
+    cache_ns = (time.perf_counter() - start) / len(events) * 1e9
+    return legacy_ns, cache_ns
+
+
+def main():
+    p = argparse.ArgumentParser(description="去重缓存检查与性能对比")
+    p.add_argument('--events', type=int, default=20000, help='采样次数')
+    p.add_argument('--keys', type=int, default=5000, help='不同标题数')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    args = p.parse_args()
+
+    check_basics()
+    check_queue_hooks()
+    window = student_agent.DEDUPLICATION_WINDOW
+    check_equivalence(make_events(args.events, args.keys, args.seed), window)
+
+    for span in (window, window * 20):
+        # 拉长去重窗口，相当于缓存中同时保留更多条目
+        legacy_ns, cache_ns = bench(make_events(args.events, args.keys, args.seed), span)
+        print(f"去重窗口 {span}s: 原实现 {legacy_ns:,.0f} ns/次，TTLCache {cache_ns:,.0f} ns/次")
+    print("✅ 去重缓存检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""会话模式（visit_session.VisitTracker）演示脚本（使用 tests/stub_server.py 替身服务器，无需启动 Node.js 后端）
+
+用法示例:
+  python tests/test_visit_session.py
+  python tests/test_visit_session.py --duration 7200 --mean-dwell 120
+
+依次检查:
+  1. 一节 40 分钟的课停在同一页面：只产生 1 个开始、若干心跳和 1 个结束事件，停留时长准确
+  2. 采样中断（睡眠、锁屏）超过 max_gap 时，访问在最后一次采样处结束，中断时间不计入停留时长
+  3. 用合成的窗口切换记录按采样间隔驱动会话模式，经 student_agent.encode_visits 上报到替身服务器：
+     服务器合并后的每个页面停留时长与记录中的真实值比较，并与逐条采样模式的记录数 / 写入次数对比
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('PROBE_BACKEND', 'null')
+import student_agent  # noqa: E402
+from platform_probe import TraceProbe, generate_trace  # noqa: E402
+from report_uploader import ReportTransport  # noqa: E402
+from stub_server import start_stub_server  # noqa: E402
+from ttl_cache import TTLCache  # noqa: E402
+from visit_session import VisitTracker, OPEN, HEARTBEAT, CLOSED  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def check_lesson():
+    tracker = VisitTracker(heartbeat=60, max_gap=15)
+    events = []
+    for i in range(481):
+        events += tracker.observe(('zxxk.com', '学科网'), i * 5.0)
+    events += tracker.observe(('baidu.com', '百度一下'), 2405.0)
+    states = [e["state"] for e in events]
+    print(f"40 分钟同一页面: 481 次采样 → {len(events)} 个事件"
+          f"（开始 {states.count(OPEN)}，心跳 {states.count(HEARTBEAT)}，结束 {states.count(CLOSED)}）")
+    closed = events[-2]
+    assert states.count(OPEN) == 2 and states.count(HEARTBEAT) == 40 and states.count(CLOSED) == 1
+    assert closed["state"] == CLOSED and closed["focused"] == 2405.0 and closed["end"] == 2405.0
+
+
+def check_gap():
+    tracker = VisitTracker(heartbeat=60, max_gap=15)
+    tracker.observe(('zxxk.com', '学科网'), 0.0)
+    tracker.observe(('zxxk.com', '学科网'), 5.0)
+    events = tracker.observe(('zxxk.com', '学科网'), 600.0)
+    print(f"采样中断 595 秒: {[(e['state'], e['end'], e['focused']) for e in events]}")
+    assert [e["state"] for e in events] == [CLOSED, OPEN]
+    assert events[0]["end"] == 5.0 and events[0]["focused"] == 5.0
+    assert tracker.close(603.0)[0]["focused"] == 3.0
+
+
+def true_dwell(events, duration):
+    """记录中每个标题在前台的真实时长（秒）"""
+    totals = defaultdict(float)
+    for event, following in zip(events, events[1:] + [{"t": duration}]):
+        totals[event["title"]] += min(duration, following["t"]) - event["t"]
+    return totals
+
+
+def check_fleet_accuracy(args):
+    clock = FakeClock()
+    trace = generate_trace(duration=args.duration, mean_dwell=args.mean_dwell, seed=args.seed)
+    probe = TraceProbe(trace, loop=False, clock=clock)
+    tracker = VisitTracker(heartbeat=args.heartbeat, max_gap=3 * args.interval, clock=clock)
+    server, base_url = start_stub_server()
+    transport = ReportTransport(base_url, timeout=5)
+
+    samples = 0
+    sample_mode_records = 0
+    reports = TTLCache(student_agent.DEDUPLICATION_WINDOW)
+    pending = []
+    t = 0.0
+    while t < args.duration:
+        clock.now = t
+        window = probe.foreground_window()
+        url = student_agent.title_parser.parse(window.title, window.window_class, None, None)
+        key = (student_agent.extract_domain(url), window.title[:100])
+        samples += 1
+        if not student_agent.deduplicate(key, t, reports):
+            sample_mode_records += 1
+        events = tracker.observe(key, t, url)
+        if events:
+            pending += student_agent.encode_visits({"student_id": "pc_01", "visits": events, "image": None})
+        if len(pending) >= 20:
+            transport.send_records(pending)
+            pending = []
+        t += args.interval
+    pending += student_agent.encode_visits({"student_id": "pc_01", "visits": tracker.close(args.duration),
+                                            "image": None})
+    transport.send_records(pending)
+    server.shutdown()
+
+    truth = true_dwell(trace, args.duration)
+    measured = defaultdict(float)
+    for visit in server.state.visits.values():
+        assert visit["state"] == "closed"
+        measured[visit["title"]] += visit["focused_seconds"]
+    print(f"模拟 {args.duration:g} 秒、采样间隔 {args.interval:g} 秒，共 {samples} 次采样:")
+    for title, seconds in sorted(truth.items(), key=lambda item: -item[1]):
+        print(f"  {title[:24]:<24} 真实 {seconds:7.0f}s  会话模式 {measured[title[:100]]:7.0f}s")
+    total_error = sum(abs(measured[title[:100]] - seconds) for title, seconds in truth.items())
+    stats = server.state.stats
+    print(f"停留时长总误差 {total_error:.0f}s / {args.duration:g}s（采样间隔带来的误差）")
+    print(f"逐条采样模式: 不去重 {samples} 条记录，去重后 {sample_mode_records} 条（停留时长无从得知）；"
+          f"会话模式: {stats['records_stored']} 条浏览记录 + {len(server.state.visits)} 个访问区间，"
+          f"共 {stats['reports']} 次写入")
+    assert total_error <= 0.05 * args.duration
+    assert stats['records_stored'] == len(server.state.visits)
+
+
+def main():
+    p = argparse.ArgumentParser(description="会话模式演示")
+    p.add_argument('--duration', type=float, default=3600, help='模拟时长（秒）')
+    p.add_argument('--interval', type=float, default=5, help='采样间隔（秒）')
+    p.add_argument('--heartbeat', type=float, default=60, help='心跳间隔（秒）')
+    p.add_argument('--mean-dwell', type=float, default=60, help='合成记录中窗口平均停留时间（秒）')
+    p.add_argument('--seed', type=int, default=1, help='随机种子')
+    args = p.parse_args()
+
+    check_lesson()
+    check_gap()
+    check_fleet_accuracy(args)
+    print("✅ 会话模式检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""浏览器窗口增量检查（window_checker.BrowserWindowChecker）演示脚本，无需 Windows，运行约 5 秒
+
+用法示例:
+  python tests/test_window_checker.py
+  python tests/test_window_checker.py --windows 12 --scans 30 --search-ms 150
+
+依次检查:
+  1. 与原实现（每轮对每个浏览器窗口重新搜索地址栏）对比：同样的窗口变化下地址栏读取次数、耗时，
+     以及标题变化后只读取缓存的地址栏控件
+  2. 地址栏读取卡住时，本轮最多等待 deadline 秒，晚到的结果下一轮使用；窗口在读取期间又变化时丢弃旧结果；
+     读取出错或没读到 URL 时下一轮重新读取，标题不变也不会一直漏掉
+  3. 打开黑名单网页后在同一轮关闭窗口并记录拦截延迟；黑名单更新后用缓存的 URL 重新判断，不重新读取地址栏
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blacklist_matcher import BlacklistMatcher  # noqa: E402
+from window_checker import BrowserWindowChecker, looks_like_browser  # noqa: E402
+
+
+class FakeWindow:
+    def __init__(self, hwnd, title, url):
+        self._hWnd = hwnd
+        self.title = title
+        self.url = url
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDesktop:
+    """模拟 UI Automation：搜索地址栏控件耗时 search 秒，读取已找到控件的值耗时 read 秒"""
+
+    def __init__(self, search=0.05, read=0.002):
+        self.search = search
+        self.read = read
+        self.searches = 0
+        self.reads = 0
+        self.hang = {}  # hwnd → 本次读取额外卡住的秒数
+        self.fail = {}  # hwnd → 接下来读取失败的次数
+
+    def read_url(self, window, address_bar):
+        if address_bar is None:
+            self.searches += 1
+            time.sleep(self.search)
+            address_bar = ('address-bar', window._hWnd)
+        self.reads += 1
+        time.sleep(self.read + self.hang.pop(window._hWnd, 0))
+        if self.fail.get(window._hWnd):
+            self.fail[window._hWnd] -= 1
+            raise RuntimeError("地址栏控件已失效")
+        return window.url, address_bar
+
+
+def make_windows(count):
+    windows = [FakeWindow(i, f"页面 {i} - Google Chrome", f"https://www.zxxk.com/p/{i}") for i in range(count)]
+    windows += [FakeWindow(1000 + i, f"文档 {i}.docx - Word", None) for i in range(count)]
+    return windows
+
+
+def navigate(window, title, url):
+    window.title = f"{title} - Google Chrome"
+    window.url = url
+
+
+def original_check(windows, desktop, matcher):
+    """原实现：每轮对每个浏览器窗口重新搜索地址栏"""
+    for window in windows:
+        title = window.title.strip()
+        if not title or not looks_like_browser(title):
+            continue
+        url, _ = desktop.read_url(window, None)
+        if url and matcher.match(url):
+            window.close()
+
+
+def compare(args):
+    matcher = BlacklistMatcher(['bilibili.com'])
+    results = {}
+    for name in ('original', 'incremental'):
+        desktop = FakeDesktop(search=args.search_ms / 1000)
+        windows = make_windows(args.windows)
+        checker = BrowserWindowChecker(desktop.read_url, lambda url: matcher.match(url) is not None, deadline=1.0)
+        started = time.perf_counter()
+        for scan in range(args.scans):
+            if scan % 5 == 4:
+                # 每 5 轮有一个窗口切换了标签页
+                navigate(windows[scan % args.windows], f"作业 {scan}", f"https://www.zxxk.com/hw/{scan}")
+            if name == 'original':
+                original_check(windows, desktop, matcher)
+            else:
+                checker.check(windows)
+        elapsed = time.perf_counter() - started
+        results[name] = (desktop, elapsed, checker)
+        print(f"{name:<12} {args.scans} 轮 × {args.windows} 个浏览器窗口: 搜索地址栏 {desktop.searches} 次，"
+              f"读取 {desktop.reads} 次，总耗时 {elapsed * 1000:.0f} ms")
+    original, incremental = results['original'], results['incremental']
+    metrics = incremental[2].metrics()
+    print(f"  增量检查指标: {metrics}")
+    assert incremental[0].searches == args.windows
+    assert incremental[0].reads == args.windows + args.scans // 5
+    assert metrics["address_bar_reused"] == args.scans // 5
+    assert incremental[1] < original[1] / 5
+
+
+def check_deadline():
+    desktop = FakeDesktop(search=0.01)
+    windows = make_windows(3)
+    checker = BrowserWindowChecker(desktop.read_url, lambda url: False, deadline=0.2)
+    checker.check(windows)
+    desktop.hang[1] = 0.5
+    navigate(windows[1], "慢网页", "https://www.zxxk.com/slow")
+    started = time.perf_counter()
+    checker.check(windows)
+    first = time.perf_counter() - started
+    time.sleep(0.6)
+    checker.check(windows)
+    metrics = checker.metrics()
+    print(f"读取卡住 0.5 秒、期限 0.2 秒: 本轮耗时 {first * 1000:.0f} ms，超时 {metrics['uia_timeouts']} 次，"
+          f"下一轮使用晚到结果 {metrics['uia_late']} 次")
+    assert first < 0.3 and metrics["uia_timeouts"] == 1 and metrics["uia_late"] == 1
+    assert checker._states[1].url == "https://www.zxxk.com/slow"
+
+    # 读取还没完成时窗口又跳转了：旧结果被丢弃，下一轮重新读取
+    desktop.hang[2] = 0.4
+    navigate(windows[2], "第一页", "https://www.zxxk.com/a")
+    checker.check(windows)
+    navigate(windows[2], "第二页", "https://www.zxxk.com/b")
+    checker.check(windows)
+    time.sleep(0.5)
+    checker.check(windows)
+    print(f"读取期间窗口又变化: 最终 URL {checker._states[2].url}")
+    assert checker._states[2].url == "https://www.zxxk.com/b"
+
+    # 读取出错 / 页面还在加载没有 URL：标题不变，下一轮仍然重新读取
+    desktop.fail[0] = 1
+    navigate(windows[0], "出错页", "https://www.zxxk.com/err")
+    checker.check(windows)
+    assert checker._states[0].url is None and checker._states[0].dirty
+    navigate(windows[1], "加载中", None)
+    checker.check(windows)
+    assert checker._states[0].url == "https://www.zxxk.com/err" and checker._states[1].dirty
+    windows[1].url = "https://www.zxxk.com/loaded"
+    checker.check(windows)
+    print(f"读取出错 {checker.metrics()['uia_errors']} 次后重新读取: {checker._states[0].url}，"
+          f"加载完成后: {checker._states[1].url}")
+    assert checker._states[1].url == "https://www.zxxk.com/loaded"
+
+
+def check_block():
+    matcher = BlacklistMatcher(['bilibili.com'])
+    desktop = FakeDesktop(search=0.05)
+    windows = make_windows(4)
+    blocked = []
+
+    def on_block(window, url):
+        blocked.append(url)
+
+    checker = BrowserWindowChecker(desktop.read_url, lambda url: matcher.match(url) is not None, deadline=1.0)
+    checker.check(windows, on_block)
+    navigate(windows[0], "哔哩哔哩", "https://www.bilibili.com/video/1")
+    checker.check(windows, on_block)
+    assert windows[0].closed and blocked == ["https://www.bilibili.com/video/1"]
+    windows = [w for w in windows if not w.closed]
+
+    reads = desktop.reads
+    matcher.update(['bilibili.com', 'https://www.zxxk.com/p/3'])
+    checker.invalidate()
+    checker.check(windows, on_block)
+    metrics = checker.metrics()
+    print(f"拦截: {blocked}，拦截延迟 {metrics['time_to_block']}；黑名单更新后新增读取 {desktop.reads - reads} 次")
+    assert windows[2].closed and desktop.reads == reads
+    assert metrics["blocked"] == 2 and metrics["time_to_block"]["max"] < 0.1
+
+
+def main():
+    p = argparse.ArgumentParser(description="浏览器窗口增量检查演示")
+    p.add_argument('--windows', type=int, default=8, help='浏览器窗口数（另有同样数量的非浏览器窗口）')
+    p.add_argument('--scans', type=int, default=20, help='检查轮数')
+    p.add_argument('--search-ms', type=float, default=20, help='模拟一次地址栏控件搜索的耗时（毫秒）')
+    args = p.parse_args()
+
+    compare(args)
+    check_deadline()
+    check_block()
+    print("✅ 浏览器窗口增量检查通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# title_parser.py —— 浏览器窗口标题 → URL 解析
+# 功能：与 student_agent 原来的逐条 re.search 结果一致，但：
+#      - 所有正则在导入时编译一次，按浏览器类型去掉标题末尾的浏览器名称后再解析
+#      - 顶级域名判断改为按空白分词单次扫描，不再用长的 (com|cn|...) 分支正则
+#        （中文标题通常没有空格，整段标题就是一个词，原正则在长标题上大量回溯）
+#      - 解析结果按 (可执行文件名, 窗口类名, 原始标题) 做 LRU 缓存，重复的标题只解析一次
+
+import re
+from collections import OrderedDict
+
+# 被视为浏览器的窗口类名（标题中找不到网址时才会尝试增强的域名提取）
+BROWSER_CLASSES = frozenset(['Chrome_WidgetWin_1', 'MozillaWindowClass', 'IEFrame', 'ApplicationFrameWindow'])
+
+TLDS = ('com', 'cn', 'net', 'org', 'edu', 'gov', 'mil', 'int', 'info', 'biz', 'name', 'museum',
+        'coop', 'aero', 'pro', 'tel', 'mobi', 'asia', 'jobs', 'travel')
+_TLD_SET = frozenset(TLDS)
+_TLD_LENGTHS = sorted({len(t) for t in TLDS})
+
+_HTTP_RE = re.compile(r'https?://[^\s]+')
+_WWW_RE = re.compile(r'www\.[^\s]+\.[^\s]+')
+_SITE_RE = re.compile(r'(youtube|baidu|google|bing|sohu|sina|qq|taobao|jd|tmall|1688)\.com')
+_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9_-]')
+
+# 各浏览器追加在标题末尾的名称（不含网址，去掉后不影响网址提取，只是少扫描几个字符）
+FAMILY_SUFFIXES = {
+    'chromium': re.compile(r'\s+-\s+(?:Google Chrome|Microsoft\u200b? ?Edge|Opera)$'),
+    'firefox': re.compile(r'\s+[—-]\s+Mozilla Firefox$'),
+}
+
+
+def _tld_at(token, dot):
+    """token[dot] 为 '.' 时，返回紧跟其后的顶级域名（没有则返回 None）"""
+    for n in _TLD_LENGTHS:
+        tld = token[dot + 1:dot + 1 + n]
+        if len(tld) < n:
+            break
+        if tld in _TLD_SET:
+            return tld
+    return None
+
+
+def find_tld_token(title):
+    """
+    第一个包含 “.顶级域名” 的词（'.' 前至少一个字符），返回整个词；
+    等价于 re.search(r'([^\\s]+\\.(com|cn|...)[^\\s]*)', title).group(1)
+    """
+    for token in title.split():
+        dot = token.find('.', 1)
+        while dot != -1:
+            if _tld_at(token, dot):
+                return token
+            dot = token.find('.', dot + 1)
+    return None
+
+
+def find_tld_path(title):
+    """
+    第一个以 “.顶级域名/” 或（位于标题末尾时）“.顶级域名” 结尾的前缀，取最靠右的一处；
+    等价于 re.search(r'([^\\s]+\\.(com|cn|...)(/|$))', title).group(1)
+    """
+    tokens = title.split()
+    # '$' 匹配字符串末尾，或末尾单个换行符之前
+    tail = title[:-1] if title.endswith('\n') else title
+    at_end = bool(tail) and not tail[-1].isspace()
+    for index, token in enumerate(tokens):
+        last = index == len(tokens) - 1 and at_end
+        dot = token.rfind('.')
+        while dot >= 1:
+            tld = _tld_at(token, dot)
+            if tld:
+                end = dot + 1 + len(tld)
+                if end < len(token) and token[end] == '/':
+                    return token[:end + 1]
+                if end == len(token) and last:
+                    return token
+            dot = token.rfind('.', 0, dot)
+    return None
+
+
+class TitleParser:
+    """parse(title, window_class, exe_name, strategy) 返回 URL（与原实现相同的规则）"""
+
+    def __init__(self, memo_size=4096):
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, title, window_class=None, exe_name=None, strategy=None):
+        key = (exe_name, window_class, title)
+        url = self._memo.get(key)
+        if url is not None:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return url
+        self.misses += 1
+        url = self._parse(title, window_class, exe_name, strategy)
+        self._memo[key] = url
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return url
+
+    def _parse(self, title, window_class, exe_name, strategy):
+        text = title
+        suffix = FAMILY_SUFFIXES.get(strategy)
+        if suffix is not None:
+            text = suffix.sub('', text)
+
+        url = extract_url(text)
+        # 标题中没有网址、但窗口是浏览器时，尝试更宽松的域名提取（进程已退出时跳过）
+        # 这里的规则与标题末尾有关，使用完整标题
+        if url is None and window_class in BROWSER_CLASSES and exe_name is not None:
+            url = extract_domain_hint(title.lower())
+        if url is None:
+            if title.strip():
+                # 为有标题但无法提取URL的窗口创建一个基于标题的标识，避免域名显示为 unknown
+                return "app:" + _UNSAFE_RE.sub('_', title[:30])
+            return "about:blank"
+        return url
+
+    def metrics(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0, "entries": len(self._memo)}
+
+
+def extract_url(text):
+    """完整网址 → www. 开头的网址 → 带常见顶级域名的词；没有协议的补上 https://"""
+    match = _HTTP_RE.search(text)
+    if match:
+        return match.group(0)
+    match = _WWW_RE.search(text)
+    if match:
+        return 'https://' + match.group(0)
+    token = find_tld_token(text)
+    if token:
+        return 'https://' + token
+    return None
+
+
+def extract_domain_hint(lowered):
+    """浏览器窗口的增强域名提取（输入为小写标题）"""
+    hint = find_tld_path(lowered)
+    if hint is None:
+        match = _WWW_RE.search(lowered)
+        hint = match.group(0) if match else None
+    if hint is None:
+        match = _SITE_RE.search(lowered)
+        hint = match.group(1) if match else None
+    return 'https://' + hint if hint else None
@@ -0,0 +1,82 @@
+# ttl_cache.py —— 带过期时间和容量上限的缓存（上报去重、拦截记录去重共用）
+# 功能：条目按最后写入时间排列（OrderedDict），过期检查只看最旧的一端，
+#      每次读写的清理工作均摊 O(1)，不再每次遍历全部条目；
+#      超过 max_size 时淘汰最旧的条目，长时间运行也不会无限增长。
+#      所有方法都可以传入 now（例如模拟时钟的时间），不传时使用 clock()。
+
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    ttl       条目在最后一次写入后保留的秒数（超过 ttl 即过期，与原来的 “now - t > ttl” 判断相同）
+    max_size  条目数上限
+    """
+
+    def __init__(self, ttl, max_size=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max(1, int(max_size))
+        self.clock = clock
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and self.clock() - entry[0] <= self.ttl
+
+    def _expire(self, now):
+        data = self._data
+        while data:
+            key, (stamp, _) = next(iter(data.items()))
+            if now - stamp <= self.ttl:
+                break
+            del data[key]
+            self.expired += 1
+
+    def get(self, key, now=None, default=None):
+        """未过期时返回值，否则返回 default"""
+        now = self.clock() if now is None else now
+        self._expire(now)
+        entry = self._data.get(key)
+        if entry is None or now - entry[0] > self.ttl:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, now=None):
+        """写入（或刷新）条目，过期时间从现在重新计算"""
+        now = self.clock() if now is None else now
+        self._expire(now)
+        if key in self._data:
+            self._data.move_to_end(key)
+        self._data[key] = (now, value)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evicted += 1
+
+    def add(self, key, now=None):
+        """key 不存在（或已过期）时加入并返回 True；已存在时返回 False，且不刷新过期时间"""
+        now = self.clock() if now is None else now
+        if self.get(key, now) is not None:
+            return False
+        self.set(key, True, now)
+        return True
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def metrics(self):
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                "expired": self.expired, "evicted": self.evicted}
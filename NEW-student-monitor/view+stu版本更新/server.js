@@ -3,6 +3,7 @@ const express = require('express');
 const sqlite3 = require('sqlite3').verbose();
 const cors = require('cors');
 const bodyParser = require('body-parser');
+const { createBlacklistVersions } = require('../blacklist_versions');
 
 const app = express();
 const PORT = 3000;
@@ -48,6 +49,15 @@ function initDatabase() {
     });
 }
 
+// 带版本号的黑名单（见 blacklist_versions.js）：学生端定时条件请求，没有变化时返回 304，有变化时只返回差异
+const blacklistVersions = createBlacklistVersions();
+
+app.get('/api/url-blacklist/current', blacklistVersions.current(callback => {
+  db.all('SELECT domain FROM blacklist ORDER BY domain', (err, rows) => callback(err, rows && rows.map(r => r.domain)));
+}));
+
+app.get('/api/url-blacklist/events', blacklistVersions.events());
+
 app.get('/api/blacklist', (req, res) => {
   db.all('SELECT domain FROM blacklist ORDER BY domain', (err, rows) => {
     res.json(err ? { error: err.message } : rows.map(r => r.domain));
@@ -57,15 +67,18 @@ app.get('/api/blacklist', (req, res) => {
 app.post('/api/blacklist/add', (req, res) => {
   const { domain } = req.body;
   if (!domain) return res.status(400).json({ error: '需提供 domain' });
-  db.run('INSERT OR IGNORE INTO blacklist (domain) VALUES (?)', [domain.trim().toLowerCase()], 
+  const cleanDomain = domain.trim().toLowerCase();
+  db.run('INSERT OR IGNORE INTO blacklist (domain) VALUES (?)', [cleanDomain], 
     function (err) {
+      if (!err && this.changes > 0) blacklistVersions.record(cleanDomain, 'add');
       res.json(err ? { error: '插入失败' } : { ok: true, id: this.lastID });
     }
   );
 });
 
 app.delete('/api/blacklist/:domain', (req, res) => {
-  db.run('DELETE FROM blacklist WHERE domain = ?', [req.params.domain], (err) => {
+  db.run('DELETE FROM blacklist WHERE domain = ?', [req.params.domain], function (err) {
+    if (!err && this.changes > 0) blacklistVersions.record(req.params.domain, 'remove');
     res.json(err ? { error: err.message } : { ok: true });
   });
 });
@@ -3,6 +3,7 @@ const express = require('express');
 const sqlite3 = require('sqlite3').verbose();
 const cors = require('cors');
 const bodyParser = require('body-parser');
+const { createBlacklistVersions } = require('../blacklist_versions');
 
 const app = express();
 const PORT = 3000;
@@ -63,6 +64,15 @@ function initDatabase() {
 }
 
 // ====== API 接口 ======
+// 带版本号的黑名单（见 blacklist_versions.js）：学生端定时条件请求，没有变化时返回 304，有变化时只返回差异
+const blacklistVersions = createBlacklistVersions();
+
+app.get('/api/url-blacklist/current', blacklistVersions.current(callback => {
+  db.all('SELECT domain FROM blacklist ORDER BY domain', (err, rows) => callback(err, rows && rows.map(r => r.domain)));
+}));
+
+app.get('/api/url-blacklist/events', blacklistVersions.events());
+
 app.get('/api/blacklist', (req, res) => {
   db.all('SELECT domain FROM blacklist ORDER BY domain', (err, rows) => {
     if (err) return res.status(500).json({ error: err.message });
@@ -73,18 +83,21 @@ app.get('/api/blacklist', (req, res) => {
 app.post('/api/blacklist/add', (req, res) => {
   const { domain } = req.body;
   if (!domain) return res.status(400).json({ error: '需提供 domain' });
+  const cleanDomain = domain.trim().toLowerCase();
   db.run('INSERT OR IGNORE INTO blacklist (domain) VALUES (?)', 
-    [domain.trim().toLowerCase()], 
+    [cleanDomain], 
     function (err) {
       if (err) return res.status(500).json({ error: '插入失败' });
+      if (this.changes > 0) blacklistVersions.record(cleanDomain, 'add');
       res.json({ ok: true, id: this.lastID });
     }
   );
 });
 
 app.delete('/api/blacklist/:domain', (req, res) => {
-  db.run('DELETE FROM blacklist WHERE domain = ?', [req.params.domain], (err) => {
+  db.run('DELETE FROM blacklist WHERE domain = ?', [req.params.domain], function (err) {
     if (err) return res.status(500).json({ error: err.message });
+    if (this.changes > 0) blacklistVersions.record(req.params.domain, 'remove');
     res.json({ ok: true });
   });
 });
@@ -2,34 +2,36 @@
 import time
 import json
 import requests
-import os
 import socket
 import re
 import threading
 from urllib.parse import urlparse
 
+from blacklist_matcher import BlacklistMatcher
+from blacklist_sync import BlacklistSync
+from process_cache import ProcessCache
+
 # ====== 配置 ======
 SERVER_URL = "http://10.1.82.202:3000/api/report"
 REPORT_INTERVAL = 10  # ← 10秒上报一次
 STUDENT_ID = socket.gethostname().lower() or f"pc_{int(time.time()) % 1000}"
 
 # ====== 黑名单本地缓存 ======
-blacklist_cache = set()
-last_blacklist_update = 0
+blacklist_matcher = BlacklistMatcher()
+blacklist_sync = BlacklistSync(blacklist_matcher)
+BLACKLIST_URL = SERVER_URL.replace('/api/report', '/api/url-blacklist/current')
+BLACKLIST_FULL_URL = SERVER_URL.replace('/api/report', '/api/blacklist')  # 旧版服务端只有完整列表
 
 def update_blacklist():
-    """定时从服务端拉取最新黑名单"""
-    global blacklist_cache, last_blacklist_update
+    """定时从服务端同步黑名单：带版本号的条件请求，没有变化时服务器返回 304，有变化时只返回差异"""
     while True:
         try:
-            resp = requests.get(f"{SERVER_URL.replace('/api/report', '/api/blacklist')}", timeout=5)
-            if resp.status_code == 200:
-                blacklist_cache = set(resp.json())
-                last_blacklist_update = time.time()
-                print(f"✅ 黑名单已更新（{len(blacklist_cache)} 条）")
+            added, removed = blacklist_sync.pull_or_full(requests, BLACKLIST_URL, BLACKLIST_FULL_URL, timeout=5)
+            if added or removed:
+                print(f"✅ 黑名单已更新：新增 {added} 条，删除 {removed} 条（共 {len(blacklist_matcher)} 条）")
         except Exception as e:
             print(f"⚠️ 黑名单更新失败: {e}")
-        time.sleep(60)  # 每分钟更新一次
+        time.sleep(60)  # 每分钟检查一次
 
 # 启动黑名单更新线程
 threading.Thread(target=update_blacklist, daemon=True).start()
@@ -53,7 +55,8 @@ def is_valid_public_url(url):
 try:
     import win32gui
     import win32process
-    import psutil
+
+    process_cache = ProcessCache()
 
     def get_active_browser_info():
         hwnd = win32gui.GetForegroundWindow()
@@ -63,11 +66,10 @@ try:
         title = win32gui.GetWindowText(hwnd)
         _, pid = win32process.GetWindowThreadProcessId(hwnd)
 
-        try:
-            proc = psutil.Process(pid)
-            exe_name = os.path.basename(proc.exe()).lower()
-        except:
+        proc = process_cache.lookup(pid, hwnd)
+        if proc is None:
             return None, None
+        exe_name = proc.exe_name
 
         # 支持三大浏览器
         if not any(browser in exe_name for browser in ['chrome', 'msedge', 'firefox']):
@@ -117,11 +119,7 @@ def report_once():
         parsed = urlparse(url)
         domain = parsed.hostname.lower() if parsed.hostname else ''
         domain = domain.replace('www.', '')
-        for b in blacklist_cache:
-            b = b.strip().lower()
-            if b and (domain == b or domain.endswith('.' + b)):
-                is_blacklisted = True
-                break
+        is_blacklisted = blacklist_matcher.match(domain) is not None
     except Exception as e:
         print(f"⚠️ 黑名单匹配异常: {e}")
 
@@ -2,15 +2,21 @@
 import time
 import json
 import requests
-import os
 import socket
 import re
 import threading
 from urllib.parse import urlparse
 
+from agent_core import AgentCore
+from blacklist_matcher import BlacklistMatcher
+from blacklist_sync import BlacklistSync
+from process_cache import ProcessCache
+
 # ====== 配置 ======
 SERVER_URL = "http://10.1.82.202:3000/api/report"
 REPORT_INTERVAL = 10
+QUEUE_SIZE = 16
+QUEUE_POLICY = "coalesce"  # 队列满时：drop_oldest / coalesce / block
 
 # 获取学生机局域网IP
 def get_local_ip():
@@ -27,18 +33,21 @@ STUDENT_ID = socket.gethostname().lower()
 STUDENT_IP = get_local_ip()
 
 # ====== 黑名单缓存 ======
-blacklist_cache = set()
+blacklist_matcher = BlacklistMatcher()
+blacklist_sync = BlacklistSync(blacklist_matcher)
+BLACKLIST_URL = SERVER_URL.replace('/api/report', '/api/url-blacklist/current')
+BLACKLIST_FULL_URL = SERVER_URL.replace('/api/report', '/api/blacklist')  # 旧版服务端只有完整列表
+
 def update_blacklist():
-    global blacklist_cache
+    """定时从服务端同步黑名单：带版本号的条件请求，没有变化时服务器返回 304，有变化时只返回差异"""
     while True:
         try:
-            resp = requests.get(SERVER_URL.replace('/api/report', '/api/blacklist'), timeout=5)
-            if resp.status_code == 200:
-                blacklist_cache = set(resp.json())
-                print(f"✅ 黑名单更新: {len(blacklist_cache)} 条")
+            added, removed = blacklist_sync.pull_or_full(requests, BLACKLIST_URL, BLACKLIST_FULL_URL, timeout=5)
+            if added or removed:
+                print(f"✅ 黑名单已更新：新增 {added} 条，删除 {removed} 条（共 {len(blacklist_matcher)} 条）")
         except Exception as e:
             print(f"⚠️ 黑名单更新失败: {e}")
-        time.sleep(60)
+        time.sleep(60)  # 每分钟检查一次
 threading.Thread(target=update_blacklist, daemon=True).start()
 
 # ====== 仅允许可查验的公开网页 ======
@@ -57,16 +66,17 @@ def is_valid_public_url(url):
 
 # ====== 获取浏览器活动（Chrome / Edge / Firefox）======
 try:
-    import win32gui, win32process, psutil
+    import win32gui, win32process
+    process_cache = ProcessCache()
     def get_active_browser_info():
         hwnd = win32gui.GetForegroundWindow()
         if not hwnd: return None, None
         title = win32gui.GetWindowText(hwnd)
         _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        try:
-            proc = psutil.Process(pid)
-            exe_name = os.path.basename(proc.exe()).lower()
-        except: return None, None
+        proc = process_cache.lookup(pid, hwnd)
+        if proc is None:
+            return None, None
+        exe_name = proc.exe_name
         
         # 支持三大浏览器
         if not any(b in exe_name for b in ['chrome', 'msedge', 'firefox']):
@@ -88,11 +98,16 @@ except ImportError as e:
     def get_active_browser_info():
         return "https://www.zxxk.com", "学科网 - 初中数学"
 
-# ====== 上报 ======
-def report_once():
+# ====== 采样 ======
+def sample_once():
     url, title = get_active_browser_info()
     if not url or not is_valid_public_url(url):
-        return  # 跳过无效页面
+        return None  # 跳过无效页面
+    return url, title
+
+# ====== 编码：黑名单匹配 + 组装数据 ======
+def encode_sample(sample):
+    url, title = sample
 
     # 黑名单匹配
     is_blacklisted = False
@@ -100,15 +115,11 @@ def report_once():
         parsed = urlparse(url)
         domain = parsed.hostname.lower() if parsed.hostname else ''
         domain = domain.replace('www.', '')
-        for b in blacklist_cache:
-            b = b.strip().lower()
-            if b and (domain == b or domain.endswith('.' + b)):
-                is_blacklisted = True
-                break
+        is_blacklisted = blacklist_matcher.match(domain) is not None
     except Exception as e:
         print(f"⚠️ 黑名单匹配异常: {e}")
 
-    payload = {
+    return {
         "student_id": STUDENT_ID,
         "student_ip": STUDENT_IP,  # ← 新增
         "url": url,
@@ -116,16 +127,27 @@ def report_once():
         "blacklisted": is_blacklisted
     }
 
+# ====== 上报 ======
+def send_payload(payload):
     try:
         resp = requests.post(SERVER_URL, json=payload, timeout=5)
-        status = "🔴黑名单" if is_blacklisted else "🟢正常"
-        print(f"[{time.strftime('%H:%M:%S')}] {STUDENT_ID}({STUDENT_IP}) | {status} | {url} | {title}")
+        status = "🔴黑名单" if payload["blacklisted"] else "🟢正常"
+        print(f"[{time.strftime('%H:%M:%S')}] {STUDENT_ID}({STUDENT_IP}) | {status} | {payload['url']} | {payload['title']}")
     except Exception as e:
         print(f"❌ 上报失败: {e}")
 
+def report_once():
+    sample = sample_once()
+    if sample:
+        send_payload(encode_sample(sample))
+
 if __name__ == '__main__':
     print(f"🧑 学生端启动 | ID: {STUDENT_ID} | IP: {STUDENT_IP} | 10秒/次")
     print("🔍 仅报送可查验的 http/https 页面")
+    # 采样线程固定节拍，上报在独立线程中进行
+    core = AgentCore(sample_once, encode_sample, send_payload, REPORT_INTERVAL,
+                     queue_size=QUEUE_SIZE, policy=QUEUE_POLICY, key=lambda s: s,
+                     block_timeout=REPORT_INTERVAL).start()
     while True:
-        report_once()
-        time.sleep(REPORT_INTERVAL)
\ No newline at end of file
+        time.sleep(300)
+        print(f"📊 队列统计: {json.dumps(core.metrics(), ensure_ascii=False)}")
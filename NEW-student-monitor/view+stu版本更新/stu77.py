@@ -2,12 +2,15 @@
 import time
 import json
 import requests
-import os
 import socket
 import re
 import threading
 from urllib.parse import urlparse  # ← 新增导入
 
+from blacklist_matcher import BlacklistMatcher
+from blacklist_sync import BlacklistSync
+from process_cache import ProcessCache
+
 # ====== 配置 ======
 SERVER_URL = "http://10.1.82.202:3000/api/report"
 REPORT_INTERVAL = 10
@@ -17,28 +20,29 @@ STUDENT_ID = socket.gethostname().lower() or f"pc_{int(time.time()) % 1000}"
 STUDENT_IP = socket.gethostbyname(socket.gethostname())  # ← 关键：获取IP
 
 # ====== 黑名单本地缓存 ======
-blacklist_cache = set()
-last_blacklist_update = 0
+blacklist_matcher = BlacklistMatcher()
+blacklist_sync = BlacklistSync(blacklist_matcher)
+BLACKLIST_URL = SERVER_URL.replace('/api/report', '/api/url-blacklist/current')
+BLACKLIST_FULL_URL = SERVER_URL.replace('/api/report', '/api/blacklist')  # 旧版服务端只有完整列表
 
 def update_blacklist():
-    global blacklist_cache, last_blacklist_update
+    """定时从服务端同步黑名单：带版本号的条件请求，没有变化时服务器返回 304，有变化时只返回差异"""
     while True:
         try:
-            resp = requests.get(f"{SERVER_URL.replace('/api/report', '/api/blacklist')}", timeout=5)
-            if resp.status_code == 200:
-                blacklist_cache = set(resp.json())
-                last_blacklist_update = time.time()
-                print(f"✅ 黑名单已更新（{len(blacklist_cache)} 条）")
+            added, removed = blacklist_sync.pull_or_full(requests, BLACKLIST_URL, BLACKLIST_FULL_URL, timeout=5)
+            if added or removed:
+                print(f"✅ 黑名单已更新：新增 {added} 条，删除 {removed} 条（共 {len(blacklist_matcher)} 条）")
         except Exception as e:
             print(f"⚠️ 黑名单更新失败: {e}")
-        time.sleep(60)
+        time.sleep(60)  # 每分钟检查一次
 threading.Thread(target=update_blacklist, daemon=True).start()
 
 # ====== 获取当前浏览器活动（Chrome/Edge/Firefox）======
 try:
     import win32gui
     import win32process
-    import psutil
+
+    process_cache = ProcessCache()
 
     def get_active_browser_info():
         hwnd = win32gui.GetForegroundWindow()
@@ -46,11 +50,10 @@ try:
             return None, None
         title = win32gui.GetWindowText(hwnd)
         _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        try:
-            proc = psutil.Process(pid)
-            exe_name = os.path.basename(proc.exe()).lower()
-        except:
+        proc = process_cache.lookup(pid, hwnd)
+        if proc is None:
             return None, None
+        exe_name = proc.exe_name
         # 支持 Firefox！
         if not any(b in exe_name for b in ['chrome', 'msedge', 'firefox']):
             return None, None
@@ -79,11 +82,7 @@ def report_once():
     try:
         parsed = urlparse(url)
         domain = parsed.hostname.lower().replace('www.', '') if parsed.hostname else ''
-        for b in blacklist_cache:
-            b = b.strip().lower()
-            if b and (domain == b or domain.endswith('.' + b)):
-                is_blacklisted = True
-                break
+        is_blacklisted = blacklist_matcher.match(domain) is not None
     except:
         pass
 
@@ -1,21 +1,28 @@
 import os
+import sys
 import json
 import time
 import socket
 import platform
-import shutil
-import sqlite3
 import schedule
 import pygetwindow as gw
 import requests
 import webbrowser
 import socketio
-from datetime import datetime
-from pathlib import Path
-from urllib.parse import urlparse, urljoin
-from threading import Thread
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+from threading import Thread, Timer
 import uiautomation as auto
 
+# 公共模块由 install.bat 从上级目录复制到本目录（清单见 shared_modules.txt）
+from blacklist_matcher import BlacklistMatcher
+from blacklist_sync import BlacklistSync
+from fleet_schedule import DecorrelatedBackoff, phase_delay
+from server_policy import THROTTLE_STATUS, AgentPolicy, parse_retry_after
+from browser_history import BrowserHistoryCollector, HistoryCursorStore, find_windows_profiles
+from ttl_cache import TTLCache
+from window_checker import BrowserWindowChecker
+
 # -------------------------- 配置项 --------------------------
 CONFIG = {
     "SERVER": {
@@ -24,33 +31,63 @@ CONFIG = {
     },
     "COLLECT": {
         "interval": 3,
-        "browser_history_limit": 50
+        "browser_history_limit": 50,
+        "history_cursor_path": os.path.join(os.getcwd(), "history_cursors.json")
     },
     "URL_BLOCK": {
         "block_page_path": os.path.join(os.getcwd(), "block_page.html"),
         "check_window_interval": 2,
-        "blacklist_pull_interval": 60
+        "uia_deadline": 1.0,  # 单次读取浏览器地址栏的期限（秒）
+        "blacklist_pull_interval": 60,
+        "blacklist_fetch_jitter": 10  # 推送缺版本时，随机等待最多多少秒再拉取
     }
 }
 
 # 全局变量
 student_id = None
 url_blacklist = []
-blocked_url_cache = set()
+# url_blacklist 的编译索引；纯域名规则（qq.com）与原实现一样只在地址完全相同时拦截，拦截整个域名用 *.qq.com
+blacklist_matcher = BlacklistMatcher(bare_domains=False)
+# 带版本号的同步：条件请求 / 差异 / 推送中直接带差异，就地更新 blacklist_matcher
+blacklist_sync = BlacklistSync(blacklist_matcher, jitter=CONFIG["URL_BLOCK"]["blacklist_fetch_jitter"])
+blacklist_fetch_timer = None
+# 最近上报过拦截记录的URL（每个URL 60 秒内只上报一次，条目自动过期）
+blocked_url_cache = TTLCache(60, max_size=1024)
+history_collector = None
+# 服务器下发的采集策略（sample_interval 为采集上报间隔，秒），随上传响应或 Socket.io 推送更新
+agent_policy = AgentPolicy({"sample_interval": CONFIG["COLLECT"]["interval"] * 60}, min_interval=30,
+                           max_interval=3600)
+collect_job = None
+# 服务器返回 429 / 503 后，在这个时间（time.time()）之前不再上传
+upload_not_before = 0.0
 sio = socketio.Client()
 is_connected = False
+# 共用的 HTTP 会话（保持长连接，避免每次请求新建 TCP 连接）
+http = requests.Session()
 
 # -------------------------- 初始化 --------------------------
-def init():
+def load_student_id():
+    """尝试从本地文件加载 student_id"""
     global student_id
-    init_block_page()
-    
-    # 尝试从本地文件加载 student_id
     if os.path.exists('student_id.txt'):
         with open('student_id.txt', 'r') as f:
             student_id = f.read().strip()
             print(f"ℹ️ 从本地加载学生机ID: {student_id}")
 
+def save_student_id(new_id):
+    """服务端分配/更新了ID时写回本地文件，返回是否发生变化"""
+    global student_id
+    if student_id == new_id:
+        return False
+    student_id = new_id
+    with open('student_id.txt', 'w') as f:
+        f.write(str(student_id))
+    return True
+
+def init():
+    init_block_page()
+    load_student_id()
+
     # 启动 Socket.io 和 API 拉取黑名单
     Thread(target=start_communication, daemon=True).start()
 
@@ -58,11 +95,15 @@ def init():
     time.sleep(2) 
 
     Thread(target=start_check_browser_window, daemon=True).start()
-    schedule.every(CONFIG["COLLECT"]["interval"]).minutes.do(collect_and_upload_data)
+    global collect_job
+    collect_job = schedule.every(CONFIG["COLLECT"]["interval"]).minutes.do(collect_and_upload_data)
     schedule.every(CONFIG["URL_BLOCK"]["blacklist_pull_interval"]).seconds.do(pull_blacklist_from_server)
-    
-    collect_and_upload_data() # 立即执行一次
-    
+
+    # 第一次采集对齐到本机的相位（按学生机ID哈希），机房同时开机时各台机器错开上报
+    delay = collection_phase_delay()
+    collect_job.next_run = datetime.now() + timedelta(seconds=delay)
+    print(f"ℹ️ {delay:.0f} 秒后第一次采集上报")
+
     print(f"✅ 学生机客户端初始化完成（采集间隔：{CONFIG['COLLECT']['interval']}分钟）")
     try:
         while True:
@@ -71,17 +112,57 @@ def init():
     except KeyboardInterrupt:
         print("\n👋 客户端已退出")
 
+def collection_phase_delay():
+    """距离本机采集相位的秒数；还没有学生机ID时用计算机名"""
+    return phase_delay(student_id or socket.gethostname(), collection_interval())
+
+def collection_interval():
+    """当前的采集上报间隔（秒）：服务器策略或本地配置"""
+    return agent_policy.get("sample_interval")
+
+def on_policy_changed(changes):
+    """服务器调整采集间隔后，采集任务从下一次开始按新间隔执行"""
+    if "sample_interval" in changes and collect_job is not None:
+        collect_job.interval = int(round(changes["sample_interval"]))
+        collect_job.unit = "seconds"
+        print(f"ℹ️ 采集间隔调整为 {collect_job.interval} 秒")
+
+agent_policy.subscribe(on_policy_changed)
+
+def upload_deferred():
+    """服务器要求暂停上传时跳过本次采集（浏览历史的高水位未提交，下次一并上传）"""
+    wait = upload_not_before - time.time()
+    if wait > 0:
+        print(f"ℹ️ 服务器繁忙，{wait:.0f} 秒后再上传")
+    return wait > 0
+
+def throttle_upload(status, retry_after):
+    """429 / 503：按 Retry-After 暂停上传（没有该头时暂停一个采集间隔），返回是否被限流"""
+    global upload_not_before
+    if status not in THROTTLE_STATUS:
+        return False
+    delay = parse_retry_after(retry_after)
+    if delay is None:
+        delay = collection_interval()
+    upload_not_before = time.time() + delay
+    print(f"⚠️ 服务器繁忙（状态码 {status}），{delay:.0f} 秒内不再上传")
+    return True
+
 def start_communication():
-    """启动 Socket.io 客户端并处理重连"""
+    """启动 Socket.io 客户端并处理重连（去相关的指数退避，服务器重启时各台机器错开重连）"""
     global is_connected
+    # 原实现固定 5 秒重连；最长等待 15 秒，服务器恢复后最晚 3 个原间隔内全部连上
+    backoff = DecorrelatedBackoff(base=2, cap=15)
     while True:
         if not is_connected:
             try:
                 sio.connect(CONFIG["SERVER"]["socketio_url"],transports=["websocket"])
                 is_connected = True
+                backoff.reset()
             except Exception as e:
-                print(f"❌ Socket.io 连接失败, 5秒后重试...: {e}")
-                time.sleep(5)
+                wait = backoff.next()
+                print(f"❌ Socket.io 连接失败, {wait:.0f}秒后重试...: {e}")
+                time.sleep(wait)
         else:
             time.sleep(1) # 保持线程 alive
 
@@ -107,131 +188,55 @@ def get_system_info():
         "collect_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
-def get_browser_history():
-    history = []  # 用于存储所有浏览器历史
-    user_home = str(Path.home())
-    system = platform.system()
-    browser_paths = {  # 浏览器历史文件路径（不变）
-        "Chrome": {"Windows": f"{user_home}\\AppData\\Local\\Google\\Chrome\\User Data\\Default\\History"},
-        "Edge": {"Windows": f"{user_home}\\AppData\\Local\\Microsoft\\Edge\\User Data\\Default\\History"},
-        "Firefox": {"Windows": f"{user_home}\\AppData\\Roaming\\Mozilla\\Firefox\\Profiles"}
-    }
+def get_history_collector():
+    """首次使用时创建增量历史采集器（高水位保存在 history_cursors.json）"""
+    global history_collector
+    if history_collector is None:
+        history_collector = BrowserHistoryCollector(
+            find_windows_profiles(),
+            HistoryCursorStore(CONFIG["COLLECT"]["history_cursor_path"]),
+            limit=CONFIG["COLLECT"]["browser_history_limit"],
+        )
+    return history_collector
 
-    # 步骤2：完善 Chrome/Edge 历史读取逻辑（补充实际采集代码）
-    def read_chrome_edge_history(path, browser):
-        nonlocal history  # 允许函数修改外部的 history 列表
-        if not os.path.exists(path):
-            return
-        temp_path = f"{path}.temp"  # 临时文件（避免原文件被浏览器锁定）
-        max_retries = 3  # 重试次数（解决文件占用问题）
-        retry_delay = 1
+def get_browser_history():
+    """返回 (新增的浏览历史, 待提交的高水位)；上传成功后再调用 commit_browser_history 提交"""
+    if platform.system() != "Windows":
+        return [], {}
+    return get_history_collector().collect()
 
-        for attempt in range(max_retries):
-            try:
-                shutil.copy2(path, temp_path)  # 复制原文件到临时路径
-                conn = sqlite3.connect(temp_path)
-                cursor = conn.cursor()
-                # 读取Chrome/Edge历史（SQLite数据库）
-                cursor.execute("""
-                    SELECT url, title, last_visit_time 
-                    FROM urls 
-                    ORDER BY last_visit_time DESC 
-                    LIMIT ?
-                """, (CONFIG["COLLECT"]["browser_history_limit"],))
-                # 解析历史数据并添加到 history 列表
-                for row in cursor.fetchall():
-                    url, title, visit_time = row
-                    if visit_time != 0:
-                        # Chrome时间戳转换（1601-01-01起的微秒）
-                        visit_dt = datetime(1601, 1, 1) + datetime.timedelta(microseconds=visit_time)
-                        history.append({
-                            "browser": browser, "url": url, "title": title or "无标题",
-                            "visit_time": visit_dt.strftime("%Y-%m-%d %H:%M:%S")
-                        })
-                conn.close()
-                os.remove(temp_path)  # 删除临时文件
-                break
-            except PermissionError:
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                else:
-                    print(f"❌ 读取{browser}历史失败：文件被占用（已重试{max_retries}次）")
-            except Exception as e:
-                print(f"❌ 读取{browser}历史失败：{str(e)[:50]}")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                break
-
-    # 步骤3：定义 Firefox 历史读取函数
-    def read_firefox_history(profile_dir):
-        nonlocal history
-        if not os.path.exists(profile_dir):
-            return
-        # 遍历Firefox配置文件夹，找到 places.sqlite（历史数据库）
-        for root, _, files in os.walk(profile_dir):
-            if "places.sqlite" in files:
-                db_path = os.path.join(root, "places.sqlite")
-                temp_path = f"{db_path}.temp"
-                try:
-                    shutil.copy2(db_path, temp_path)
-                    conn = sqlite3.connect(temp_path)
-                    cursor = conn.cursor()
-                    # 读取Firefox历史
-                    cursor.execute("""
-                        SELECT p.url, p.title, v.visit_date 
-                        FROM moz_places p 
-                        JOIN moz_historyvisits v ON p.id = v.place_id 
-                        ORDER BY v.visit_date DESC 
-                        LIMIT ?
-                    """, (CONFIG["COLLECT"]["browser_history_limit"],))
-                    for row in cursor.fetchall():
-                        url, title, visit_date = row
-                        if visit_date != 0:
-                            # Firefox时间戳转换（1970-01-01起的微秒）
-                            visit_dt = datetime.fromtimestamp(visit_date / 1000000)
-                            history.append({
-                                "browser": "Firefox", "url": url, "title": title or "无标题",
-                                "visit_time": visit_dt.strftime("%Y-%m-%d %H:%M:%S")
-                            })
-                    conn.close()
-                    os.remove(temp_path)
-                except Exception as e:
-                    print(f"❌ 读取Firefox历史失败：{str(e)[:30]}")
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                break
-
-    # 步骤4：调用采集函数（按系统区分）
-    if system == "Windows":
-        read_chrome_edge_history(browser_paths["Chrome"]["Windows"], "Chrome")
-        read_chrome_edge_history(browser_paths["Edge"]["Windows"], "Edge")
-        read_firefox_history(browser_paths["Firefox"]["Windows"])
-
-    # 关键：返回采集到的历史列表
-    return history
-    
+def commit_browser_history(cursors):
+    try:
+        get_history_collector().commit(cursors)
+    except Exception as e:
+        print(f"❌ 保存浏览历史进度失败: {e}")
 
 def collect_and_upload_data():
+    if upload_deferred():
+        return
     print(f"\n📅 开始采集（{datetime.now().strftime('%H:%M:%S')}）")
     try:
         system_info = get_system_info()
-        browser_history = get_browser_history()
-        data = {"system_info": system_info, "browser_history": browser_history}
+        browser_history, history_cursors = get_browser_history()
+        data = {"system_info": system_info, "browser_history": browser_history,
+                "url_block": window_checker.metrics()}
+        print(f"ℹ️ URL 拦截检查: {data['url_block']}")
         
-        response = requests.post(
+        response = http.post(
             f"{CONFIG['SERVER']['api_url']}/api/student/upload",
             json=data,
+            headers=agent_policy.headers(),
             timeout=10
         )
         
+        if throttle_upload(response.status_code, response.headers.get("Retry-After")):
+            return
         if response.status_code == 200:
             result = response.json()
+            agent_policy.apply(result.get("policy"))
             if result.get("success"):
-                global student_id
-                if student_id != result.get("student_id"):
-                    student_id = result.get("student_id")
-                    with open('student_id.txt', 'w') as f:
-                        f.write(str(student_id))
+                commit_browser_history(history_cursors)
+                if save_student_id(result.get("student_id")):
                     print(f"✅ 注册/更新成功，学生机ID: {student_id}")
                 else:
                     print(f"✅ 数据上传成功")
@@ -252,27 +257,20 @@ def init_block_page():
         f.write(block_page_content)
 
 def is_url_blocked(url):
+    """支持完整URL（纯域名规则同样按完整地址比较）、*.域名 通配、以 / 结尾的URL前缀 规则"""
     if not url or not url_blacklist: return False
-    parsed = urlparse(url)
-    domain = parsed.netloc.split(':')[0]
+    return blacklist_matcher.match(url) is not None
 
-    for pattern in url_blacklist:
-        pattern = pattern.strip()
-        if not pattern: continue
-        if pattern == url: return True
-        if pattern.startswith('*.') and domain.endswith(pattern[2:]): return True
-        if pattern.endswith('/') and url.startswith(pattern): return True
-    return False
+def should_report_blocked_url(url):
+    """同一URL每分钟只上报一次拦截记录"""
+    if not student_id or not url: return False
+    return blocked_url_cache.add(url)
 
 def report_blocked_url(url):
-    global student_id, blocked_url_cache
-    if not student_id or not url: return
-    cache_key = f"{url}_{int(time.time() / 60)}"
-    if cache_key in blocked_url_cache: return
-    blocked_url_cache.add(cache_key)
+    if not should_report_blocked_url(url): return
 
     try:
-        response = requests.post(
+        response = http.post(
             f"{CONFIG['SERVER']['api_url']}/api/student/block-log",
             json={"student_id": student_id, "url": url},
             timeout=5
@@ -291,40 +289,55 @@ def open_block_page(url):
         if win.isMinimized: win.restore()
         win.activate()
 
-def get_browser_url_uia(window_title):
-    """使用 UI Automation 尝试获取浏览器地址栏 URL"""
-    # 尝试定位 Chrome/Edge 地址栏
-    address_bar = auto.WindowControl(searchDepth=10, Name="地址和搜索栏")
-    if address_bar.Exists(0, 0):
+# Chrome/Edge 与 Firefox 地址栏控件的名称
+ADDRESS_BAR_NAMES = ("地址和搜索栏", "位置")
+
+def find_address_bar(hwnd):
+    """在指定浏览器窗口的控件树中查找地址栏（较慢，找到后由调用方缓存）"""
+    root = auto.ControlFromHandle(hwnd)
+    if not root: return None
+    for name in ADDRESS_BAR_NAMES:
+        control = auto.Control(searchFromControl=root, searchDepth=10, Name=name)
+        if control.Exists(0, 0):
+            return control
+    return None
+
+def read_address_bar(address_bar):
+    # 获取地址栏的完整文本，这可能包含额外信息
+    full_text = address_bar.GetValuePattern().Value
+    if full_text.startswith(('http://', 'https://')):
+        return full_text.split(' ')[0] # 简单处理，取第一个空格前的部分
+    return full_text
+
+def read_browser_url(window, address_bar=None):
+    """
+    使用 UI Automation 读取浏览器地址栏，返回 (url, 地址栏控件)；
+    address_bar 为上次找到的控件，失效（标签页拖出、窗口重建）时重新查找
+    """
+    if address_bar is not None:
         try:
-            # 获取地址栏的完整文本，这可能包含额外信息
-            full_text = address_bar.GetValuePattern().Value
-            # 通常 URL 是文本的第一部分，或者可以直接获取
-            if full_text.startswith(('http://', 'https://')):
-                return full_text.split(' ')[0] # 简单处理，取第一个空格前的部分
-            return full_text
+            return read_address_bar(address_bar), address_bar
         except Exception:
-            pass
-
-    # 尝试定位 Firefox 地址栏
-    firefox_address_bar = auto.EditControl(searchDepth=10, Name="位置")
-    if firefox_address_bar.Exists(0, 0):
+            address_bar = None
+    address_bar = find_address_bar(window._hWnd)
+    if address_bar is not None:
         try:
-            return firefox_address_bar.GetValuePattern().Value
+            return read_address_bar(address_bar), address_bar
         except Exception:
             pass
-            
-    return None
+    return get_browser_url_fallback(window), address_bar
+
+def init_uia_thread():
+    """UI Automation 在非主线程中使用前需要初始化 COM"""
+    return auto.UIAutomationInitializerInThread()
 
 def get_browser_url(window):
     """获取浏览器窗口的当前URL（优先使用UI Automation）"""
     if platform.system() != "Windows": return None
-    
-    url = get_browser_url_uia(window.title)
-    if url:
-        return url
+    return read_browser_url(window)[0]
 
-    # 如果 UI Automation 失败，可以回退到旧的方法作为备用
+def get_browser_url_fallback(window):
+    """UI Automation 失败时回退到旧的方法作为备用"""
     try:
         import win32gui
         import win32process
@@ -353,26 +366,27 @@ def get_browser_url(window):
         
     return None
 
-def check_browser_windows():
+# 浏览器窗口状态表（按窗口句柄缓存标题、地址栏控件、URL 和拦截判断）
+window_checker = BrowserWindowChecker(read_browser_url, is_url_blocked,
+                                      deadline=CONFIG["URL_BLOCK"]["uia_deadline"],
+                                      worker_init=init_uia_thread)
+
+def check_browser_windows(report=None):
+    """
+    report: 拦截后上报的回调，默认同步调用 report_blocked_url。
+    只重新读取新出现或标题变化的浏览器窗口的地址栏，见 window_checker
+    """
+    report = report or report_blocked_url
     if not url_blacklist: return
-    browser_keywords = ["chrome", "edge", "firefox", "safari", "浏览器"]
-    checked_urls = set()
+
+    def on_block(window, url):
+        print(f"🚫 拦截URL: {url}（窗口：{window.title}）")
+        open_block_page(url)
+        report(url)
+        time.sleep(1) # 避免快速关闭多个窗口导致问题
 
     try:
-        for window in gw.getAllWindows():
-            win_title = window.title.strip().lower()
-            if not win_title or not any(kw in win_title for kw in browser_keywords): continue
-            
-            url = get_browser_url(window)
-            if not url or url in checked_urls: continue
-            
-            checked_urls.add(url)
-            if is_url_blocked(url):
-                print(f"🚫 拦截URL: {url}（窗口：{window.title}）")
-                window.close()
-                open_block_page(url)
-                report_blocked_url(url)
-                time.sleep(1) # 避免快速关闭多个窗口导致问题
+        window_checker.check(gw.getAllWindows(), on_block)
     except Exception as e:
         print(f"❌ 检查浏览器窗口失败: {e}")
 
@@ -401,27 +415,59 @@ def disconnect():
     is_connected = False
     print(f"❌ Socket.io 断开连接")
 
+@sio.on('policy-update')
+def on_policy_update(data):
+    agent_policy.apply(data)
+
 @sio.on('blacklist-update')
 def on_blacklist_update(data):
-    global url_blacklist
-    print(f"ℹ️ 收到黑名单更新: {data}")
-    pull_blacklist_from_server() # 简单处理，直接重新拉取整个列表
+    """推送带着差异时直接应用；不带版本号（旧服务器）或发现缺版本时，随机等待几秒后再拉取"""
+    global blacklist_fetch_timer
+    changes = blacklist_sync.apply_push(data) if isinstance(data, dict) else None
+    if changes is not None:
+        on_blacklist_changed(*changes)
+        return
+    if blacklist_fetch_timer is not None and blacklist_fetch_timer.is_alive():
+        return
+    delay = blacklist_sync.fetch_delay()
+    print(f"ℹ️ 收到黑名单更新，{delay:.1f} 秒后拉取")
+    blacklist_fetch_timer = Timer(delay, pull_blacklist_from_server)
+    blacklist_fetch_timer.daemon = True
+    blacklist_fetch_timer.start()
 
 def pull_blacklist_from_server():
+    """条件请求：没有变化时服务器返回 304，有变化时只返回差异"""
     try:
-        response = requests.get(f"{CONFIG['SERVER']['api_url']}/api/url-blacklist/current", timeout=5)
-        if response.status_code == 200:
-            new_blacklist = response.json().get("blacklist", [])
-            global url_blacklist
-            if sorted(url_blacklist) != sorted(new_blacklist):
-                url_blacklist = new_blacklist
-                print(f"✅ 拉取并更新URL黑名单（共{len(url_blacklist)}条规则）")
+        on_blacklist_changed(*blacklist_sync.pull(http, f"{CONFIG['SERVER']['api_url']}/api/url-blacklist/current"))
     except Exception as e:
         print(f"❌ 拉取黑名单失败: {e}")
 
+def on_blacklist_changed(added, removed):
+    global url_blacklist
+    if not (added or removed): return
+    url_blacklist = sorted(blacklist_matcher.rules)
+    window_checker.invalidate()
+    print(f"✅ 更新URL黑名单：新增{added}条，删除{removed}条（共{len(url_blacklist)}条规则，版本{blacklist_sync.version}）")
+
+def apply_blacklist(new_blacklist):
+    """用完整列表更新（只增删有变化的规则）"""
+    on_blacklist_changed(*blacklist_matcher.update(s.strip() for s in new_blacklist))
+
 # -------------------------- 主函数 --------------------------
 if __name__ == "__main__":
     if platform.system() != "Windows":
         print("⚠️ 警告：URL拦截功能在非Windows系统上可能无法正常工作。")
+    # AGENT_RUNTIME=asyncio 时使用单事件循环的异步运行时（需安装 aiohttp）
+    if os.environ.get("AGENT_RUNTIME") == "asyncio":
+        # student_async 通过 import student 使用本模块的状态；本文件作为脚本运行时模块名是 __main__，
+        # 先登记为 student，避免 import 时再加载一份（两套黑名单、Socket.io 客户端和全局变量）
+        sys.modules.setdefault("student", sys.modules[__name__])
+        try:
+            from student_async import main as async_main
+        except ImportError as e:
+            print(f"⚠️ 无法启用异步运行时（{e}），改用默认模式")
+        else:
+            async_main()
+            raise SystemExit
     init()
 
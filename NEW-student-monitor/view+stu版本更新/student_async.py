@@ -0,0 +1,226 @@
+# student_async.py —— 学生机客户端异步运行时（可选）
+# 功能：一个事件循环统一管理 HTTP 长连接池、Socket.io 连接、定时采集与窗口拦截检查，
+#      取代 schedule + 多个守护线程 + 每次新建连接的 requests 调用
+# 启动：python student_async.py   或   set AGENT_RUNTIME=asyncio 后运行 student.py
+#      （student.py 作为脚本运行时先把自己登记为 student 模块，下面的 import student 不会再加载一份）
+
+import asyncio
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import aiohttp
+import socketio
+
+import student
+from fleet_schedule import DecorrelatedBackoff
+
+CONFIG = student.CONFIG
+
+
+class AsyncStudentRuntime:
+    def __init__(self, config=CONFIG):
+        self.config = config
+        self.api_url = config["SERVER"]["api_url"]
+        self.loop = None
+        self.http = None
+        self.sio = None
+        # 窗口枚举、UI Automation、浏览器历史读取都是阻塞调用，放到单个工作线程里串行执行
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="student-blocking")
+        self._tasks = []
+        self._blacklist_fetch = None
+
+    # -------------------------- HTTP --------------------------
+    async def collect_and_upload(self):
+        if student.upload_deferred():
+            return
+        print(f"\n📅 开始采集（{datetime.now().strftime('%H:%M:%S')}）")
+        try:
+            system_info = await self.loop.run_in_executor(self.executor, student.get_system_info)
+            browser_history, history_cursors = await self.loop.run_in_executor(
+                self.executor, student.get_browser_history)
+            data = {"system_info": system_info, "browser_history": browser_history,
+                    "url_block": student.window_checker.metrics()}
+            print(f"ℹ️ URL 拦截检查: {data['url_block']}")
+            async with self.http.post(f"{self.api_url}/api/student/upload", json=data,
+                                      headers=student.agent_policy.headers(),
+                                      timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                if student.throttle_upload(resp.status, resp.headers.get("Retry-After")):
+                    return
+                if resp.status != 200:
+                    print(f"❌ 数据上传失败，状态码: {resp.status}, 响应: {(await resp.text())[:50]}")
+                    return
+                result = await resp.json(content_type=None)
+            student.agent_policy.apply(result.get("policy"))
+            if result.get("success"):
+                student.commit_browser_history(history_cursors)
+                if student.save_student_id(result.get("student_id")):
+                    print(f"✅ 注册/更新成功，学生机ID: {student.student_id}")
+                else:
+                    print("✅ 数据上传成功")
+            else:
+                print(f"❌ 数据上传失败: {result.get('error', '未知错误')}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ 采集或上传任务异常: {e}")
+
+    async def pull_blacklist(self):
+        """条件请求：没有变化时服务器返回 304，有变化时只返回差异（见 blacklist_sync）"""
+        sync = student.blacklist_sync
+        params, headers = sync.request_options()
+        try:
+            async with self.http.get(f"{self.api_url}/api/url-blacklist/current",
+                                     params={k: str(v) for k, v in params.items()}, headers=headers,
+                                     timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                if resp.status == 304:
+                    changes = sync.apply_response(304, None)
+                elif resp.status == 200:
+                    changes = sync.apply_response(200, await resp.json(content_type=None), resp.headers.get("ETag"))
+                else:
+                    return
+            student.on_blacklist_changed(*changes)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ 拉取黑名单失败: {e}")
+
+    async def pull_blacklist_later(self):
+        """推送缺版本时随机等待几秒再拉取，避免所有学生机同时请求"""
+        await asyncio.sleep(student.blacklist_sync.fetch_delay())
+        await self.pull_blacklist()
+
+    async def report_blocked(self, url):
+        if not student.should_report_blocked_url(url):
+            return
+        try:
+            async with self.http.post(f"{self.api_url}/api/student/block-log",
+                                      json={"student_id": student.student_id, "url": url},
+                                      timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                if resp.status == 200 and (await resp.json(content_type=None)).get("success"):
+                    print(f"ℹ️ 上报拦截记录: {url}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ 上报拦截记录失败: {e}")
+
+    def _report_from_worker(self, url):
+        """窗口检查在工作线程中运行，拦截上报交回事件循环异步发送"""
+        asyncio.run_coroutine_threadsafe(self.report_blocked(url), self.loop)
+
+    # -------------------------- 周期任务 --------------------------
+    async def every(self, seconds, job, delay=0):
+        """seconds 可以是返回间隔的函数（每次重新读取，服务器策略调整后下一次生效）"""
+        await asyncio.sleep(delay)
+        while True:
+            await job()
+            await asyncio.sleep(seconds() if callable(seconds) else seconds)
+
+    async def check_windows(self):
+        await self.loop.run_in_executor(self.executor, student.check_browser_windows, self._report_from_worker)
+
+    # -------------------------- Socket.io --------------------------
+    def _register_socket_handlers(self):
+        @self.sio.event
+        async def connect():
+            student.is_connected = True
+            print("✅ Socket.io 连接成功")
+            await self.pull_blacklist()
+
+        @self.sio.event
+        async def disconnect():
+            student.is_connected = False
+            print("❌ Socket.io 断开连接")
+
+        @self.sio.on('policy-update')
+        async def on_policy_update(data):
+            student.agent_policy.apply(data)
+
+        @self.sio.on('blacklist-update')
+        async def on_blacklist_update(data):
+            changes = student.blacklist_sync.apply_push(data) if isinstance(data, dict) else None
+            if changes is not None:
+                student.on_blacklist_changed(*changes)
+            elif self._blacklist_fetch is None or self._blacklist_fetch.done():
+                print("ℹ️ 收到黑名单更新，稍后拉取")
+                self._blacklist_fetch = asyncio.create_task(self.pull_blacklist_later())
+
+    async def keep_socket(self):
+        """连接断开后按去相关的指数退避重连"""
+        # 原实现固定 5 秒重连；最长等待 15 秒，服务器恢复后最晚 3 个原间隔内全部连上
+        backoff = DecorrelatedBackoff(base=2, cap=15)
+        while True:
+            try:
+                await self.sio.connect(self.config["SERVER"]["socketio_url"], transports=["websocket"])
+                backoff.reset()
+                await self.sio.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Socket.io 连接失败: {e}")
+            wait = backoff.next()
+            print(f"ℹ️ {wait:.0f}秒后重连 Socket.io")
+            await asyncio.sleep(wait)
+
+    # -------------------------- 生命周期 --------------------------
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=90)
+        self.http = aiohttp.ClientSession(connector=connector)
+        self.sio = socketio.AsyncClient(reconnection=False, http_session=self.http)
+        self._register_socket_handlers()
+        student.init_block_page()
+        student.load_student_id()
+
+        self._tasks = [
+            asyncio.create_task(self.keep_socket()),
+            asyncio.create_task(self.every(self.config["URL_BLOCK"]["blacklist_pull_interval"], self.pull_blacklist)),
+            asyncio.create_task(self.every(self.config["URL_BLOCK"]["check_window_interval"], self.check_windows)),
+            asyncio.create_task(self.every(student.collection_interval, self.collect_and_upload,
+                                           student.collection_phase_delay())),
+        ]
+        print(f"✅ 学生机客户端（异步模式）初始化完成（采集间隔：{self.config['COLLECT']['interval']}分钟）")
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """取消所有任务后再关闭连接，保证退出时不遗留半完成的请求"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        try:
+            if self.sio.connected:
+                await self.sio.disconnect()
+        except Exception:
+            pass
+        await self.http.close()
+        self.executor.shutdown(wait=False)
+
+
+def main():
+    runtime = AsyncStudentRuntime()
+
+    async def _main():
+        task = asyncio.create_task(runtime.run())
+        loop = asyncio.get_running_loop()
+        try:
+            # Windows 不支持 add_signal_handler，依赖 KeyboardInterrupt
+            loop.add_signal_handler(signal.SIGTERM, task.cancel)
+        except (NotImplementedError, AttributeError):
+            pass
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+    print("\n👋 客户端已退出")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# visit_session.py —— 会话模式：把前台窗口采样流合并为访问区间
+# 功能：每次采样只告诉 VisitTracker “现在前台是什么”，由它判断访问的开始和结束，
+#      输出三种事件（同一次访问的事件 visit_id 相同）：
+#        open       开始访问（附带截图，服务器新增一条浏览记录）
+#        heartbeat  访问仍在继续，每 heartbeat 秒一次，更新结束时间和停留时长
+#        closed     访问结束（切换到其它页面、没有前台窗口、采样中断或代理退出）
+#      服务器按 visit_id 合并这些事件，因此一次 40 分钟的访问只产生 1 条浏览记录和少量更新，
+#      停留时长也不再受采样间隔和去重窗口影响。
+#
+# 停留时长按相邻两次采样的间隔累加；间隔超过 max_gap（睡眠、锁屏、采样卡住）时
+# 不计入停留时长，并在上一次采样处结束访问。
+
+import time
+import uuid
+
+OPEN = 'open'
+HEARTBEAT = 'heartbeat'
+CLOSED = 'closed'
+
+
+class Visit:
+    __slots__ = ('visit_id', 'key', 'data', 'start', 'end', 'focused', 'last_emit')
+
+    def __init__(self, key, now, data=None):
+        self.visit_id = uuid.uuid4().hex
+        self.key = key
+        self.data = data
+        self.start = now
+        self.end = now
+        self.focused = 0.0
+        self.last_emit = now
+
+    def event(self, state):
+        return {"visit_id": self.visit_id, "state": state, "key": self.key, "data": self.data,
+                "start": self.start, "end": self.end, "focused": round(self.focused, 1)}
+
+
+class VisitTracker:
+    """
+    observe(key, now, data)  每次采样调用一次，key 为 (domain, title)，没有可上报的前台窗口时传 None；
+                             data 为访问开始时附带的数据（如完整URL），原样放在该访问的每个事件中；
+                             返回本次产生的事件列表（按发生顺序，通常为空）
+    close(now)               结束当前访问（代理退出时调用），返回 closed 事件列表
+    """
+
+    def __init__(self, heartbeat=60, max_gap=15, clock=time.time):
+        self.heartbeat = heartbeat
+        self.max_gap = max_gap
+        self.clock = clock
+        self.current = None
+        self.opened = 0
+        self.heartbeats = 0
+        self.closed = 0
+        self.samples = 0
+
+    def _close(self, end):
+        visit, self.current = self.current, None
+        visit.end = max(visit.start, end)
+        self.closed += 1
+        return visit.event(CLOSED)
+
+    def observe(self, key, now=None, data=None):
+        now = self.clock() if now is None else now
+        self.samples += 1
+        events = []
+        visit = self.current
+        if visit is not None:
+            gap = now - visit.end
+            if gap > self.max_gap or gap < 0:
+                # 采样中断（或时钟被调整）：停在上一次看到它的时刻
+                events.append(self._close(visit.end))
+            else:
+                visit.focused += gap
+                visit.end = now
+                if key != visit.key:
+                    events.append(self._close(now))
+        visit = self.current
+        if key is None:
+            return events
+        if visit is None:
+            self.current = Visit(key, now, data)
+            self.opened += 1
+            events.append(self.current.event(OPEN))
+        elif now - visit.last_emit >= self.heartbeat:
+            visit.last_emit = now
+            self.heartbeats += 1
+            events.append(visit.event(HEARTBEAT))
+        return events
+
+    def close(self, now=None):
+        """结束当前访问，返回 closed 事件列表（没有进行中的访问时为空）"""
+        if self.current is None:
+            return []
+        now = self.clock() if now is None else now
+        visit = self.current
+        gap = now - visit.end
+        if 0 <= gap <= self.max_gap:
+            visit.focused += gap
+            visit.end = now
+        return [self._close(visit.end)]
+
+    def metrics(self):
+        return {"samples": self.samples, "opened": self.opened, "heartbeats": self.heartbeats,
+                "closed": self.closed, "open": self.current is not None}
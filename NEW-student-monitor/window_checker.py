@@ -0,0 +1,209 @@
+# window_checker.py —— 浏览器窗口增量检查（URL 拦截用）
+# 功能：每轮检查只列出顶层窗口（很便宜），按窗口句柄保存状态表：
+#      标题、缓存的地址栏控件、最近读到的 URL、是否命中黑名单。
+#      - 只有新出现的窗口或标题变化的窗口才重新读取地址栏（UI Automation 查询很慢），
+#        标题不变的窗口沿用上次的结果；已关闭的窗口从状态表中删除
+#      - 地址栏控件找到后缓存下来，标题变化（切换标签页、打开新网页）时直接读取控件的值，不再搜索控件树
+#      - 地址栏读取在专用线程中执行（UI Automation 需要在所在线程初始化 COM），每次读取有 deadline 秒的期限，
+#        超时的窗口本轮跳过，晚到的结果在下一轮使用，同一窗口同时只有一个读取在进行
+#      - 读取失败或没读到 URL 时窗口保持待读取状态，下一轮重新读取
+#      - 黑名单更新后调用 invalidate()，用缓存的 URL 重新判断，不需要重新读取地址栏
+#      - 记录拦截延迟（time-to-block）：从某一轮检查发现窗口变化（或黑名单更新）到关闭该窗口的时间
+#
+# 接口：
+#   read_url(window, address_bar) -> (url, address_bar)   读取地址栏；address_bar 为上次缓存的控件（可能为 None）
+#   check(windows, on_block)   windows 为当前的顶层窗口列表，命中黑名单的窗口关闭后调用 on_block(window, url)
+
+import collections
+import queue
+import threading
+import time
+
+BROWSER_KEYWORDS = ("chrome", "edge", "firefox", "safari", "浏览器")
+
+
+def looks_like_browser(title):
+    title = title.lower()
+    return any(kw in title for kw in BROWSER_KEYWORDS)
+
+
+def window_handle(window):
+    """platform_probe.Window 用 hwnd，pygetwindow 的窗口对象用 _hWnd"""
+    hwnd = getattr(window, 'hwnd', None)
+    return hwnd if hwnd is not None else getattr(window, '_hWnd', None)
+
+
+def close_window(window):
+    window.close()
+
+
+class _Query:
+    __slots__ = ('window', 'title', 'address_bar', 'url', 'done', 'started', 'seconds')
+
+    def __init__(self, window, title, address_bar, started):
+        self.window = window
+        self.title = title
+        self.address_bar = address_bar
+        self.url = None
+        self.done = threading.Event()
+        self.started = started
+        self.seconds = 0.0
+
+
+class WindowState:
+    __slots__ = ('hwnd', 'title', 'address_bar', 'url', 'verdict', 'dirty', 'pending', 'changed_at', 'notified')
+
+    def __init__(self, hwnd):
+        self.hwnd = hwnd
+        self.title = None
+        self.address_bar = None
+        self.url = None
+        self.verdict = None       # None: 未判断；True / False: 是否命中黑名单
+        self.dirty = True         # 标题变化后还没有读到对应的 URL
+        self.pending = None       # 正在进行的地址栏读取
+        self.changed_at = None    # 发现标题变化（或黑名单更新）的那一轮检查的时间
+        self.notified = False     # 已经为当前 URL 调用过 on_block
+
+
+class BrowserWindowChecker:
+    """
+    read_url     读取地址栏的函数，见模块说明
+    is_blocked   判断 URL 是否命中黑名单
+    deadline     单次地址栏读取的期限（秒）
+    is_browser   根据窗口标题判断是否为浏览器窗口
+    close        关闭窗口的函数
+    worker_init  在读取线程启动时调用一次（如初始化 COM），返回值在线程存活期间保持引用
+    """
+
+    def __init__(self, read_url, is_blocked, deadline=1.0, is_browser=looks_like_browser, close=close_window,
+                 worker_init=None, history=100, clock=time.monotonic):
+        self.read_url = read_url
+        self.is_blocked = is_blocked
+        self.deadline = deadline
+        self.is_browser = is_browser
+        self.close = close
+        self.worker_init = worker_init
+        self.clock = clock
+        self._states = {}
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_context = None
+        self._rules_changed = False
+        self._latencies = collections.deque(maxlen=history)
+        self.stats = {"scans": 0, "uia_queries": 0, "uia_skipped": 0, "uia_timeouts": 0, "uia_late": 0,
+                      "uia_errors": 0, "address_bar_reused": 0, "uia_seconds": 0.0, "blocked": 0}
+
+    # -------------------------- 地址栏读取线程 --------------------------
+    def _run_worker(self):
+        # 返回值（如 COM 初始化对象）保持引用直到线程结束
+        self._worker_context = self.worker_init() if self.worker_init else None
+        while True:
+            query = self._queue.get()
+            started = time.monotonic()
+            try:
+                query.url, query.address_bar = self.read_url(query.window, query.address_bar)
+            except Exception as e:
+                print(f"❌ 读取浏览器地址栏失败: {e}")
+                query.url, query.address_bar = None, None
+                self.stats["uia_errors"] += 1
+            query.seconds = time.monotonic() - started
+            query.done.set()
+
+    def _submit(self, state, window):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run_worker, name='browser-url-reader', daemon=True)
+            self._worker.start()
+        if state.address_bar is not None:
+            self.stats["address_bar_reused"] += 1
+        self.stats["uia_queries"] += 1
+        state.pending = _Query(window, state.title, state.address_bar, self.clock())
+        self._queue.put(state.pending)
+
+    def _collect(self, state, late):
+        """取回已完成的读取结果；结果对应的标题已经过时则丢弃，没读到 URL（读取失败、页面还在加载）时下一轮重新读取"""
+        query = state.pending
+        state.pending = None
+        self.stats["uia_seconds"] += query.seconds
+        if late:
+            self.stats["uia_late"] += 1
+        state.address_bar = query.address_bar
+        if query.title != state.title or query.url is None:
+            return
+        state.url = query.url
+        state.verdict = None
+        state.dirty = False
+
+    def _refresh(self, state, window):
+        """需要时读取地址栏，最多等待 deadline 秒"""
+        if state.pending is not None and state.pending.done.is_set():
+            self._collect(state, late=True)
+        if state.pending is None and state.dirty:
+            self._submit(state, window)
+            if state.pending.done.wait(self.deadline):
+                self._collect(state, late=False)
+            else:
+                self.stats["uia_timeouts"] += 1
+        elif state.pending is None:
+            self.stats["uia_skipped"] += 1
+
+    # -------------------------- 检查 --------------------------
+    def invalidate(self):
+        """黑名单变化后调用（可在其它线程中调用）：下一轮用缓存的 URL 重新判断"""
+        self._rules_changed = True
+
+    def check(self, windows, on_block=None):
+        now = self.clock()
+        self.stats["scans"] += 1
+        if self._rules_changed:
+            self._rules_changed = False
+            for state in self._states.values():
+                state.verdict = None
+                state.notified = False
+                state.changed_at = now
+
+        seen = set()
+        for window in windows:
+            title = (window.title or '').strip()
+            hwnd = window_handle(window)
+            if not title or hwnd is None or not self.is_browser(title):
+                continue
+            seen.add(hwnd)
+            state = self._states.get(hwnd)
+            if state is None:
+                state = self._states[hwnd] = WindowState(hwnd)
+            if state.title != title:
+                state.title = title
+                state.url = None
+                state.verdict = None
+                state.dirty = True
+                state.notified = False
+                state.changed_at = now
+            self._refresh(state, window)
+
+            if state.url and state.verdict is None:
+                state.verdict = self.is_blocked(state.url)
+            if state.verdict:
+                self._block(state, window, on_block)
+
+        for hwnd in [hwnd for hwnd in self._states if hwnd not in seen]:
+            del self._states[hwnd]
+
+    def _block(self, state, window, on_block):
+        # 关闭失败时窗口还会出现在下一轮的列表里，只重新关闭，不重复通知
+        self.close(window)
+        if state.notified:
+            return
+        state.notified = True
+        self.stats["blocked"] += 1
+        self._latencies.append(self.clock() - state.changed_at)
+        if on_block:
+            on_block(window, state.url)
+
+    def metrics(self):
+        latencies = sorted(self._latencies)
+
+        def pick(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+
+        return dict(self.stats, uia_seconds=round(self.stats["uia_seconds"], 3), windows=len(self._states),
+                    time_to_block={"p50": pick(0.5), "p95": pick(0.95), "max": pick(1.0)})